@@ -1,15 +1,36 @@
+import asyncio
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
 
 from jose import jwt
 from passlib.context import CryptContext
 
 from app.config import settings
 from app.utils.logger import setup_logger
+from app.utils.rate_limiter import KeyedRateLimiter
 
 _logger = setup_logger(__name__)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+GOOGLE_CERTS_URL: str = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS: Tuple[str, ...] = ("accounts.google.com", "https://accounts.google.com")
+DEFAULT_CERT_TTL: float = 300.0  # Seconds certificates are kept when the response has no max-age
+MIN_CERT_REFETCH: float = 60.0  # Unknown key IDs trigger at most one early refetch per this many seconds
+
+# A bcrypt round takes ~250 ms on a Raspberry Pi; run on the event loop it would stall every stream
+_executor = ThreadPoolExecutor(max_workers=settings.AUTH_WORKERS, thread_name_prefix="auth")
+
+_workers = max(1, settings.WEB_CONCURRENCY)
+login_limiter: KeyedRateLimiter = KeyedRateLimiter(
+    rate=settings.LOGIN_PER_MINUTE / 60 / _workers,
+    capacity=max(1, settings.LOGIN_BURST // _workers)
+)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verify a plain text password against a hashed password.
@@ -35,6 +56,106 @@ def get_password_hash(password: str) -> str:
     """
     return pwd_context.hash(password)
 
+async def _run(func: Callable[..., Any], *args: Any) -> Any:
+    return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    `verify_password` on the auth thread pool, leaving the event loop free.
+    """
+    return await _run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    `get_password_hash` on the auth thread pool, leaving the event loop free.
+    """
+    return await _run(get_password_hash, password)
+
+def cache_max_age(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Seconds a response stays fresh: its Cache-Control max-age minus its Age.
+
+    Returns:
+        The remaining lifetime, or None if the response must not be cached or has no max-age.
+    """
+    headers = {name.lower(): value for name, value in headers.items()}
+    cache_control = headers.get("cache-control", "").lower()
+    match = re.search(r"max-age=(\d+)", cache_control)
+    if not match or "no-store" in cache_control or "no-cache" in cache_control:
+        return None
+    age = headers.get("age", "0")
+    return max(0.0, int(match.group(1)) - (int(age) if age.isdigit() else 0))
+
+class GoogleCerts:
+    """
+    Google's ID token signing certificates, kept for as long as their response's
+    Cache-Control allows (verify_oauth2_token fetches them on every call, one
+    blocking HTTPS round trip per login). A token signed with a key ID missing
+    from the cached set causes an early refetch, since Google rotates its keys.
+    """
+    def __init__(self) -> None:
+        self._certs: Dict[str, str] = {}
+        self._expires = 0.0
+        self._fetched = float("-inf")
+        self._request: Any = None
+        self._lock = threading.Lock()
+
+    def _fetch(self) -> Tuple[Dict[str, str], float]:
+        from google.auth import exceptions
+        from google.auth.transport import requests
+
+        if self._request is None:
+            self._request = requests.Request()  # Keeps one HTTPS session to Google
+        response = self._request(GOOGLE_CERTS_URL, method="GET")
+        if response.status != 200:
+            raise exceptions.TransportError(f"Could not fetch Google certificates: HTTP {response.status}")
+        ttl = cache_max_age(response.headers)
+        return json.loads(response.data), DEFAULT_CERT_TTL if ttl is None else ttl
+
+    def get(self, key_id: Optional[str] = None) -> Dict[str, str]:
+        """
+        The current certificates by key ID, refetched if expired or missing `key_id`.
+        """
+        with self._lock:
+            now = time.monotonic()
+            unknown = key_id is not None and key_id not in self._certs and now - self._fetched >= MIN_CERT_REFETCH
+            if now >= self._expires or unknown:
+                self._certs, ttl = self._fetch()
+                self._fetched = now
+                self._expires = now + ttl
+                _logger.info("Fetched %d Google certificates, fresh for %.0f s", len(self._certs), ttl)
+            return self._certs
+
+google_certs: GoogleCerts = GoogleCerts()
+
+def verify_google_id_token(token: str) -> Dict[str, Any]:
+    """
+    Verify a Google ID token's signature, audience, expiry and issuer, as
+    `id_token.verify_oauth2_token` does, against the cached certificates.
+
+    Args:
+        token: The encoded ID token.
+
+    Returns:
+        The token's claims.
+
+    Raises:
+        ValueError: If the token is malformed, expired, for another client or not issued by Google.
+    """
+    from google.auth import jwt as google_jwt
+
+    certs = google_certs.get(google_jwt.decode_header(token).get("kid"))
+    claims = google_jwt.decode(token, certs=certs, audience=settings.GOOGLE_CLIENT_ID)
+    if claims.get("iss") not in GOOGLE_ISSUERS:
+        raise ValueError(f"Wrong issuer: {claims.get('iss')}")
+    return claims
+
+async def verify_google_id_token_async(token: str) -> Dict[str, Any]:
+    """
+    `verify_google_id_token` on the auth thread pool, leaving the event loop free.
+    """
+    return await _run(verify_google_id_token, token)
+
 def create_access_token(
     data: dict, 
     expires_delta: Optional[timedelta] = None
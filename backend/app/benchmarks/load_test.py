@@ -0,0 +1,145 @@
+"""
+HTTP load-test harness.
+
+Drives a running server with a fixed number of concurrent clients and reports
+throughput and latency percentiles. With --workers it starts uvicorn itself for
+each worker count in turn (on a throwaway copy of the settings) and prints how
+throughput scales across cores.
+
+Usage (from the backend directory):
+    python -m app.benchmarks.load_test --url http://localhost:8000 --path /health
+    python -m app.benchmarks.load_test --workers 1,2,4 --path /health --path "/search?q=queen"
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def run_load(
+    base_url: str,
+    paths: List[str],
+    concurrency: int = 32,
+    duration: float = 10.0,
+    headers: Optional[Dict[str, str]] = None
+) -> Dict[str, float]:
+    """
+    Issue requests round-robin over `paths` from `concurrency` clients for `duration` seconds.
+
+    Args:
+        base_url: Server root, e.g. "http://localhost:8000".
+        paths: Request paths (GET) cycled through by each client.
+        concurrency: Number of concurrent clients.
+        duration: Test length in seconds.
+        headers: Extra request headers (e.g. Authorization).
+
+    Returns:
+        Summary with requests, errors, requests per second and latency percentiles (ms).
+    """
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=30) as client:
+        async def worker(offset: int) -> None:
+            nonlocal errors
+            index = offset
+            while time.perf_counter() < deadline:
+                path = paths[index % len(paths)]
+                index += 1
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50": _percentile(latencies, 0.50),
+        "p95": _percentile(latencies, 0.95),
+        "p99": _percentile(latencies, 0.99),
+    }
+
+def _wait_ready(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health/ready", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} did not become ready")
+
+def run_scaling(worker_counts: List[int], paths: List[str], concurrency: int, duration: float, port: int) -> None:
+    """
+    Start uvicorn with each worker count, load it and print a throughput table.
+    """
+    base_url = f"http://127.0.0.1:{port}"
+    baseline: Optional[float] = None
+    print(f"{'workers':>7} {'req/s':>9} {'scale':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for workers in worker_counts:
+        env = {**os.environ, "WEB_CONCURRENCY": str(workers)}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+             "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            _wait_ready(base_url)
+            result = asyncio.run(run_load(base_url, paths, concurrency, duration))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        baseline = baseline or result["rps"]
+        print(
+            f"{workers:>7} {result['rps']:>9.1f} {result['rps'] / baseline:>5.2f}x "
+            f"{result['p50']:>8.1f} {result['p95']:>8.1f} {result['p99']:>8.1f} {result['errors']:>7}"
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="Server to load (ignored with --workers)")
+    parser.add_argument("--path", action="append", help="Request path, repeatable (default /health)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--token", help="Bearer token for authenticated endpoints")
+    parser.add_argument("--workers", help="Comma-separated uvicorn worker counts to compare, e.g. 1,2,4")
+    parser.add_argument("--port", type=int, default=8765, help="Port used with --workers")
+    args = parser.parse_args()
+    paths = args.path or ["/health"]
+
+    if args.workers:
+        run_scaling([int(w) for w in args.workers.split(",")], paths, args.concurrency, args.duration, args.port)
+        return
+
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else None
+    result = asyncio.run(run_load(args.url, paths, args.concurrency, args.duration, headers))
+    print(
+        f"{result['requests']} requests, {result['errors']} errors, {result['rps']:.1f} req/s, "
+        f"p50 {result['p50']:.1f} ms, p95 {result['p95']:.1f} ms, p99 {result['p99']:.1f} ms"
+    )
+
+if __name__ == "__main__":
+    main()
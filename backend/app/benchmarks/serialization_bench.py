@@ -0,0 +1,121 @@
+"""
+Track-list serialisation benchmark.
+
+Builds a throwaway SQLite database with one large playlist and a large liked
+list, then times the query-to-bytes path of the playlist and liked endpoints
+two ways: the previous one (full ORM rows, `.dict()` per row, `jsonable_encoder`
+and stdlib json) and the current one (column selects encoded by
+`utils.json_response.dumps`).
+
+Usage (from the backend directory):
+    python -m app.benchmarks.serialization_bench [--sizes 500,5000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from typing import Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.models import PlaylistTrack, Track, UserActivity
+from app.services.playlist_order import GAP
+from app.services.tracks import TRACK_COLUMNS, row_dicts
+from app.utils import json_response
+
+def _populate(session: Session, size: int) -> None:
+    for index in range(size):
+        track_id = str(uuid.uuid4())
+        session.add(Track(
+            id=track_id, title=f"Song {index}", artist=f"Artist {index % 50}", album=f"Album {index % 200}",
+            source_type="youtube", remote_id=f"vid{index:08d}", duration=180 + index % 120,
+            thumbnail=f"https://i.ytimg.com/vi/vid{index:08d}/hqdefault.jpg"
+        ))
+        session.add(PlaylistTrack(playlist_id="bench", track_id=track_id, position=(index + 1) * GAP))
+        session.add(UserActivity(user_id="bench", track_id=track_id, is_liked=True, play_count=index % 7))
+    session.commit()
+
+def _legacy_playlist(session: Session) -> bytes:
+    rows = session.exec(
+        select(Track, PlaylistTrack.position, PlaylistTrack.id)
+        .join(PlaylistTrack).where(PlaylistTrack.playlist_id == "bench").order_by(PlaylistTrack.position)
+    ).all()
+    result = []
+    for track, position, entry_id in rows:
+        t_dict = track.dict()
+        t_dict["playlist_position"] = position
+        t_dict["entry_id"] = entry_id
+        result.append(t_dict)
+    return json.dumps(jsonable_encoder(result)).encode()
+
+def _lean_playlist(session: Session) -> bytes:
+    rows = session.exec(
+        select(*TRACK_COLUMNS, PlaylistTrack.position.label("playlist_position"), PlaylistTrack.id.label("entry_id"))
+        .join(PlaylistTrack).where(PlaylistTrack.playlist_id == "bench").order_by(PlaylistTrack.position)
+    ).all()
+    return json_response.dumps(row_dicts(rows))
+
+def _legacy_liked(session: Session) -> bytes:
+    rows = session.exec(
+        select(Track).join(UserActivity).where(UserActivity.user_id == "bench", UserActivity.is_liked == True)
+    ).all()
+    return json.dumps(jsonable_encoder([t.dict() for t in rows])).encode()
+
+def _lean_liked(session: Session) -> bytes:
+    rows = session.exec(
+        select(*TRACK_COLUMNS).join(UserActivity).where(UserActivity.user_id == "bench", UserActivity.is_liked == True)
+    ).all()
+    result = row_dicts(rows)
+    for t_dict in result:
+        t_dict["is_liked"] = True
+    return json_response.dumps(result)
+
+def _time(engine, func: Callable[[Session], bytes], repeat: int) -> Dict[str, float]:
+    samples: List[float] = []
+    size = 0
+    for _ in range(repeat):
+        # A fresh session per run, as in a request: nothing comes from the identity map
+        with Session(engine) as session:
+            started = time.perf_counter()
+            size = len(func(session))
+            samples.append((time.perf_counter() - started) * 1000)
+    return {"median": statistics.median(samples), "best": min(samples), "bytes": size}
+
+def run(sizes: List[int], repeat: int) -> None:
+    """
+    Print the median timings of both paths for each list size.
+    """
+    encoder = "orjson" if json_response.orjson is not None else "stdlib json (orjson not installed)"
+    print(f"Lean path encoder: {encoder}")
+    print(f"{'endpoint':>9} {'rows':>6} {'legacy ms':>10} {'lean ms':>8} {'speedup':>8} {'KiB':>7}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            SQLModel.metadata.create_all(engine)
+            with Session(engine) as session:
+                _populate(session, size)
+            for name, legacy, lean in (
+                ("playlist", _legacy_playlist, _lean_playlist),
+                ("liked", _legacy_liked, _lean_liked),
+            ):
+                old = _time(engine, legacy, repeat)
+                new = _time(engine, lean, repeat)
+                print(
+                    f"{name:>9} {size:>6} {old['median']:>10.1f} {new['median']:>8.1f} "
+                    f"{old['median'] / new['median']:>7.1f}x {new['bytes'] / 1024:>7.0f}"
+                )
+            engine.dispose()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="500,5000", help="Comma-separated list sizes")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    run([int(s) for s in args.sizes.split(",")], args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Startup cost report.
+
+Measures what the API pays before it can serve its first request:
+per-module import cost (from a fresh interpreter with `-X importtime`) and
+the cost of the initialisation steps run at startup.
+
+Usage (from the backend directory):
+    python -m app.benchmarks.startup_bench [--top 20]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+def measure_imports(module: str = "app.main") -> Tuple[float, List[Tuple[str, float]]]:
+    """
+    Import `module` in a fresh interpreter and aggregate cumulative import time per top-level package.
+
+    Args:
+        module: Module to import.
+
+    Returns:
+        (total milliseconds, list of (package, milliseconds) sorted by cost).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=os.environ.copy()
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    per_package: Dict[str, float] = defaultdict(float)
+    total = 0.0
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        package = name.split(".")[0]
+        if package == "app":
+            # Break our own package down per module
+            package = ".".join(name.split(".")[:2])
+        per_package[package] += int(self_us) / 1000
+        total += int(self_us) / 1000
+    ranked = sorted(per_package.items(), key=lambda kv: kv[1], reverse=True)
+    return total, ranked
+
+def _timed(func: Callable[[], object]) -> float:
+    started = time.perf_counter()
+    func()
+    return (time.perf_counter() - started) * 1000
+
+def measure_init() -> List[Tuple[str, float]]:
+    """
+    Time the startup initialisation steps against a throwaway database.
+
+    Returns:
+        List of (step, milliseconds).
+    """
+    tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+
+    from app.db import init_db
+    from app.services.metadata_cache import MetadataCache
+    from app.services.ytmusic_client import YTMusicClient
+
+    steps = [
+        ("init_db (fresh)", init_db),
+        ("init_db (migrated)", init_db),
+        ("metadata cache connect", lambda: MetadataCache(os.path.join(tmp, "meta.db"))._conn()),
+        ("YTMusic client construct", lambda: YTMusicClient()._get_yt()),
+    ]
+    return [(name, _timed(func)) for name, func in steps]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=20, help="Number of packages to list")
+    args = parser.parse_args()
+
+    total, ranked = measure_imports()
+    print(f"Import of app.main: {total:.1f} ms")
+    for package, ms in ranked[:args.top]:
+        print(f"  {package:<40} {ms:8.1f} ms")
+
+    print("Initialisation:")
+    for name, ms in measure_init():
+        print(f"  {name:<40} {ms:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Search suggestion benchmark.
+
+Fills a throwaway SQLite database with synthetic tracks (titles, artists and
+albums drawn from a fixed vocabulary), rebuilds the suggest index from it and
+times `SuggestIndex.suggest` for short and longer prefixes, whole words,
+words with two letters swapped and random letters.
+
+Usage (from the backend directory):
+    python -m app.benchmarks.suggest_bench [--tracks 100000] [--queries 2000]
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import tempfile
+import time
+import uuid
+from typing import Dict, List
+
+import psutil
+from sqlalchemy import insert
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.models import Track
+from app.services.suggest import SuggestIndex
+
+_SYLLABLES = ["ka", "lo", "mi", "ra", "sun", "ve", "tor", "el", "an", "dre", "no", "shi", "ba", "lu", "ze", "qui"]
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(1, 4)))
+
+def _populate(engine, tracks: int, rng: random.Random) -> List[str]:
+    vocabulary = [_word(rng) for _ in range(20000)]
+    artists = [" ".join(rng.sample(vocabulary, rng.randint(1, 3))).title() for _ in range(tracks // 20)]
+    albums = [" ".join(rng.sample(vocabulary, rng.randint(1, 4))).title() for _ in range(tracks // 10)]
+    titles = [" ".join(rng.sample(vocabulary, rng.randint(1, 6))).title() for _ in range(tracks)]
+    with Session(engine) as session:
+        session.exec(insert(Track), params=[
+            {"id": str(uuid.uuid4()), "title": title, "artist": rng.choice(artists),
+             "album": rng.choice(albums), "source_type": "local"}
+            for title in titles
+        ])
+        session.commit()
+    return titles
+
+def _typo(word: str, rng: random.Random) -> str:
+    position = rng.randrange(len(word) - 1)
+    return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+
+def _inputs(titles: List[str], count: int, rng: random.Random) -> Dict[str, List[str]]:
+    words = [w.lower() for title in rng.sample(titles, count) for w in title.split() if len(w) >= 5][:count]
+    return {
+        "prefix 1-2": [w[:rng.randint(1, 2)] for w in words],
+        "prefix 3-5": [w[:rng.randint(3, 5)] for w in words],
+        "whole word": words,
+        "typo": [_typo(w, rng) for w in words],
+        "gibberish": ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 8))) for _ in words],
+    }
+
+def run(tracks: int, queries: int, seed: int) -> None:
+    """
+    Print build time, index memory and per-lookup latency percentiles.
+    """
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        SQLModel.metadata.create_all(engine)
+        titles = _populate(engine, tracks, rng)
+
+        index = SuggestIndex()
+        process = psutil.Process()
+        rss = process.memory_info().rss
+        started = time.perf_counter()
+        with Session(engine) as session:
+            index.rebuild(session)
+        build_ms = (time.perf_counter() - started) * 1000
+        grown = process.memory_info().rss - rss
+        engine.dispose()
+
+    print(f"{tracks} tracks -> {len(index)} terms; build {build_ms:.0f} ms, process grew {grown / 2 ** 20:.0f} MiB")
+    print(f"{'input':>11} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'hits':>6}")
+    for name, inputs in _inputs(titles, queries, rng).items():
+        samples: List[float] = []
+        hits = 0
+        for text in inputs:
+            started = time.perf_counter()
+            hits += bool(index.suggest(text, 8))
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        print(
+            f"{name:>11} {statistics.median(samples):>8.3f} {samples[int(len(samples) * 0.99) - 1]:>8.3f} "
+            f"{samples[-1]:>8.3f} {hits / len(samples):>6.0%}"
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    run(args.tracks, args.queries, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,126 @@ class Settings(BaseSettings):
     API_SUBDOMAIN: Optional[str] = None
     CLOUDFLARE_TUNNEL_TOKEN: Optional[str] = None
 
+    # Reverse proxies in front of the app (Caddy and the tunnel connector on the Docker network),
+    # whose X-Forwarded-For / CF-Connecting-IP headers are trusted to name the client
+    TRUSTED_PROXIES: str = "127.0.0.1,::1,172.16.0.0/12"
+
+    # Number of uvicorn worker processes (also read by uvicorn itself); shared budgets
+    # such as the YouTube Music rate limit are split between them
+    WEB_CONCURRENCY: int = 1
+
+    # Logging: default level, per-module overrides ("app.services.streamer=WARNING,app.indexer=DEBUG"),
+    # "text" or "json" output, directory of the rotating app.log (skipped if missing) and the
+    # per-second rate and burst of each per-request message template
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: str = ""
+    LOG_FORMAT: str = "text"
+    LOG_DIR: Optional[str] = "/app/db"
+    LOG_REQUEST_RATE: float = 2.0
+    LOG_REQUEST_BURST: float = 10.0
+
+    # Seconds to wait after startup before the full library scan begins
+    STARTUP_SCAN_DELAY: int = 30
+
+    # Background jobs: worker threads for scans/rebuilds ("cpu") and transfers ("io")
+    JOB_CPU_WORKERS: int = 1
+    JOB_IO_WORKERS: int = 2
+
+    # Authentication: threads running bcrypt and Google token checks off the event loop, and
+    # login attempts allowed per client IP (a burst, then a steady rate; split between workers)
+    AUTH_WORKERS: int = 2
+    LOGIN_BURST: int = 10
+    LOGIN_PER_MINUTE: float = 10.0
+
+    # Playlists: maximum tracks per batch/import request and parallel YouTube lookups while importing
+    PLAYLIST_BATCH_LIMIT: int = 1000
+    PLAYLIST_IMPORT_CONCURRENCY: int = 8
+
+    # Response cache for read-heavy list endpoints (per worker process)
+    RESPONSE_CACHE_TTL: int = 30
+    RESPONSE_CACHE_SIZE: int = 512
+
+    # Storage inventory: running totals are re-seeded from a full walk this often (seconds)
+    INVENTORY_RECONCILE_INTERVAL: int = 86400
+
+    # Consistency sweeper: stale partials, temp cache budget and track row repair
+    SWEEP_INTERVAL: int = 21600
+    SWEEP_IO_RATE: int = 200  # Filesystem operations per second
+    PARTIAL_MAX_AGE: int = 3600  # .download files untouched this long are leftovers
+    TEMP_CACHE_MAX_GB: float = 2.0
+
+    # Artist/album browse catalog: aggregates are recomputed from scratch this often (seconds)
+    CATALOG_REBUILD_INTERVAL: int = 86400
+
+    # Smart playlists: rules and tracks per playlist, SQLite VM steps one full evaluation may
+    # take, and seconds before playlists with relative-date rules are re-evaluated on view
+    SMART_PLAYLIST_MAX_RULES: int = 10
+    SMART_PLAYLIST_MAX_TRACKS: int = 500
+    SMART_PLAYLIST_MAX_STEPS: int = 20000000
+    SMART_PLAYLIST_MAX_AGE: int = 3600
+
+    # Listening history: plays buffered per worker before one batched insert (flushed at least
+    # every PLAY_LOG_FLUSH_INTERVAL seconds), rollup interval and retention of raw/daily rows
+    PLAY_LOG_BATCH: int = 100
+    PLAY_LOG_FLUSH_INTERVAL: float = 2.0
+    PLAY_ROLLUP_INTERVAL: int = 900
+    PLAY_EVENT_RETENTION_DAYS: int = 90
+    PLAY_DAILY_RETENTION_DAYS: int = 400
+
+    # Stream pacing: upstream bandwidth shared fairly by all /stream responses (0 = unlimited),
+    # seconds of audio sent at once to fill the player's buffer, delivery rate after that as a
+    # multiple of the track's bitrate (STREAM_DEFAULT_KBPS when unknown, as for live YouTube),
+    # and a default per-listener cap (0 = none) with overrides ("user_id=kbps,ip:1.2.3.4=kbps").
+    # Bandwidth budgets are split between workers
+    STREAM_UPLINK_KBPS: int = 10000
+    STREAM_BURST_SECONDS: float = 15.0
+    STREAM_PACE_MULTIPLIER: float = 2.0
+    STREAM_DEFAULT_KBPS: int = 160
+    STREAM_USER_KBPS: int = 0
+    STREAM_USER_LIMITS: str = ""
+
+    # Downloads: yt-dlp processes running at once (split between workers), how many of them prefetch
+    # and offline sync may take (the rest are kept for playback), live YouTube streams per signed-in
+    # listener before their oldest is cancelled (0 = no limit) and seconds a stream waits for a free process
+    DOWNLOAD_MAX_PROCESSES: int = 4
+    DOWNLOAD_MAX_BACKGROUND: int = 2
+    DOWNLOAD_PER_LISTENER: int = 3
+    DOWNLOAD_QUEUE_TIMEOUT: float = 10.0
+
+    # Search: seconds to wait for YouTube Music before answering with local results only,
+    # and before a progressive (/search/stream) search gives up on it
+    SEARCH_YOUTUBE_DEADLINE: float = 1.5
+    SEARCH_STREAM_TIMEOUT: float = 10.0
+
+    # Search suggestions: seconds between full rebuilds of each worker's in-memory index
+    # (tracks indexed by the leader reach other workers' indexes on the next rebuild)
+    SUGGEST_REBUILD_INTERVAL: int = 600
+
+    # Response compression (brotli is used when the optional package is installed)
+    COMPRESSION_MIN_SIZE: int = 512
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 4
+
+    # Request profiling
+    SLOW_REQUEST_THRESHOLD_MS: int = 1000
+    PROFILE_SAMPLE_RATE: float = 0.0
+
+    # YouTube metadata cache (defaults to yt_metadata.db next to the SQLite database)
+    METADATA_CACHE_PATH: Optional[str] = None
+
+    # YouTube Music client: dedicated executor, token bucket and retries
+    YTMUSIC_MAX_WORKERS: int = 4
+    YTMUSIC_RATE_PER_SEC: float = 5.0
+    YTMUSIC_BURST: int = 10
+    YTMUSIC_MAX_RETRIES: int = 3
+    YTMUSIC_POOL_SIZE: int = 8
+
+    # Radio Mode: seconds between full rebuilds of the local recommendation index
+    RADIO_REBUILD_INTERVAL: int = 1800
+
+    # Deduplication: confirm tag matches with an ffmpeg-based acoustic fingerprint
+    DEDUP_FINGERPRINT: bool = False
+
     @classmethod
     def strip_variables(cls, values: dict) -> dict:
         """
@@ -1,8 +1,12 @@
+import os
 import typing
+from sqlalchemy import event
 from sqlmodel import create_engine, Session, SQLModel
 
 from app.config import settings
+from app.utils.leader import default_lock_dir, file_lock
 from app.utils.logger import setup_logger
+from app.utils.profiler import install_sqlalchemy_hooks
 
 _logger = setup_logger(__name__)
 
@@ -14,33 +18,113 @@ else:
     connect_args = {}
 
 engine = create_engine(uri, connect_args=connect_args)
+install_sqlalchemy_hooks(engine)
+
+if uri.startswith("sqlite"):
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record) -> None:
+        # WAL lets worker processes read while another writes; wait on locks instead of failing
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+
+# (table, column, SQL type) added after tables may already exist in deployed databases
+_ADDED_COLUMNS = [
+    ("track", "thumbnail", "TEXT"),
+    ("track", "dedup_key", "VARCHAR"),
+    ("track", "canonical_id", "VARCHAR"),
+    ("job", "cancel_requested", "BOOLEAN NOT NULL DEFAULT 0"),
+    ("track", "file_size", "INTEGER"),
+    ("track", "artist_id", "VARCHAR"),
+    ("track", "album_id", "VARCHAR"),
+    ("track", "thumbnail_checked_at", "DATETIME"),
+]
+# (index name, table, column) for indexed columns from `_ADDED_COLUMNS`
+_ADDED_INDEXES = [
+    ("ix_track_dedup_key", "track", "dedup_key"),
+    ("ix_track_canonical_id", "track", "canonical_id"),
+    ("ix_track_artist_id", "track", "artist_id"),
+    ("ix_track_album_id", "track", "album_id"),
+    ("ix_useractivity_user_last_played", "useractivity", "user_id, last_played"),
+]
+# (table, column) whose absence means the table predates a primary key change and must be rebuilt
+_REBUILT_TABLES = [
+    ("playlisttrack", "id"),
+]
+# Stored in SQLite's `user_version`; the lists are append-only, so their length identifies
+# the migration level and lets startup skip schema inspection once it is reached
+_SCHEMA_VERSION: int = len(_ADDED_COLUMNS) + len(_ADDED_INDEXES) + len(_REBUILT_TABLES)
+
+# Spacing used when renumbering playlist positions (see services/playlist_order.py)
+_PLAYLIST_GAP: int = 1024
+
+def _rebuild_table(conn: typing.Any, table: str) -> None:
+    """
+    Recreate a table from the current model and copy its rows over (SQLite cannot alter primary keys).
+    """
+    from sqlalchemy import text
+
+    columns = {
+        # Old composite-key rows get a surrogate id and sparse positions in their existing order
+        "playlisttrack": (
+            "playlist_id, track_id, position",
+            f"playlist_id, track_id, ROW_NUMBER() OVER (PARTITION BY playlist_id ORDER BY position) * {_PLAYLIST_GAP}"
+        ),
+    }[table]
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {table}_old"))
+    SQLModel.metadata.tables[table].create(conn)
+    conn.execute(text(f"INSERT INTO {table} ({columns[0]}) SELECT {columns[1]} FROM {table}_old"))
+    conn.execute(text(f"DROP TABLE {table}_old"))
 
 def init_db() -> None:
     """
     Initialize the database by creating all defined models as tables.
+    Worker processes run this one at a time.
     """
-    import os
-    from app import models
-    
     # Ensure the directory for the database file exists
     if uri.startswith("sqlite:///"):
         db_path = uri.replace("sqlite:///", "")
         db_dir = os.path.dirname(db_path)
         if db_dir and not os.path.exists(db_dir):
             os.makedirs(db_dir, exist_ok=True)
-            
+
+    with file_lock(os.path.join(default_lock_dir(), "myspotify.init.lock")):
+        _create_and_migrate()
+
+def _create_and_migrate() -> None:
+    from app import models
+
     SQLModel.metadata.create_all(engine)
     
-    # Check for missing thumbnail column (Automatic Migration)
+    from sqlalchemy import text, inspect
+
+    is_sqlite = uri.startswith("sqlite")
+    if is_sqlite:
+        with engine.connect() as conn:
+            if conn.execute(text("PRAGMA user_version")).scalar() == _SCHEMA_VERSION:
+                return
+
+    # Add columns introduced after the initial schema (Automatic Migration)
     try:
-        from sqlalchemy import text, inspect
         inspector = inspect(engine)
-        if "track" in inspector.get_table_names():
-            columns = [c["name"] for c in inspector.get_columns("track")]
-            if "thumbnail" not in columns:
-                _logger.info("Migrating database: Adding 'thumbnail' column to 'track' table")
-                with engine.begin() as conn:
-                    conn.execute(text("ALTER TABLE track ADD COLUMN thumbnail TEXT"))
+        existing_tables = inspector.get_table_names()
+        with engine.begin() as conn:
+            for table, column in _REBUILT_TABLES:
+                if table in existing_tables and column not in [c["name"] for c in inspector.get_columns(table)]:
+                    _logger.info("Migrating database: Rebuilding '%s' table", table)
+                    _rebuild_table(conn, table)
+            for table, column, sql_type in _ADDED_COLUMNS:
+                if table not in existing_tables:
+                    continue
+                columns = [c["name"] for c in inspector.get_columns(table)]
+                if column not in columns:
+                    _logger.info("Migrating database: Adding '%s' column to '%s' table", column, table)
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {sql_type}"))
+            for index_name, table, column in _ADDED_INDEXES:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({column})"))
+            if is_sqlite:
+                conn.execute(text(f"PRAGMA user_version = {_SCHEMA_VERSION}"))
     except Exception:
         _logger.exception("Automatic database migration failed")
 
@@ -1,12 +1,16 @@
 import uuid
 from pathlib import Path
+from typing import Optional
 
-from mutagen.mp3 import MP3
-from mutagen.id3 import ID3
 from sqlmodel import Session, select
 
 from app.models import Track
 from app.db import engine
+from app.services import catalog, inventory, smart_playlists
+from app.services.dedup import dedup_key, link_duplicates
+from app.services.jobs import JobContext
+from app.services.response_cache import LIBRARY, bump
+from app.services.suggest import suggest_index
 from app.utils.logger import setup_logger
 
 _logger = setup_logger(__name__)
@@ -29,12 +33,17 @@ def scan_file(file_path: Path, session: Session) -> None:
         if existing:
             return
 
+        # Deferred: mutagen is only needed once a new file has to be read
+        from mutagen.mp3 import MP3
+        from mutagen.id3 import ID3
+
         audio = MP3(file_path, ID3=ID3)
         
         title = audio.get("TIT2", [file_path.stem])[0]
         artist = audio.get("TPE1", [None])[0]
         album = audio.get("TALB", [None])[0]
         duration = int(audio.info.length) if audio.info else None
+        file_size = file_path.stat().st_size
 
         track = Track(
             id=str(uuid.uuid4()),
@@ -44,20 +53,47 @@ def scan_file(file_path: Path, session: Session) -> None:
             source_type="local",
             local_path=str(file_path),
             is_cached=True,
-            duration=duration
+            duration=duration,
+            file_size=file_size,
+            dedup_key=dedup_key(str(artist) if artist else None, str(title))
         )
         session.add(track)
+        catalog.add_track(session, track)
+        smart_playlists.track_added(session, track)
+        inventory.file_added(inventory.LIBRARY, file_path, file_size, session)
+        bump(session, LIBRARY)
         session.commit()
+        suggest_index.add_track(track.title, track.artist, track.album)
         _logger.info("Indexed new track: %s", file_path.name)
     except Exception:
         _logger.exception("Error indexing file: %s", file_path)
 
-def scan_library(library_path: str) -> None:
+def forget_file(file_path: Path, session: Session) -> None:
+    """
+    Account for an indexed library file that was deleted or moved away.
+
+    The Track row is kept, so likes and playlist entries survive, and is counted
+    as a missing-file row in the storage inventory.
+
+    Args:
+        file_path: Absolute path the file had.
+        session: Active database session.
+    """
+    track = session.exec(select(Track).where(Track.local_path == str(file_path))).first()
+    if not track:
+        return
+    inventory.file_removed(inventory.LIBRARY, file_path, track.file_size or 0, session)
+    inventory.adjust({inventory.MISSING_ROWS: 1}, session)
+    session.commit()
+    _logger.info("Indexed file no longer present: %s", file_path.name)
+
+def scan_library(library_path: str, ctx: Optional[JobContext] = None) -> None:
     """
     Recursively scan a directory for MP3 files and index them.
 
     Args:
         library_path: Path to the music library directory.
+        ctx: Job context for progress reporting and cancellation, when run as a job.
     """
     library_dir = Path(library_path)
     if not library_dir.exists():
@@ -67,18 +103,22 @@ def scan_library(library_path: str) -> None:
     _logger.info("Starting library scan at %s", library_path)
     from app.config import settings
     cache_path = Path(settings.CACHE_DIR)
-    
+
+    # Skip files inside the cache directory
+    files = [f for f in library_dir.rglob("*.mp3") if cache_path not in f.parents]
     with Session(engine) as session:
-        for file_path in library_dir.rglob("*.mp3"):
-            # Skip if file is inside the cache directory
-            if cache_path in file_path.parents:
-                continue
+        for index, file_path in enumerate(files, start=1):
             scan_file(file_path, session)
-    _logger.info("Library scan complete")
+            if ctx:
+                ctx.check_cancelled()
+                ctx.progress(index / (len(files) + 1), f"{index}/{len(files)} files")
+        # Point YouTube copies of library tracks at the local file
+        linked = link_duplicates(session)
+    _logger.info("Library scan complete (%d duplicates linked)", linked)
 
-def run_indexer() -> None:
+def run_indexer(ctx: Optional[JobContext] = None) -> None:
     """
     Convenience function to run the indexer on the default library path.
     """
     from app.config import settings
-    scan_library(settings.MUSIC_PATH)
+    scan_library(settings.MUSIC_PATH, ctx)
@@ -1,33 +1,50 @@
 import os
 import asyncio
-import httpx
+import math
+import random
 import threading
+import time
 import uuid
 from datetime import datetime, timezone
 from typing import List, Optional, Any
 
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Request
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import func
 from sqlmodel import Session, select, or_, delete
-from app.models import User, Track, UserActivity, Playlist, PlaylistTrack
+from app.models import User, Track, UserActivity, Playlist, PlaylistTrack, Artist, Album, SmartPlaylist, SmartPlaylistTrack
+from app.schemas import AlbumDetailOut, ArtistDetailOut, ArtistOut, HistoryEntryOut, LibraryTrackOut, PlaylistEntryOut, PlaylistImport, PlaylistOrder, PlaylistTrackAdd, PlaylistTrackBatch, PopularTrackOut, SmartPlaylistIn, SmartPlaylistOut, TopTrackOut, TrackOut
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
 from fastapi import Form
-from jose import jwt as jose_jwt
 
 from fastapi.staticfiles import StaticFiles
 from app.config import settings
-from app.auth_utils import create_access_token, get_password_hash, verify_password, verify_token
+from app.auth_utils import (
+    create_access_token, get_password_hash_async, login_limiter, verify_google_id_token_async,
+    verify_password_async, verify_token
+)
 from app.db import init_db, get_session, engine
-from app.models import User, Track, UserActivity
-from app.indexer import run_indexer
-from app.watcher import start_watcher
-from app.services import ytmusic, streamer
-from app.utils.logger import setup_logger
-from google.oauth2 import id_token
-from google.auth.transport import requests
+from app.services import ytmusic, streamer, dedup, tracks, playlist_order, response_cache, inventory, shuffle, catalog, smart_playlists
+from app.services import search as search_service
+from app.services.response_cache import LIBRARY, PLAYS, bump, cached_json, user_scope
+from app.services.radio import radio_engine, rebuild_radio_index
+from app.services.suggest import rebuild_suggest_index, suggest_index
+from app.services.play_log import history_statement, play_log, top_statement
+from app.services.stream_scheduler import stream_owner, stream_scheduler
+from app.services.downloads import DownloadBusy, DownloadCancelled, download_manager
+from app.services.jobs import job_runner, run_periodically, PRIORITY_HIGH, PRIORITY_LOW
+from app.services.job_handlers import register_handlers, schedule_periodic_jobs
+from app.utils.leader import LeaderElection, default_lock_dir
+from app.utils.logger import RateLimitedLogger, setup_logger
+from app.utils.client_ip import client_ip
+from app.utils.compression import CompressionMiddleware
+from app.utils.profiler import ProfilingMiddleware, profiling, track_phase
+from app.utils.projection import parse_fields, project
 
 _logger = setup_logger(__name__)
+# Per-request messages, sampled so that bursts of plays or streams do not flood the log
+_request_log = RateLimitedLogger(_logger)
 
 app = FastAPI(
     title="MySpotify API",
@@ -49,24 +66,74 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    gzip_level=settings.GZIP_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY,
+)
+app.add_middleware(ProfilingMiddleware)
+
+register_handlers(job_runner)
+
+# With several uvicorn workers, only the leader runs the watcher and background jobs
+leader = LeaderElection(os.path.join(default_lock_dir(), "myspotify.leader.lock"))
+
+# Readiness of components initialised in background, reported by /health/ready
+READINESS = {"database": False}
+# Why the background startup failed, if it did (the worker then never becomes ready)
+BOOTSTRAP_ERROR: Optional[str] = None
 
-# Search Cache: query -> {"results": List[dict], "expires": timestamp}
-SEARCH_CACHE = {}
-CACHE_TTL = 300 # 5 minutes
+def _start_leader_services() -> None:
+    """
+    Resume background jobs, schedule maintenance and start the library watcher.
+    """
+    job_runner.start()
+    schedule_periodic_jobs(job_runner)
+    # Deferred: watchdog is only needed by the watcher thread
+    from app.watcher import start_watcher
+    threading.Thread(target=start_watcher, args=(settings.MUSIC_PATH,), daemon=True).start()
+
+def _bootstrap() -> None:
+    """
+    Initialise the database, then join the leader election once it is usable.
+    A failure is logged and reported by /health/ready instead of dying with the thread.
+    """
+    global BOOTSTRAP_ERROR
+    started = time.perf_counter()
+    try:
+        init_db()
+        READINESS["database"] = True
+        _logger.info("Database ready in %.1f ms", (time.perf_counter() - started) * 1000)
+
+        # Every worker serves Radio Mode from its own in-memory index
+        run_periodically(
+            rebuild_radio_index, settings.RADIO_REBUILD_INTERVAL,
+            initial_delay=settings.STARTUP_SCAN_DELAY, name="radio-rebuild"
+        )
+        run_periodically(rebuild_suggest_index, settings.SUGGEST_REBUILD_INTERVAL, name="suggest-rebuild")
+        play_log.start(settings.PLAY_LOG_FLUSH_INTERVAL)
+        leader.run(_start_leader_services)
+    except Exception as exc:
+        BOOTSTRAP_ERROR = f"{exc.__class__.__name__}: {exc}"
+        _logger.exception("Startup failed; this worker will not report ready")
 
 @app.on_event("startup")
 def on_startup() -> None:
     """
-    Bootstrap the application: init DB, start indexer and watcher.
+    Bootstrap the application without blocking: DB init, election, jobs and watcher run in background.
     """
     _logger.info("Initializing MySpotify Backend...")
-    init_db()
-    # Run indexer on startup in background
-    threading.Thread(target=run_indexer, daemon=True).start()
-    # Start watcher in background
-    threading.Thread(target=start_watcher, args=(settings.MUSIC_PATH,), daemon=True).start()
+    threading.Thread(target=_bootstrap, daemon=True).start()
     _logger.info("Startup complete")
 
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    """
+    Write plays still buffered in this worker.
+    """
+    play_log.try_flush()
+
 async def ensure_track_exists(session: Session, track_id: str) -> Optional[Track]:
     """
     Ensure a track exists in the database. 
@@ -78,24 +145,15 @@ async def ensure_track_exists(session: Session, track_id: str) -> Optional[Track
         return track
 
     # Attempt auto-indexing for YouTube IDs (usually 11 chars)
-    if len(track_id) == 11:
+    if len(track_id) == tracks.YOUTUBE_ID_LENGTH:
         _logger.info("Track %s not found in DB. Attempting auto-indexing.", track_id)
         try:
-            yt_info = await asyncio.to_thread(ytmusic.yt.get_song, track_id)
-            if yt_info and "videoDetails" in yt_info:
-                details = yt_info["videoDetails"]
-                thumbnails = details.get("thumbnail", {}).get("thumbnails", [])
-                thumb_url = thumbnails[-1].get("url") if thumbnails else None
-                
-                new_track = Track(
-                    id=str(uuid.uuid4()),
-                    title=details.get("title", "Unknown Title"),
-                    artist=details.get("author", "Unknown Artist"),
-                    remote_id=track_id,
-                    source_type="youtube",
-                    thumbnail=thumb_url
-                )
+            new_track = tracks.track_from_song(track_id, await ytmusic.get_song(track_id))
+            if new_track:
                 session.add(new_track)
+                catalog.add_track(session, new_track)
+                smart_playlists.track_added(session, new_track)
+                bump(session, LIBRARY)
                 session.commit()
                 session.refresh(new_track)
                 return new_track
@@ -123,11 +181,12 @@ async def get_current_user(
     Raises:
         HTTPException: If the token is invalid or the user does not exist.
     """
-    payload = verify_token(token)
-    if payload is None:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    user_id = payload.get("sub")
-    user = session.get(User, user_id)
+    with track_phase("auth"):
+        payload = verify_token(token)
+        if payload is None:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        user_id = payload.get("sub")
+        user = session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return user
@@ -142,11 +201,12 @@ async def get_optional_user(
     if not token or token in ["undefined", "null", "none"] or "." not in token:
         return None
     try:
-        payload = verify_token(token)
-        if payload is None:
-            return None
-        user_id = payload.get("sub")
-        return session.get(User, user_id)
+        with track_phase("auth"):
+            payload = verify_token(token)
+            if payload is None:
+                return None
+            user_id = payload.get("sub")
+            return session.get(User, user_id)
     except Exception:
         return None
 
@@ -170,12 +230,47 @@ async def get_admin_user(current_user: User = Depends(get_current_user)) -> User
 @app.get("/health")
 async def health() -> dict:
     """
-    Simple health check endpoint.
+    Liveness check: the process is up and serving requests.
     """
     return {"status": "healthy"}
 
+@app.get("/health/ready")
+async def readiness() -> Any:
+    """
+    Readiness check: 503 until the database is initialised, or for good if startup failed
+    (status "failed" with the error). Also reports whether the initial library scan has finished.
+    """
+    if BOOTSTRAP_ERROR is not None:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "failed", "error": BOOTSTRAP_ERROR, "components": dict(READINESS)}
+        )
+    ready = READINESS["database"]
+    components = {
+        **READINESS,
+        "library_scan": ready and job_runner.has_succeeded("index"),
+        "leader": leader.is_leader
+    }
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "starting", "components": components}
+    )
+
 # Auth Endpoints
-@app.post("/auth/register", response_model=User)
+def throttle_login(request: Request) -> None:
+    """
+    Reject a client IP making login attempts faster than LOGIN_PER_MINUTE (after a burst of LOGIN_BURST),
+    so a flood of password checks cannot saturate the auth threads.
+    """
+    client = client_ip(request)
+    retry_after = login_limiter.check(client)
+    if retry_after:
+        _logger.warning("Throttled login attempts from %s", client)
+        raise HTTPException(
+            status_code=429, detail="Too many login attempts", headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+
+@app.post("/auth/register", response_model=User, dependencies=[Depends(throttle_login)])
 async def register(
     username: str, 
     email: str, 
@@ -196,7 +291,7 @@ async def register(
         id=str(uuid.uuid4()),
         username=username,
         email=email,
-        hashed_password=get_password_hash(password),
+        hashed_password=await get_password_hash_async(password),
         role="admin" if session.exec(select(User)).first() is None else "user"
     )
     session.add(user)
@@ -204,7 +299,7 @@ async def register(
     session.refresh(user)
     return user
 
-@app.post("/auth/token")
+@app.post("/auth/token", dependencies=[Depends(throttle_login)])
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), 
     session: Session = Depends(get_session)
@@ -215,7 +310,7 @@ async def login_for_access_token(
     _logger.info("Token login attempt for: %s", form_data.username)
     statement = select(User).where(User.username == form_data.username)
     user = session.exec(statement).first()
-    if not user or not user.hashed_password or not verify_password(form_data.password, user.hashed_password):
+    if not user or not user.hashed_password or not await verify_password_async(form_data.password, user.hashed_password):
         _logger.warning("Failed login attempt for: %s", form_data.username)
         raise HTTPException(status_code=401, detail="Incorrect username or password")
     
@@ -245,12 +340,16 @@ async def login() -> dict:
     )
     return {"url": google_url}
 
-@app.get("/auth/callback")
+@app.get("/auth/callback", dependencies=[Depends(throttle_login)])
 async def auth_callback(code: str, session: Session = Depends(get_session)) -> dict:
     """
     Handle the Google OAuth2 callback.
     """
     _logger.info("Handling Google OAuth2 callback")
+    # Deferred: only needed for the OAuth2 code flow
+    import httpx
+    from jose import jwt as jose_jwt
+
     # Exchange code for token
     async with httpx.AsyncClient() as client:
         payload = {
@@ -313,7 +412,7 @@ async def auth_callback(code: str, session: Session = Depends(get_session)) -> d
             }
         }
 
-@app.post("/auth/google")
+@app.post("/auth/google", dependencies=[Depends(throttle_login)])
 async def google_auth(token_data: dict, session: Session = Depends(get_session)) -> dict:
     """
     Handle Google Auth via ID Token (Web GSI or Mobile).
@@ -321,10 +420,10 @@ async def google_auth(token_data: dict, session: Session = Depends(get_session))
     token = token_data.get("id_token")
     if not token:
         raise HTTPException(status_code=400, detail="Missing id_token")
-    
+
     try:
         # Verify the ID token
-        idinfo = id_token.verify_oauth2_token(token, requests.Request(), settings.GOOGLE_CLIENT_ID)
+        idinfo = await verify_google_id_token_async(token)
         
         email = idinfo["email"]
         google_id = idinfo["sub"]
@@ -363,7 +462,7 @@ async def google_auth(token_data: dict, session: Session = Depends(get_session))
         _logger.error("Invalid Google Token: %s", str(e))
         raise HTTPException(status_code=401, detail="Invalid Google token")
 
-@app.post("/auth/google/login")
+@app.post("/auth/google/login", dependencies=[Depends(throttle_login)])
 async def google_login_redirect(
     request: Request, 
     credential: str = Form(...), 
@@ -375,7 +474,7 @@ async def google_login_redirect(
     """
     try:
         # Verify the ID token (credential)
-        idinfo = id_token.verify_oauth2_token(credential, requests.Request(), settings.GOOGLE_CLIENT_ID)
+        idinfo = await verify_google_id_token_async(credential)
         
         email = idinfo["email"]
         google_id = idinfo["sub"]
@@ -436,13 +535,129 @@ async def get_system_config() -> dict:
     return await get_auth_config()
 
 @app.post("/system/index")
-async def trigger_index(background_tasks: BackgroundTasks) -> dict:
+async def trigger_index() -> dict:
     """
-    Manually trigger a full library index scan.
+    Manually trigger a full library index scan (joins the running scan if there is one).
     """
     _logger.info("Manual index triggered")
-    background_tasks.add_task(run_indexer)
-    return {"message": "Indexing started in background"}
+    job_id = job_runner.submit("index")
+    return {"message": "Indexing started in background", "job_id": job_id}
+
+@app.get("/system/jobs")
+async def list_jobs(
+    status: Optional[str] = None,
+    limit: int = 50,
+    admin: User = Depends(get_admin_user)
+) -> List[dict]:
+    """
+    List recent background jobs, optionally filtered by status.
+    """
+    return job_runner.list_jobs(status=status, limit=limit)
+
+@app.get("/system/jobs/{job_id}")
+async def get_job(job_id: str, admin: User = Depends(get_admin_user)) -> dict:
+    """
+    Get the status and progress of a background job.
+    """
+    job = job_runner.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/system/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, admin: User = Depends(get_admin_user)) -> dict:
+    """
+    Cancel a queued or running background job.
+    """
+    if not job_runner.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Job is not active")
+    _logger.info("Admin %s cancelled job %s", admin.id, job_id)
+    return {"status": "cancelling"}
+
+@app.get("/system/profiling")
+async def get_profiling(admin: User = Depends(get_admin_user)) -> dict:
+    """
+    Get the request profiling configuration and recent slow or sampled request traces
+    of the worker process that serves the request (see `worker_pid`).
+    """
+    return profiling.snapshot()
+
+@app.post("/system/profiling")
+async def configure_profiling(
+    threshold_ms: Optional[int] = None,
+    sample_rate: Optional[float] = None,
+    admin: User = Depends(get_admin_user)
+) -> dict:
+    """
+    Adjust the slow-request threshold and the fraction of requests run under cProfile.
+
+    Settings and traces are per worker process: with WEB_CONCURRENCY > 1 this only
+    changes the worker that serves the request (reported as `worker_pid`), and the
+    others keep SLOW_REQUEST_THRESHOLD_MS and PROFILE_SAMPLE_RATE from the environment.
+    """
+    _logger.info("Admin %s updating profiling settings", admin.id)
+    profiling.configure(threshold_ms=threshold_ms, sample_rate=sample_rate)
+    snapshot = profiling.snapshot()
+    return {
+        "worker_pid": snapshot["worker_pid"],
+        "threshold_ms": snapshot["threshold_ms"],
+        "sample_rate": snapshot["sample_rate"],
+    }
+
+@app.post("/system/dedup")
+async def trigger_dedup(
+    reclaim: bool = False,
+    admin: User = Depends(get_admin_user)
+) -> dict:
+    """
+    Link YouTube tracks to equivalent local tracks and optionally delete their redundant cached audio.
+    """
+    _logger.info("Deduplication triggered by %s (reclaim=%s)", admin.id, reclaim)
+    job_id = job_runner.submit("dedup", {"reclaim": reclaim})
+    return {"message": "Deduplication started in background", "job_id": job_id}
+
+@app.get("/system/inventory")
+async def get_inventory(
+    session: Session = Depends(get_session),
+    admin: User = Depends(get_admin_user)
+) -> dict:
+    """
+    Storage inventory from running totals: library bytes per format, persistent and temp
+    cache, partial downloads and tracks whose file is missing. No filesystem walk.
+    """
+    return inventory.snapshot(session)
+
+@app.post("/system/inventory/reconcile")
+async def reconcile_inventory(admin: User = Depends(get_admin_user)) -> dict:
+    """
+    Recompute the storage inventory with a full walk in the background.
+    """
+    job_id = job_runner.submit("inventory_reconcile", {"force": True})
+    return {"message": "Inventory reconciliation started in background", "job_id": job_id}
+
+@app.post("/system/sweep")
+async def sweep_storage(admin: User = Depends(get_admin_user)) -> dict:
+    """
+    Clear stale partial downloads, enforce the temp cache budget and repair track rows in the background.
+    """
+    job_id = job_runner.submit("sweep")
+    return {"message": "Sweep started in background", "job_id": job_id}
+
+@app.get("/system/streams")
+async def get_streams(admin: User = Depends(get_admin_user)) -> dict:
+    """
+    Active streams of this worker with their bitrate, allocated pace and measured
+    throughput (kbit/s), plus the uplink and per-listener limits in force.
+    """
+    return stream_scheduler.snapshot()
+
+@app.get("/system/downloads")
+async def get_downloads(admin: User = Depends(get_admin_user)) -> dict:
+    """
+    yt-dlp downloads of this worker: running and queued ones, and per class (play, prefetch,
+    sync) the admission counts and recent queue times.
+    """
+    return download_manager.snapshot()
 
 # System Info
 @app.get("/system/storage")
@@ -464,128 +679,109 @@ async def get_storage() -> dict:
 @app.get("/search")
 async def search(
     q: str, 
+    response: Response,
     offset: int = 0,
     limit: int = 20,
+    fields: Optional[str] = None,
     session: Session = Depends(get_session), 
     current_user: Optional[User] = Depends(get_current_user)
 ) -> List[dict]:
     """
     Search for tracks across local library and YouTube Music.
-    Uses in-memory caching to optimize paginated requests.
+    Both sources are queried concurrently; if YouTube misses `SEARCH_YOUTUBE_DEADLINE`,
+    the local results are returned alone with an `X-Search-Partial` header.
+    `fields` (e.g. "id,title,artist") limits each result to those keys.
     """
+    projection = parse_fields(fields, LibraryTrackOut)
     if not q or not q.strip():
         _logger.info("Empty search query received, returning empty list")
         return []
 
-    _logger.info("Searching for: %s (offset: %s, limit: %s)", q, offset, limit)
-    
-    # 1. Check Cache
-    now = datetime.now().timestamp()
-    if q in SEARCH_CACHE and SEARCH_CACHE[q]["expires"] > now:
-        _logger.info("Serving YouTube results from cache for: %s", q)
-        yt_results = SEARCH_CACHE[q]["results"]
-    else:
-        # Fetch a large batch to pre-populate future pages
-        yt_limit = 100 
-        try:
-            yt_results = await asyncio.to_thread(ytmusic.search_youtube, q, limit=yt_limit)
-            SEARCH_CACHE[q] = {
-                "results": yt_results,
-                "expires": now + CACHE_TTL
-            }
-        except Exception:
-            _logger.exception("YouTube Search Error")
-            yt_results = []
-    
-    # 2. Search local DB (fast) with pagination
-    # Note: We still do local DB search every time to ensure we get new local additions
-    statement = select(Track).where(
-        or_(
-            Track.title.contains(q),
-            Track.artist.contains(q),
-            Track.album.contains(q)
-        )
-    ).offset(offset).limit(limit)
-    local_results = session.exec(statement).all()
-        
-    final_results = []
-    cached_tracks = {t.remote_id: t for t in local_results if t.remote_id}
-    
-    # Add local results first
-    final_results.extend([t.dict() for t in local_results])
-    
-    # Slice YT results to match the current "page"
-    current_yt_page = yt_results[offset:offset+limit] if len(yt_results) > offset else []
-
-    # Add YT results if not already present in local results
-    for yt_item in current_yt_page:
-        remote_id = yt_item["remote_id"]
-        if remote_id not in cached_tracks:
-            db_track = session.exec(select(Track).where(Track.remote_id == remote_id)).first()
-            if db_track:
-                # Lazy backfill: Update thumbnail if missing
-                if yt_item.get("thumbnail") and not db_track.thumbnail:
-                    db_track.thumbnail = yt_item["thumbnail"]
-                    session.add(db_track)
-                    session.commit()
-                    session.refresh(db_track)
-                final_results.append(db_track.dict())
-                cached_tracks[remote_id] = db_track
-            else:
-                final_results.append(yt_item)
-                cached_tracks[remote_id] = yt_item
-            
-    # Enrich with liked status
-    if current_user:
-        likes_statement = select(UserActivity).where(
-            UserActivity.user_id == current_user.id, 
-            UserActivity.is_liked == True
-        )
-        likes = {a.track_id for a in session.exec(likes_statement).all()}
-        for item in final_results:
-            item["is_liked"] = (item.get("id") in likes) or \
-                (session.exec(select(Track.id).where(Track.remote_id == item.get("remote_id"))).first() in likes)
-
-    return final_results
+    _request_log.info("Searching for: %s (offset: %s, limit: %s)", q, offset, limit)
+    results, partial = await search_service.search(
+        session, q, offset, limit, current_user.id if current_user else None, settings.SEARCH_YOUTUBE_DEADLINE
+    )
+    if partial:
+        response.headers["X-Search-Partial"] = "youtube-timeout"
+    if results and current_user:
+        suggest_index.record_query(current_user.id, q)
+    return project(results, projection)
+
+@app.get("/search/suggest")
+async def search_suggest(request: Request, q: str = "", limit: int = 8) -> List[dict]:
+    """
+    Autocomplete for the search box: library titles, artists and albums, plus the
+    caller's own earlier queries if they send a valid token, matching what was
+    typed, tolerating typos. Served from memory, no database or YouTube access.
+    """
+    authorization = request.headers.get("authorization", "")
+    payload = verify_token(authorization[7:]) if authorization.lower().startswith("bearer ") else None
+    user_id = payload.get("sub") if payload else None
+    return suggest_index.suggest(q, max(1, min(limit, 20)), user_id)
+
+@app.get("/search/stream")
+async def search_stream(
+    q: str,
+    offset: int = 0,
+    limit: int = 20,
+    current_user: Optional[User] = Depends(get_current_user)
+) -> StreamingResponse:
+    """
+    Progressive search as NDJSON: a `local` event with library hits right away, a `youtube`
+    event with YouTube hits not already sent, then `done` (with `partial` if YouTube timed out).
+    """
+    if not q or not q.strip():
+        raise HTTPException(status_code=400, detail="Empty search query")
+    _request_log.info("Streaming search for: %s (offset: %s, limit: %s)", q, offset, limit)
+    return StreamingResponse(
+        search_service.search_events(
+            q, offset, limit, current_user.id if current_user else None, settings.SEARCH_STREAM_TIMEOUT
+        ),
+        media_type="application/x-ndjson"
+    )
 
-@app.get("/tracks/popular")
+@app.get("/tracks/popular", response_model=List[PopularTrackOut])
 async def get_popular_tracks(
+    request: Request,
     offset: int = 0,
     limit: int = 20,
+    fields: Optional[str] = None,
     session: Session = Depends(get_session),
     current_user: Optional[User] = Depends(get_optional_user)
-) -> List[dict]:
+) -> Any:
     """
     Fetch popular tracks from the local library based on global play counts.
     """
-    from sqlalchemy import func
-    
-    # Query tracks and sum their play counts across all users
-    statement = (
-        select(Track, func.sum(UserActivity.play_count).label("total_plays"))
-        .join(UserActivity, UserActivity.track_id == Track.id, isouter=True)
-        .group_by(Track.id)
-        .order_by(func.sum(UserActivity.play_count).desc(), Track.added_at.desc())
-        .offset(offset)
-        .limit(limit)
+    async def build() -> List[dict]:
+        # Query track columns and sum their play counts across all users
+        statement = (
+            select(*tracks.TRACK_COLUMNS, func.sum(UserActivity.play_count).label("total_plays"))
+            .join(UserActivity, UserActivity.track_id == Track.id, isouter=True)
+            .group_by(Track.id)
+            .order_by(func.sum(UserActivity.play_count).desc(), Track.added_at.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+        results = tracks.row_dicts(session.exec(statement).all())
+
+        # Get user likes if logged in
+        likes = set()
+        if current_user:
+            likes_stmt = select(UserActivity.track_id).where(UserActivity.user_id == current_user.id, UserActivity.is_liked == True)
+            likes = set(session.exec(likes_stmt).all())
+
+        for t_dict in results:
+            t_dict["is_liked"] = t_dict["id"] in likes
+            t_dict["total_plays"] = int(t_dict["total_plays"] or 0)
+
+        return results
+
+    scopes = [PLAYS, LIBRARY] + ([user_scope(current_user.id)] if current_user else [])
+    return await cached_json(
+        request, session, "tracks/popular", scopes, build,
+        {"offset": offset, "limit": limit, "user": current_user.id if current_user else None},
+        fields=parse_fields(fields, PopularTrackOut)
     )
-    results = session.exec(statement).all()
-    
-    final_results = []
-    
-    # Get user likes if logged in
-    likes = set()
-    if current_user:
-        likes_stmt = select(UserActivity.track_id).where(UserActivity.user_id == current_user.id, UserActivity.is_liked == True)
-        likes = set(session.exec(likes_stmt).all())
-
-    for track, total_plays in results:
-        t_dict = track.dict()
-        t_dict["is_liked"] = t_dict["id"] in likes
-        t_dict["total_plays"] = int(total_plays or 0)
-        final_results.append(t_dict)
-        
-    return final_results
 
 @app.post("/tracks/{track_id}/like")
 async def like_track(
@@ -597,7 +793,7 @@ async def like_track(
     """
     Toggle 'liked' status for a specific track.
     """
-    _logger.info("User %s liking track %s: %s", current_user.id, track_id, is_liked)
+    _request_log.info("User %s liking track %s: %s", current_user.id, track_id, is_liked)
     track = await ensure_track_exists(session, track_id)
     
     if not track:
@@ -617,39 +813,50 @@ async def like_track(
         activity.is_liked = is_liked
         session.add(activity)
     
+    smart_playlists.activity_changed(session, current_user.id, track.id)
+    bump(session, user_scope(current_user.id))
     session.commit()
+    if is_liked:
+        radio_engine.record_like(current_user.id, track)
     return {"status": "success", "is_liked": is_liked}
 
-@app.get("/tracks/recent")
+@app.get("/tracks/recent", response_model=List[LibraryTrackOut])
 async def get_recent_tracks(
+    request: Request,
     offset: int = 0,
     limit: int = 20,
+    fields: Optional[str] = None,
     session: Session = Depends(get_session),
     current_user: Optional[User] = Depends(get_optional_user)
-) -> List[dict]:
+) -> Any:
     """
     Fetch recently added or modified tracks.
     """
-    statement = (
-        select(Track)
-        .order_by(Track.added_at.desc())
-        .offset(offset)
-        .limit(limit)
+    async def build() -> List[dict]:
+        statement = (
+            select(*tracks.TRACK_COLUMNS)
+            .order_by(Track.added_at.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+        results = tracks.row_dicts(session.exec(statement).all())
+
+        likes = set()
+        if current_user:
+            likes_stmt = select(UserActivity.track_id).where(UserActivity.user_id == current_user.id, UserActivity.is_liked == True)
+            likes = set(session.exec(likes_stmt).all())
+
+        for t_dict in results:
+            t_dict["is_liked"] = t_dict["id"] in likes
+
+        return results
+
+    scopes = [LIBRARY] + ([user_scope(current_user.id)] if current_user else [])
+    return await cached_json(
+        request, session, "tracks/recent", scopes, build,
+        {"offset": offset, "limit": limit, "user": current_user.id if current_user else None},
+        fields=parse_fields(fields, LibraryTrackOut)
     )
-    results = session.exec(statement).all()
-    
-    final_results = []
-    likes = set()
-    if current_user:
-        likes_stmt = select(UserActivity.track_id).where(UserActivity.user_id == current_user.id, UserActivity.is_liked == True)
-        likes = set(session.exec(likes_stmt).all())
-
-    for track in results:
-        t_dict = track.dict()
-        t_dict["is_liked"] = t_dict["id"] in likes
-        final_results.append(t_dict)
-        
-    return final_results
 
 @app.post("/tracks/{track_id}/play")
 async def track_played(
@@ -660,7 +867,7 @@ async def track_played(
     """
     Record a play event for a track and increment play count.
     """
-    _logger.info("User %s played track %s", current_user.id, track_id)
+    _request_log.info("User %s played track %s", current_user.id, track_id)
     track = await ensure_track_exists(session, track_id)
     
     if not track:
@@ -688,55 +895,124 @@ async def track_played(
         # Trigger persistent caching on the 3rd play
         if activity.play_count == 3:
             _logger.info("Track %s reached threshold (3 plays). Promoting to persistent cache.", track.id)
-            from app.services.cache_manager import promote_track_to_cache
-            # Since streamer.py currently caches everything, we might just need to ensure 
-            # it's marked as 'protected' or moved to a specific folder.
-            # For now, we'll let streamer.py handle the heavy lifting and CacheManager handle cleanup.
-            promote_track_to_cache(track.remote_id)
+            if track.remote_id:
+                job_runner.submit("promote", {"remote_id": track.remote_id}, priority=PRIORITY_HIGH)
     
+    smart_playlists.activity_changed(session, current_user.id, track.id)
+    bump(session, user_scope(current_user.id), PLAYS)
     session.commit()
+    play_log.record(current_user.id, track.id)
+    radio_engine.record_play(current_user.id, track)
     return {"status": "success", "play_count": activity.play_count}
 
-@app.get("/tracks/liked")
+@app.post("/tracks/{track_id}/prefetch")
+async def prefetch_track(
+    track_id: str,
+    sync: bool = False,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+) -> dict:
+    """
+    Download a YouTube track into the temp cache in background so that playback starts instantly.
+    `sync=true` marks an offline copy, downloaded only when no prefetch is waiting.
+    """
+    track = await ensure_track_exists(session, track_id)
+    if not track:
+        raise HTTPException(status_code=404, detail="Track could not be resolved.")
+    if track.is_cached or not track.remote_id:
+        return {"status": "cached"}
+    job_id = job_runner.submit("prefetch", {"remote_id": track.remote_id, "sync": sync})
+    return {"status": "queued", "job_id": job_id}
+
+@app.get("/tracks/liked", response_model=List[LibraryTrackOut])
 async def get_liked_tracks(
+    request: Request,
+    fields: Optional[str] = None,
     session: Session = Depends(get_session), 
     current_user: User = Depends(get_current_user)
-) -> List[dict]:
+) -> Any:
     """
-    Fetch all tracks that the current user has 'liked', with thumbnail backfill.
+    Fetch all tracks that the current user has 'liked', queueing a thumbnail backfill if needed.
     """
-    statement = select(Track).join(UserActivity).where(
-        UserActivity.user_id == current_user.id,
-        UserActivity.is_liked == True
+    async def build() -> List[dict]:
+        statement = select(*tracks.TRACK_COLUMNS).join(UserActivity).where(
+            UserActivity.user_id == current_user.id,
+            UserActivity.is_liked == True
+        )
+        results = tracks.row_dicts(session.exec(statement).all())
+        for t_dict in results:
+            t_dict["is_liked"] = True
+
+        if any(tracks.needs_thumbnail(t) for t in results):
+            # Missing thumbnails are filled in by a background job
+            job_runner.submit("backfill", priority=PRIORITY_LOW)
+        return results
+
+    return await cached_json(
+        request, session, "tracks/liked", [user_scope(current_user.id), LIBRARY], build,
+        {"user": current_user.id},
+        fields=parse_fields(fields, LibraryTrackOut)
     )
-    liked_tracks = session.exec(statement).all()
-    
-    results = []
-    updated = False
-    for t in liked_tracks:
-        track_dict = t.dict()
-        # Proactive Backfill: If YT track missing thumbnail, fetch it now
-        if t.source_type == "youtube" and not t.thumbnail and t.remote_id:
-            try:
-                _logger.info("Proactively fetching thumbnail for liked track: %s", t.title)
-                yt_info = await asyncio.to_thread(ytmusic.yt.get_song, t.remote_id)
-                if yt_info and "videoDetails" in yt_info:
-                    details = yt_info["videoDetails"]
-                    thumbnails = details.get("thumbnail", {}).get("thumbnails", [])
-                    if thumbnails:
-                        t.thumbnail = thumbnails[-1].get("url")
-                        track_dict["thumbnail"] = t.thumbnail
-                        session.add(t)
-                        updated = True
-            except Exception:
-                _logger.warning("Failed to proactive backfill thumbnail for %s", t.remote_id)
-        
-        results.append(track_dict)
-    
-    if updated:
-        session.commit()
-        
-    return results
+
+def _shuffle_params(weight: Optional[str], seed: Optional[int], current_user: Optional[User]) -> int:
+    """
+    Validate shuffle parameters and return the seed to use (a new one if none was given).
+    """
+    if weight is not None:
+        if weight not in shuffle.WEIGHTS:
+            raise HTTPException(status_code=400, detail=f"weight must be one of: {', '.join(shuffle.WEIGHTS)}")
+        if not current_user:
+            raise HTTPException(status_code=401, detail="Weighted shuffles need a signed-in user")
+    return seed if seed is not None else random.getrandbits(31)
+
+@app.get("/tracks/random", response_model=List[LibraryTrackOut])
+async def get_random_tracks(
+    request: Request,
+    seed: Optional[int] = None,
+    offset: int = 0,
+    limit: int = 20,
+    weight: Optional[str] = None,
+    fields: Optional[str] = None,
+    session: Session = Depends(get_session),
+    current_user: Optional[User] = Depends(get_optional_user)
+) -> Any:
+    """
+    A page of a seeded shuffle of the library, without reading the whole list.
+    The seed is returned in `X-Shuffle-Seed`; passing it back with the next offset
+    continues the same order. `weight` ("plays" or "likes") makes tracks the user
+    played or liked come up sooner.
+    """
+    seed = _shuffle_params(weight, seed, current_user)
+
+    async def build() -> List[dict]:
+        collection = shuffle.library_collection(session)
+        keys = shuffle.page_keys(
+            collection, seed, offset, limit,
+            (weight, current_user.id) if weight else None,
+            lambda: shuffle.library_weights(session, current_user.id, weight)
+        )
+        results = shuffle.library_page(session, keys)
+
+        likes = set()
+        if current_user and results:
+            likes = set(session.exec(select(UserActivity.track_id).where(
+                UserActivity.user_id == current_user.id,
+                UserActivity.is_liked == True,
+                UserActivity.track_id.in_([t["id"] for t in results])
+            )).all())
+        for t_dict in results:
+            t_dict["is_liked"] = t_dict["id"] in likes
+        return results
+
+    scopes = [LIBRARY] + ([user_scope(current_user.id)] if current_user else [])
+    response = await cached_json(
+        request, session, "tracks/random", scopes, build,
+        {"seed": seed, "offset": offset, "limit": limit, "weight": weight,
+         "user": current_user.id if current_user else None},
+        fields=parse_fields(fields, LibraryTrackOut)
+    )
+    response.headers["X-Shuffle-Seed"] = str(seed)
+    return response
 
 @app.get("/tracks/{track_id}")
 async def get_track(
@@ -754,41 +1030,167 @@ async def get_track(
     
     # Optional backfill here too
     if track.source_type == "youtube" and not track.thumbnail and track.remote_id:
-        try:
-            yt_info = await asyncio.to_thread(ytmusic.yt.get_song, track.remote_id)
-            if yt_info and "videoDetails" in yt_info:
-                details = yt_info["videoDetails"]
-                thumbnails = details.get("thumbnail", {}).get("thumbnails", [])
-                if thumbnails:
-                    track.thumbnail = thumbnails[-1].get("url")
-                    session.add(track)
-                    session.commit()
-                    session.refresh(track)
-        except Exception: pass
+        job_runner.submit("backfill", priority=PRIORITY_LOW)
 
     return track.dict()
 
+# Strong references to background related-track fetches
+_RELATED_FETCHES: set = set()
+
+async def _load_related(remote_id: str) -> None:
+    """
+    Fetch YouTube related tracks for a seed into the radio engine.
+    """
+    related = await ytmusic.get_related_tracks(remote_id)
+    radio_engine.set_related(remote_id, related)
+
 @app.get("/tracks/{track_id}/related")
 async def get_related(
     track_id: str, 
+    limit: int = 20,
+    exclude: Optional[str] = None,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ) -> List[dict]:
     """
-    Radio Mode: Fetch related tracks based on a track ID.
+    Radio Mode: Fetch the next batch of related tracks for a seed track.
+
+    Local co-occurrence candidates are mixed with YouTube related tracks and filtered
+    against what the user was already served. YouTube is only awaited when the local
+    index has too little to offer; otherwise it is fetched in the background.
+    `exclude` is a comma-separated list of IDs already queued on the client.
     """
-    _logger.info("Radio Mode requested for track: %s", track_id)
+    _request_log.info("Radio Mode requested for track: %s", track_id)
     # 1. Identify the track to get the remote_id
     statement = select(Track).where(or_(Track.id == track_id, Track.remote_id == track_id))
     track = session.exec(statement).first()
     
+    seed_id = track.id if track else None
     remote_id = track.remote_id if track else track_id
     
-    # 2. Fetch related from YT
-    from app.services.ytmusic import get_related_tracks
-    related = get_related_tracks(remote_id)
+    # 2. Make sure YouTube candidates for the seed are (being) loaded
+    if remote_id and radio_engine.get_cached_related(remote_id) is None:
+        if radio_engine.local_degree(seed_id) >= limit:
+            task = asyncio.create_task(_load_related(remote_id))
+            _RELATED_FETCHES.add(task)
+            task.add_done_callback(_RELATED_FETCHES.discard)
+        else:
+            await _load_related(remote_id)
     
-    return related
+    # 3. Mix, dedupe against history and return from memory
+    excluded = [k for k in (exclude or "").split(",") if k]
+    return radio_engine.next_batch(seed_id, remote_id, current_user.id, limit=limit, exclude=excluded)
+
+# Browse Endpoints
+_ARTIST_ORDER = {
+    "name": (Artist.sort_name,),
+    "tracks": (Artist.track_count.desc(), Artist.sort_name),
+}
+
+@app.get("/artists", response_model=List[ArtistOut])
+async def list_artists(
+    request: Request,
+    offset: int = 0,
+    limit: int = 50,
+    sort: str = "name",
+    fields: Optional[str] = None,
+    session: Session = Depends(get_session)
+) -> Any:
+    """
+    Page of artists by name, or by number of tracks with `sort=tracks`.
+    Reads a range of the sort index; counts, durations and artwork are precomputed.
+    """
+    order = _ARTIST_ORDER.get(sort)
+    if order is None:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(_ARTIST_ORDER)}")
+
+    async def build() -> List[dict]:
+        statement = select(*catalog.ARTIST_COLUMNS).order_by(*order).offset(offset).limit(limit)
+        return tracks.row_dicts(session.exec(statement).all())
+
+    return await cached_json(
+        request, session, "artists", [LIBRARY], build,
+        {"offset": offset, "limit": limit, "sort": sort},
+        fields=parse_fields(fields, ArtistOut)
+    )
+
+@app.get("/artists/{artist_id}", response_model=ArtistDetailOut)
+async def get_artist(request: Request, artist_id: str, session: Session = Depends(get_session)) -> Any:
+    """
+    An artist with their albums, ordered by title.
+    """
+    async def build() -> dict:
+        row = session.exec(select(*catalog.ARTIST_COLUMNS).where(Artist.id == artist_id)).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Artist not found")
+        albums = session.exec(
+            select(*catalog.ALBUM_COLUMNS).where(Album.artist_id == artist_id).order_by(Album.sort_title)
+        ).all()
+        return {**row._asdict(), "albums": tracks.row_dicts(albums)}
+
+    return await cached_json(request, session, "artist", [LIBRARY], build, {"artist": artist_id})
+
+@app.get("/artists/{artist_id}/tracks", response_model=List[TrackOut])
+async def get_artist_tracks(
+    request: Request,
+    artist_id: str,
+    offset: int = 0,
+    limit: int = 50,
+    fields: Optional[str] = None,
+    session: Session = Depends(get_session)
+) -> Any:
+    """
+    Page of an artist's tracks (all albums), ordered by title.
+    """
+    async def build() -> List[dict]:
+        statement = (
+            select(*tracks.TRACK_COLUMNS).where(Track.artist_id == artist_id)
+            .order_by(Track.title).offset(offset).limit(limit)
+        )
+        return tracks.row_dicts(session.exec(statement).all())
+
+    return await cached_json(
+        request, session, "artist/tracks", [LIBRARY], build,
+        {"artist": artist_id, "offset": offset, "limit": limit},
+        fields=parse_fields(fields, TrackOut)
+    )
+
+@app.get("/albums/{album_id}", response_model=AlbumDetailOut)
+async def get_album(
+    request: Request,
+    album_id: str,
+    offset: int = 0,
+    limit: int = 100,
+    session: Session = Depends(get_session)
+) -> Any:
+    """
+    An album with its artist's name and a page of its tracks, ordered by title.
+    """
+    async def build() -> dict:
+        row = session.exec(
+            select(*catalog.ALBUM_COLUMNS, Artist.name.label("artist_name"))
+            .join(Artist, Artist.id == Album.artist_id)
+            .where(Album.id == album_id)
+        ).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Album not found")
+        album_tracks = session.exec(
+            select(*tracks.TRACK_COLUMNS).where(Track.album_id == album_id)
+            .order_by(Track.title).offset(offset).limit(limit)
+        ).all()
+        return {**row._asdict(), "tracks": tracks.row_dicts(album_tracks)}
+
+    return await cached_json(
+        request, session, "album", [LIBRARY], build, {"album": album_id, "offset": offset, "limit": limit}
+    )
+
+@app.post("/system/catalog/rebuild")
+async def rebuild_catalog(admin: User = Depends(get_admin_user)) -> dict:
+    """
+    Recompute artist and album aggregates from the Track table in the background.
+    """
+    job_id = job_runner.submit("catalog_rebuild")
+    return {"message": "Catalog rebuild queued", "job_id": job_id}
 
 # Playlist Endpoints
 @app.get("/playlists")
@@ -819,6 +1221,7 @@ async def create_playlist(
         owner_id=current_user.id
     )
     session.add(new_playlist)
+    bump(session, user_scope(current_user.id))
     session.commit()
     session.refresh(new_playlist)
     return new_playlist.dict()
@@ -847,16 +1250,164 @@ async def add_track_to_playlist(
     if not track:
         raise HTTPException(status_code=404, detail="Track could not be found or indexed.")
 
-    # 3. Get current max position
-    count_stmt = select(PlaylistTrack).where(PlaylistTrack.playlist_id == playlist_id)
-    existing_tracks = session.exec(count_stmt).all()
-    next_pos = len(existing_tracks)
+    # 3. Append after the current last position (the same track may appear more than once)
+    next_pos = playlist_order.append_position(session, playlist_id)
 
-    # 4. Add relation using the database Track.id
-    new_rel = PlaylistTrack(playlist_id=playlist_id, track_id=track.id, position=next_pos)
-    session.add(new_rel)
+    # 4. Add the entry using the database Track.id
+    entry = PlaylistTrack(playlist_id=playlist_id, track_id=track.id, position=next_pos)
+    session.add(entry)
+    bump(session, user_scope(current_user.id))
     session.commit()
-    return {"status": "success"}
+    radio_engine.record_playlist_add(playlist_id, track)
+    return {"status": "success", "entry_id": entry.id}
+
+def _get_owned_playlist(session: Session, playlist_id: str, user: User) -> Playlist:
+    """
+    Fetch a playlist owned by `user`, or raise 404.
+    """
+    playlist = session.exec(select(Playlist).where(
+        Playlist.id == playlist_id,
+        Playlist.owner_id == user.id
+    )).first()
+    if not playlist:
+        raise HTTPException(status_code=404, detail="Playlist not found")
+    return playlist
+
+async def _append_tracks(
+    session: Session,
+    playlist: Playlist,
+    track_ids: List[str],
+    allow_duplicates: bool = False,
+    created: bool = False
+) -> dict:
+    """
+    Resolve and append many tracks to a playlist in one transaction.
+    Unless `allow_duplicates`, tracks already in the playlist (or repeated in the request) are skipped.
+    A `created` playlist is not saved yet and is added in the same transaction as its tracks.
+    """
+    playlist_id = playlist.id
+    resolved = await tracks.resolve_tracks(session, track_ids, settings.PLAYLIST_IMPORT_CONCURRENCY)
+    if created:
+        # After resolving, which commits new YouTube tracks on its own
+        session.add(playlist)
+    present = set(session.exec(
+        select(PlaylistTrack.track_id).where(PlaylistTrack.playlist_id == playlist_id)
+    ).all())
+
+    position = playlist_order.append_position(session, playlist_id)
+    added: List[Track] = []
+    unresolved: List[str] = []
+    for track_id in track_ids:
+        track = resolved.get(track_id)
+        if not track:
+            unresolved.append(track_id)
+            continue
+        if track.id in present and not allow_duplicates:
+            continue
+        present.add(track.id)
+        session.add(PlaylistTrack(playlist_id=playlist_id, track_id=track.id, position=position))
+        position += playlist_order.GAP
+        added.append(track)
+    bump(session, user_scope(playlist.owner_id))
+    session.commit()
+
+    for track in added:
+        radio_engine.record_playlist_add(playlist_id, track)
+    return {"added": len(added), "skipped": len(track_ids) - len(added) - len(unresolved), "unresolved": unresolved}
+
+@app.post("/playlists/{playlist_id}/tracks/batch")
+async def add_tracks_to_playlist(
+    playlist_id: str,
+    batch: PlaylistTrackAdd,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+) -> dict:
+    """
+    Append many tracks to a playlist in one transaction, resolving YouTube IDs concurrently.
+    """
+    playlist = _get_owned_playlist(session, playlist_id, current_user)
+    result = await _append_tracks(session, playlist, batch.track_ids, batch.allow_duplicates)
+    _logger.info("Batch added %d tracks to playlist %s", result["added"], playlist_id)
+    return {"status": "success", **result}
+
+@app.post("/playlists/{playlist_id}/tracks/remove")
+async def remove_tracks_from_playlist(
+    playlist_id: str,
+    batch: PlaylistTrackBatch,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+) -> dict:
+    """
+    Remove many tracks (all their entries) from a playlist in one statement.
+    """
+    _get_owned_playlist(session, playlist_id, current_user)
+    # Removing never needs YouTube: unknown IDs cannot be in the playlist
+    db_ids = {track.id for track in tracks.find_tracks(session, batch.track_ids).values()}
+    result = session.exec(delete(PlaylistTrack).where(
+        PlaylistTrack.playlist_id == playlist_id,
+        PlaylistTrack.track_id.in_(db_ids)
+    ))
+    bump(session, user_scope(current_user.id))
+    session.commit()
+    return {"status": "success", "removed": result.rowcount}
+
+@app.put("/playlists/{playlist_id}/order")
+async def reorder_playlist(
+    playlist_id: str,
+    order: PlaylistOrder,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+) -> dict:
+    """
+    Reorder a playlist in one transaction. Listed tracks come first in the given order;
+    the rest keep their relative order after them. For single moves use the entry move endpoint.
+    """
+    _get_owned_playlist(session, playlist_id, current_user)
+    found = tracks.find_tracks(session, order.track_ids)
+    rows = session.exec(
+        select(PlaylistTrack)
+        .where(PlaylistTrack.playlist_id == playlist_id)
+        .order_by(PlaylistTrack.position)
+    ).all()
+    entries_by_track: dict = {}
+    for row in rows:
+        entries_by_track.setdefault(row.track_id, []).append(row)
+
+    ordered: List[PlaylistTrack] = []
+    placed: set = set()
+    for track_id in order.track_ids:
+        track = found.get(track_id)
+        entries = entries_by_track.get(track.id) if track else None
+        if entries:
+            # A repeated ID takes the track's next entry
+            row = entries.pop(0)
+            ordered.append(row)
+            placed.add(row.id)
+    ordered.extend(row for row in rows if row.id not in placed)
+
+    for index, row in enumerate(ordered, start=1):
+        position = index * playlist_order.GAP
+        if row.position != position:
+            row.position = position
+            session.add(row)
+    bump(session, user_scope(current_user.id))
+    session.commit()
+    return {"status": "success", "count": len(ordered)}
+
+@app.post("/playlists/import")
+async def import_playlist(
+    data: PlaylistImport,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+) -> dict:
+    """
+    Create a playlist from an ordered list of track IDs, resolving YouTube IDs concurrently.
+    """
+    playlist = Playlist(id=str(uuid.uuid4()), name=data.name, owner_id=current_user.id)
+    # Saved together with its tracks, so a failed import leaves no empty playlist behind
+    result = await _append_tracks(session, playlist, data.track_ids, created=True)
+    _logger.info("Imported playlist %s with %d tracks", playlist.id, result["added"])
+    return {"status": "success", "playlist_id": playlist.id, **result}
 
 @app.delete("/playlists/{playlist_id}/tracks/{track_id}")
 async def delete_track_from_playlist(
@@ -884,74 +1435,157 @@ async def delete_track_from_playlist(
     if not track:
         raise HTTPException(status_code=404, detail="Track could not be resolved.")
 
+    # With duplicates, the first occurrence is removed; use the entry endpoint for a specific one
     statement = select(PlaylistTrack).where(
         PlaylistTrack.playlist_id == playlist_id, 
         PlaylistTrack.track_id == track.id
-    )
+    ).order_by(PlaylistTrack.position)
     relation = session.exec(statement).first()
     
     if not relation:
         raise HTTPException(status_code=404, detail="Track not in playlist")
 
     session.delete(relation)
+    bump(session, user_scope(current_user.id))
+    session.commit()
+    return {"status": "success"}
+
+@app.delete("/playlists/{playlist_id}/entries/{entry_id}")
+async def delete_playlist_entry(
+    playlist_id: str,
+    entry_id: int,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+) -> dict:
+    """
+    Remove one specific entry from a playlist.
+    """
+    _get_owned_playlist(session, playlist_id, current_user)
+    entry = session.get(PlaylistTrack, entry_id)
+    if not entry or entry.playlist_id != playlist_id:
+        raise HTTPException(status_code=404, detail="Entry not in playlist")
+    session.delete(entry)
+    bump(session, user_scope(current_user.id))
     session.commit()
     return {"status": "success"}
 
-@app.get("/playlists/{playlist_id}/tracks")
+@app.post("/playlists/{playlist_id}/entries/{entry_id}/move")
+async def move_playlist_entry(
+    playlist_id: str,
+    entry_id: int,
+    after_entry_id: Optional[int] = None,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+) -> dict:
+    """
+    Move an entry right after another entry (or to the start when `after_entry_id` is omitted).
+    Usually a single row write.
+    """
+    _get_owned_playlist(session, playlist_id, current_user)
+    entry = session.get(PlaylistTrack, entry_id)
+    if not entry or entry.playlist_id != playlist_id:
+        raise HTTPException(status_code=404, detail="Entry not in playlist")
+    after = None
+    if after_entry_id is not None:
+        after = session.get(PlaylistTrack, after_entry_id)
+        if not after or after.playlist_id != playlist_id or after.id == entry.id:
+            raise HTTPException(status_code=400, detail="Invalid target entry")
+
+    entry.position = playlist_order.position_after_entry(session, playlist_id, after, moving_id=entry.id)
+    session.add(entry)
+    bump(session, user_scope(current_user.id))
+    session.commit()
+    return {"status": "success", "position": entry.position}
+
+@app.get("/playlists/{playlist_id}/tracks", response_model=List[PlaylistEntryOut])
 async def get_playlist_tracks(
+    request: Request,
     playlist_id: str,
+    fields: Optional[str] = None,
     session: Session = Depends(get_session), 
     current_user: User = Depends(get_current_user)
-) -> List[dict]:
+) -> Any:
     """
     Fetch all tracks in a specific playlist, ordered by position.
     """
-    # 1. Verify ownership
-    playlist = session.exec(select(Playlist).where(
-        Playlist.id == playlist_id, 
-        Playlist.owner_id == current_user.id
-    )).first()
-    
-    if not playlist:
-        raise HTTPException(status_code=404, detail="Playlist not found")
+    async def build() -> List[dict]:
+        # 1. Verify ownership
+        playlist = session.exec(select(Playlist).where(
+            Playlist.id == playlist_id, 
+            Playlist.owner_id == current_user.id
+        )).first()
+
+        if not playlist:
+            raise HTTPException(status_code=404, detail="Playlist not found")
+
+        # 2. Get tracks with enrichment
+        # Reads in order straight from the (playlist_id, position) index
+        statement = (
+            select(
+                *tracks.TRACK_COLUMNS,
+                PlaylistTrack.position.label("playlist_position"),
+                PlaylistTrack.id.label("entry_id")
+            )
+            .join(PlaylistTrack)
+            .where(PlaylistTrack.playlist_id == playlist_id)
+            .order_by(PlaylistTrack.position)
+        )
+        tracks_list = tracks.row_dicts(session.exec(statement).all())
 
-    # 2. Get tracks with enrichment
-    statement = (
-        select(Track, PlaylistTrack.position)
-        .join(PlaylistTrack)
-        .where(PlaylistTrack.playlist_id == playlist_id)
-        .order_by(PlaylistTrack.position)
+        # 3. Missing thumbnails are backfilled by a background job
+        if any(tracks.needs_thumbnail(t) for t in tracks_list):
+            job_runner.submit("backfill", priority=PRIORITY_LOW)
+
+        return tracks_list
+
+    # Playlist mutations bump the owner's scope, so it versions every playlist they own
+    return await cached_json(
+        request, session, "playlists/tracks", [user_scope(current_user.id), LIBRARY], build,
+        {"playlist": playlist_id, "user": current_user.id},
+        fields=parse_fields(fields, PlaylistEntryOut)
     )
-    result = session.exec(statement).all()
-    
-    # 3. Format response with backfill
-    tracks_list = []
-    updated = False
-    for track, position in result:
-        t_dict = track.dict()
-        t_dict["playlist_position"] = position
-        
-        # Lazy backfill for playlists
-        if track.source_type == "youtube" and not track.thumbnail and track.remote_id:
-            try:
-                _logger.info("Backfilling playlist track: %s", track.title)
-                yt_info = await asyncio.to_thread(ytmusic.yt.get_song, track.remote_id)
-                if yt_info and "videoDetails" in yt_info:
-                    details = yt_info["videoDetails"]
-                    thumbnails = details.get("thumbnail", {}).get("thumbnails", [])
-                    if thumbnails:
-                        track.thumbnail = thumbnails[-1].get("url")
-                        t_dict["thumbnail"] = track.thumbnail
-                        session.add(track)
-                        updated = True
-            except Exception: pass
-            
-        tracks_list.append(t_dict)
-    
-    if updated:
-        session.commit()
-        
-    return tracks_list
+
+@app.get("/playlists/{playlist_id}/shuffle", response_model=List[PlaylistEntryOut])
+async def shuffle_playlist(
+    request: Request,
+    playlist_id: str,
+    seed: Optional[int] = None,
+    offset: int = 0,
+    limit: int = 50,
+    weight: Optional[str] = None,
+    fields: Optional[str] = None,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    A page of a seeded shuffle of a playlist's entries; paging works as for `/tracks/random`.
+    """
+    seed = _shuffle_params(weight, seed, current_user)
+
+    async def build() -> List[dict]:
+        playlist = session.exec(select(Playlist).where(
+            Playlist.id == playlist_id,
+            Playlist.owner_id == current_user.id
+        )).first()
+        if not playlist:
+            raise HTTPException(status_code=404, detail="Playlist not found")
+
+        collection = shuffle.playlist_collection(session, playlist_id)
+        keys = shuffle.page_keys(
+            collection, seed, offset, limit,
+            (weight, current_user.id) if weight else None,
+            lambda: shuffle.playlist_weights(session, playlist_id, current_user.id, weight)
+        )
+        return shuffle.playlist_page(session, keys)
+
+    response = await cached_json(
+        request, session, "playlists/shuffle", [user_scope(current_user.id), LIBRARY], build,
+        {"playlist": playlist_id, "seed": seed, "offset": offset, "limit": limit, "weight": weight,
+         "user": current_user.id},
+        fields=parse_fields(fields, PlaylistEntryOut)
+    )
+    response.headers["X-Shuffle-Seed"] = str(seed)
+    return response
 
 @app.delete("/playlists/{playlist_id}")
 async def delete_playlist(
@@ -973,32 +1607,233 @@ async def delete_playlist(
     session.delete(playlist)
     # Also delete associations
     session.exec(delete(PlaylistTrack).where(PlaylistTrack.playlist_id == playlist_id))
+    bump(session, user_scope(current_user.id))
+    session.commit()
+    return {"status": "success"}
+
+# Listening History Endpoints
+@app.get("/me/history", response_model=List[HistoryEntryOut])
+async def get_history(
+    request: Request,
+    before: Optional[int] = None,
+    limit: int = 50,
+    fields: Optional[str] = None,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Fetch the current user's plays, newest first. Pages are keyset-paginated:
+    pass the last entry's `event_id` as `before` to read the next one.
+    """
+    # Plays buffered in this worker become visible at once (unless the database is busy, when
+    # they follow with the next periodic flush); other workers flush within seconds
+    await asyncio.to_thread(play_log.try_flush)
+
+    async def build() -> List[dict]:
+        results = tracks.row_dicts(session.exec(history_statement(current_user.id, before, limit)).all())
+        for t_dict in results:
+            t_dict["played_at"] = datetime.fromtimestamp(t_dict["played_at"], timezone.utc)
+        return results
+
+    return await cached_json(
+        request, session, "me/history", [user_scope(current_user.id), LIBRARY], build,
+        {"before": before, "limit": limit, "user": current_user.id},
+        fields=parse_fields(fields, HistoryEntryOut)
+    )
+
+@app.get("/me/top", response_model=List[TopTrackOut])
+async def get_top_tracks(
+    request: Request,
+    period: str = "month",
+    limit: int = 20,
+    fields: Optional[str] = None,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Fetch the current user's most played tracks of the last `week`, `month`, `year` or `all` time,
+    from the play rollups (plays of the last PLAY_ROLLUP_INTERVAL seconds are not counted yet).
+    """
+    try:
+        statement = top_statement(current_user.id, period, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def build() -> List[dict]:
+        return tracks.row_dicts(session.exec(statement).all())
+
+    return await cached_json(
+        request, session, "me/top", [user_scope(current_user.id), LIBRARY], build,
+        {"period": period, "limit": limit, "user": current_user.id},
+        fields=parse_fields(fields, TopTrackOut)
+    )
+
+# Smart Playlist Endpoints
+def _owned_smart_playlist(session: Session, playlist_id: str, user: User) -> SmartPlaylist:
+    playlist = session.exec(select(SmartPlaylist).where(
+        SmartPlaylist.id == playlist_id,
+        SmartPlaylist.owner_id == user.id
+    )).first()
+    if not playlist:
+        raise HTTPException(status_code=404, detail="Smart playlist not found")
+    return playlist
+
+def _save_smart_playlist(session: Session, playlist: SmartPlaylist, data: SmartPlaylistIn) -> dict:
+    """
+    Apply a definition, evaluate it in full and commit; invalid or too costly rules are rejected.
+    """
+    try:
+        smart_playlists.define(
+            playlist, data.name, [rule.model_dump() for rule in data.rules], data.match, data.sort, data.limit
+        )
+        smart_playlists.refresh(session, playlist)
+    except ValueError as e:
+        session.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except smart_playlists.RulesTooExpensive:
+        session.rollback()
+        raise HTTPException(status_code=422, detail="Rules are too costly to evaluate; add a narrower rule")
+    bump(session, user_scope(playlist.owner_id))
+    session.commit()
+    session.refresh(playlist)
+    return smart_playlists.describe(playlist)
+
+@app.get("/smart-playlists", response_model=List[SmartPlaylistOut])
+async def get_smart_playlists(
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+) -> List[dict]:
+    """
+    Fetch all smart playlists owned by the current user.
+    """
+    playlists = session.exec(select(SmartPlaylist).where(SmartPlaylist.owner_id == current_user.id)).all()
+    return [smart_playlists.describe(p) for p in playlists]
+
+@app.post("/smart-playlists", response_model=SmartPlaylistOut)
+async def create_smart_playlist(
+    data: SmartPlaylistIn,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+) -> dict:
+    """
+    Create a rule-based playlist, e.g. tracks liked but not played in 30 days:
+    `{"rules": [{"field": "liked", "op": "is", "value": true},
+    {"field": "last_played", "op": "not_in_last", "value": 30}]}`.
+    """
+    playlist = SmartPlaylist(id=str(uuid.uuid4()), owner_id=current_user.id, name=data.name, rules="[]", max_tracks=0)
+    session.add(playlist)
+    return _save_smart_playlist(session, playlist, data)
+
+@app.put("/smart-playlists/{playlist_id}", response_model=SmartPlaylistOut)
+async def update_smart_playlist(
+    playlist_id: str,
+    data: SmartPlaylistIn,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+) -> dict:
+    """
+    Replace a smart playlist's name and rules and re-evaluate it.
+    """
+    return _save_smart_playlist(session, _owned_smart_playlist(session, playlist_id, current_user), data)
+
+@app.get("/smart-playlists/{playlist_id}/tracks", response_model=List[LibraryTrackOut])
+async def get_smart_playlist_tracks(
+    request: Request,
+    playlist_id: str,
+    offset: int = 0,
+    limit: int = 100,
+    fields: Optional[str] = None,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Fetch a page of a smart playlist from its materialised membership, in the playlist's sort order.
+    It is only re-evaluated in full when incremental updates could not keep it exact
+    or its relative-date rules are older than SMART_PLAYLIST_MAX_AGE.
+    """
+    playlist = _owned_smart_playlist(session, playlist_id, current_user)
+    if smart_playlists.needs_refresh(playlist):
+        try:
+            smart_playlists.refresh(session, playlist)
+            bump(session, user_scope(current_user.id))
+            session.commit()
+        except smart_playlists.RulesTooExpensive:
+            # Keep serving the last complete evaluation
+            session.rollback()
+
+    async def build() -> List[dict]:
+        statement = (
+            smart_playlists.members_statement(playlist, *tracks.TRACK_COLUMNS, smart_playlists.IS_LIKED)
+            .offset(offset)
+            .limit(limit)
+        )
+        results = tracks.row_dicts(session.exec(statement).all())
+        for t_dict in results:
+            t_dict["is_liked"] = bool(t_dict["is_liked"])
+        return results
+
+    return await cached_json(
+        request, session, "smart-playlists/tracks", [user_scope(current_user.id), LIBRARY], build,
+        {"playlist": playlist_id, "offset": offset, "limit": limit, "user": current_user.id},
+        fields=parse_fields(fields, LibraryTrackOut)
+    )
+
+@app.delete("/smart-playlists/{playlist_id}")
+async def delete_smart_playlist(
+    playlist_id: str,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+) -> dict:
+    """
+    Delete a user's smart playlist and its membership.
+    """
+    playlist = _owned_smart_playlist(session, playlist_id, current_user)
+    session.exec(delete(SmartPlaylistTrack).where(SmartPlaylistTrack.smart_playlist_id == playlist_id))
+    session.delete(playlist)
+    bump(session, user_scope(current_user.id))
     session.commit()
     return {"status": "success"}
 
 @app.get("/stream/{track_id}")
-async def stream_track(track_id: str, session: Session = Depends(get_session)) -> Any:
+async def stream_track(track_id: str, request: Request, session: Session = Depends(get_session)) -> Any:
     """
     Stream a track's audio data. Handles local files, cached YT tracks, and live YT streaming.
+    Delivery is paced by the stream scheduler (see /system/streams).
     """
-    _logger.info("Streaming request for: %s", track_id)
+    _request_log.info("Streaming request for: %s", track_id)
+    owner = stream_owner(request)
     statement = select(Track).where(or_(Track.id == track_id, Track.remote_id == track_id))
     track = session.exec(statement).first()
+    if track:
+        # Prefer the local library copy of deduplicated YouTube tracks
+        track = dedup.resolve_canonical(session, track)
     
     if track and track.is_cached and track.local_path:
         if os.path.exists(track.local_path):
-            _logger.info("Streaming from local cache: %s", track.local_path)
-            return streamer.get_local_stream(track.local_path)
+            _request_log.info("Streaming from local cache: %s", track.local_path)
+            return streamer.get_local_stream(track.local_path, track.id, owner, track.duration)
         else:
             _logger.warning("Track marked as cached but file missing: %s. Falling back to YT.", track.local_path)
             # Update DB to reflect reality
             track.is_cached = False
             track.local_path = None
             session.add(track)
+            inventory.adjust({inventory.MISSING_ROWS: -1}, session)
+            bump(session, LIBRARY)
             session.commit()
     
-    _logger.info("Streaming from YouTube: %s", track.remote_id if track else track_id)
-    return await streamer.stream_youtube(track.remote_id if track else track_id)
+    _request_log.info("Streaming from YouTube: %s", track.remote_id if track else track_id)
+    try:
+        return await streamer.stream_youtube(
+            track.remote_id if track else track_id, owner, track.duration if track else None
+        )
+    except DownloadBusy as e:
+        _logger.warning("No download slot for %s within %.0f s", track_id, e.retry_after)
+        raise HTTPException(
+            status_code=503, detail="Too many downloads in progress", headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+    except DownloadCancelled:
+        raise HTTPException(status_code=409, detail="Superseded by a newer stream")
 
 # Mount the web frontend (Static HTML/JS/CSS)
 static_dir = os.path.join(os.path.dirname(__file__), "static")
@@ -1,5 +1,6 @@
 from datetime import datetime, timezone
 from typing import Optional, List
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 
 class User(SQLModel, table=True):
@@ -33,6 +34,17 @@ class Track(SQLModel, table=True):
     is_cached: bool = Field(default=False)
     duration: Optional[int] = None
     thumbnail: Optional[str] = Field(default=None)
+    # Last time the thumbnail backfill looked this track up and found no thumbnail
+    thumbnail_checked_at: Optional[datetime] = None
+    # Deduplication: normalised "artist|title" key and the preferred (usually local)
+    # Track this row duplicates
+    dedup_key: Optional[str] = Field(default=None, index=True)
+    canonical_id: Optional[str] = Field(default=None, index=True)
+    # Size of the file at local_path when it was indexed or cached (for storage accounting)
+    file_size: Optional[int] = None
+    # Browse catalog entries (see services/catalog.py); unset for duplicates and artist-less rows
+    artist_id: Optional[str] = Field(default=None, index=True)
+    album_id: Optional[str] = Field(default=None, index=True)
     added_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc)
     )
@@ -40,6 +52,13 @@ class Track(SQLModel, table=True):
     # Relationships
     activities: List["UserActivity"] = Relationship(back_populates="track")
 
+class TrackFingerprint(SQLModel, table=True):
+    """
+    Acoustic fingerprint of a track's audio file, used to confirm duplicates.
+    """
+    track_id: str = Field(foreign_key="track.id", primary_key=True)
+    fingerprint: str
+
 class Playlist(SQLModel, table=True):
     """
     User-defined collection of tracks.
@@ -55,16 +74,24 @@ class Playlist(SQLModel, table=True):
 
 class PlaylistTrack(SQLModel, table=True):
     """
-    Many-to-many relationship between playlists and tracks with position.
+    Playlist entry: a track at a position. The same track may appear more than once.
+    Positions are sparse (see `services/playlist_order.py`) so most inserts and
+    moves write a single row.
     """
-    playlist_id: str = Field(foreign_key="playlist.id", primary_key=True)
-    track_id: str = Field(foreign_key="track.id", primary_key=True)
+    __table_args__ = (Index("ix_playlisttrack_playlist_position", "playlist_id", "position"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    playlist_id: str = Field(foreign_key="playlist.id")
+    track_id: str = Field(foreign_key="track.id", index=True)
     position: int
 
 class UserActivity(SQLModel, table=True):
     """
     Tracks user interaction with a track (likes, play count).
     """
+    # Serves "played in the last N days" smart playlist rules as a range of one user's rows
+    __table_args__ = (Index("ix_useractivity_user_last_played", "user_id", "last_played"),)
+
     user_id: str = Field(foreign_key="user.id", primary_key=True)
     track_id: str = Field(foreign_key="track.id", primary_key=True)
     play_count: int = Field(default=0)
@@ -74,3 +101,135 @@ class UserActivity(SQLModel, table=True):
     # Relationships
     user: User = Relationship(back_populates="activities")
     track: Track = Relationship(back_populates="activities")
+
+class Job(SQLModel, table=True):
+    """
+    Persistent record of a background job run by the job runner.
+    """
+    id: str = Field(primary_key=True)
+    job_type: str = Field(index=True)
+    # Jobs sharing an active unique_key are coalesced into one
+    unique_key: str = Field(index=True)
+    status: str = Field(default="queued", index=True)  # 'queued', 'running', 'succeeded', 'failed', 'cancelled'
+    priority: int = Field(default=5)  # Lower runs first
+    payload: Optional[str] = None  # JSON-encoded keyword arguments for the handler
+    progress: float = Field(default=0.0)
+    message: Optional[str] = None
+    attempts: int = Field(default=0)
+    cancel_requested: bool = Field(default=False)  # Set by follower processes, applied by the leader
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc)
+    )
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class VersionCounter(SQLModel, table=True):
+    """
+    Monotonic version per data scope ("user:<id>", "library", "plays"), bumped on every
+    change so that cached responses and ETags can be validated with one lookup.
+    """
+    scope: str = Field(primary_key=True)
+    version: int = Field(default=0)
+
+class InventoryCounter(SQLModel, table=True):
+    """
+    Running storage total such as "library.mp3.bytes" or "cache.temp.files", adjusted
+    with atomic increments as files are indexed, cached and removed (see services/inventory.py).
+    """
+    key: str = Field(primary_key=True)
+    value: int = Field(default=0)
+
+class Artist(SQLModel, table=True):
+    """
+    Browse entry for a main artist, keyed by the folded name so that "Radiohead" and
+    "radiohead feat. Thom Yorke" share one row. Aggregates are maintained incrementally
+    by services/catalog.py and recomputed by its periodic rebuild.
+    """
+    id: str = Field(primary_key=True)
+    name: str
+    sort_name: str = Field(index=True)  # Folded name
+    track_count: int = Field(default=0, index=True)
+    album_count: int = Field(default=0)
+    total_duration: int = Field(default=0)  # Seconds
+    thumbnail: Optional[str] = None  # Artwork of one of the artist's tracks
+
+class Album(SQLModel, table=True):
+    """
+    Browse entry for an album of a main artist, with the same aggregates as Artist.
+    """
+    __table_args__ = (Index("ix_album_artist_sort", "artist_id", "sort_title"),)
+
+    id: str = Field(primary_key=True)
+    artist_id: str = Field(foreign_key="artist.id")
+    title: str
+    sort_title: str = Field(index=True)  # Folded title
+    track_count: int = Field(default=0)
+    total_duration: int = Field(default=0)
+    thumbnail: Optional[str] = None
+
+class SmartPlaylist(SQLModel, table=True):
+    """
+    Playlist defined by rules over the library and its owner's activity (see
+    services/smart_playlists.py). Membership is materialised in SmartPlaylistTrack
+    and kept current as tracks are played, liked and indexed.
+    """
+    id: str = Field(primary_key=True)
+    owner_id: str = Field(foreign_key="user.id", index=True)
+    name: str
+    rules: str  # JSON list of {"field", "op", "value"}
+    match: str = Field(default="all")  # 'all' or 'any' of the rules
+    sort: str = Field(default="added")
+    max_tracks: int
+    # Derived from the rules when saved: only tracks with activity can match, and
+    # membership drifts with time (relative-date rules)
+    needs_activity: bool = Field(default=False, index=True)
+    timed: bool = Field(default=False)
+    track_count: int = Field(default=0)
+    stale: bool = Field(default=True)  # Incremental maintenance could not keep membership exact
+    refreshed_at: Optional[datetime] = None
+
+class SmartPlaylistTrack(SQLModel, table=True):
+    """
+    Materialised membership of a smart playlist (unordered; ordered by the playlist's sort when read).
+    """
+    smart_playlist_id: str = Field(foreign_key="smartplaylist.id", primary_key=True)
+    track_id: str = Field(foreign_key="track.id", primary_key=True, index=True)
+
+class PlayEvent(SQLModel, table=True):
+    """
+    One play, appended in batches by services/play_log.py and never updated. Rolled up
+    into PlayDaily and PlayMonthly, then pruned after PLAY_EVENT_RETENTION_DAYS.
+    """
+    # A user's history, newest first, is a backwards range scan of this index. IDs are
+    # never reused (AUTOINCREMENT), so pruning cannot put new events under a rollup watermark
+    __table_args__ = (Index("ix_playevent_user_event", "user_id", "id"), {"sqlite_autoincrement": True})
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: str = Field(foreign_key="user.id")
+    track_id: str = Field(foreign_key="track.id")
+    played_at: int  # Epoch seconds
+
+class PlayDaily(SQLModel, table=True):
+    """
+    Plays of a track by a user on one UTC day (days since the epoch).
+    """
+    user_id: str = Field(foreign_key="user.id", primary_key=True)
+    day: int = Field(primary_key=True)
+    track_id: str = Field(foreign_key="track.id", primary_key=True)
+    plays: int = Field(default=0)
+
+class PlayMonthly(SQLModel, table=True):
+    """
+    Plays of a track by a user in one UTC month (YYYYMM).
+    """
+    user_id: str = Field(foreign_key="user.id", primary_key=True)
+    month: int = Field(primary_key=True)
+    track_id: str = Field(foreign_key="track.id", primary_key=True)
+    plays: int = Field(default=0)
+
+class RollupWatermark(SQLModel, table=True):
+    """
+    Highest source row ID a rollup has already aggregated, so each row is counted once.
+    """
+    name: str = Field(primary_key=True)
+    last_id: int = Field(default=0)
@@ -0,0 +1,140 @@
+from datetime import datetime
+from typing import Any, List, Optional
+
+from pydantic import BaseModel, Field
+
+from app.config import settings
+
+class PlaylistTrackBatch(BaseModel):
+    """
+    A batch of track IDs (database or YouTube IDs) to add to or remove from a playlist.
+    """
+    track_ids: List[str] = Field(min_length=1, max_length=settings.PLAYLIST_BATCH_LIMIT)
+
+class PlaylistTrackAdd(PlaylistTrackBatch):
+    """
+    Tracks to append to a playlist; tracks already in it are skipped unless `allow_duplicates`.
+    """
+    allow_duplicates: bool = False
+
+class PlaylistOrder(BaseModel):
+    """
+    New playlist order: listed tracks first, in this order; unlisted tracks keep their relative order after them.
+    """
+    track_ids: List[str] = Field(min_length=1, max_length=settings.PLAYLIST_BATCH_LIMIT)
+
+class PlaylistImport(BaseModel):
+    """
+    A new playlist to create from an ordered list of track IDs.
+    """
+    name: str = Field(min_length=1, max_length=200)
+    track_ids: List[str] = Field(max_length=settings.PLAYLIST_BATCH_LIMIT)
+
+class TrackOut(BaseModel):
+    """
+    Track fields returned by list endpoints (selected column by column, without loading ORM objects).
+    """
+    id: str
+    title: str
+    artist: Optional[str] = None
+    album: Optional[str] = None
+    source_type: str
+    remote_id: Optional[str] = None
+    is_cached: bool = False
+    duration: Optional[int] = None
+    thumbnail: Optional[str] = None
+    canonical_id: Optional[str] = None
+    added_at: datetime
+
+class LibraryTrackOut(TrackOut):
+    """
+    A track in a library listing, flagged if the current user likes it.
+    """
+    is_liked: bool = False
+
+class PopularTrackOut(LibraryTrackOut):
+    """
+    A track in the popular list, with its play count across all users.
+    """
+    total_plays: int = 0
+
+class PlaylistEntryOut(TrackOut):
+    """
+    A track in a playlist with its entry ID and sparse position.
+    """
+    playlist_position: int
+    entry_id: int
+
+class ArtistOut(BaseModel):
+    """
+    A browse entry for a main artist with its precomputed aggregates.
+    """
+    id: str
+    name: str
+    track_count: int
+    album_count: int
+    total_duration: int
+    thumbnail: Optional[str] = None
+
+class AlbumOut(BaseModel):
+    """
+    A browse entry for an album with its precomputed aggregates.
+    """
+    id: str
+    artist_id: str
+    title: str
+    track_count: int
+    total_duration: int
+    thumbnail: Optional[str] = None
+
+class ArtistDetailOut(ArtistOut):
+    """
+    An artist with all of their albums.
+    """
+    albums: List[AlbumOut]
+
+class AlbumDetailOut(AlbumOut):
+    """
+    An album with its artist's name and a page of its tracks.
+    """
+    artist_name: str
+    tracks: List[TrackOut]
+
+class SmartRule(BaseModel):
+    """
+    One smart playlist condition, e.g. {"field": "last_played", "op": "not_in_last", "value": 30}.
+    """
+    field: str
+    op: str
+    value: Any
+
+class SmartPlaylistIn(BaseModel):
+    """
+    A smart playlist definition: tracks matching all (or any) of the rules, sorted and capped.
+    """
+    name: str = Field(min_length=1, max_length=200)
+    rules: List[SmartRule] = Field(default_factory=list, max_length=settings.SMART_PLAYLIST_MAX_RULES)
+    match: str = "all"
+    sort: str = "added"
+    limit: int = Field(default=settings.SMART_PLAYLIST_MAX_TRACKS, ge=1, le=settings.SMART_PLAYLIST_MAX_TRACKS)
+
+class SmartPlaylistOut(SmartPlaylistIn):
+    """
+    A smart playlist with its current size.
+    """
+    id: str
+    track_count: int
+    refreshed_at: Optional[datetime] = None
+
+class HistoryEntryOut(TrackOut):
+    """
+    A play in the user's listening history; pass the last `event_id` as `before` for the next page.
+    """
+    event_id: int
+    played_at: datetime
+
+class TopTrackOut(TrackOut):
+    """
+    A track in the user's most played list for a period, with its play count.
+    """
+    plays: int
@@ -1,7 +1,10 @@
 import os
 import shutil
 from pathlib import Path
-from typing import List
+from typing import List, Optional
+from app.services import inventory
+from app.services.downloads import PRIORITY_PREFETCH, DownloadCancelled, download_manager
+from app.services.jobs import JobContext
 from app.utils.logger import setup_logger
 
 _logger = setup_logger(__name__)
@@ -22,8 +25,15 @@ def enforce_cache_limit():
     if not CACHE_DIR.exists():
         return
 
-    current_size = get_dir_size(CACHE_DIR)
     limit_bytes = MAX_CACHE_SIZE_GB * 1024 * 1024 * 1024
+    # The inventory's running total spares the directory walk while under the limit
+    counted = inventory.area_bytes(inventory.PERSISTENT)
+    if counted is not None and counted <= limit_bytes:
+        return
+
+    current_size = get_dir_size(CACHE_DIR)
+    if counted is not None and counted != current_size:
+        inventory.adjust({f"{inventory.PERSISTENT}.bytes": current_size - counted})
 
     if current_size > limit_bytes:
         _logger.info("Cache limit exceeded (%d bytes). Cleaning up...", current_size)
@@ -38,13 +48,38 @@ def enforce_cache_limit():
             try:
                 os.remove(file)
                 current_size -= file_size
+                # Its Track row still points at the file until the next stream repairs it
+                inventory.adjust({
+                    f"{inventory.PERSISTENT}.files": -1,
+                    f"{inventory.PERSISTENT}.bytes": -file_size,
+                    inventory.MISSING_ROWS: 1,
+                })
                 _logger.info("Removed cached file: %s", file.name)
             except Exception:
                 _logger.exception("Failed to remove cached file: %s", file.name)
 
+def _mark_cached(track_id: str, path: Path) -> None:
+    """
+    Record the cached file location on the Track with this remote ID.
+    """
+    from sqlmodel import Session, select
+    from app.db import engine
+    from app.models import Track
+    from app.services.response_cache import LIBRARY, bump
+    with Session(engine) as db_session:
+        stmt = select(Track).where(Track.remote_id == track_id)
+        track = db_session.exec(stmt).first()
+        if track:
+            track.is_cached = True
+            track.local_path = str(path)
+            db_session.add(track)
+            bump(db_session, LIBRARY)
+            db_session.commit()
+
 def promote_track_to_cache(track_id: str):
     """
     Move a track from temp cache to persistent cache once it hits the threshold.
+    Runs as a background job; the cache limit is enforced by a separate job.
     """
     temp_path = TEMP_DIR / f"{track_id}.mp3"
     persistent_path = CACHE_DIR / f"{track_id}.mp3"
@@ -59,21 +94,9 @@ def promote_track_to_cache(track_id: str):
             _logger.info("Moving track %s to persistent cache...", track_id)
             os.makedirs(CACHE_DIR, exist_ok=True)
             shutil.move(str(temp_path), str(persistent_path))
-            
-            # Update DB status
-            from sqlmodel import Session, select
-            from app.db import engine
-            from app.models import Track
-            with Session(engine) as db_session:
-                stmt = select(Track).where(Track.remote_id == track_id)
-                track = db_session.exec(stmt).first()
-                if track:
-                    track.is_cached = True
-                    track.local_path = str(persistent_path)
-                    db_session.add(track)
-                    db_session.commit()
-            
-            enforce_cache_limit()
+            inventory.file_moved(inventory.TEMP, inventory.PERSISTENT, persistent_path, persistent_path.stat().st_size)
+
+            _mark_cached(track_id, persistent_path)
         except Exception:
             _logger.exception("Failed to promote track %s to persistent cache", track_id)
     else:
@@ -98,3 +121,47 @@ async def cache_track(track_id: str, stream_url: str):
     # In this app architecture, tracks are usually downloaded during indexing.
     # We will repurpose the existing library logic to 'promote' popular tracks to cache.
     pass
+
+def prefetch_track(track_id: str, ctx: Optional[JobContext] = None, priority: int = PRIORITY_PREFETCH) -> str:
+    """
+    Download a YouTube track into the temp cache ahead of playback, once the download
+    manager has a slot for its class.
+
+    Args:
+        track_id: The YouTube video ID.
+        ctx: Job context; cancelling the job kills the download (or withdraws it while queued).
+        priority: PRIORITY_PREFETCH, or PRIORITY_SYNC for offline copies.
+
+    Returns:
+        A short result message.
+    """
+    temp_path = TEMP_DIR / f"{track_id}.mp3"
+    if is_track_cached(track_id) or temp_path.exists():
+        return "Already cached"
+
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    download_path = Path(f"{temp_path}.download")
+    cmd = ["yt-dlp", "-f", "bestaudio", "-o", "-", f"https://www.youtube.com/watch?v={track_id}"]
+    inventory.adjust({f"{inventory.PARTIAL}.files": 1})
+    try:
+        with open(download_path, "wb") as out:
+            try:
+                returncode = download_manager.run(
+                    cmd, track_id, out, priority=priority, cancelled=lambda: bool(ctx and ctx.cancelled)
+                )
+            except DownloadCancelled:
+                returncode = None
+        if ctx:
+            ctx.check_cancelled()
+        if returncode != 0:
+            raise RuntimeError(f"yt-dlp exited with {returncode}")
+        os.rename(download_path, temp_path)
+    finally:
+        if download_path.exists():
+            download_path.unlink()
+        inventory.adjust({f"{inventory.PARTIAL}.files": -1})
+
+    inventory.file_added(inventory.TEMP, temp_path, temp_path.stat().st_size)
+    _mark_cached(track_id, temp_path)
+    _logger.info("Prefetched track %s into temp cache", track_id)
+    return "Prefetched"
@@ -0,0 +1,206 @@
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import bindparam, text, update
+from sqlmodel import Session, delete, select
+
+from app.db import engine
+from app.models import Album, Artist, Track
+from app.schemas import AlbumOut, ArtistOut
+from app.services.jobs import JobContext
+from app.services.response_cache import LIBRARY, bump
+from app.utils.logger import setup_logger
+from app.utils.text import fold_text, main_artist, main_artist_name
+
+_logger = setup_logger(__name__)
+
+REBUILD_BATCH: int = 1000  # Track rows re-pointed per statement during a rebuild
+
+# Columns selected by browse endpoints, as for tracks.TRACK_COLUMNS
+ARTIST_COLUMNS = tuple(getattr(Artist, name) for name in ArtistOut.model_fields)
+ALBUM_COLUMNS = tuple(getattr(Album, name) for name in AlbumOut.model_fields)
+
+_ADD_ARTIST = text(
+    "INSERT INTO artist (id, name, sort_name, track_count, album_count, total_duration, thumbnail) "
+    "VALUES (:id, :name, :sort_name, 1, 0, :duration, :thumbnail) "
+    "ON CONFLICT(id) DO UPDATE SET track_count = track_count + 1, "
+    "total_duration = total_duration + :duration, thumbnail = COALESCE(thumbnail, :thumbnail)"
+)
+_ADD_ALBUM = text(
+    "INSERT INTO album (id, artist_id, title, sort_title, track_count, total_duration, thumbnail) "
+    "VALUES (:id, :artist_id, :title, :sort_title, 1, :duration, :thumbnail) "
+    "ON CONFLICT(id) DO UPDATE SET track_count = track_count + 1, "
+    "total_duration = total_duration + :duration, thumbnail = COALESCE(thumbnail, :thumbnail)"
+)
+_REMOVE = {
+    table: text(
+        f"UPDATE {table} SET track_count = track_count - 1, total_duration = total_duration - :duration "
+        "WHERE id = :id"
+    )
+    for table in ("artist", "album")
+}
+_DELETE_EMPTY = {
+    table: text(f"DELETE FROM {table} WHERE id = :id AND track_count <= 0") for table in ("artist", "album")
+}
+_FILL_ARTWORK = {
+    table: text(f"UPDATE {table} SET thumbnail = :thumbnail WHERE id = :id AND thumbnail IS NULL")
+    for table in ("artist", "album")
+}
+# Read from the (artist_id, sort_title) index, so it stays cheap enough to run on every change
+_COUNT_ALBUMS = text(
+    "UPDATE artist SET album_count = (SELECT count(*) FROM album WHERE artist_id = :id) WHERE id = :id"
+)
+
+def artist_id(key: str) -> str:
+    """
+    Stable ID of the artist with folded name `key` (the same in every process and rebuild).
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"myspotify:artist:{key}"))
+
+def album_id(artist_key: str, title_key: str) -> str:
+    """
+    Stable ID of the album with folded title `title_key` by the artist with folded name `artist_key`.
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"myspotify:album:{artist_key}|{title_key}"))
+
+def add_track(session: Session, track: Track) -> None:
+    """
+    Count a new (or newly canonical) track into its artist and album, creating
+    them if needed, and point the track at them. Joins the caller's transaction.
+    """
+    if track.canonical_id:
+        return
+    artist_key = main_artist(track.artist)
+    if not artist_key:
+        return
+    track.artist_id = artist_id(artist_key)
+    values = {"duration": track.duration or 0, "thumbnail": track.thumbnail}
+    session.exec(_ADD_ARTIST, params={
+        "id": track.artist_id, "name": main_artist_name(track.artist), "sort_name": artist_key, **values
+    })
+    title_key = fold_text(track.album)
+    if title_key:
+        track.album_id = album_id(artist_key, title_key)
+        session.exec(_ADD_ALBUM, params={
+            "id": track.album_id, "artist_id": track.artist_id, "title": track.album.strip(),
+            "sort_title": title_key, **values
+        })
+        session.exec(_COUNT_ALBUMS, params={"id": track.artist_id})
+    session.add(track)
+
+def remove_track(session: Session, track: Track) -> None:
+    """
+    Uncount a track from its artist and album (e.g. once it is linked as a duplicate),
+    dropping entries left empty. Joins the caller's transaction.
+    """
+    duration = track.duration or 0
+    if track.album_id:
+        session.exec(_REMOVE["album"], params={"id": track.album_id, "duration": duration})
+        session.exec(_DELETE_EMPTY["album"], params={"id": track.album_id})
+    if track.artist_id:
+        session.exec(_REMOVE["artist"], params={"id": track.artist_id, "duration": duration})
+        session.exec(_COUNT_ALBUMS, params={"id": track.artist_id})
+        session.exec(_DELETE_EMPTY["artist"], params={"id": track.artist_id})
+    track.artist_id = None
+    track.album_id = None
+    session.add(track)
+
+def fill_artwork(session: Session, track: Track) -> None:
+    """
+    Use a track's newly found thumbnail for its artist and album if they have none.
+    """
+    if not track.thumbnail:
+        return
+    for table, entry_id in (("artist", track.artist_id), ("album", track.album_id)):
+        if entry_id:
+            session.exec(_FILL_ARTWORK[table], params={"id": entry_id, "thumbnail": track.thumbnail})
+
+def rebuild(ctx: Optional[JobContext] = None) -> Dict[str, int]:
+    """
+    Recompute every artist and album from the Track table and re-point tracks whose
+    entries changed, replacing the incrementally maintained rows.
+
+    The most common spelling of a name is kept; artwork is that of the first
+    track (in insertion order) that has any. Tracks added while the rows are
+    grouped are only counted by the next rebuild.
+
+    Returns:
+        Counts of artists, albums and re-pointed tracks.
+    """
+    artists: Dict[str, Dict[str, Any]] = {}
+    albums: Dict[str, Dict[str, Any]] = {}
+    names: Dict[str, Counter] = {}
+    titles: Dict[str, Counter] = {}
+    changed: List[Dict[str, Any]] = []
+
+    with Session(engine) as session:
+        rows = session.exec(
+            select(
+                Track.id, Track.artist, Track.album, Track.duration, Track.thumbnail,
+                Track.canonical_id, Track.artist_id, Track.album_id
+            ).order_by(Track.added_at)
+        ).all()
+    if ctx:
+        ctx.progress(0.2, f"Grouping {len(rows)} tracks")
+
+    for row in rows:
+        artist_key = None if row.canonical_id else main_artist(row.artist)
+        new_artist, new_album = None, None
+        if artist_key:
+            new_artist = artist_id(artist_key)
+            artist = artists.setdefault(new_artist, {
+                "id": new_artist, "sort_name": artist_key, "track_count": 0, "album_count": 0,
+                "total_duration": 0, "thumbnail": None
+            })
+            artist["track_count"] += 1
+            artist["total_duration"] += row.duration or 0
+            artist["thumbnail"] = artist["thumbnail"] or row.thumbnail
+            names.setdefault(new_artist, Counter())[main_artist_name(row.artist)] += 1
+
+            title_key = fold_text(row.album)
+            if title_key:
+                new_album = album_id(artist_key, title_key)
+                album = albums.get(new_album)
+                if album is None:
+                    album = albums[new_album] = {
+                        "id": new_album, "artist_id": new_artist, "sort_title": title_key,
+                        "track_count": 0, "total_duration": 0, "thumbnail": None
+                    }
+                    artist["album_count"] += 1
+                album["track_count"] += 1
+                album["total_duration"] += row.duration or 0
+                album["thumbnail"] = album["thumbnail"] or row.thumbnail
+                titles.setdefault(new_album, Counter())[row.album.strip()] += 1
+        if (new_artist, new_album) != (row.artist_id, row.album_id):
+            changed.append({"track_id": row.id, "artist_id": new_artist, "album_id": new_album})
+
+    for entry_id, counts in names.items():
+        artists[entry_id]["name"] = counts.most_common(1)[0][0]
+    for entry_id, counts in titles.items():
+        albums[entry_id]["title"] = counts.most_common(1)[0][0]
+
+    if ctx:
+        ctx.check_cancelled()
+        ctx.progress(0.6, f"Writing {len(artists)} artists and {len(albums)} albums")
+    with Session(engine) as session:
+        session.exec(delete(Album))
+        session.exec(delete(Artist))
+        if artists:
+            session.connection().execute(Artist.__table__.insert(), list(artists.values()))
+        if albums:
+            session.connection().execute(Album.__table__.insert(), list(albums.values()))
+        repoint = (
+            update(Track.__table__)
+            .where(Track.__table__.c.id == bindparam("track_id"))
+            .values(artist_id=bindparam("artist_id"), album_id=bindparam("album_id"))
+        )
+        for start in range(0, len(changed), REBUILD_BATCH):
+            session.connection().execute(repoint, changed[start:start + REBUILD_BATCH])
+        bump(session, LIBRARY)
+        session.commit()
+
+    _logger.info(
+        "Catalog rebuilt: %d artists, %d albums, %d tracks re-pointed", len(artists), len(albums), len(changed)
+    )
+    return {"artists": len(artists), "albums": len(albums), "repointed": len(changed)}
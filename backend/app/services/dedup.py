@@ -0,0 +1,278 @@
+import math
+import os
+import subprocess
+from array import array
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.models import Track, TrackFingerprint
+from app.services import catalog, inventory, smart_playlists
+from app.services.response_cache import LIBRARY, bump
+from app.utils.logger import setup_logger
+from app.utils.text import normalise_title, primary_artist
+
+_logger = setup_logger(__name__)
+
+DURATION_TOLERANCE: int = 3  # Seconds of difference still considered the same recording
+FINGERPRINT_SECONDS: int = 30
+FINGERPRINT_SAMPLE_RATE: int = 8000
+FINGERPRINT_FRAME: int = 2000  # 250 ms frames at 8 kHz
+FINGERPRINT_MIN_SIMILARITY: float = 0.8
+
+def dedup_key(artist: Optional[str], title: Optional[str]) -> Optional[str]:
+    """
+    Build the normalised "artist|title" matching key for a track.
+
+    Args:
+        artist: Free-text artist field.
+        title: Track title.
+
+    Returns:
+        The key, or None if the title is empty after normalisation.
+    """
+    norm_title = normalise_title(title)
+    if not norm_title:
+        return None
+    return f"{primary_artist(artist)}|{norm_title}"
+
+def durations_match(a: Optional[int], b: Optional[int]) -> bool:
+    """
+    Return True if two durations are within tolerance (unknown durations match anything).
+    """
+    if a is None or b is None:
+        return True
+    return abs(a - b) <= DURATION_TOLERANCE
+
+def compute_fingerprint(path: str) -> Optional[str]:
+    """
+    Compute a lightweight acoustic fingerprint from the first seconds of an audio file.
+
+    The file is decoded to 8 kHz mono PCM with ffmpeg. For every 250 ms frame the
+    signal energy and zero-crossing rate are measured, and each bit of the
+    fingerprint records whether one of them rose from the previous frame. This is
+    robust to re-encoding and volume changes, which is all we need to confirm
+    that two tag-matched files are the same recording.
+
+    Args:
+        path: Path to the audio file.
+
+    Returns:
+        The fingerprint as a string of '0'/'1' characters, or None if decoding failed.
+    """
+    cmd = [
+        "ffmpeg", "-v", "quiet", "-i", path,
+        "-t", str(FINGERPRINT_SECONDS),
+        "-ac", "1", "-ar", str(FINGERPRINT_SAMPLE_RATE),
+        "-f", "s16le", "-"
+    ]
+    try:
+        pcm = subprocess.run(cmd, capture_output=True, timeout=60, check=True).stdout
+    except (OSError, subprocess.SubprocessError):
+        _logger.warning("Fingerprint decoding failed for: %s", path)
+        return None
+
+    samples = array("h")
+    samples.frombytes(pcm[:len(pcm) - len(pcm) % 2])
+    frames = len(samples) // FINGERPRINT_FRAME
+    if frames < 2:
+        return None
+
+    energies: List[float] = []
+    crossings: List[int] = []
+    for index in range(frames):
+        frame = samples[index * FINGERPRINT_FRAME:(index + 1) * FINGERPRINT_FRAME]
+        energies.append(math.sqrt(sum(s * s for s in frame) / FINGERPRINT_FRAME))
+        crossings.append(sum(1 for a, b in zip(frame, frame[1:]) if (a < 0) != (b < 0)))
+
+    bits = []
+    for index in range(1, frames):
+        bits.append("1" if energies[index] > energies[index - 1] else "0")
+        bits.append("1" if crossings[index] > crossings[index - 1] else "0")
+    return "".join(bits)
+
+def fingerprint_similarity(a: str, b: str, max_shift: int = 4) -> float:
+    """
+    Compare two fingerprints, allowing a small alignment offset between them.
+
+    Args:
+        a: First fingerprint.
+        b: Second fingerprint.
+        max_shift: Maximum frame offset to try in each direction.
+
+    Returns:
+        The best fraction of matching bits (0.0 - 1.0).
+    """
+    best = 0.0
+    for shift in range(-max_shift, max_shift + 1):
+        offset = shift * 2  # Two bits per frame
+        left = a[max(0, offset):]
+        right = b[max(0, -offset):]
+        length = min(len(left), len(right))
+        if length == 0:
+            continue
+        matches = sum(1 for x, y in zip(left[:length], right[:length]) if x == y)
+        best = max(best, matches / length)
+    return best
+
+def _ensure_fingerprint(session: Session, track: Track) -> Optional[str]:
+    stored = session.get(TrackFingerprint, track.id)
+    if stored:
+        return stored.fingerprint
+    if not track.local_path or not os.path.exists(track.local_path):
+        return None
+    fingerprint = compute_fingerprint(track.local_path)
+    if fingerprint:
+        session.add(TrackFingerprint(track_id=track.id, fingerprint=fingerprint))
+    return fingerprint
+
+def _confirm(session: Session, candidate: Track, canonical: Track, use_fingerprint: bool) -> bool:
+    if not durations_match(candidate.duration, canonical.duration):
+        return False
+    if not use_fingerprint:
+        return True
+    a, b = _ensure_fingerprint(session, candidate), _ensure_fingerprint(session, canonical)
+    if a is None or b is None:
+        # Nothing to compare against (e.g. YouTube track not cached yet): trust the tags
+        return True
+    return fingerprint_similarity(a, b) >= FINGERPRINT_MIN_SIMILARITY
+
+def link_duplicates(session: Session, use_fingerprint: Optional[bool] = None) -> int:
+    """
+    Link YouTube Track rows to the equivalent local Track via `canonical_id`.
+
+    Missing dedup keys are filled in first. Candidates must share the key and have
+    durations within tolerance; with `use_fingerprint` the match is additionally
+    confirmed acoustically when both files are available.
+
+    Args:
+        session: Database session.
+        use_fingerprint: Override for the `DEDUP_FINGERPRINT` setting.
+
+    Returns:
+        Number of newly linked rows.
+    """
+    if use_fingerprint is None:
+        use_fingerprint = settings.DEDUP_FINGERPRINT
+
+    for track in session.exec(select(Track).where(Track.dedup_key == None)).all():
+        track.dedup_key = dedup_key(track.artist, track.title)
+        session.add(track)
+    session.commit()
+
+    locals_by_key: Dict[str, List[Track]] = defaultdict(list)
+    for track in session.exec(
+        select(Track).where(Track.source_type == "local", Track.dedup_key != None)
+    ).all():
+        locals_by_key[track.dedup_key].append(track)
+
+    linked = 0
+    candidates = session.exec(
+        select(Track).where(
+            Track.source_type == "youtube",
+            Track.canonical_id == None,
+            Track.dedup_key.in_(list(locals_by_key.keys()))
+        )
+    ).all()
+    for candidate in candidates:
+        for canonical in locals_by_key[candidate.dedup_key]:
+            if _confirm(session, candidate, canonical, use_fingerprint):
+                candidate.canonical_id = canonical.id
+                catalog.remove_track(session, candidate)
+                smart_playlists.track_removed(session, candidate.id)
+                linked += 1
+                _logger.info("Linked duplicate %s -> local %s", candidate.id, canonical.id)
+                break
+    if linked:
+        bump(session, LIBRARY)
+    session.commit()
+    return linked
+
+def reclaim_duplicates(session: Session) -> Tuple[int, int]:
+    """
+    Delete cached YouTube audio for tracks that have a local canonical copy.
+
+    Args:
+        session: Database session.
+
+    Returns:
+        (number of files removed, bytes reclaimed).
+    """
+    cache_roots = [Path(settings.CACHE_DIR).resolve(), Path(settings.TEMP_DIR).resolve()]
+    removed, reclaimed = 0, 0
+    rows = session.exec(
+        select(Track).where(Track.canonical_id != None, Track.is_cached == True)
+    ).all()
+    for track in rows:
+        if not track.local_path:
+            continue
+        path = Path(track.local_path).resolve()
+        if not any(root in path.parents for root in cache_roots):
+            continue  # Never delete library files
+        try:
+            size = path.stat().st_size if path.exists() else 0
+            if path.exists():
+                os.remove(path)
+                area = inventory.PERSISTENT if cache_roots[0] in path.parents else inventory.TEMP
+                inventory.file_removed(area, path, size, session)
+            removed += 1
+            reclaimed += size
+        except OSError:
+            _logger.exception("Failed to reclaim duplicate cache file: %s", path)
+            continue
+        track.is_cached = False
+        track.local_path = None
+        session.add(track)
+    bump(session, LIBRARY)
+    session.commit()
+    if removed:
+        _logger.info("Reclaimed %d duplicate cache files (%d bytes)", removed, reclaimed)
+    return removed, reclaimed
+
+def resolve_canonical(session: Session, track: Track) -> Track:
+    """
+    Return the playable canonical copy of a track if it has one, else the track itself.
+    """
+    if not track.canonical_id:
+        return track
+    canonical = session.get(Track, track.canonical_id)
+    if canonical and canonical.local_path and os.path.exists(canonical.local_path):
+        return canonical
+    return track
+
+def collapse_results(results: List[Dict]) -> List[Dict]:
+    """
+    Drop search results that duplicate an earlier result (same key, matching duration).
+    Local results come first in search output, so they win over YouTube copies.
+
+    Args:
+        results: Track dictionaries in display order.
+
+    Returns:
+        The filtered list, order preserved.
+    """
+    kept: List[Dict] = []
+    seen: Dict[str, List[Optional[int]]] = defaultdict(list)
+    for item in results:
+        key = item.get("dedup_key") or dedup_key(item.get("artist"), item.get("title"))
+        if key and any(durations_match(item.get("duration"), d) for d in seen[key]):
+            continue
+        if key:
+            seen[key].append(item.get("duration"))
+        kept.append(item)
+    return kept
+
+def run_dedup(reclaim: bool = False) -> None:
+    """
+    Link duplicates (and optionally reclaim redundant cache files) in a fresh session.
+    """
+    from app.db import engine
+
+    with Session(engine) as session:
+        linked = link_duplicates(session)
+        _logger.info("Deduplication linked %d tracks", linked)
+        if reclaim:
+            reclaim_duplicates(session)
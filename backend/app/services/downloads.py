@@ -0,0 +1,405 @@
+import asyncio
+import bisect
+import itertools
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import IO, Any, Callable, Deque, Dict, List, Optional
+
+from app.config import settings
+from app.services.stream_scheduler import ANONYMOUS_PREFIX
+from app.utils.logger import setup_logger
+
+_logger = setup_logger(__name__)
+
+# Download classes, most urgent first
+PRIORITY_PLAY: int = 0  # Live stream a listener is waiting on
+PRIORITY_PREFETCH: int = 1  # Next track fetched ahead of playback
+PRIORITY_SYNC: int = 2  # Offline copies nobody is waiting on
+CLASS_NAMES = {PRIORITY_PLAY: "play", PRIORITY_PREFETCH: "prefetch", PRIORITY_SYNC: "sync"}
+
+KILL_GRACE: float = 2.0  # Seconds a terminated yt-dlp gets to exit before it is killed
+POLL_INTERVAL: float = 0.5  # Seconds between cancellation checks of blocking downloads
+QUEUE_SAMPLES: int = 200  # Recent queue times kept per class for the percentiles
+
+class DownloadBusy(Exception):
+    """
+    Raised when no download slot frees up within the queue timeout.
+    """
+    def __init__(self, retry_after: float) -> None:
+        super().__init__("All download slots are busy")
+        self.retry_after = retry_after
+
+class DownloadCancelled(Exception):
+    """
+    Raised when a queued download is cancelled, e.g. superseded by the same listener's next track.
+    """
+
+class _Slot:
+    """
+    A download admitted or waiting for admission.
+    """
+    def __init__(self, slot_id: int, priority: int, track_id: str, owner: Optional[str]) -> None:
+        self.id = slot_id
+        self.priority = priority
+        self.track_id = track_id
+        self.owner = owner
+        self.queued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.pid: Optional[int] = None
+        self.cancelled = False
+        self.kill: Optional[Callable[[], None]] = None  # Set once a process runs under the slot
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "id": self.id,
+            "class": CLASS_NAMES[self.priority],
+            "track_id": self.track_id,
+            "owner": self.owner,
+            "pid": self.pid,
+            "queued_seconds": round((self.started_at or now) - self.queued_at, 3),
+            "running_seconds": round(now - self.started_at, 1) if self.started_at else None,
+        }
+
+class _Waiter:
+    """
+    A queued slot and how to wake whoever waits for it: an event for threads, a future for coroutines.
+    """
+    def __init__(self, slot: _Slot, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        self.slot = slot
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = threading.Event()
+        self.error: Optional[Exception] = None
+
+    def wake(self, error: Optional[Exception] = None) -> None:
+        self.error = error
+        self.event.set()
+        if self.future is not None:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+def _resolve(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
+
+class Download:
+    """
+    A running yt-dlp process holding a download slot until `close` is called.
+    """
+    def __init__(self, manager: "DownloadManager", slot: _Slot, process: asyncio.subprocess.Process) -> None:
+        self.manager = manager
+        self.slot = slot
+        self.process = process
+        self._closed = False
+
+    @property
+    def stdout(self) -> asyncio.StreamReader:
+        return self.process.stdout
+
+    @property
+    def cancelled(self) -> bool:
+        """
+        Whether the download was superseded (its process is then killed).
+        """
+        return self.slot.cancelled
+
+    async def wait(self) -> int:
+        """
+        Wait for the process to exit and return its exit code.
+        """
+        return await self.process.wait()
+
+    async def close(self) -> None:
+        """
+        Terminate the process if it is still running (killing it if it ignores that) and
+        free the slot. Safe to call more than once.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if self.process.returncode is None:
+                _logger.info("Terminating abandoned download of %s (pid %s)", self.slot.track_id, self.process.pid)
+                self.process.terminate()
+                try:
+                    await asyncio.wait_for(self.process.wait(), KILL_GRACE)
+                except asyncio.TimeoutError:
+                    self.process.kill()
+                    await self.process.wait()
+        except ProcessLookupError:
+            pass
+        finally:
+            self.manager.release(self.slot)
+
+class DownloadManager:
+    """
+    Admission control for yt-dlp processes.
+
+    At most `max_processes` downloads run at once, and prefetch and offline sync
+    downloads may hold at most `max_background` of them, so a slot is always
+    kept for playback. Waiting downloads are admitted by class (play, then
+    prefetch, then sync) and in arrival order within a class. A live stream
+    waits at most `queue_timeout` seconds before DownloadBusy is raised, and
+    a signed-in listener starting more than `per_listener` live streams cancels
+    their oldest, so skipping through tracks never piles up processes (anonymous
+    listeners are only known by an address that a whole household may share, so
+    theirs are never cancelled). The time each
+    download spends queued is recorded per class. Thread-safe: live streams
+    are admitted on the event loop, prefetches on job threads.
+    """
+    def __init__(self, max_processes: int, max_background: int, per_listener: int, queue_timeout: float) -> None:
+        self.max_processes = max(1, max_processes)
+        self.max_background = max(0, min(max_background, self.max_processes))
+        self.per_listener = per_listener
+        self.queue_timeout = queue_timeout
+        self._active: Dict[int, _Slot] = {}
+        self._queue: List[_Waiter] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._queue_times: Dict[int, Deque[float]] = {
+            priority: deque(maxlen=QUEUE_SAMPLES) for priority in CLASS_NAMES
+        }
+        self._counts: Dict[int, Dict[str, int]] = {
+            priority: {"admitted": 0, "timed_out": 0, "cancelled": 0} for priority in CLASS_NAMES
+        }
+
+    def _admissible(self, priority: int) -> bool:
+        if len(self._active) >= self.max_processes:
+            return False
+        if priority == PRIORITY_PLAY:
+            return True
+        background = sum(1 for slot in self._active.values() if slot.priority != PRIORITY_PLAY)
+        return background < self.max_background
+
+    def _admit(self, slot: _Slot) -> None:
+        slot.started_at = time.monotonic()
+        self._active[slot.id] = slot
+        self._queue_times[slot.priority].append(slot.started_at - slot.queued_at)
+        self._counts[slot.priority]["admitted"] += 1
+
+    def _dispatch(self) -> None:
+        # The queue is sorted by class, and a class that cannot be admitted blocks the ones after it
+        while self._queue and self._admissible(self._queue[0].slot.priority):
+            waiter = self._queue.pop(0)
+            self._admit(waiter.slot)
+            waiter.wake()
+
+    def _try_admit(self, slot: _Slot, waiter: _Waiter) -> bool:
+        """
+        Admit `slot` right away if nothing of its class or above is waiting, else queue it. Called under the lock.
+        """
+        if (
+            slot.priority == PRIORITY_PLAY and self.per_listener > 0
+            and slot.owner and not slot.owner.startswith(ANONYMOUS_PREFIX)
+        ):
+            self._supersede(slot.owner)
+        if self._admissible(slot.priority) and not any(queued.slot.priority <= slot.priority for queued in self._queue):
+            self._admit(slot)
+            return True
+        bisect.insort(self._queue, waiter, key=lambda queued: (queued.slot.priority, queued.slot.id))
+        return False
+
+    def _supersede(self, owner: str) -> None:
+        """
+        Cancel a listener's oldest live streams until a new one fits within `per_listener`.
+        """
+        running = sorted(
+            (slot for slot in self._active.values()
+             if slot.priority == PRIORITY_PLAY and slot.owner == owner and not slot.cancelled),
+            key=lambda slot: slot.id
+        )
+        queued = [waiter for waiter in self._queue if waiter.slot.priority == PRIORITY_PLAY and waiter.slot.owner == owner]
+        # Running streams are older than queued ones, so they go first
+        excess = len(running) + len(queued) + 1 - self.per_listener
+        for slot in running:
+            if excess <= 0:
+                break
+            _logger.info("Cancelling download of %s superseded by a newer stream for %s", slot.track_id, owner)
+            slot.cancelled = True
+            if slot.kill:
+                slot.kill()
+            excess -= 1
+        for waiter in queued:
+            if excess <= 0:
+                break
+            self._queue.remove(waiter)
+            self._counts[PRIORITY_PLAY]["cancelled"] += 1
+            waiter.wake(DownloadCancelled("Superseded by a newer stream"))
+            excess -= 1
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """
+        Withdraw a waiter that gave up. Returns True if it had already been admitted (its slot must be released).
+        """
+        with self._lock:
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+                return False
+            return waiter.error is None
+
+    async def acquire_async(self, priority: int, track_id: str, owner: Optional[str] = None) -> _Slot:
+        """
+        Wait on the event loop for a download slot (at most `queue_timeout` for live streams).
+
+        Raises:
+            DownloadBusy: If no slot freed up in time.
+            DownloadCancelled: If the download was superseded while queued.
+        """
+        slot = _Slot(next(self._ids), priority, track_id, owner)
+        waiter = _Waiter(slot, asyncio.get_running_loop())
+        with self._lock:
+            if self._try_admit(slot, waiter):
+                return slot
+        timeout = self.queue_timeout if priority == PRIORITY_PLAY else None
+        try:
+            await asyncio.wait_for(waiter.future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as error:
+            if self._abandon(waiter):
+                self.release(slot)
+            if isinstance(error, asyncio.TimeoutError):
+                with self._lock:
+                    self._counts[priority]["timed_out"] += 1
+                raise DownloadBusy(self.queue_timeout) from None
+            raise
+        if waiter.error:
+            raise waiter.error
+        return slot
+
+    def acquire(self, priority: int, track_id: str, cancelled: Callable[[], bool] = lambda: False) -> _Slot:
+        """
+        Block the calling thread until a download slot is free.
+
+        Args:
+            priority: Download class.
+            track_id: Track being downloaded, reported by `snapshot`.
+            cancelled: Polled while waiting; once it returns True the wait is abandoned.
+
+        Raises:
+            DownloadCancelled: If `cancelled` returned True first.
+        """
+        slot = _Slot(next(self._ids), priority, track_id, None)
+        waiter = _Waiter(slot)
+        with self._lock:
+            if self._try_admit(slot, waiter):
+                return slot
+        while not waiter.event.wait(POLL_INTERVAL):
+            if cancelled():
+                if self._abandon(waiter):
+                    self.release(slot)
+                with self._lock:
+                    self._counts[priority]["cancelled"] += 1
+                raise DownloadCancelled("Cancelled while queued")
+        if waiter.error:
+            raise waiter.error
+        return slot
+
+    def release(self, slot: _Slot) -> None:
+        """
+        Free an admitted slot and admit whatever waits next.
+        """
+        with self._lock:
+            if self._active.pop(slot.id, None) is not None:
+                self._dispatch()
+
+    async def open_stream(self, cmd: List[str], track_id: str, owner: Optional[str] = None) -> Download:
+        """
+        Start a live download (`cmd` writing the audio to stdout) once a play slot is free.
+
+        Returns:
+            The running download; its caller must `close` it when done or abandoned.
+        """
+        slot = await self.acquire_async(PRIORITY_PLAY, track_id, owner)
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                # Never read, so it must not be a pipe that yt-dlp could fill and block on
+                stderr=asyncio.subprocess.DEVNULL
+            )
+        except BaseException:
+            self.release(slot)
+            raise
+        slot.pid = process.pid
+        slot.kill = process.kill
+        if slot.cancelled:
+            process.kill()
+        return Download(self, slot, process)
+
+    def run(
+        self,
+        cmd: List[str],
+        track_id: str,
+        stdout: IO[bytes],
+        priority: int = PRIORITY_PREFETCH,
+        cancelled: Callable[[], bool] = lambda: False
+    ) -> Optional[int]:
+        """
+        Run a background download to completion in the calling thread once a slot of its class is free.
+
+        Args:
+            cmd: yt-dlp command line.
+            track_id: Track being downloaded.
+            stdout: File the process writes to.
+            priority: PRIORITY_PREFETCH or PRIORITY_SYNC.
+            cancelled: Polled while queued and running; the process is killed once it returns True.
+
+        Returns:
+            The exit code, or None if the download was cancelled.
+        """
+        slot = self.acquire(priority, track_id, cancelled)
+        try:
+            process = subprocess.Popen(cmd, stdout=stdout, stderr=subprocess.DEVNULL)
+            slot.pid = process.pid
+            slot.kill = process.kill
+            while process.poll() is None:
+                if cancelled() or slot.cancelled:
+                    process.terminate()
+                    try:
+                        process.wait(KILL_GRACE)
+                    except subprocess.TimeoutExpired:
+                        process.kill()
+                        process.wait()
+                    return None
+                time.sleep(POLL_INTERVAL)
+            return process.returncode
+        finally:
+            self.release(slot)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Running and queued downloads, plus per-class counts and queue times (ms) of recent admissions.
+        """
+        with self._lock:
+            active = [slot.snapshot() for slot in sorted(self._active.values(), key=lambda slot: slot.id)]
+            queued = [waiter.slot.snapshot() for waiter in self._queue]
+            classes = {}
+            for priority, name in CLASS_NAMES.items():
+                times = sorted(self._queue_times[priority])
+                classes[name] = {
+                    "running": sum(1 for slot in active if slot["class"] == name),
+                    "queued": sum(1 for slot in queued if slot["class"] == name),
+                    **self._counts[priority],
+                    "queue_ms": {
+                        "mean": round(sum(times) / len(times) * 1000, 1) if times else None,
+                        "p95": round(times[min(len(times) - 1, int(len(times) * 0.95))] * 1000, 1) if times else None,
+                        "max": round(times[-1] * 1000, 1) if times else None,
+                    },
+                }
+        return {
+            "max_processes": self.max_processes,
+            "max_background": self.max_background,
+            "per_listener": self.per_listener,
+            "classes": classes,
+            "running": active,
+            "queued": queued,
+        }
+
+_workers = max(1, settings.WEB_CONCURRENCY)
+download_manager: DownloadManager = DownloadManager(
+    max_processes=max(1, settings.DOWNLOAD_MAX_PROCESSES // _workers),
+    max_background=settings.DOWNLOAD_MAX_BACKGROUND,
+    per_listener=settings.DOWNLOAD_PER_LISTENER,
+    queue_timeout=settings.DOWNLOAD_QUEUE_TIMEOUT,
+)
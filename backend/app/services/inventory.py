@@ -0,0 +1,218 @@
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from sqlalchemy import text
+from sqlmodel import Session, delete, select
+
+from app.config import settings
+from app.db import engine
+from app.models import InventoryCounter, Track
+from app.utils.logger import setup_logger
+
+_logger = setup_logger(__name__)
+
+# Storage areas; each keeps "<area>.files" and "<area>.bytes" counters. Library
+# totals are kept per format as "library.<extension>.*".
+LIBRARY: str = "library"
+PERSISTENT: str = "cache.persistent"
+TEMP: str = "cache.temp"
+PARTIAL: str = "partials"  # .download files: in-flight downloads, or orphans after a crash
+MISSING_ROWS: str = "missing_rows"  # Tracks whose local_path no longer exists
+RECONCILED_AT: str = "reconciled_at"
+
+AUDIO_EXTENSIONS = {".mp3", ".flac", ".m4a", ".ogg", ".opus", ".wav", ".aac", ".webm"}
+PARTIAL_SUFFIX: str = ".download"
+
+_ADJUST = text(
+    "INSERT INTO inventorycounter (key, value) VALUES (:key, :delta) "
+    "ON CONFLICT(key) DO UPDATE SET value = value + :delta"
+)
+
+def _prefix(area: str, path: Union[str, Path]) -> str:
+    if area != LIBRARY:
+        return area
+    return f"{LIBRARY}.{Path(path).suffix.lstrip('.').lower() or 'other'}"
+
+def adjust(deltas: Dict[str, int], session: Optional[Session] = None) -> None:
+    """
+    Apply increments to inventory counters.
+
+    With a session the increments join the caller's transaction (committed with it);
+    otherwise they are committed on their own, and failures are only logged.
+    """
+    if session is None:
+        try:
+            with Session(engine) as own:
+                adjust(deltas, own)
+                own.commit()
+        except Exception:
+            _logger.exception("Failed to update storage inventory")
+        return
+    for key, delta in deltas.items():
+        if delta:
+            session.exec(_ADJUST, params={"key": key, "delta": delta})
+
+def set_value(key: str, value: int, session: Optional[Session] = None) -> None:
+    """
+    Overwrite a counter with an exact value (e.g. after a pass that counted it).
+    """
+    if session is None:
+        with Session(engine) as own:
+            set_value(key, value, own)
+            own.commit()
+        return
+    counter = session.get(InventoryCounter, key) or InventoryCounter(key=key)
+    counter.value = value
+    session.add(counter)
+
+def file_added(area: str, path: Union[str, Path], size: int, session: Optional[Session] = None) -> None:
+    """
+    Count a file that appeared in a storage area.
+    """
+    prefix = _prefix(area, path)
+    adjust({f"{prefix}.files": 1, f"{prefix}.bytes": size}, session)
+
+def file_removed(area: str, path: Union[str, Path], size: int, session: Optional[Session] = None) -> None:
+    """
+    Uncount a file that left a storage area.
+    """
+    prefix = _prefix(area, path)
+    adjust({f"{prefix}.files": -1, f"{prefix}.bytes": -size}, session)
+
+def file_moved(
+    source: str,
+    target: str,
+    path: Union[str, Path],
+    size: int,
+    session: Optional[Session] = None
+) -> None:
+    """
+    Move a file's count from one storage area to another in one update.
+    """
+    src, dst = _prefix(source, path), _prefix(target, path)
+    adjust({
+        f"{src}.files": -1, f"{src}.bytes": -size,
+        f"{dst}.files": 1, f"{dst}.bytes": size,
+    }, session)
+
+def area_bytes(area: str) -> Optional[int]:
+    """
+    Current byte total of a storage area, or None if the inventory was never reconciled.
+    """
+    with Session(engine) as session:
+        values = dict(session.exec(
+            select(InventoryCounter.key, InventoryCounter.value)
+            .where(InventoryCounter.key.in_([RECONCILED_AT, f"{area}.bytes"]))
+        ).all())
+    if RECONCILED_AT not in values:
+        return None
+    return max(0, values.get(f"{area}.bytes", 0))
+
+def _walk(root: Path, totals: Dict[str, int], area: str) -> None:
+    """
+    Add every file under `root` to `totals`: partial downloads separately, and only audio for the library.
+    """
+    if not root.exists():
+        return
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                size = os.stat(path).st_size
+            except OSError:
+                continue  # Removed while walking
+            if name.endswith(PARTIAL_SUFFIX):
+                prefix = PARTIAL
+            elif area == LIBRARY and Path(name).suffix.lower() not in AUDIO_EXTENSIONS:
+                continue
+            else:
+                prefix = _prefix(area, name)
+            totals[f"{prefix}.files"] = totals.get(f"{prefix}.files", 0) + 1
+            totals[f"{prefix}.bytes"] = totals.get(f"{prefix}.bytes", 0) + size
+
+def reconcile(ctx: Optional[Any] = None) -> Dict[str, int]:
+    """
+    Recompute every counter with a full walk of the library and cache directories
+    and a check of each track's local_path, then replace the stored totals.
+
+    Increments made while the walk runs may be lost; the next reconciliation fixes them.
+
+    Args:
+        ctx: Optional job context for progress reporting and cancellation.
+
+    Returns:
+        The new counter values.
+    """
+    totals: Dict[str, int] = {}
+    areas = [(Path(settings.MUSIC_PATH), LIBRARY), (Path(settings.CACHE_DIR), PERSISTENT), (Path(settings.TEMP_DIR), TEMP)]
+    for index, (root, area) in enumerate(areas):
+        if ctx:
+            ctx.check_cancelled()
+            ctx.progress(index / (len(areas) + 1), f"Walking {area}")
+        _walk(root, totals, area)
+
+    if ctx:
+        ctx.progress(len(areas) / (len(areas) + 1), "Checking track files")
+    with Session(engine) as session:
+        paths = session.exec(select(Track.local_path).where(Track.local_path != None)).all()
+        totals[MISSING_ROWS] = sum(1 for path in paths if not os.path.exists(path))
+        totals[RECONCILED_AT] = int(time.time())
+        session.exec(delete(InventoryCounter))
+        for key, value in totals.items():
+            session.add(InventoryCounter(key=key, value=value))
+        session.commit()
+    _logger.info(
+        "Storage inventory reconciled: %d library files, %d missing-file rows, %d partial downloads",
+        sum(v for k, v in totals.items() if k.startswith(f"{LIBRARY}.") and k.endswith(".files")),
+        totals[MISSING_ROWS], totals.get(f"{PARTIAL}.files", 0)
+    )
+    return totals
+
+def reconciled_age() -> Optional[float]:
+    """
+    Seconds since the last reconciliation, or None if there was none.
+    """
+    with Session(engine) as session:
+        counter = session.get(InventoryCounter, RECONCILED_AT)
+    return time.time() - counter.value if counter else None
+
+def snapshot(session: Session) -> Dict[str, Any]:
+    """
+    Read all counters (one query) into a report.
+
+    Returns:
+        Library totals per format, cache totals per area with the cache limit,
+        partial downloads, missing-file rows and when the totals were last reconciled.
+    """
+    from app.services.cache_manager import MAX_CACHE_SIZE_GB
+
+    values = dict(session.exec(select(InventoryCounter.key, InventoryCounter.value)).all())
+
+    def totals(prefix: str) -> Dict[str, int]:
+        # Increments racing a reconciliation can leave a counter slightly negative
+        return {
+            "files": max(0, values.get(f"{prefix}.files", 0)),
+            "bytes": max(0, values.get(f"{prefix}.bytes", 0)),
+        }
+
+    formats = sorted({key.split(".")[1] for key in values if key.startswith(f"{LIBRARY}.")})
+    by_format = {fmt: totals(f"{LIBRARY}.{fmt}") for fmt in formats}
+    reconciled_at = values.get(RECONCILED_AT)
+    return {
+        "library": {
+            "files": sum(t["files"] for t in by_format.values()),
+            "bytes": sum(t["bytes"] for t in by_format.values()),
+            "by_format": by_format,
+        },
+        "cache": {
+            "persistent": totals(PERSISTENT),
+            "temp": totals(TEMP),
+            "limit_bytes": MAX_CACHE_SIZE_GB * 1024 * 1024 * 1024,
+        },
+        "partials": totals(PARTIAL),
+        "missing_rows": max(0, values.get(MISSING_ROWS, 0)),
+        "reconciled_at": datetime.fromtimestamp(reconciled_at, timezone.utc) if reconciled_at else None,
+    }
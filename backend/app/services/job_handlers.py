@@ -0,0 +1,191 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session, or_, select
+
+from app.config import settings
+from app.models import Track
+from app.services.jobs import JobContext, JobRunner
+from app.services.response_cache import LIBRARY, bump
+from app.utils.logger import setup_logger
+
+_logger = setup_logger(__name__)
+
+BACKFILL_BATCH: int = 200  # Tracks per backfill run
+BACKFILL_RETRY_DAYS: int = 7  # Tracks without a thumbnail on YouTube are looked up again after this long
+CACHE_ENFORCE_INTERVAL: int = 3600
+METADATA_PRUNE_INTERVAL: int = 86400
+
+def index_library(ctx: JobContext) -> str:
+    """
+    Full library scan.
+    """
+    from app.indexer import run_indexer
+
+    run_indexer(ctx)
+    return "Library scanned"
+
+def dedup_tracks(ctx: JobContext, reclaim: bool = False) -> str:
+    """
+    Link YouTube tracks to local copies, optionally reclaiming their cached audio.
+    """
+    from app.services.dedup import run_dedup
+
+    run_dedup(reclaim)
+    return "Duplicates linked"
+
+def enforce_cache(ctx: JobContext) -> str:
+    """
+    Trim the persistent cache to its size limit.
+    """
+    from app.services.cache_manager import enforce_cache_limit
+
+    enforce_cache_limit()
+    return "Cache limit enforced"
+
+def promote(ctx: JobContext, remote_id: str) -> str:
+    """
+    Move a frequently played track into the persistent cache.
+    """
+    from app.services.cache_manager import promote_track_to_cache
+    from app.services.jobs import job_runner
+
+    promote_track_to_cache(remote_id)
+    job_runner.submit("cache_enforce")
+    return "Promoted"
+
+def prefetch(ctx: JobContext, remote_id: str, sync: bool = False) -> str:
+    """
+    Download a YouTube track into the temp cache ahead of playback (or as an offline copy,
+    which yields to prefetches for download slots).
+    """
+    from app.services.cache_manager import prefetch_track
+    from app.services.downloads import PRIORITY_PREFETCH, PRIORITY_SYNC
+
+    return prefetch_track(remote_id, ctx, PRIORITY_SYNC if sync else PRIORITY_PREFETCH)
+
+def reconcile_inventory(ctx: JobContext, force: bool = False) -> str:
+    """
+    Recompute the storage inventory from a full walk, unless it was reconciled recently.
+    """
+    from app.services import inventory
+
+    age = inventory.reconciled_age()
+    if not force and age is not None and age < settings.INVENTORY_RECONCILE_INTERVAL / 2:
+        return "Inventory is recent"
+    inventory.reconcile(ctx)
+    return "Inventory reconciled"
+
+def sweep(ctx: JobContext) -> str:
+    """
+    Clear stale partials, enforce the temp cache budget and repair track rows against the filesystem.
+    """
+    from app.services.sweeper import run_sweep
+
+    return run_sweep(ctx)
+
+def rebuild_catalog(ctx: JobContext) -> str:
+    """
+    Recompute artist and album aggregates from the Track table.
+    """
+    from app.services import catalog
+
+    counts = catalog.rebuild(ctx)
+    return f"{counts['artists']} artists, {counts['albums']} albums"
+
+def rollup_plays(ctx: JobContext) -> str:
+    """
+    Aggregate new play events into daily and monthly counts and prune old ones.
+    """
+    from app.services.play_log import rollup
+
+    counts = rollup(ctx)
+    return f"{counts['rolled_up']} plays rolled up, {counts['pruned_events']} events pruned"
+
+def backfill_thumbnails(ctx: JobContext) -> str:
+    """
+    Fill in missing thumbnails of YouTube tracks from song metadata.
+
+    Tracks never looked up come first, in ID order. A track whose lookup finds no
+    thumbnail is stamped and skipped for `BACKFILL_RETRY_DAYS`, so permanent misses
+    do not fill every batch and keep the rest from being reached.
+    """
+    from app.db import engine
+    from app.services import catalog, ytmusic
+
+    retry_before = datetime.now(timezone.utc) - timedelta(days=BACKFILL_RETRY_DAYS)
+    with Session(engine) as session:
+        tracks = session.exec(
+            select(Track).where(
+                Track.source_type == "youtube",
+                Track.thumbnail == None,
+                Track.remote_id != None,
+                or_(Track.thumbnail_checked_at == None, Track.thumbnail_checked_at < retry_before)
+            ).order_by(Track.thumbnail_checked_at, Track.id).limit(BACKFILL_BATCH)
+        ).all()
+
+        async def fetch_all() -> int:
+            filled = 0
+            for index, track in enumerate(tracks, start=1):
+                ctx.check_cancelled()
+                thumbnail = ytmusic.song_thumbnail(await ytmusic.get_song(track.remote_id))
+                if thumbnail:
+                    track.thumbnail = thumbnail
+                    catalog.fill_artwork(session, track)
+                    filled += 1
+                else:
+                    track.thumbnail_checked_at = datetime.now(timezone.utc)
+                session.add(track)
+                ctx.progress(index / len(tracks))
+            return filled
+
+        filled = asyncio.run(fetch_all()) if tracks else 0
+        if filled:
+            bump(session, LIBRARY)
+        session.commit()
+    _logger.info("Backfilled %d of %d thumbnails", filled, len(tracks))
+    return f"Backfilled {filled} of {len(tracks)} thumbnails"
+
+def prune_metadata(ctx: JobContext) -> str:
+    """
+    Drop YouTube metadata cache entries past their stale window.
+    """
+    from app.services import ytmusic
+
+    removed = ytmusic.metadata_cache.prune()
+    return f"Pruned {removed} entries"
+
+def register_handlers(runner: JobRunner) -> None:
+    """
+    Register the application's background job types.
+    """
+    runner.register("index", index_library, kind="cpu")
+    runner.register("dedup", dedup_tracks, kind="cpu")
+    runner.register("cache_enforce", enforce_cache, kind="io")
+    runner.register("promote", promote, kind="io", exclusive=False)
+    runner.register("prefetch", prefetch, kind="io", exclusive=False)
+    runner.register("backfill", backfill_thumbnails, kind="io")
+    runner.register("metadata_prune", prune_metadata, kind="io")
+    runner.register("inventory_reconcile", reconcile_inventory, kind="io")
+    runner.register("sweep", sweep, kind="io")
+    runner.register("catalog_rebuild", rebuild_catalog, kind="cpu")
+    runner.register("play_rollup", rollup_plays, kind="io")
+
+def schedule_periodic_jobs(runner: JobRunner) -> None:
+    """
+    Schedule the startup scan and recurring maintenance jobs.
+    """
+    # The first scan waits so it does not compete with the first requests
+    runner.submit_later("index", settings.STARTUP_SCAN_DELAY)
+    runner.schedule_every("cache_enforce", CACHE_ENFORCE_INTERVAL, initial_delay=settings.STARTUP_SCAN_DELAY)
+    runner.schedule_every("metadata_prune", METADATA_PRUNE_INTERVAL)
+    # Seeds the inventory on first start; later runs only correct drift
+    runner.schedule_every(
+        "inventory_reconcile", settings.INVENTORY_RECONCILE_INTERVAL, initial_delay=settings.STARTUP_SCAN_DELAY
+    )
+    runner.schedule_every("sweep", settings.SWEEP_INTERVAL, initial_delay=settings.STARTUP_SCAN_DELAY)
+    # Seeds the catalog of existing libraries; afterwards it is maintained as tracks are added
+    runner.schedule_every(
+        "catalog_rebuild", settings.CATALOG_REBUILD_INTERVAL, initial_delay=settings.STARTUP_SCAN_DELAY
+    )
+    runner.schedule_every("play_rollup", settings.PLAY_ROLLUP_INTERVAL, initial_delay=settings.STARTUP_SCAN_DELAY)
@@ -0,0 +1,512 @@
+import heapq
+import itertools
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlmodel import Session, delete, select
+
+from app.config import settings
+from app.models import Job
+from app.utils.logger import setup_logger
+
+_logger = setup_logger(__name__)
+
+PRIORITY_HIGH: int = 0
+PRIORITY_NORMAL: int = 5
+PRIORITY_LOW: int = 10
+
+ACTIVE_STATUSES = ("queued", "running")
+MAX_ATTEMPTS: int = 3  # Runs interrupted by a restart are resumed at most this many times
+PROGRESS_INTERVAL: float = 1.0  # Minimum seconds between persisted progress updates
+RETENTION_DAYS: int = 7  # Finished jobs older than this are deleted on start
+POLL_INTERVAL: float = 2.0  # Seconds between checks for jobs submitted by other processes
+
+class JobCancelled(Exception):
+    """
+    Raised inside a handler when its job has been cancelled.
+    """
+
+class JobContext:
+    """
+    Handle passed to job handlers for progress reporting and cooperative cancellation.
+    """
+    def __init__(self, runner: "JobRunner", job_id: str) -> None:
+        self.job_id = job_id
+        self._runner = runner
+        self._cancel = threading.Event()
+        self._last_report = 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def check_cancelled(self) -> None:
+        """
+        Raise `JobCancelled` if cancellation was requested. Handlers call this between units of work.
+        """
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def progress(self, fraction: float, message: Optional[str] = None) -> None:
+        """
+        Report progress (0.0 - 1.0). Persisted at most once per `PROGRESS_INTERVAL`.
+        """
+        now = time.monotonic()
+        if now - self._last_report < PROGRESS_INTERVAL and fraction < 1.0:
+            return
+        self._last_report = now
+        self._runner._update(self.job_id, progress=round(min(max(fraction, 0.0), 1.0), 4), message=message)
+
+@dataclass
+class _Handler:
+    func: Callable[..., Optional[str]]
+    kind: str  # 'cpu' or 'io'
+    exclusive: bool  # Only one job of this type may be queued or running
+
+class JobRunner:
+    """
+    Persistent background job runner.
+
+    Jobs are stored in the `Job` table and executed by two bounded worker pools:
+    "cpu" for scans and rebuilds, "io" for network and file transfers. Each pool
+    pulls from its own priority queue. Submitting a job whose unique key is already
+    queued or running returns the existing job instead (one full scan at a time,
+    one prefetch per track). Queued and interrupted jobs are resumed on `start()`.
+    Handlers receive a `JobContext` plus the job payload as keyword arguments.
+
+    With several worker processes only the elected leader calls `start()`. Followers
+    just persist submissions and cancellation requests; the leader picks them up
+    by polling the table.
+    """
+    def __init__(self, engine: Any = None, cpu_workers: int = 1, io_workers: int = 2) -> None:
+        self._engine = engine
+        self._workers = {"cpu": cpu_workers, "io": io_workers}
+        self._handlers: Dict[str, _Handler] = {}
+        self._queues: Dict[str, List[Tuple[int, int, str]]] = {"cpu": [], "io": []}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._active: Dict[str, str] = {}  # unique_key -> job ID
+        self._keys: Dict[str, str] = {}  # job ID -> unique_key, for active jobs
+        self._contexts: Dict[str, JobContext] = {}  # Running jobs
+        self._schedule: List[Tuple[float, int, str, Optional[Dict], int, Optional[float]]] = []
+        self._succeeded: set = set()  # Job types that completed at least once
+        self._started = False
+
+    @property
+    def engine(self) -> Any:
+        if self._engine is None:
+            from app.db import engine
+            self._engine = engine
+        return self._engine
+
+    def register(
+        self,
+        job_type: str,
+        func: Callable[..., Optional[str]],
+        kind: str = "io",
+        exclusive: bool = True
+    ) -> None:
+        """
+        Register the handler for a job type.
+
+        Args:
+            job_type: Name used when submitting jobs.
+            func: Callable invoked as `func(ctx, **payload)`; may return a result message.
+            kind: Worker pool to run on, "cpu" or "io".
+            exclusive: Coalesce all submissions of this type while one is active.
+        """
+        self._handlers[job_type] = _Handler(func, kind, exclusive)
+
+    # Persistence helpers
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        with Session(self.engine) as session:
+            job = session.get(Job, job_id)
+            if job:
+                for name, value in fields.items():
+                    setattr(job, name, value)
+                session.add(job)
+                session.commit()
+
+    def _push(self, job: Job) -> None:
+        """
+        Queue a persisted job in memory. Caller holds `_cond`.
+        """
+        kind = self._handlers[job.job_type].kind
+        heapq.heappush(self._queues[kind], (job.priority, next(self._seq), job.id))
+        self._active[job.unique_key] = job.id
+        self._keys[job.id] = job.unique_key
+        self._cond.notify_all()
+
+    def _release(self, job_id: str) -> None:
+        """
+        Forget an active job. Caller holds `_cond`.
+        """
+        key = self._keys.pop(job_id, None)
+        if key and self._active.get(key) == job_id:
+            del self._active[key]
+        self._contexts.pop(job_id, None)
+        self._cond.notify_all()
+
+    # Public API
+
+    def submit(
+        self,
+        job_type: str,
+        payload: Optional[Dict] = None,
+        priority: int = PRIORITY_NORMAL,
+        unique_key: Optional[str] = None
+    ) -> str:
+        """
+        Persist and queue a job, or return the active job it duplicates.
+
+        Args:
+            job_type: A registered job type.
+            payload: JSON-serialisable keyword arguments for the handler.
+            priority: Lower values run first.
+            unique_key: Coalescing key; defaults to the job type for exclusive handlers
+                and to the type plus payload otherwise.
+
+        Returns:
+            The job ID.
+        """
+        handler = self._handlers.get(job_type)
+        if handler is None:
+            raise ValueError(f"Unknown job type: {job_type}")
+        encoded = json.dumps(payload, sort_keys=True) if payload else None
+        if unique_key is None:
+            unique_key = job_type if handler.exclusive else f"{job_type}:{encoded or ''}"
+
+        with self._cond:
+            existing = self._active.get(unique_key) if self._started else self._find_active(unique_key)
+            if existing:
+                return existing
+            job = Job(
+                id=str(uuid.uuid4()),
+                job_type=job_type,
+                unique_key=unique_key,
+                priority=priority,
+                payload=encoded
+            )
+            with Session(self.engine) as session:
+                session.add(job)
+                session.commit()
+                session.refresh(job)
+            if self._started:
+                self._push(job)
+        _logger.info("Queued %s job %s (priority %d)", job_type, job.id, priority)
+        return job.id
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued job, or ask a running one to stop at its next checkpoint.
+
+        Returns:
+            True if the job was active.
+        """
+        if not self._started:
+            # Follower: the leader applies the request on its next poll
+            with Session(self.engine) as session:
+                job = session.get(Job, job_id)
+                if not job or job.status not in ACTIVE_STATUSES:
+                    return False
+                job.cancel_requested = True
+                session.add(job)
+                session.commit()
+            return True
+
+        with self._cond:
+            if job_id not in self._keys:
+                return False
+            ctx = self._contexts.get(job_id)
+            if ctx:
+                ctx._cancel.set()
+                return True
+        # Persisted before the job is released: the poller re-reads the status of jobs
+        # it does not know, so it cannot queue this one again
+        self._update(job_id, status="cancelled", finished_at=datetime.now(timezone.utc))
+        with self._cond:
+            self._release(job_id)  # Left in the heap; skipped when popped
+        _logger.info("Cancelled queued job %s", job_id)
+        return True
+
+    def _status(self, job_id: str) -> Optional[str]:
+        with Session(self.engine) as session:
+            return session.exec(select(Job.status).where(Job.id == job_id)).first()
+
+    def _find_active(self, unique_key: str) -> Optional[str]:
+        with Session(self.engine) as session:
+            return session.exec(
+                select(Job.id).where(Job.unique_key == unique_key, Job.status.in_(ACTIVE_STATUSES))
+            ).first()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Return a job as a dictionary, or None if unknown.
+        """
+        with Session(self.engine) as session:
+            job = session.get(Job, job_id)
+            return job.dict() if job else None
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """
+        Return the most recent jobs, optionally filtered by status.
+        """
+        statement = select(Job).order_by(Job.created_at.desc()).limit(limit)
+        if status:
+            statement = statement.where(Job.status == status)
+        with Session(self.engine) as session:
+            return [job.dict() for job in session.exec(statement).all()]
+
+    def has_succeeded(self, job_type: str) -> bool:
+        """
+        Return True once a job of this type has completed successfully (in any process).
+        """
+        if job_type not in self._succeeded:
+            with Session(self.engine) as session:
+                if session.exec(
+                    select(Job.id).where(Job.job_type == job_type, Job.status == "succeeded")
+                ).first():
+                    self._succeeded.add(job_type)
+        return job_type in self._succeeded
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> bool:
+        """
+        Block until a job is no longer active.
+
+        Returns:
+            False if the timeout expired first.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: job_id not in self._keys, timeout)
+
+    def schedule_every(
+        self,
+        job_type: str,
+        interval: float,
+        initial_delay: float = 0.0,
+        payload: Optional[Dict] = None,
+        priority: int = PRIORITY_LOW
+    ) -> None:
+        """
+        Submit a job periodically, starting after `initial_delay` seconds.
+        """
+        self._add_schedule(job_type, initial_delay, payload, priority, interval)
+
+    def submit_later(
+        self,
+        job_type: str,
+        delay: float,
+        payload: Optional[Dict] = None,
+        priority: int = PRIORITY_NORMAL
+    ) -> None:
+        """
+        Submit a job once after `delay` seconds.
+        """
+        self._add_schedule(job_type, delay, payload, priority, None)
+
+    def _add_schedule(
+        self,
+        job_type: str,
+        delay: float,
+        payload: Optional[Dict],
+        priority: int,
+        interval: Optional[float]
+    ) -> None:
+        with self._cond:
+            heapq.heappush(
+                self._schedule,
+                (time.monotonic() + delay, next(self._seq), job_type, payload, priority, interval)
+            )
+            self._cond.notify_all()
+
+    def start(self) -> None:
+        """
+        Resume persisted jobs and start the worker, scheduler and polling threads (leader only).
+        """
+        if self._started:
+            return
+        self._started = True
+        self._resume()
+        for kind, count in self._workers.items():
+            for index in range(count):
+                threading.Thread(
+                    target=self._work, args=(kind,), name=f"job-{kind}-{index}", daemon=True
+                ).start()
+        threading.Thread(target=self._run_schedule, name="job-scheduler", daemon=True).start()
+        threading.Thread(target=self._poll, name="job-poller", daemon=True).start()
+
+    def _resume(self) -> None:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=RETENTION_DAYS)
+        with Session(self.engine) as session:
+            session.exec(delete(Job).where(Job.status.not_in(ACTIVE_STATUSES), Job.created_at < cutoff))
+            session.commit()
+        resumed = self._adopt(ACTIVE_STATUSES)
+        if resumed:
+            _logger.info("Resumed %d background jobs", resumed)
+
+    def _adopt(self, statuses: Tuple[str, ...]) -> int:
+        """
+        Queue persisted jobs this process does not know about yet.
+
+        Returns:
+            The number of jobs queued.
+        """
+        adopted = 0
+        with Session(self.engine) as session:
+            pending = session.exec(
+                select(Job).where(Job.status.in_(statuses)).order_by(Job.created_at)
+            ).all()
+            for job in pending:
+                if job.id in self._keys:
+                    continue
+                if job.job_type not in self._handlers or job.unique_key in self._active or job.cancel_requested:
+                    job.status = "cancelled"
+                elif job.status == "running" and job.attempts >= MAX_ATTEMPTS:
+                    job.status = "failed"
+                    job.message = "Interrupted too many times"
+                else:
+                    with self._cond:
+                        # The job may have been cancelled and released since it was read
+                        if job.id in self._keys or self._status(job.id) not in statuses:
+                            continue
+                        job.status = "queued"
+                        self._push(job)
+                    adopted += 1
+                    continue
+                job.finished_at = datetime.now(timezone.utc)
+                session.add(job)
+            session.commit()
+        return adopted
+
+    def _poll(self) -> None:
+        while True:
+            time.sleep(POLL_INTERVAL)
+            try:
+                self._adopt(("queued",))
+                with Session(self.engine) as session:
+                    requested = session.exec(
+                        select(Job.id).where(Job.cancel_requested == True, Job.status.in_(ACTIVE_STATUSES))
+                    ).all()
+                for job_id in requested:
+                    self.cancel(job_id)
+            except Exception:
+                _logger.exception("Polling for submitted jobs failed")
+
+    # Threads
+
+    def _run_schedule(self) -> None:
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                due = []
+                while self._schedule and self._schedule[0][0] <= now:
+                    due.append(heapq.heappop(self._schedule))
+                for _, _, job_type, payload, priority, interval in due:
+                    if interval:
+                        heapq.heappush(
+                            self._schedule,
+                            (now + interval, next(self._seq), job_type, payload, priority, interval)
+                        )
+                if not due:
+                    timeout = self._schedule[0][0] - now if self._schedule else None
+                    self._cond.wait(timeout)
+                    continue
+            for _, _, job_type, payload, priority, _ in due:
+                try:
+                    self.submit(job_type, payload, priority)
+                except Exception:
+                    _logger.exception("Failed to submit scheduled %s job", job_type)
+
+    def _next_job(self, kind: str) -> str:
+        with self._cond:
+            while True:
+                queue = self._queues[kind]
+                while queue:
+                    _, _, job_id = heapq.heappop(queue)
+                    if job_id in self._keys:  # Skip jobs cancelled while queued
+                        self._contexts[job_id] = JobContext(self, job_id)
+                        return job_id
+                self._cond.wait()
+
+    def _work(self, kind: str) -> None:
+        while True:
+            job_id = self._next_job(kind)
+            try:
+                self._execute(job_id)
+            except Exception:
+                # e.g. the database was locked while recording the job's state; the worker carries on
+                _logger.exception("Job %s could not be run", job_id)
+
+    def _execute(self, job_id: str) -> None:
+        """
+        Run a job popped from a queue and record its outcome. The job is always
+        released, so its unique key can be submitted again, whatever fails.
+        """
+        try:
+            ctx = self._contexts.get(job_id)
+            with Session(self.engine) as session:
+                job = session.get(Job, job_id)
+                if job is None:
+                    _logger.warning("Job %s disappeared before it ran", job_id)
+                    return
+                if ctx is None or job.status == "cancelled":
+                    return  # Cancelled while it was being popped
+                job.status = "running"
+                job.attempts += 1
+                job.started_at = datetime.now(timezone.utc)
+                session.add(job)
+                session.commit()
+                job_type, payload = job.job_type, json.loads(job.payload) if job.payload else {}
+
+            started = time.perf_counter()
+            status, message = "succeeded", None
+            try:
+                message = self._handlers[job_type].func(ctx, **payload)
+            except JobCancelled:
+                status = "cancelled"
+            except Exception as exc:
+                status, message = "failed", f"{exc.__class__.__name__}: {exc}"
+                _logger.exception("Job %s (%s) failed", job_id, job_type)
+
+            fields: Dict[str, Any] = {"status": status, "message": message, "finished_at": datetime.now(timezone.utc)}
+            if status == "succeeded":
+                fields["progress"] = 1.0
+                self._succeeded.add(job_type)
+            self._update(job_id, **fields)
+        finally:
+            with self._cond:
+                self._release(job_id)
+        _logger.info(
+            "Job %s (%s) %s in %.1f ms", job_id, job_type, status, (time.perf_counter() - started) * 1000
+        )
+
+def run_periodically(
+    func: Callable[[], Any],
+    interval: float,
+    initial_delay: float = 0.0,
+    name: str = "periodic"
+) -> threading.Thread:
+    """
+    Run `func` every `interval` seconds in a daemon thread of this process.
+    For per-process maintenance (e.g. in-memory indexes); shared work belongs in a job.
+    """
+    def loop() -> None:
+        time.sleep(initial_delay)
+        while True:
+            try:
+                func()
+            except Exception:
+                _logger.exception("Periodic task %s failed", name)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name=name, daemon=True)
+    thread.start()
+    return thread
+
+job_runner: JobRunner = JobRunner(cpu_workers=settings.JOB_CPU_WORKERS, io_workers=settings.JOB_IO_WORKERS)
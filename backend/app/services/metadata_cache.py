@@ -0,0 +1,216 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.config import settings
+from app.utils.logger import setup_logger
+
+_logger = setup_logger(__name__)
+
+# kind -> (fresh TTL, additional stale-while-revalidate window) in seconds
+DEFAULT_TTLS: Dict[str, Tuple[int, int]] = {
+    "song": (7 * 24 * 3600, 30 * 24 * 3600),
+    "search": (6 * 3600, 24 * 3600),
+    "watch": (24 * 3600, 7 * 24 * 3600),
+}
+NEGATIVE_TTL: int = 600  # Lookups that found nothing are not retried for 10 minutes
+ERROR_TTL: int = 30  # Lookups that failed (network, 5xx, throttling) are only held back this long
+# `is_error` values: what a negatively cached entry records
+NOT_FOUND, FAILED = 1, 2
+IO_WORKERS: int = 2  # Threads (each with its own connection) running cache reads and writes
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata_cache (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    is_error INTEGER NOT NULL DEFAULT 0,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+)
+"""
+
+def default_cache_path() -> str:
+    """
+    Resolve the metadata cache file location: next to the SQLite database when possible.
+
+    Returns:
+        Absolute path of the cache database file.
+    """
+    if settings.METADATA_CACHE_PATH:
+        return settings.METADATA_CACHE_PATH
+    if settings.DATABASE_URL.startswith("sqlite:///"):
+        db_path = settings.DATABASE_URL.replace("sqlite:///", "")
+        return os.path.join(os.path.dirname(db_path) or ".", "yt_metadata.db")
+    return os.path.join(settings.CACHE_DIR, "yt_metadata.db")
+
+class MetadataCache:
+    """
+    Disk-backed (SQLite) cache for YouTube Music metadata lookups.
+
+    Entries are fresh for the kind's TTL. After that they are still served for a
+    stale window while a background refresh runs. Lookups that found nothing are
+    remembered for `negative_ttl` seconds so that dead video IDs are not retried on
+    every request; lookups that raised may be transient failures and are only held
+    back for `error_ttl` seconds.
+    SQLite is only accessed from a small thread pool, never from the event loop.
+    """
+    def __init__(
+        self,
+        path: str,
+        ttls: Optional[Dict[str, Tuple[int, int]]] = None,
+        negative_ttl: int = NEGATIVE_TTL,
+        error_ttl: int = ERROR_TTL
+    ) -> None:
+        self.path = path
+        self.ttls = ttls or DEFAULT_TTLS
+        self.negative_ttl = negative_ttl
+        self.error_ttl = error_ttl
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="metadata-cache")
+        # In-flight background refreshes (also keeps a reference to each task)
+        self._refreshing: Dict[Tuple[str, str], asyncio.Task] = {}
+
+    def _conn(self) -> sqlite3.Connection:
+        """
+        Return this thread's connection, creating the database on first use.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a blocking cache operation on the cache's threads.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _read(self, kind: str, key: str) -> Optional[Tuple[Any, int, float]]:
+        row = self._conn().execute(
+            "SELECT value, is_error, fetched_at FROM metadata_cache WHERE kind = ? AND key = ?",
+            (kind, key)
+        ).fetchone()
+        if row is None:
+            return None
+        value = json.loads(row[0]) if row[0] is not None else None
+        return value, row[1], row[2]
+
+    def _write(self, kind: str, key: str, value: Any, is_error: int = 0) -> None:
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO metadata_cache (kind, key, value, is_error, fetched_at) VALUES (?, ?, ?, ?, ?)",
+            (kind, key, None if is_error else json.dumps(value), is_error, time.time())
+        )
+        conn.commit()
+
+    async def _store(self, kind: str, key: str, value: Any, is_error: int = 0) -> None:
+        """
+        Write an entry, logging rather than raising if the database refuses it (e.g. while
+        locked by another worker): a lookup already paid for is still returned to the caller.
+        """
+        try:
+            await self._run(self._write, kind, key, value, is_error)
+        except sqlite3.Error:
+            _logger.exception("Metadata cache write failed for %s:%s", kind, key)
+
+    async def _fetch_and_store(self, kind: str, key: str, fetcher: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await fetcher()
+        except Exception:
+            await self._store(kind, key, None, FAILED)
+            raise
+        if value is None:
+            await self._store(kind, key, None, NOT_FOUND)
+        else:
+            await self._store(kind, key, value)
+        return value
+
+    async def _refresh(self, kind: str, key: str, fetcher: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            value = await fetcher()
+            if value is not None:
+                await self._run(self._write, kind, key, value)
+        except Exception:
+            # Keep serving the stale value; it will be retried on a later hit
+            _logger.warning("Background refresh failed for %s:%s", kind, key)
+        finally:
+            self._refreshing.pop((kind, key), None)
+
+    def _schedule_refresh(self, kind: str, key: str, fetcher: Callable[[], Awaitable[Any]]) -> None:
+        if (kind, key) in self._refreshing:
+            return
+        self._refreshing[(kind, key)] = asyncio.get_running_loop().create_task(
+            self._refresh(kind, key, fetcher)
+        )
+
+    async def get_or_fetch(
+        self,
+        kind: str,
+        key: str,
+        fetcher: Callable[[], Awaitable[Any]]
+    ) -> Optional[Any]:
+        """
+        Return the cached value for (kind, key), awaiting `fetcher` on a miss.
+
+        Args:
+            kind: Entry kind, one of the configured TTL kinds ("song", "search", "watch").
+            key: Lookup key within the kind.
+            fetcher: Zero-argument coroutine function performing the real lookup.
+
+        Returns:
+            The cached or freshly fetched value, or None if the lookup is negatively cached.
+
+        Raises:
+            Exception: Whatever `fetcher` raises on a miss (held back for `error_ttl`).
+        """
+        ttl, stale_window = self.ttls[kind]
+        try:
+            entry = await self._run(self._read, kind, key)
+        except sqlite3.Error:
+            _logger.exception("Metadata cache read failed for %s:%s", kind, key)
+            return await fetcher()
+
+        if entry is not None:
+            value, is_error, fetched_at = entry
+            age = time.time() - fetched_at
+            if is_error and age < (self.negative_ttl if is_error == NOT_FOUND else self.error_ttl):
+                return None
+            if not is_error and age < ttl:
+                return value
+            if not is_error and age < ttl + stale_window:
+                self._schedule_refresh(kind, key, fetcher)
+                return value
+
+        return await self._fetch_and_store(kind, key, fetcher)
+
+    def prune(self) -> int:
+        """
+        Delete entries that are past their stale window.
+
+        Returns:
+            Number of removed entries.
+        """
+        conn = self._conn()
+        now = time.time()
+        removed = 0
+        for kind, (ttl, stale_window) in self.ttls.items():
+            cursor = conn.execute(
+                "DELETE FROM metadata_cache WHERE kind = ? AND fetched_at < ?",
+                (kind, now - ttl - stale_window)
+            )
+            removed += cursor.rowcount
+        conn.commit()
+        return removed
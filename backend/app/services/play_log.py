@@ -0,0 +1,206 @@
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, text
+from sqlmodel import Session, delete, select
+
+from app.config import settings
+from app.db import engine
+from app.models import PlayDaily, PlayEvent, PlayMonthly, RollupWatermark, Track
+from app.services.jobs import JobContext
+from app.services.response_cache import bump, user_scope
+from app.services.tracks import TRACK_COLUMNS
+from app.utils.logger import setup_logger
+
+_logger = setup_logger(__name__)
+
+DAY: int = 86400
+MAX_PENDING_BATCHES: int = 50  # Buffered batches kept while the database rejects inserts
+PERIODS = ("week", "month", "year", "all")
+
+_WATERMARK = "play_rollup"
+# Both rollups read the same range of new events and add to existing aggregates
+_ROLLUPS = [
+    text(
+        "INSERT INTO playdaily (user_id, day, track_id, plays) "
+        f"SELECT user_id, played_at / {DAY} AS day, track_id, count(*) FROM playevent "
+        "WHERE id > :low AND id <= :high GROUP BY user_id, day, track_id "
+        "ON CONFLICT (user_id, day, track_id) DO UPDATE SET plays = plays + excluded.plays"
+    ),
+    text(
+        "INSERT INTO playmonthly (user_id, month, track_id, plays) "
+        "SELECT user_id, CAST(strftime('%Y%m', played_at, 'unixepoch') AS INTEGER) AS month, track_id, count(*) "
+        "FROM playevent WHERE id > :low AND id <= :high GROUP BY user_id, month, track_id "
+        "ON CONFLICT (user_id, month, track_id) DO UPDATE SET plays = plays + excluded.plays"
+    ),
+]
+
+class PlayLog:
+    """
+    Per-process buffer of plays, appended to PlayEvent with one batched insert.
+
+    Recording a play is a list append, so it never touches the database from a
+    request. This worker's flusher thread (`start`) writes the buffer every
+    PLAY_LOG_FLUSH_INTERVAL seconds, or as soon as it holds `batch_size` plays,
+    so history lags plays by at most that interval (plays still buffered when a
+    worker is killed are lost).
+    """
+    def __init__(self, batch_size: int) -> None:
+        self.batch_size = batch_size
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._full = threading.Event()
+
+    def record(self, user_id: str, track_id: str, played_at: Optional[float] = None) -> None:
+        """
+        Buffer a play, waking the flusher if the buffer is full.
+        """
+        event = {"user_id": user_id, "track_id": track_id, "played_at": int(played_at or time.time())}
+        with self._lock:
+            self._pending.append(event)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._full.set()
+
+    def start(self, interval: float) -> threading.Thread:
+        """
+        Start this worker's flusher thread, writing the buffer every `interval` seconds or once it is full.
+        """
+        def loop() -> None:
+            while True:
+                self._full.wait(interval)
+                self._full.clear()
+                self.try_flush()
+
+        thread = threading.Thread(target=loop, name="play-log-flush", daemon=True)
+        thread.start()
+        return thread
+
+    def flush(self) -> int:
+        """
+        Write the buffered plays and bump the versions of the users they belong to.
+
+        Returns:
+            Number of plays written.
+        """
+        with self._lock:
+            events, self._pending = self._pending, []
+        if not events:
+            return 0
+        try:
+            with Session(engine) as session:
+                session.connection().execute(PlayEvent.__table__.insert(), events)
+                bump(session, *sorted({user_scope(event["user_id"]) for event in events}))
+                session.commit()
+        except Exception:
+            with self._lock:
+                # Retried by the next flush, oldest plays dropped first if the database stays unavailable
+                self._pending[:0] = events
+                del self._pending[:-self.batch_size * MAX_PENDING_BATCHES]
+            raise
+        return len(events)
+
+    def try_flush(self) -> int:
+        """
+        `flush`, logging a failure instead of raising it (the plays stay buffered for the next flush).
+        """
+        try:
+            return self.flush()
+        except Exception:
+            _logger.exception("Failed to write %d buffered plays", len(self._pending))
+            return 0
+
+play_log: PlayLog = PlayLog(settings.PLAY_LOG_BATCH)
+
+def rollup(ctx: Optional[JobContext] = None) -> Dict[str, int]:
+    """
+    Add the plays logged since the last run to the daily and monthly aggregates, then
+    prune raw events older than PLAY_EVENT_RETENTION_DAYS and daily rows older than
+    PLAY_DAILY_RETENTION_DAYS. Runs in one transaction with the watermark, so every
+    event is counted exactly once even if a run fails halfway.
+
+    Returns:
+        Counts of events rolled up and of raw events and daily rows pruned.
+    """
+    now = int(time.time())
+    with Session(engine) as session:
+        watermark = session.get(RollupWatermark, _WATERMARK) or RollupWatermark(name=_WATERMARK)
+        low = watermark.last_id
+        high = session.exec(select(func.max(PlayEvent.id))).one() or low
+        rolled = 0
+        if high > low:
+            rolled = session.exec(
+                select(func.count()).where(PlayEvent.id > low, PlayEvent.id <= high)
+            ).one()
+            users = session.exec(
+                select(PlayEvent.user_id).where(PlayEvent.id > low, PlayEvent.id <= high).distinct()
+            ).all()
+            for statement in _ROLLUPS:
+                session.exec(statement, params={"low": low, "high": high})
+            watermark.last_id = high
+            session.add(watermark)
+            # Top lists are read from the aggregates
+            bump(session, *sorted(user_scope(user_id) for user_id in users))
+        if ctx:
+            ctx.progress(0.5, f"Rolled up {rolled} plays")
+
+        # Only events already counted are deleted
+        pruned_events = session.exec(delete(PlayEvent).where(
+            PlayEvent.id <= high, PlayEvent.played_at < now - settings.PLAY_EVENT_RETENTION_DAYS * DAY
+        )).rowcount
+        pruned_days = session.exec(delete(PlayDaily).where(
+            PlayDaily.day < now // DAY - settings.PLAY_DAILY_RETENTION_DAYS
+        )).rowcount
+        session.commit()
+
+    _logger.info("Rolled up %d plays; pruned %d events and %d daily rows", rolled, pruned_events, pruned_days)
+    return {"rolled_up": rolled, "pruned_events": pruned_events, "pruned_days": pruned_days}
+
+def history_statement(user_id: str, before: Optional[int], limit: int) -> Any:
+    """
+    Select a page of a user's plays, newest first, with their tracks (keyset
+    pagination on the event ID: pass the last `event_id` of a page as `before`).
+    """
+    statement = (
+        select(PlayEvent.id.label("event_id"), PlayEvent.played_at, *TRACK_COLUMNS)
+        .join(Track, Track.id == PlayEvent.track_id)
+        .where(PlayEvent.user_id == user_id)
+    )
+    if before is not None:
+        statement = statement.where(PlayEvent.id < before)
+    return statement.order_by(PlayEvent.id.desc()).limit(limit)
+
+def top_statement(user_id: str, period: str, limit: int, now: Optional[datetime] = None) -> Any:
+    """
+    Select a user's most played tracks of the last week or month (from the daily
+    aggregates), the last twelve months or all time (from the monthly ones), with
+    their play counts. Plays not yet rolled up are not counted.
+
+    Raises:
+        ValueError: If the period is not supported.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of: {', '.join(PERIODS)}")
+    now = now or datetime.now(timezone.utc)
+    if period in ("week", "month"):
+        first_day = int(now.timestamp()) // DAY - (6 if period == "week" else 29)
+        table, window = PlayDaily, PlayDaily.day >= first_day
+    else:
+        year, month = divmod(now.year * 12 + now.month - 1 - 11, 12)
+        table = PlayMonthly
+        window = PlayMonthly.month >= (year * 100 + month + 1 if period == "year" else 0)
+
+    totals = (
+        select(table.track_id, func.sum(table.plays).label("plays"))
+        .where(table.user_id == user_id, window)
+        .group_by(table.track_id)
+        .subquery()
+    )
+    return (
+        select(*TRACK_COLUMNS, totals.c.plays)
+        .join(totals, totals.c.track_id == Track.id)
+        .order_by(totals.c.plays.desc(), Track.id)
+        .limit(limit)
+    )
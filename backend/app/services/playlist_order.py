@@ -0,0 +1,112 @@
+from typing import List, Optional
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.models import PlaylistTrack
+from app.utils.logger import setup_logger
+
+_logger = setup_logger(__name__)
+
+# Playlist positions are sparse integers spaced GAP apart. Appending takes MAX + GAP,
+# inserting or moving between two entries takes the midpoint, and deleting leaves
+# a hole. Each is a single row write; only when two neighbours have no integer
+# left between them is the playlist renumbered (`rebalance`).
+GAP: int = 1024
+
+def append_position(session: Session, playlist_id: str) -> int:
+    """
+    Position after the last entry of a playlist (a single MAX query on the (playlist_id, position) index).
+    """
+    last = session.exec(
+        select(func.max(PlaylistTrack.position)).where(PlaylistTrack.playlist_id == playlist_id)
+    ).one()
+    return GAP if last is None else last + GAP
+
+def position_between(before: Optional[int], after: Optional[int]) -> Optional[int]:
+    """
+    Pick a position strictly between two neighbours.
+
+    Args:
+        before: Position of the preceding entry, or None at the start.
+        after: Position of the following entry, or None at the end.
+
+    Returns:
+        The new position, or None if there is no room and the playlist must be rebalanced.
+    """
+    if before is None and after is None:
+        return GAP
+    if after is None:
+        return before + GAP
+    if before is None:
+        return after - GAP
+    if after - before < 2:
+        return None
+    return (before + after) // 2
+
+def rebalance(session: Session, playlist_id: str) -> List[PlaylistTrack]:
+    """
+    Renumber a playlist's entries GAP apart, keeping their order. Does not commit.
+
+    Returns:
+        The entries in order.
+    """
+    entries = session.exec(
+        select(PlaylistTrack)
+        .where(PlaylistTrack.playlist_id == playlist_id)
+        .order_by(PlaylistTrack.position, PlaylistTrack.id)
+    ).all()
+    for index, entry in enumerate(entries, start=1):
+        entry.position = index * GAP
+        session.add(entry)
+    session.flush()
+    _logger.info("Rebalanced positions of playlist %s (%d entries)", playlist_id, len(entries))
+    return entries
+
+def _neighbour_after(session: Session, playlist_id: str, position: int, exclude_id: Optional[int]) -> Optional[int]:
+    statement = (
+        select(PlaylistTrack.position)
+        .where(PlaylistTrack.playlist_id == playlist_id, PlaylistTrack.position > position)
+        .order_by(PlaylistTrack.position)
+        .limit(1)
+    )
+    if exclude_id is not None:
+        statement = statement.where(PlaylistTrack.id != exclude_id)
+    return session.exec(statement).first()
+
+def _first_position(session: Session, playlist_id: str, exclude_id: Optional[int]) -> Optional[int]:
+    statement = select(func.min(PlaylistTrack.position)).where(PlaylistTrack.playlist_id == playlist_id)
+    if exclude_id is not None:
+        statement = statement.where(PlaylistTrack.id != exclude_id)
+    return session.exec(statement).one()
+
+def position_after_entry(
+    session: Session,
+    playlist_id: str,
+    after: Optional[PlaylistTrack],
+    moving_id: Optional[int] = None
+) -> int:
+    """
+    Position for an entry placed right after `after` (or at the start when None),
+    rebalancing the playlist first if the neighbours are adjacent. Does not commit.
+
+    Args:
+        session: Database session.
+        playlist_id: Target playlist.
+        after: Entry to place after, or None for the first slot.
+        moving_id: ID of the entry being moved, ignored as a neighbour.
+
+    Returns:
+        The position to assign.
+    """
+    for _ in range(2):
+        if after is None:
+            position = position_between(None, _first_position(session, playlist_id, moving_id))
+        else:
+            following = _neighbour_after(session, playlist_id, after.position, moving_id)
+            position = position_between(after.position, following)
+        if position is not None:
+            return position
+        # `after` is in the session's identity map, so it sees its new position
+        rebalance(session, playlist_id)
+    raise RuntimeError(f"Could not find a position in playlist {playlist_id}")
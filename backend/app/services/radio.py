@@ -0,0 +1,315 @@
+import math
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from typing import Deque, Dict, Iterable, List, Optional, Set
+
+from sqlmodel import Session, select
+
+from app.models import PlaylistTrack, Track, UserActivity
+from app.utils.logger import setup_logger
+
+_logger = setup_logger(__name__)
+
+PLAYLIST_WINDOW: int = 20  # Tracks closer than this in a playlist are considered related
+USER_TOP_ITEMS: int = 50  # Per-user items used for co-occurrence (strongest signals first)
+SESSION_WINDOW: int = 5  # Recently played tracks linked to each new play
+
+def track_to_candidate(track: Track) -> Dict:
+    """
+    Build the compact track dictionary kept in memory and returned by Radio Mode.
+    """
+    return {
+        "id": track.id,
+        "title": track.title,
+        "artist": track.artist,
+        "album": track.album,
+        "duration": track.duration,
+        "source_type": track.source_type,
+        "remote_id": track.remote_id,
+        "is_cached": track.is_cached,
+        "thumbnail": track.thumbnail,
+    }
+
+class RadioEngine:
+    """
+    In-memory Radio Mode recommender.
+
+    Combines an item-item co-occurrence graph built from playlists and user activity
+    with cached YouTube related-track lists, and remembers what each user was
+    already served so that consecutive refills do not repeat themselves.
+    All reads are served from memory; the graph is updated incrementally on
+    play/like/playlist events and fully rebuilt periodically in the background.
+    """
+    def __init__(
+        self,
+        max_neighbours: int = 50,
+        history_size: int = 200,
+        related_cache_size: int = 2000,
+        local_share: float = 0.5
+    ) -> None:
+        self.max_neighbours = max_neighbours
+        self.history_size = history_size
+        self.related_cache_size = related_cache_size
+        self.local_share = local_share
+        self.built_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._tracks: Dict[str, Dict] = {}
+        self._by_remote: Dict[str, str] = {}
+        self._neighbours: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._playlists: Dict[str, List[str]] = {}
+        self._related: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._history: Dict[str, Deque[str]] = {}  # Played and served keys, for dedupe
+        self._plays: Dict[str, Deque[str]] = {}  # Recently played track IDs, for session links
+
+    # Graph construction
+
+    @staticmethod
+    def _link(graph: Dict[str, Dict[str, float]], a: str, b: str, weight: float) -> None:
+        if a == b:
+            return
+        graph[a][b] = graph[a].get(b, 0.0) + weight
+        graph[b][a] = graph[b].get(a, 0.0) + weight
+
+    def _trim(self, graph: Dict[str, Dict[str, float]], keys: Optional[Iterable[str]] = None) -> None:
+        for key in (keys if keys is not None else list(graph.keys())):
+            neighbours = graph.get(key)
+            if neighbours and len(neighbours) > self.max_neighbours:
+                top = sorted(neighbours.items(), key=lambda kv: kv[1], reverse=True)[:self.max_neighbours]
+                graph[key] = dict(top)
+
+    def rebuild(self, session: Session) -> None:
+        """
+        Rebuild the co-occurrence index from `PlaylistTrack` and `UserActivity`.
+
+        Args:
+            session: Database session used for the bulk reads.
+        """
+        started = time.perf_counter()
+        tracks = {t.id: track_to_candidate(t) for t in session.exec(select(Track)).all()}
+        graph: Dict[str, Dict[str, float]] = defaultdict(dict)
+
+        playlists: Dict[str, List[str]] = defaultdict(list)
+        rows = session.exec(
+            select(PlaylistTrack.playlist_id, PlaylistTrack.track_id)
+            .order_by(PlaylistTrack.playlist_id, PlaylistTrack.position)
+        ).all()
+        for playlist_id, track_id in rows:
+            playlists[playlist_id].append(track_id)
+        for items in playlists.values():
+            for i, a in enumerate(items):
+                for j in range(i + 1, min(len(items), i + 1 + PLAYLIST_WINDOW)):
+                    # Adjacent tracks are stronger evidence than distant ones
+                    self._link(graph, a, items[j], 1.0 / (j - i))
+
+        per_user: Dict[str, List] = defaultdict(list)
+        activities = session.exec(
+            select(UserActivity.user_id, UserActivity.track_id, UserActivity.play_count, UserActivity.is_liked)
+        ).all()
+        for user_id, track_id, play_count, is_liked in activities:
+            weight = (2.0 if is_liked else 0.0) + math.log1p(play_count or 0)
+            if weight > 0:
+                per_user[user_id].append((weight, track_id))
+        for items in per_user.values():
+            top = sorted(items, reverse=True)[:USER_TOP_ITEMS]
+            norm = 1.0 / math.log2(2 + len(top))
+            for i, (wa, a) in enumerate(top):
+                for wb, b in top[i + 1:]:
+                    self._link(graph, a, b, min(wa, wb) * norm * 0.5)
+
+        self._trim(graph)
+        with self._lock:
+            self._tracks = tracks
+            self._by_remote = {t["remote_id"]: t["id"] for t in tracks.values() if t.get("remote_id")}
+            self._neighbours = graph
+            self._playlists = dict(playlists)
+            self.built_at = time.time()
+        _logger.info(
+            "Radio index rebuilt: %d tracks, %d nodes in %.1f ms",
+            len(tracks), len(graph), (time.perf_counter() - started) * 1000
+        )
+
+    # Incremental updates
+
+    def _register(self, track: Track) -> None:
+        candidate = track_to_candidate(track)
+        self._tracks[track.id] = candidate
+        if track.remote_id:
+            self._by_remote[track.remote_id] = track.id
+
+    def _push_history(self, user_id: str, key: Optional[str]) -> None:
+        if not key:
+            return
+        history = self._history.get(user_id)
+        if history is None:
+            history = self._history[user_id] = deque(maxlen=self.history_size)
+        history.append(key)
+
+    def record_play(self, user_id: str, track: Track) -> None:
+        """
+        Link a played track with the user's most recent plays and add it to their history.
+        """
+        with self._lock:
+            self._register(track)
+            plays = self._plays.setdefault(user_id, deque(maxlen=SESSION_WINDOW))
+            recent = list(plays)
+            for distance, other in enumerate(reversed(recent), start=1):
+                self._link(self._neighbours, track.id, other, 0.5 / distance)
+            plays.append(track.id)
+            self._push_history(user_id, track.id)
+            self._trim(self._neighbours, [track.id, *recent])
+
+    def record_like(self, user_id: str, track: Track) -> None:
+        """
+        Strengthen the links between a liked track and the user's recent listening.
+        """
+        with self._lock:
+            self._register(track)
+            recent = list(self._plays.get(user_id, ()))
+            for other in recent:
+                self._link(self._neighbours, track.id, other, 1.0)
+            self._trim(self._neighbours, [track.id, *recent])
+
+    def record_playlist_add(self, playlist_id: str, track: Track) -> None:
+        """
+        Link a track appended to a playlist with the tracks preceding it.
+        """
+        with self._lock:
+            self._register(track)
+            items = self._playlists.setdefault(playlist_id, [])
+            window = items[-PLAYLIST_WINDOW:]
+            for distance, other in enumerate(reversed(window), start=1):
+                self._link(self._neighbours, track.id, other, 1.0 / distance)
+            items.append(track.id)
+            self._trim(self._neighbours, [track.id, *window])
+
+    # Related-track graph from YouTube
+
+    def get_cached_related(self, remote_id: str) -> Optional[List[Dict]]:
+        """
+        Return the cached YouTube related tracks for a seed, or None if never fetched.
+        """
+        with self._lock:
+            related = self._related.get(remote_id)
+            if related is not None:
+                self._related.move_to_end(remote_id)
+            return related
+
+    def set_related(self, remote_id: str, candidates: List[Dict]) -> None:
+        """
+        Cache the YouTube related tracks for a seed (LRU bounded).
+        """
+        with self._lock:
+            self._related[remote_id] = candidates
+            self._related.move_to_end(remote_id)
+            while len(self._related) > self.related_cache_size:
+                self._related.popitem(last=False)
+
+    # Recommendation
+
+    def local_degree(self, seed_id: Optional[str]) -> int:
+        """
+        Return the number of local neighbours known for a seed track.
+        """
+        if not seed_id:
+            return 0
+        with self._lock:
+            return len(self._neighbours.get(seed_id, ()))
+
+    def _local_candidates(self, seed_id: str, limit: int) -> List[Dict]:
+        scores: Dict[str, float] = dict(self._neighbours.get(seed_id, {}))
+        # Second hop with damped weights widens the pool for sparse seeds
+        if len(scores) < limit:
+            for neighbour, weight in list(scores.items()):
+                for second, second_weight in self._neighbours.get(neighbour, {}).items():
+                    if second != seed_id:
+                        scores[second] = scores.get(second, 0.0) + 0.25 * weight * second_weight
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        return [self._tracks[k] for k, _ in ranked if k in self._tracks]
+
+    def next_batch(
+        self,
+        seed_id: Optional[str],
+        seed_remote_id: Optional[str],
+        user_id: str,
+        limit: int = 20,
+        exclude: Optional[Iterable[str]] = None
+    ) -> List[Dict]:
+        """
+        Return the next batch of Radio Mode tracks for a seed.
+
+        Local co-occurrence candidates and cached YouTube related tracks are interleaved
+        (roughly `local_share` local), deduplicated by id/remote_id and filtered against
+        the user's recent history. Returned tracks are added to that history.
+
+        Args:
+            seed_id: Database ID of the seed track, if it is known locally.
+            seed_remote_id: YouTube ID of the seed track, if any.
+            user_id: The listening user.
+            limit: Maximum number of tracks to return.
+            exclude: Additional track IDs or remote IDs the client already has queued.
+
+        Returns:
+            A list of track dictionaries.
+        """
+        with self._lock:
+            if seed_id is None and seed_remote_id:
+                seed_id = self._by_remote.get(seed_remote_id)
+            local = self._local_candidates(seed_id, limit * 2) if seed_id else []
+            remote = list(self._related.get(seed_remote_id, [])) if seed_remote_id else []
+
+            seen: Set[str] = set(self._history.get(user_id, ()))
+            seen.update(exclude or ())
+            seen.update(k for k in (seed_id, seed_remote_id) if k)
+            # History stores database IDs; also block their YouTube IDs
+            seen.update(
+                self._tracks[k]["remote_id"] for k in list(seen)
+                if k in self._tracks and self._tracks[k].get("remote_id")
+            )
+
+            def take(source) -> Optional[Dict]:
+                for item in source:
+                    keys = {item.get("id"), item.get("remote_id")} - {None}
+                    # Prefer the library copy of YouTube tracks we already know
+                    known = self._by_remote.get(item.get("remote_id") or "")
+                    if known in self._tracks:
+                        item = self._tracks[known]
+                        keys.add(known)
+                    if keys & seen:
+                        continue
+                    seen.update(keys)
+                    return item
+                return None
+
+            local_iter, remote_iter = iter(local), iter(remote)
+            local_quota = max(1, round(limit * self.local_share))
+            batch: List[Dict] = []
+            taken_local = 0
+            while len(batch) < limit:
+                taken_remote = len(batch) - taken_local
+                want_local = taken_local < local_quota and \
+                    taken_local * (1 - self.local_share) <= taken_remote * self.local_share
+                item = take(local_iter) if want_local else take(remote_iter)
+                from_local = want_local
+                if item is None:
+                    item = take(remote_iter) if want_local else take(local_iter)
+                    from_local = not want_local
+                if item is None:
+                    break
+                taken_local += int(from_local)
+                batch.append(item)
+
+            for item in batch:
+                self._push_history(user_id, item.get("id") or item.get("remote_id"))
+            return batch
+
+radio_engine: RadioEngine = RadioEngine()
+
+def rebuild_radio_index() -> None:
+    """
+    Rebuild the radio index in a fresh database session.
+    """
+    from app.db import engine
+
+    with Session(engine) as session:
+        radio_engine.rebuild(session)
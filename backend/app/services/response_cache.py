@@ -0,0 +1,135 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.models import VersionCounter
+from app.utils.json_response import dumps
+from app.utils.projection import project
+from app.utils.logger import setup_logger
+
+_logger = setup_logger(__name__)
+
+# Scopes: per-user state (likes, plays, playlists), track rows, and global play counts
+LIBRARY: str = "library"
+PLAYS: str = "plays"
+
+_BUMP = text(
+    "INSERT INTO versioncounter (scope, version) VALUES (:scope, 1) "
+    "ON CONFLICT(scope) DO UPDATE SET version = version + 1"
+)
+
+def user_scope(user_id: str) -> str:
+    return f"user:{user_id}"
+
+def bump(session: Session, *scopes: str) -> None:
+    """
+    Increment version counters inside the caller's transaction (committed with it).
+    """
+    for scope in scopes:
+        session.exec(_BUMP, params={"scope": scope})
+
+def current_versions(session: Session, scopes: Iterable[str]) -> Tuple[int, ...]:
+    """
+    Read the versions of several scopes with one query (missing scopes are version 0).
+    """
+    scopes = list(scopes)
+    rows = dict(session.exec(
+        select(VersionCounter.scope, VersionCounter.version).where(VersionCounter.scope.in_(scopes))
+    ).all())
+    return tuple(rows.get(scope, 0) for scope in scopes)
+
+class ResponseCache:
+    """
+    Small in-process LRU of serialised JSON responses.
+
+    Keys include the version of every scope the response depends on, so a bump
+    makes old entries unreachable; the TTL only bounds how long they linger.
+    """
+    def __init__(self, ttl: float = 30.0, max_entries: int = 512) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, body: bytes) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+response_cache: ResponseCache = ResponseCache(settings.RESPONSE_CACHE_TTL, settings.RESPONSE_CACHE_SIZE)
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Compare weakly: ignore W/ prefixes
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+async def cached_json(
+    request: Request,
+    session: Session,
+    endpoint: str,
+    scopes: Iterable[str],
+    build: Callable[[], Awaitable[Any]],
+    params: Optional[Dict[str, Any]] = None,
+    fields: Optional[Sequence[str]] = None
+) -> Response:
+    """
+    Serve a JSON list/dict endpoint with a weak ETag and a versioned response cache.
+
+    The ETag is derived from the endpoint, its parameters and the versions of the
+    scopes the data depends on. A matching `If-None-Match` is answered with 304;
+    otherwise a cached body for the same key is returned without querying or
+    serialising, and only a miss calls `build`.
+
+    Args:
+        request: Incoming request (for `If-None-Match`).
+        session: Database session used to read the versions.
+        endpoint: Name identifying the endpoint.
+        scopes: Version scopes the response depends on (include the user's scope for per-user data).
+        build: Coroutine producing the response data on a miss.
+        params: Query parameters that change the response.
+        fields: Projection applied to each item of a list response (see `utils.projection`).
+
+    Returns:
+        A 304, cached or freshly built JSON response.
+    """
+    scopes = list(scopes)
+    versions = current_versions(session, scopes)
+    raw_key = repr((endpoint, sorted((params or {}).items()), fields, list(zip(scopes, versions))))
+    key = hashlib.sha1(raw_key.encode()).hexdigest()
+    etag = f'W/"{key}"'
+    # Browsers must revalidate, but may reuse the body on 304
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    body = response_cache.get(key)
+    if body is None:
+        body = dumps(project(await build(), fields))
+        response_cache.set(key, body)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,194 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import update
+from sqlmodel import Session, or_, select
+
+from app.db import engine
+from app.models import Track, UserActivity
+from app.services import ytmusic
+from app.services.dedup import collapse_results
+from app.services.response_cache import LIBRARY, bump
+from app.services.tracks import TRACK_COLUMNS, row_dicts
+from app.utils.json_response import dumps
+from app.utils.logger import setup_logger
+
+_logger = setup_logger(__name__)
+
+# One large YouTube search pre-populates later pages (served from the metadata cache)
+YOUTUBE_BATCH: int = 100
+
+def search_local(session: Session, query: str, offset: int, limit: int) -> List[Dict[str, Any]]:
+    """
+    Page of library tracks whose title, artist or album contains `query`.
+    """
+    statement = select(*TRACK_COLUMNS).where(
+        or_(
+            Track.title.contains(query),
+            Track.artist.contains(query),
+            Track.album.contains(query)
+        )
+    ).offset(offset).limit(limit)
+    return row_dicts(session.exec(statement).all())
+
+def merge_search_results(
+    session: Session,
+    youtube_items: List[Dict[str, Any]],
+    seen: Set[str]
+) -> List[Dict[str, Any]]:
+    """
+    Turn YouTube search items into result rows, skipping anything already shown.
+
+    Items already in the database are replaced by their row (or by the local
+    track they duplicate), looked up with one query; a missing thumbnail on such
+    a row is filled in from the search item.
+
+    Args:
+        session: Database session.
+        youtube_items: Formatted YouTube search items, in display order.
+        seen: IDs and remote IDs already sent; updated in place.
+
+    Returns:
+        The new result rows, in order.
+    """
+    wanted = [item["remote_id"] for item in youtube_items if item.get("remote_id") not in seen]
+    known = {
+        row["remote_id"]: row
+        for row in row_dicts(session.exec(select(*TRACK_COLUMNS).where(Track.remote_id.in_(wanted))).all())
+    } if wanted else {}
+    canonical_ids = {row["canonical_id"] for row in known.values() if row["canonical_id"]}
+    canonicals = {
+        row["id"]: row
+        for row in row_dicts(session.exec(select(*TRACK_COLUMNS).where(Track.id.in_(canonical_ids))).all())
+    } if canonical_ids else {}
+
+    merged: List[Dict[str, Any]] = []
+    thumbnails: Dict[str, str] = {}
+    for item in youtube_items:
+        remote_id = item.get("remote_id")
+        if remote_id in seen:
+            continue
+        row = known.get(remote_id)
+        if row and row["canonical_id"]:
+            # Known duplicate of a library track: show the local copy instead
+            row = canonicals.get(row["canonical_id"], row)
+        if row:
+            if row["id"] in seen:
+                continue
+            if item.get("thumbnail") and not row["thumbnail"]:
+                row = {**row, "thumbnail": item["thumbnail"]}
+                thumbnails[row["id"]] = item["thumbnail"]
+            merged.append(row)
+            seen.add(row["id"])
+        else:
+            merged.append(item)
+        seen.add(remote_id)
+
+    if thumbnails:
+        # Lazy backfill of thumbnails the library rows were missing
+        for track_id, thumbnail in thumbnails.items():
+            session.exec(update(Track).where(Track.id == track_id).values(thumbnail=thumbnail))
+        bump(session, LIBRARY)
+        session.commit()
+    return merged
+
+def mark_liked(session: Session, user_id: Optional[str], items: List[Dict[str, Any]]) -> None:
+    """
+    Set `is_liked` on result rows for the given user (no-op for anonymous searches).
+    """
+    if not user_id:
+        return
+    likes = set(session.exec(
+        select(UserActivity.track_id).where(UserActivity.user_id == user_id, UserActivity.is_liked == True)
+    ).all())
+    # YouTube-only items carry the video ID as their id, so also match liked tracks by remote ID
+    liked_remote = set(session.exec(
+        select(Track.remote_id).where(Track.id.in_(likes), Track.remote_id != None)
+    ).all()) if likes else set()
+    for item in items:
+        item["is_liked"] = item.get("id") in likes or item.get("remote_id") in liked_remote
+
+def _seen(items: List[Dict[str, Any]]) -> Set[str]:
+    return {key for item in items for key in (item.get("id"), item.get("remote_id")) if key}
+
+async def _start_youtube(query: str) -> "asyncio.Task[List[Dict]]":
+    task = asyncio.create_task(ytmusic.search_youtube(query, limit=YOUTUBE_BATCH))
+    # Let the task reach its first await (the request is then in flight) before the local query runs
+    await asyncio.sleep(0)
+    return task
+
+async def _await_youtube(task: "asyncio.Task[List[Dict]]", timeout: float) -> Optional[List[Dict]]:
+    try:
+        # Shielded: a late search keeps running and fills the metadata cache for the next request
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+    except asyncio.TimeoutError:
+        return None
+
+async def search(
+    session: Session,
+    query: str,
+    offset: int,
+    limit: int,
+    user_id: Optional[str],
+    deadline: float
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Search the library and YouTube Music concurrently.
+
+    Args:
+        session: Database session.
+        query: Search string.
+        offset: Page offset (applied to both sources).
+        limit: Page size (per source).
+        user_id: Searching user, for `is_liked`.
+        deadline: Seconds to wait for YouTube after the local results are ready.
+
+    Returns:
+        (results with local tracks first, whether YouTube missed the deadline).
+    """
+    youtube = await _start_youtube(query)
+    local = search_local(session, query, offset, limit)
+    youtube_items = await _await_youtube(youtube, deadline)
+    if youtube_items is None:
+        _logger.info("YouTube search for %r missed the %.1fs deadline; returning local results", query, deadline)
+
+    page = (youtube_items or [])[offset:offset + limit]
+    results = collapse_results(local + merge_search_results(session, page, _seen(local)))
+    mark_liked(session, user_id, results)
+    return results, youtube_items is None
+
+def _event(kind: str, **fields: Any) -> bytes:
+    return dumps({"type": kind, **fields}) + b"\n"
+
+async def search_events(
+    query: str,
+    offset: int,
+    limit: int,
+    user_id: Optional[str],
+    timeout: float
+) -> AsyncIterator[bytes]:
+    """
+    Progressive search as NDJSON events: `local` (library hits, immediately),
+    `youtube` (new YouTube hits, deduplicated against what was already sent) and
+    `done` (`partial` is true if YouTube timed out).
+
+    Uses its own sessions, since the body is streamed after the request's dependencies are closed.
+    """
+    youtube = await _start_youtube(query)
+    with Session(engine) as session:
+        local = collapse_results(search_local(session, query, offset, limit))
+        mark_liked(session, user_id, local)
+    yield _event("local", items=local)
+
+    youtube_items = await _await_youtube(youtube, timeout)
+    if youtube_items is None:
+        yield _event("done", partial=True)
+        return
+
+    with Session(engine) as session:
+        merged = merge_search_results(session, youtube_items[offset:offset + limit], _seen(local))
+        merged = collapse_results(local + merged)[len(local):]
+        mark_liked(session, user_id, merged)
+    if merged:
+        yield _event("youtube", items=merged)
+    yield _event("done", partial=False)
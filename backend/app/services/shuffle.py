@@ -0,0 +1,260 @@
+import math
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, literal_column
+from sqlmodel import Session, select
+
+from app.models import PlaylistTrack, Track, UserActivity
+from app.services.response_cache import LIBRARY, current_versions
+from app.services.tracks import TRACK_COLUMNS, row_dicts
+from app.utils.logger import setup_logger
+
+_logger = setup_logger(__name__)
+
+WEIGHTS: Tuple[str, ...] = ("plays", "likes")
+LIKE_WEIGHT: float = 4.0  # A liked track comes up as often as four unliked ones
+MAX_COLLECTIONS: int = 64  # Key arrays kept (the library and recently shuffled playlists)
+MAX_ORDERS: int = 32  # Weighted orders kept (one per collection, seed and weighting)
+
+_MASK64 = (1 << 64) - 1
+_ROWID = literal_column("track.rowid")
+
+def _mix(value: int) -> int:
+    """
+    splitmix64 finaliser: a fast, well-distributed 64-bit hash of an integer.
+    """
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+class SeededPermutation:
+    """
+    Random-access bijection of range(size) determined by a seed.
+
+    A four-round Feistel network permutes the smallest even-bit domain holding
+    `size` values; results outside range(size) are fed back in (cycle walking)
+    until they land inside. Any position is computed in O(1) without building
+    the permutation, so a page of a shuffle costs the same at any offset.
+    """
+    ROUNDS: int = 4
+
+    def __init__(self, size: int, seed: int) -> None:
+        self.size = size
+        bits = max(2, (size - 1).bit_length())
+        self._half = (bits + 1) // 2
+        self._mask = (1 << self._half) - 1
+        self._keys = [_mix((seed & _MASK64) ^ _mix(round_)) for round_ in range(self.ROUNDS)]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index: int) -> int:
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        value = index
+        while True:
+            left, right = value >> self._half, value & self._mask
+            for key in self._keys:
+                left, right = right, left ^ (_mix(right ^ key) & self._mask)
+            value = (left << self._half) | right
+            if value < self.size:
+                return value
+
+def weighted_order(keys: array, weights: Dict[int, float], seed: int) -> array:
+    """
+    Weighted random order of `keys` (Efraimidis-Spirakis): each key draws u in (0, 1)
+    from a hash of (seed, key) and keys are sorted by u^(1/weight), here as
+    log(u)/weight, descending. Keys missing from `weights` weigh 1.
+
+    Returns:
+        Indexes into `keys`, in playback order.
+    """
+    salt = _mix(seed & _MASK64)
+
+    def score(index: int) -> float:
+        key = keys[index]
+        u = ((_mix(salt ^ key) >> 11) + 0.5) / (1 << 53)
+        return math.log(u) / weights.get(key, 1.0)
+
+    return array("I", sorted(range(len(keys)), key=score, reverse=True))
+
+@dataclass
+class Collection:
+    """
+    Dense mapping of a shuffleable collection: position -> stable row key.
+    """
+    name: str
+    signature: Tuple[Any, ...]  # Changes whenever membership does
+    keys: array  # Track rowids (library) or PlaylistTrack IDs (playlist), ascending
+    version: Optional[Tuple[int, ...]] = None  # Scope versions the signature was last checked at
+
+class _LRU:
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+_collections = _LRU(MAX_COLLECTIONS)
+_orders = _LRU(MAX_ORDERS)
+
+def _collection(
+    session: Session,
+    name: str,
+    table: Any,
+    key_column: Any,
+    condition: Any,
+    version: Optional[Tuple[int, ...]] = None
+) -> Collection:
+    """
+    The cached key array of a collection, reloaded (one index-only query) when its
+    signature, (count, max key), shows that rows were added or removed. With a
+    `version`, the signature is only checked again once the version changes.
+    """
+    cached: Optional[Collection] = _collections.get(name)
+    if cached is not None and version is not None and cached.version == version:
+        return cached
+
+    def statement(*columns: Any) -> Any:
+        return select(*columns).select_from(table).where(condition)
+
+    signature = tuple(session.exec(statement(func.count(), func.max(key_column))).one())
+    if cached is None or cached.signature != signature:
+        keys = array("q", session.exec(statement(key_column).order_by(key_column)).all())
+        cached = Collection(name=name, signature=signature, keys=keys)
+        _collections.set(name, cached)
+    cached.version = version
+    return cached
+
+def library_collection(session: Session) -> Collection:
+    """
+    Every track except known duplicates of library tracks, keyed by rowid.
+    """
+    return _collection(
+        session, "library", Track, _ROWID, Track.canonical_id == None, version=current_versions(session, [LIBRARY])
+    )
+
+def playlist_collection(session: Session, playlist_id: str) -> Collection:
+    """
+    The entries of a playlist, keyed by PlaylistTrack ID (reordering leaves it unchanged).
+    """
+    return _collection(
+        session, f"playlist:{playlist_id}", PlaylistTrack, PlaylistTrack.id, PlaylistTrack.playlist_id == playlist_id
+    )
+
+def _weight(kind: str, play_count: Optional[int], is_liked: Optional[bool]) -> float:
+    if kind == "plays":
+        return 1.0 + (play_count or 0)
+    return LIKE_WEIGHT if is_liked else 1.0
+
+def library_weights(session: Session, user_id: str, kind: str) -> Dict[int, float]:
+    """
+    Weights of the tracks the user has activity on, by rowid (others weigh 1).
+    """
+    rows = session.exec(
+        select(_ROWID, UserActivity.play_count, UserActivity.is_liked)
+        .select_from(Track)
+        .join(UserActivity, UserActivity.track_id == Track.id)
+        .where(UserActivity.user_id == user_id, Track.canonical_id == None)
+    ).all()
+    return {rowid: _weight(kind, plays, liked) for rowid, plays, liked in rows}
+
+def playlist_weights(session: Session, playlist_id: str, user_id: str, kind: str) -> Dict[int, float]:
+    """
+    Weights of a playlist's entries from the user's activity on their tracks, by entry ID.
+    """
+    rows = session.exec(
+        select(PlaylistTrack.id, UserActivity.play_count, UserActivity.is_liked)
+        .join(UserActivity, and_(UserActivity.track_id == PlaylistTrack.track_id, UserActivity.user_id == user_id))
+        .where(PlaylistTrack.playlist_id == playlist_id)
+    ).all()
+    return {entry_id: _weight(kind, plays, liked) for entry_id, plays, liked in rows}
+
+def page_keys(
+    collection: Collection,
+    seed: int,
+    offset: int,
+    limit: int,
+    weighting: Optional[Tuple[str, str]] = None,
+    load_weights: Optional[Callable[[], Dict[int, float]]] = None
+) -> List[int]:
+    """
+    Keys of one page of a seeded shuffle of `collection`.
+
+    Unweighted pages are computed position by position from a SeededPermutation.
+    A weighted order has to rank the whole collection, so it is computed once
+    per (collection, seed, weighting) and kept; weights are snapshotted then, so
+    plays during the session do not reshuffle the pages still to come.
+
+    Args:
+        collection: The collection to shuffle.
+        seed: Shuffle seed; the same seed gives the same order while membership is unchanged.
+        offset: Position of the first key in the shuffled order.
+        limit: Page size.
+        weighting: (kind, user ID) identifying the weights, or None for a uniform shuffle.
+        load_weights: Loads the weights by key (called on an order cache miss).
+
+    Returns:
+        The page's keys, in order.
+    """
+    offset = max(0, offset)
+    end = min(offset + limit, len(collection.keys))
+    if offset >= end:
+        return []
+    if weighting is None:
+        permutation = SeededPermutation(len(collection.keys), seed)
+        return [collection.keys[permutation[i]] for i in range(offset, end)]
+
+    cache_key = (collection.name, collection.signature, seed, weighting)
+    order = _orders.get(cache_key)
+    if order is None:
+        order = weighted_order(collection.keys, load_weights(), seed)
+        _orders.set(cache_key, order)
+    return [collection.keys[i] for i in order[offset:end]]
+
+def _in_order(rows: List[Dict[str, Any]], key_field: str, keys: List[int]) -> List[Dict[str, Any]]:
+    by_key = {row[key_field]: row for row in rows}
+    return [by_key[key] for key in keys if key in by_key]  # Rows deleted meanwhile are skipped
+
+def library_page(session: Session, keys: List[int]) -> List[Dict[str, Any]]:
+    """
+    Track rows for a page of library rowids, in the page's order.
+    """
+    if not keys:
+        return []
+    rows = row_dicts(session.exec(select(*TRACK_COLUMNS, _ROWID.label("rowid")).where(_ROWID.in_(keys))).all())
+    page = _in_order(rows, "rowid", keys)
+    for row in page:
+        del row["rowid"]
+    return page
+
+def playlist_page(session: Session, keys: List[int]) -> List[Dict[str, Any]]:
+    """
+    Playlist entries (tracks with position and entry ID) for a page of entry IDs, in the page's order.
+    """
+    if not keys:
+        return []
+    rows = row_dicts(session.exec(
+        select(*TRACK_COLUMNS, PlaylistTrack.position.label("playlist_position"), PlaylistTrack.id.label("entry_id"))
+        .join(PlaylistTrack)
+        .where(PlaylistTrack.id.in_(keys))
+    ).all())
+    return _in_order(rows, "entry_id", keys)
@@ -0,0 +1,347 @@
+import json
+import operator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, delete, func, insert, literal, or_, true
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.models import SmartPlaylist, SmartPlaylistTrack, Track, UserActivity
+from app.services import catalog
+from app.utils.logger import setup_logger
+from app.utils.text import main_artist
+
+_logger = setup_logger(__name__)
+
+MATCHES: Tuple[str, ...] = ("all", "any")
+MAX_DAYS: int = 36500  # Longest relative-date window accepted in a rule
+
+# Rule field -> (kind, column). Activity fields read the owner's UserActivity row,
+# which a track they never played or liked does not have
+FIELDS: Dict[str, Tuple[str, Any]] = {
+    "title": ("text", Track.title),
+    "artist": ("text", Track.artist),
+    "album": ("text", Track.album),
+    "source": ("text", Track.source_type),
+    "duration": ("number", Track.duration),
+    "added": ("date", Track.added_at),
+    "liked": ("bool", UserActivity.is_liked),
+    "plays": ("number", UserActivity.play_count),
+    "last_played": ("date", UserActivity.last_played),
+}
+OPERATORS: Dict[str, Tuple[str, ...]] = {
+    "text": ("is", "is_not", "contains", "starts_with"),
+    "number": ("eq", "ne", "lt", "lte", "gt", "gte"),
+    "date": ("in_last", "not_in_last"),  # Value in days
+    "bool": ("is",),
+}
+_COMPARE = {
+    "eq": operator.eq, "ne": operator.ne, "lt": operator.lt,
+    "lte": operator.le, "gt": operator.gt, "gte": operator.ge,
+}
+
+_PLAYS = func.coalesce(UserActivity.play_count, 0)
+IS_LIKED = func.coalesce(UserActivity.is_liked, False).label("is_liked")
+
+# Sort -> (expression, descending) keys; Track.id breaks ties so the cut-off is deterministic
+SORTS: Dict[str, Tuple[Tuple[Any, bool], ...]] = {
+    "added": ((Track.added_at, True),),
+    "plays": ((_PLAYS, True), (UserActivity.last_played, True)),
+    "last_played": ((UserActivity.last_played, True),),
+    "title": ((Track.title, False),),
+    "artist": ((Track.artist, False), (Track.title, False)),
+}
+
+_CHECK_EVERY: int = 1000  # SQLite VM steps between evaluation budget checks
+
+class RulesTooExpensive(Exception):
+    """
+    Raised when evaluating a smart playlist takes more than SMART_PLAYLIST_MAX_STEPS.
+    """
+
+@dataclass
+class CompiledRules:
+    """
+    Smart playlist rules as one SQL condition over Track and the owner's UserActivity.
+    """
+    condition: Any
+    needs_activity: bool  # No track without activity can match, so the activity rows are inner-joined
+    timed: bool  # Relative-date rules: membership drifts with time, not only with events
+
+def _like_pattern(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _compile_rule(field: str, op: str, value: Any, now: datetime) -> Tuple[Any, Optional[bool]]:
+    """
+    SQL condition of one rule, and whether a track without activity passes it
+    (None when that depends on the track).
+    """
+    if field not in FIELDS:
+        raise ValueError(f"Unknown field '{field}'; expected one of: {', '.join(FIELDS)}")
+    kind, column = FIELDS[field]
+    if op not in OPERATORS[kind]:
+        raise ValueError(f"'{field}' supports: {', '.join(OPERATORS[kind])}")
+
+    if kind == "text":
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"'{field}' needs a non-empty text value")
+        value = value.strip()
+        if op in ("is", "is_not"):
+            if field == "artist":
+                # Any spelling or featured credit of the main artist, through the catalog index
+                key = main_artist(value)
+                column, value = Track.artist_id, catalog.artist_id(key) if key else ""
+            return (column == value if op == "is" else or_(column == None, column != value)), None
+        pattern = _like_pattern(value)
+        return column.like(f"%{pattern}%" if op == "contains" else f"{pattern}%", escape="\\"), None
+
+    if kind == "number":
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"'{field}' needs a numeric value")
+        compare = _COMPARE[op]
+        if field == "plays":
+            return compare(_PLAYS, value), compare(0, value)
+        return compare(column, value), None
+
+    if kind == "date":
+        if isinstance(value, bool) or not isinstance(value, int) or not 0 < value <= MAX_DAYS:
+            raise ValueError(f"'{field}' needs a number of days between 1 and {MAX_DAYS}")
+        cutoff = now - timedelta(days=value)
+        activity = field == "last_played"
+        if op == "in_last":
+            return column >= cutoff, (False if activity else None)
+        return or_(column == None, column < cutoff), (True if activity else None)
+
+    if not isinstance(value, bool):
+        raise ValueError(f"'{field}' needs true or false")
+    return (column == True if value else column.is_not(True)), not value
+
+def compile_rules(rules: Sequence[Dict[str, Any]], match: str, now: Optional[datetime] = None) -> CompiledRules:
+    """
+    Compile smart playlist rules into one SQL condition.
+
+    Args:
+        rules: Rules as {"field", "op", "value"} dicts.
+        match: 'all' to require every rule, 'any' for at least one.
+        now: Reference time for relative-date rules (defaults to the current time).
+
+    Returns:
+        The compiled rules; no rules match every track.
+
+    Raises:
+        ValueError: If the match mode, a field, an operator or a value is not supported.
+    """
+    if match not in MATCHES:
+        raise ValueError(f"match must be one of: {', '.join(MATCHES)}")
+    if len(rules) > settings.SMART_PLAYLIST_MAX_RULES:
+        raise ValueError(f"At most {settings.SMART_PLAYLIST_MAX_RULES} rules are allowed")
+    now = now or datetime.now(timezone.utc)
+
+    conditions: List[Any] = []
+    passes: List[Optional[bool]] = []
+    for rule in rules:
+        condition, passes_without_activity = _compile_rule(rule["field"], rule["op"], rule["value"], now)
+        conditions.append(condition)
+        passes.append(passes_without_activity)
+    timed = any(FIELDS[rule["field"]][0] == "date" for rule in rules)
+
+    if not conditions:
+        return CompiledRules(condition=true(), needs_activity=False, timed=False)
+    if match == "all":
+        return CompiledRules(condition=and_(*conditions), needs_activity=False in passes, timed=timed)
+    return CompiledRules(
+        condition=or_(*conditions), needs_activity=all(p is False for p in passes), timed=timed
+    )
+
+def _compile(playlist: SmartPlaylist) -> CompiledRules:
+    return compile_rules(json.loads(playlist.rules), playlist.match)
+
+def define(
+    playlist: SmartPlaylist,
+    name: str,
+    rules: List[Dict[str, Any]],
+    match: str,
+    sort: str,
+    limit: int
+) -> None:
+    """
+    Validate a definition and apply it to `playlist`, marking it for a full refresh.
+
+    Raises:
+        ValueError: If the sort or any rule is not supported.
+    """
+    if sort not in SORTS:
+        raise ValueError(f"sort must be one of: {', '.join(SORTS)}")
+    compiled = compile_rules(rules, match)
+    playlist.name = name
+    playlist.rules = json.dumps(rules)
+    playlist.match = match
+    playlist.sort = sort
+    playlist.max_tracks = min(limit, settings.SMART_PLAYLIST_MAX_TRACKS)
+    playlist.needs_activity = compiled.needs_activity
+    playlist.timed = compiled.timed
+    playlist.stale = True
+
+def describe(playlist: SmartPlaylist) -> Dict[str, Any]:
+    """
+    A smart playlist as returned by the API (see schemas.SmartPlaylistOut).
+    """
+    return {
+        "id": playlist.id, "name": playlist.name, "rules": json.loads(playlist.rules),
+        "match": playlist.match, "sort": playlist.sort, "limit": playlist.max_tracks,
+        "track_count": playlist.track_count, "refreshed_at": playlist.refreshed_at,
+    }
+
+def _order(sort: str, reverse: bool = False) -> List[Any]:
+    keys = [*SORTS[sort], (Track.id, False)]
+    return [expression.desc() if descending != reverse else expression.asc() for expression, descending in keys]
+
+def _with_activity(statement: Any, owner_id: str, inner: bool = False) -> Any:
+    on = and_(UserActivity.track_id == Track.id, UserActivity.user_id == owner_id)
+    return statement.join(UserActivity, on) if inner else statement.outerjoin(UserActivity, on)
+
+def _candidates(playlist: SmartPlaylist, compiled: CompiledRules, *columns: Any) -> Any:
+    statement = _with_activity(select(*columns).select_from(Track), playlist.owner_id, compiled.needs_activity)
+    return statement.where(Track.canonical_id == None, compiled.condition)
+
+def members_statement(playlist: SmartPlaylist, *columns: Any, reverse: bool = False) -> Any:
+    """
+    Select `columns` of the playlist's members (Track and owner UserActivity columns
+    are available) in the playlist's sort order, or reversed.
+    """
+    statement = (
+        select(*columns)
+        .select_from(SmartPlaylistTrack)
+        .join(Track, Track.id == SmartPlaylistTrack.track_id)
+    )
+    return (
+        _with_activity(statement, playlist.owner_id)
+        .where(SmartPlaylistTrack.smart_playlist_id == playlist.id)
+        .order_by(*_order(playlist.sort, reverse))
+    )
+
+@contextmanager
+def _step_budget(session: Session, steps: int) -> Iterator[None]:
+    """
+    Interrupt statements run inside the block once they take more than `steps` SQLite VM steps.
+    """
+    connection = session.connection().connection.dbapi_connection
+    if not hasattr(connection, "set_progress_handler"):
+        yield
+        return
+    checks = iter(range(steps // _CHECK_EVERY))
+    # A true return value makes SQLite interrupt the running statement
+    connection.set_progress_handler(lambda: next(checks, None) is None, _CHECK_EVERY)
+    try:
+        yield
+    finally:
+        connection.set_progress_handler(None, _CHECK_EVERY)
+
+def needs_refresh(playlist: SmartPlaylist) -> bool:
+    """
+    Whether a playlist must be re-evaluated in full before it is read: it is new or
+    stale, or has relative-date rules and was last evaluated SMART_PLAYLIST_MAX_AGE ago.
+    """
+    if playlist.stale or playlist.refreshed_at is None:
+        return True
+    if not playlist.timed:
+        return False
+    refreshed_at = playlist.refreshed_at
+    if refreshed_at.tzinfo is None:
+        refreshed_at = refreshed_at.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - refreshed_at).total_seconds() > settings.SMART_PLAYLIST_MAX_AGE
+
+def refresh(session: Session, playlist: SmartPlaylist) -> None:
+    """
+    Re-evaluate a playlist in full and replace its membership. Joins the caller's transaction.
+
+    The evaluation is a single INSERT ... SELECT of the top `max_tracks` matches and
+    is interrupted after SMART_PLAYLIST_MAX_STEPS, so one costly rule set (say, a
+    `contains` over a huge library) cannot stall the worker.
+
+    Raises:
+        RulesTooExpensive: If the budget ran out; the caller should roll back.
+    """
+    compiled = _compile(playlist)
+    top = (
+        _candidates(playlist, compiled, literal(playlist.id), Track.id)
+        .order_by(*_order(playlist.sort))
+        .limit(playlist.max_tracks)
+    )
+    session.exec(delete(SmartPlaylistTrack).where(SmartPlaylistTrack.smart_playlist_id == playlist.id))
+    try:
+        with _step_budget(session, settings.SMART_PLAYLIST_MAX_STEPS):
+            session.exec(insert(SmartPlaylistTrack).from_select(["smart_playlist_id", "track_id"], top))
+    except OperationalError as e:
+        if "interrupt" not in str(e):
+            raise
+        _logger.warning("Smart playlist %s exceeded its evaluation budget", playlist.id)
+        raise RulesTooExpensive(playlist.id) from e
+
+    playlist.track_count = session.exec(
+        select(func.count()).where(SmartPlaylistTrack.smart_playlist_id == playlist.id)
+    ).one()
+    playlist.stale = False
+    playlist.refreshed_at = datetime.now(timezone.utc)
+    session.add(playlist)
+
+def _drop(session: Session, playlist: SmartPlaylist, member: SmartPlaylistTrack) -> None:
+    # A full playlist may have matches beyond its cap that would now move up
+    if playlist.track_count >= playlist.max_tracks:
+        playlist.stale = True
+    session.delete(member)
+    playlist.track_count -= 1
+    session.add(playlist)
+
+def _update_member(session: Session, playlist: SmartPlaylist, track_id: str) -> None:
+    """
+    Re-check one track against a playlist (a primary-key lookup) and add or drop it.
+    """
+    if playlist.stale:
+        return  # Re-evaluated in full when next read
+    matches = session.exec(
+        _candidates(playlist, _compile(playlist), Track.id).where(Track.id == track_id)
+    ).first() is not None
+    member = session.get(SmartPlaylistTrack, (playlist.id, track_id))
+    if member is not None and not matches:
+        _drop(session, playlist, member)
+    elif member is None and matches:
+        session.add(SmartPlaylistTrack(smart_playlist_id=playlist.id, track_id=track_id))
+        playlist.track_count += 1
+        session.add(playlist)
+        if playlist.track_count > playlist.max_tracks:
+            # Evict the lowest-ranked member, which may be the track just added
+            last = session.exec(members_statement(playlist, SmartPlaylistTrack.track_id, reverse=True).limit(1)).first()
+            session.delete(session.get(SmartPlaylistTrack, (playlist.id, last)))
+            playlist.track_count -= 1
+
+def activity_changed(session: Session, user_id: str, track_id: str) -> None:
+    """
+    Update the user's smart playlists after they played or (un)liked a track.
+    Joins the caller's transaction.
+    """
+    for playlist in session.exec(select(SmartPlaylist).where(SmartPlaylist.owner_id == user_id)).all():
+        _update_member(session, playlist, track_id)
+
+def track_added(session: Session, track: Track) -> None:
+    """
+    Add a newly indexed track to every smart playlist it matches. A new track has no
+    activity, so playlists that need some are skipped without a query.
+    Joins the caller's transaction.
+    """
+    if track.canonical_id:
+        return
+    for playlist in session.exec(select(SmartPlaylist).where(SmartPlaylist.needs_activity == False)).all():
+        _update_member(session, playlist, track.id)
+
+def track_removed(session: Session, track_id: str) -> None:
+    """
+    Drop a track from every smart playlist (e.g. once it is linked as a duplicate).
+    Joins the caller's transaction.
+    """
+    for member in session.exec(select(SmartPlaylistTrack).where(SmartPlaylistTrack.track_id == track_id)).all():
+        _drop(session, session.get(SmartPlaylist, member.smart_playlist_id), member)
@@ -0,0 +1,281 @@
+import itertools
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from starlette.requests import HTTPConnection
+from starlette.responses import FileResponse, StreamingResponse
+from starlette.types import Message, Receive, Scope, Send
+
+from app.auth_utils import verify_token
+from app.config import settings
+from app.utils.client_ip import client_ip
+from app.utils.logger import setup_logger
+from app.utils.rate_limiter import TokenBucket
+
+_logger = setup_logger(__name__)
+
+KBPS: float = 1000 / 8  # Bytes per second in one kbit/s
+MIN_RATE: float = 8 * KBPS  # Floor of any stream's pace, so no stream stalls outright
+THROUGHPUT_WINDOW: float = 2.0  # Seconds of delivery averaged into a stream's reported throughput
+ANONYMOUS_PREFIX: str = "ip:"  # Listeners known only by client address, possibly shared by many people
+
+def parse_limits(spec: str) -> Dict[str, float]:
+    """
+    Parse "user_id=kbps,ip:1.2.3.4=kbps" into a listener -> kbit/s mapping.
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        owner, _, kbps = item.rpartition("=")
+        try:
+            limits[owner.strip()] = float(kbps)
+        except ValueError:
+            _logger.warning("Ignoring invalid stream limit: %s", item)
+    return limits
+
+def stream_owner(request: HTTPConnection) -> str:
+    """
+    Listener a stream's bandwidth is accounted to: the user of a valid bearer token, else
+    "ip:<client address>" as resolved behind the proxies (audio elements cannot send the
+    header, so web players count per IP).
+    """
+    authorization = request.headers.get("authorization", "")
+    payload = verify_token(authorization[7:]) if authorization.lower().startswith("bearer ") else None
+    if payload and payload.get("sub"):
+        return payload["sub"]
+    return f"{ANONYMOUS_PREFIX}{client_ip(request)}"
+
+def fair_shares(capacity: Optional[float], demands: Dict[Hashable, float]) -> Dict[Hashable, float]:
+    """
+    Max-min fair split of `capacity` between `demands`: no one gets more than they ask
+    for, and what the smaller demands leave over is split evenly between the rest.
+    Everyone gets their demand when `capacity` is None (unlimited).
+    """
+    if capacity is None:
+        return dict(demands)
+    shares = {}
+    remaining = capacity
+    pending = sorted(demands.items(), key=lambda item: item[1])
+    for index, (key, demand) in enumerate(pending):
+        shares[key] = min(demand, remaining / (len(pending) - index))
+        remaining -= shares[key]
+    return shares
+
+class PacedStream:
+    """
+    One active /stream response: a token bucket over its bytes, starting full with
+    the initial buffer burst and refilled at the rate the scheduler allocates.
+    """
+    def __init__(self, stream_id: int, track_id: str, owner: str, source: str, bitrate: float, burst: float) -> None:
+        self.id = stream_id
+        self.track_id = track_id
+        self.owner = owner
+        self.source = source
+        self.bitrate = bitrate  # Bytes per second
+        self.rate = bitrate
+        self.sent = 0
+        self.started = time.monotonic()
+        self._bucket = TokenBucket(bitrate, max(burst, 1.0))
+        self._window_start = self.started
+        self._window_bytes = 0
+        self._throughput: Optional[float] = None
+
+    def set_rate(self, rate: float) -> None:
+        self.rate = max(rate, MIN_RATE)
+        self._bucket.set_rate(self.rate)
+
+    async def pace(self, size: int) -> None:
+        """
+        Wait until `size` more bytes may be sent.
+        """
+        await self._bucket.acquire_async(size)
+
+    def record(self, size: int) -> None:
+        """
+        Count `size` bytes handed to the server.
+        """
+        now = time.monotonic()
+        self.sent += size
+        self._window_bytes += size
+        if now - self._window_start >= THROUGHPUT_WINDOW:
+            self._throughput = self._window_bytes / (now - self._window_start)
+            self._window_start, self._window_bytes = now, 0
+
+    def throughput(self) -> float:
+        """
+        Bytes per second delivered over the last complete window (or so far, for a new or stalled stream).
+        """
+        elapsed = time.monotonic() - self._window_start
+        if self._throughput is None or elapsed >= THROUGHPUT_WINDOW:
+            return self._window_bytes / max(elapsed, 1e-3)
+        return self._throughput
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "track_id": self.track_id,
+            "owner": self.owner,
+            "source": self.source,
+            "bitrate_kbps": round(self.bitrate / KBPS),
+            "allocated_kbps": round(self.rate / KBPS),
+            "throughput_kbps": round(self.throughput() / KBPS),
+            "sent_bytes": self.sent,
+            "age_seconds": round(time.monotonic() - self.started, 1),
+        }
+
+class StreamScheduler:
+    """
+    Shares this worker's upstream bandwidth between its active streams.
+
+    Each stream may first send `burst_seconds` of audio at once to fill the
+    player's buffer, then is paced at `pace_multiplier` times its bitrate. When
+    the streams together would exceed the uplink, it is split max-min fairly,
+    first between listeners (a user ID, or "ip:<address>" for anonymous
+    clients) and then between each listener's streams, so a listener with many
+    streams, or one live YouTube download, cannot starve the others. Listeners
+    can also be capped below their fair share. Allocations are recomputed
+    whenever a stream starts or ends. Only used from the event loop.
+    """
+    def __init__(
+        self,
+        uplink_kbps: float,
+        pace_multiplier: float,
+        burst_seconds: float,
+        default_kbps: float,
+        user_kbps: float = 0,
+        user_limits: Optional[Dict[str, float]] = None,
+    ) -> None:
+        self.uplink = uplink_kbps * KBPS if uplink_kbps > 0 else None
+        self.pace_multiplier = pace_multiplier
+        self.burst_seconds = burst_seconds
+        self.default_bitrate = default_kbps * KBPS
+        self.user_kbps = user_kbps
+        self.user_limits = dict(user_limits or {})
+        self._streams: Dict[int, PacedStream] = {}
+        self._ids = itertools.count(1)
+
+    def open(self, track_id: str, owner: str, source: str, bitrate_kbps: Optional[float] = None) -> PacedStream:
+        """
+        Register a stream of a track at `bitrate_kbps` (the default bitrate if unknown) and rebalance.
+        """
+        bitrate = bitrate_kbps * KBPS if bitrate_kbps else self.default_bitrate
+        stream = PacedStream(next(self._ids), track_id, owner, source, bitrate, bitrate * self.burst_seconds)
+        self._streams[stream.id] = stream
+        self._rebalance()
+        return stream
+
+    def close(self, stream: PacedStream) -> None:
+        if self._streams.pop(stream.id, None) is not None:
+            self._rebalance()
+
+    def user_limit(self, owner: str) -> Optional[float]:
+        """
+        Bytes per second allowed to a listener across their streams, None if unlimited
+        (a per-listener limit of 0 exempts them from the default cap).
+        """
+        kbps = self.user_limits.get(owner, self.user_kbps)
+        return kbps * KBPS if kbps > 0 else None
+
+    def _rebalance(self) -> None:
+        by_owner: Dict[str, List[PacedStream]] = {}
+        for stream in self._streams.values():
+            by_owner.setdefault(stream.owner, []).append(stream)
+
+        demands = {}
+        for owner, streams in by_owner.items():
+            demand = sum(stream.bitrate * self.pace_multiplier for stream in streams)
+            limit = self.user_limit(owner)
+            demands[owner] = demand if limit is None else min(demand, limit)
+
+        for owner, share in fair_shares(self.uplink, demands).items():
+            streams = by_owner[owner]
+            rates = fair_shares(share, {stream.id: stream.bitrate * self.pace_multiplier for stream in streams})
+            for stream in streams:
+                stream.set_rate(rates[stream.id])
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Active streams with their allocated and measured rates, plus the limits in force.
+        """
+        streams = [stream.snapshot() for stream in self._streams.values()]
+        return {
+            "uplink_kbps": round(self.uplink / KBPS) if self.uplink else None,
+            "pace_multiplier": self.pace_multiplier,
+            "burst_seconds": self.burst_seconds,
+            "user_kbps": self.user_kbps or None,
+            "user_limits": dict(self.user_limits),
+            "active": len(streams),
+            "throughput_kbps": sum(stream["throughput_kbps"] for stream in streams),
+            "streams": streams,
+        }
+
+_workers = max(1, settings.WEB_CONCURRENCY)
+stream_scheduler: StreamScheduler = StreamScheduler(
+    uplink_kbps=settings.STREAM_UPLINK_KBPS / _workers,
+    pace_multiplier=settings.STREAM_PACE_MULTIPLIER,
+    burst_seconds=settings.STREAM_BURST_SECONDS,
+    default_kbps=settings.STREAM_DEFAULT_KBPS,
+    user_kbps=settings.STREAM_USER_KBPS / _workers,
+    user_limits={owner: kbps / _workers for owner, kbps in parse_limits(settings.STREAM_USER_LIMITS).items()},
+)
+
+class _PacedResponse:
+    """
+    Sends a response's body through a stream registered with the scheduler for as
+    long as the response is being sent (including ranged and cancelled ones).
+    """
+    scheduler: StreamScheduler
+    pacing: Dict[str, Any]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        stream = self.scheduler.open(**self.pacing)
+
+        async def paced_send(message: Message) -> None:
+            size = len(message.get("body", b"")) if message["type"] == "http.response.body" else 0
+            if size:
+                await stream.pace(size)
+            await send(message)
+            if size:
+                stream.record(size)
+
+        try:
+            await super().__call__(scope, receive, paced_send)
+        finally:
+            self.scheduler.close(stream)
+
+class PacedFileResponse(_PacedResponse, FileResponse):
+    """
+    FileResponse (with HTTP Range support) paced by the stream scheduler.
+    """
+    def __init__(self, path: str, pacing: Dict[str, Any], scheduler: StreamScheduler = stream_scheduler, **kwargs: Any) -> None:
+        super().__init__(path, **kwargs)
+        self.scheduler = scheduler
+        self.pacing = pacing
+
+class PacedStreamingResponse(_PacedResponse, StreamingResponse):
+    """
+    StreamingResponse paced by the stream scheduler, running `on_close` once it ends
+    however it ends (completed, failed or abandoned by the client).
+    """
+    def __init__(
+        self,
+        content: Any,
+        pacing: Dict[str, Any],
+        scheduler: StreamScheduler = stream_scheduler,
+        on_close: Optional[Callable[[], Awaitable[None]]] = None,
+        **kwargs: Any
+    ) -> None:
+        super().__init__(content, **kwargs)
+        self.scheduler = scheduler
+        self.pacing = pacing
+        self.on_close = on_close
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # Starlette leaves the iterator suspended when the client disconnects; closing it runs its cleanup now
+            aclose = getattr(self.body_iterator, "aclose", None)
+            if aclose:
+                await aclose()
+            if self.on_close:
+                await self.on_close()
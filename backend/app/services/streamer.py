@@ -1,45 +1,79 @@
-import os
 import asyncio
+import os
 import typing
-from typing import AsyncGenerator, Any, Generator
+from typing import AsyncGenerator, Any, Callable, Generator, Optional
 
-from fastapi.responses import StreamingResponse, FileResponse
 from sqlmodel import Session, select
 
 from app.models import Track
 from app.db import engine
-from app.utils.logger import setup_logger
+from app.services import inventory
+from app.services.downloads import download_manager
+from app.services.response_cache import LIBRARY, bump
+from app.services.stream_scheduler import PacedFileResponse, PacedStreamingResponse
+from app.utils.logger import RateLimitedLogger, setup_logger
+from app.utils.profiler import track_phase
 
 _logger = setup_logger(__name__)
+_request_log = RateLimitedLogger(_logger)
 
 from app.config import settings
 
 PERSISTENT_CACHE_DIR: str = settings.CACHE_DIR
 TEMP_CACHE_DIR: str = settings.TEMP_DIR
 
-async def stream_youtube(track_id: str) -> StreamingResponse:
+def _in_background(func: Callable[..., Any], *args: Any) -> None:
+    """
+    Run blocking bookkeeping (inventory counters) on the default executor without waiting for it.
+    Not awaited, so it also runs from a stream's cleanup after the client was cancelled.
+    """
+    asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+def _mark_cached(track_id: str, temp_path: str) -> None:
+    """
+    Count a finished download in the inventory and point its track at the temp cache file.
+    """
+    inventory.file_added(inventory.TEMP, temp_path, os.path.getsize(temp_path))
+    with Session(engine) as session:
+        statement = select(Track).where(Track.remote_id == track_id)
+        track = session.exec(statement).first()
+        if track:
+            track.is_cached = True
+            track.local_path = temp_path
+            session.add(track)
+            bump(session, LIBRARY)
+            session.commit()
+            _logger.info("Database updated with cache path for: %s", track_id)
+
+async def stream_youtube(track_id: str, owner: str = "unknown", duration: Optional[int] = None) -> PacedStreamingResponse:
     """
     Stream audio from YouTube using yt-dlp and cache it locally in the background.
 
     Args:
         track_id: The YouTube video ID or remote ID.
+        owner: Listener the stream's bandwidth is accounted to.
+        duration: Track duration in seconds, if known.
 
     Returns:
-        A FastAPI StreamingResponse.
+        A StreamingResponse paced by the stream scheduler.
+
+    Raises:
+        DownloadBusy: If no download slot freed up in time.
+        DownloadCancelled: If a newer stream of the same listener superseded this one while queued.
     """
     # 1. Check if already in persistent cache
     persistent_path = os.path.join(PERSISTENT_CACHE_DIR, f"{track_id}.mp3")
     if os.path.exists(persistent_path):
-        _logger.info("Serving track from persistent cache: %s", track_id)
-        return get_local_stream(persistent_path)
+        _request_log.info("Serving track from persistent cache: %s", track_id)
+        return get_local_stream(persistent_path, track_id, owner, duration)
 
     # 2. Check if in temp cache
     temp_path = os.path.join(TEMP_CACHE_DIR, f"{track_id}.mp3")
     if os.path.exists(temp_path):
-        _logger.info("Serving track from temporary cache: %s", track_id)
-        return get_local_stream(temp_path)
+        _request_log.info("Serving track from temporary cache: %s", track_id)
+        return get_local_stream(temp_path, track_id, owner, duration)
 
-    _logger.info("Initializing YouTube stream for track: %s", track_id)
+    _request_log.info("Initializing YouTube stream for track: %s", track_id)
     
     # Ensure cache dirs exist
     os.makedirs(PERSISTENT_CACHE_DIR, exist_ok=True)
@@ -53,11 +87,9 @@ async def stream_youtube(track_id: str) -> StreamingResponse:
         f"https://www.youtube.com/watch?v={track_id}"
     ]
     
-    process = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE
-    )
+    # Waits for a free download slot (DownloadBusy after DOWNLOAD_QUEUE_TIMEOUT)
+    with track_phase("ytdlp_spawn"):
+        download = await download_manager.open_stream(cmd, track_id, owner)
 
     download_path = f"{temp_path}.download"
 
@@ -66,52 +98,76 @@ async def stream_youtube(track_id: str) -> StreamingResponse:
         Background iterator to stream bytes and write to temp cache file simultaneously.
         """
         success = False
+        _in_background(inventory.adjust, {f"{inventory.PARTIAL}.files": 1})
         try:
             with open(download_path, "wb") as cache_file:
                 while True:
                     # Smaller read buffer (8KB) to be more mobile-friendly and avoid large initial chunk stalls
-                    chunk = await process.stdout.read(8 * 1024) 
+                    chunk = await download.stdout.read(8 * 1024) 
                     if not chunk:
                         break
                     cache_file.write(chunk)
                     yield chunk
+
+            # A killed or failed yt-dlp also ends its output early
+            returncode = await download.wait()
+            if returncode != 0:
+                raise RuntimeError(f"yt-dlp exited with {returncode}")
             
             # Atomic rename only if we reached the end successfully
             os.rename(download_path, temp_path)
             success = True
             _logger.info("Atomic cache complete for track: %s", track_id)
             
-            # After completion, update DB
-            with Session(engine) as session:
-                statement = select(Track).where(Track.remote_id == track_id)
-                track = session.exec(statement).first()
-                if track:
-                    track.is_cached = True
-                    track.local_path = temp_path
-                    session.add(track)
-                    session.commit()
-                    _logger.info("Database updated with cache path for: %s", track_id)
+            # After completion, update DB (off the event loop, like all database work here)
+            await asyncio.to_thread(_mark_cached, track_id, temp_path)
         except Exception:
-            _logger.exception("Error while streaming/caching YouTube track: %s", track_id)
+            if download.cancelled:
+                _logger.info("Stopped superseded YouTube stream: %s", track_id)
+            else:
+                _logger.exception("Error while streaming/caching YouTube track: %s", track_id)
         finally:
+            _in_background(inventory.adjust, {f"{inventory.PARTIAL}.files": -1})
             if not success and os.path.exists(download_path):
                 try:
                     os.remove(download_path)
                     _logger.info("Cleaned up partial download: %s", download_path)
                 except Exception: pass
 
-    # Use audio/mpeg as a reliable fallback, but the yield loop ensures we stream whatever yt-dlp provides
-    return StreamingResponse(iterate_stdout(), media_type="audio/mpeg")
-
-def get_local_stream(file_path: str) -> FileResponse:
+    # Use audio/mpeg as a reliable fallback, but the yield loop ensures we stream whatever yt-dlp provides.
+    # The bitrate is unknown until the download ends, so the scheduler assumes STREAM_DEFAULT_KBPS;
+    # pacing the response also paces the read from yt-dlp, so a live download cannot hog the uplink
+    pacing = {"track_id": track_id, "owner": owner, "source": "youtube"}
+    # Closing the download once the response ends kills yt-dlp if the client went away mid-track
+    return PacedStreamingResponse(iterate_stdout(), pacing, on_close=download.close, media_type="audio/mpeg")
+
+def get_local_stream(
+    file_path: str,
+    track_id: Optional[str] = None,
+    owner: str = "unknown",
+    duration: Optional[int] = None
+) -> PacedFileResponse:
     """
     Stream a local audio file using FileResponse for HTTP Range support.
 
     Args:
         file_path: Absolute path to the local audio file.
+        track_id: Track ID reported for the stream in /system/streams.
+        owner: Listener the stream's bandwidth is accounted to.
+        duration: Track duration in seconds, from which the average bitrate is derived.
 
     Returns:
-        A FastAPI FileResponse.
+        A FileResponse paced by the stream scheduler.
     """
-    _logger.info("Streaming local file via FileResponse: %s", file_path)
-    return FileResponse(file_path, media_type="audio/mpeg")
+    _request_log.info("Streaming local file via FileResponse: %s", file_path)
+    bitrate_kbps = None
+    if duration:
+        try:
+            bitrate_kbps = os.path.getsize(file_path) * 8 / 1000 / duration
+        except OSError:
+            pass
+    pacing = {
+        "track_id": track_id or os.path.basename(file_path), "owner": owner,
+        "source": "file", "bitrate_kbps": bitrate_kbps
+    }
+    return PacedFileResponse(file_path, pacing, media_type="audio/mpeg")
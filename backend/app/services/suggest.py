@@ -0,0 +1,356 @@
+import heapq
+import math
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlmodel import Session, select
+
+from app.models import Track
+from app.utils.logger import setup_logger
+from app.utils.text import fold_text
+
+_logger = setup_logger(__name__)
+
+TITLE, ARTIST, ALBUM, QUERY = 0, 1, 2, 3
+KIND_NAMES: Tuple[str, ...] = ("title", "artist", "album", "query")
+
+MAX_LIMIT: int = 20  # Most suggestions returned per lookup
+SHORT_PREFIX: int = 2  # Prefixes up to this length are ranked once and cached
+PREFIX_SCAN: int = 1000  # Prefix keys ranked per lookup for longer prefixes
+FUZZY_MIN_LENGTH: int = 3  # Shorter words have too few trigrams to correct
+FUZZY_THRESHOLD: float = 0.4  # Share of the typed word's trigrams a correction must contain
+FUZZY_CORRECTIONS: int = 3  # Corrections of the typed word looked up
+FUZZY_SCAN: int = 200  # Prefix keys ranked per correction
+MAX_QUERIES: int = 5000  # Distinct recent queries kept, across all users
+
+def _trigrams(word: str) -> Set[str]:
+    """
+    Trigrams of a word, with a leading space marking the word start.
+    """
+    padded = " " + word
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class SuggestIndex:
+    """
+    In-memory autocomplete index over library titles, artists and albums plus each user's recent queries.
+
+    Each distinct term is stored once (interned) with its kind and weight (how
+    many tracks or searches share it) in parallel arrays. Prefix lookups use a
+    sorted array of (term, word offset) pairs, one per word start, so "beat"
+    finds "The Beatles": binary search over it yields the ranges a trie would,
+    without a node per character, and the top terms of one- and two-letter
+    prefixes are cached as a trie keeps them at its upper nodes. Typos are
+    handled per word: a trigram index over the distinct words proposes
+    corrections for the word being typed, which are then looked up as prefixes.
+
+    Queries are private: they are kept per user, apart from the shared library
+    terms, and only suggested back to the user who searched for them. Each user
+    has few, so theirs are simply scanned on every lookup.
+
+    Rebuilt periodically; new tracks and queries are added incrementally in between.
+    """
+    def __init__(self) -> None:
+        self.built_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._texts: List[str] = []  # Display text per term ID
+        self._folded: List[str] = []  # Folded text per term ID
+        self._kinds = array("B")
+        self._weights = array("I")
+        self._ids: Dict[Tuple[int, str], int] = {}
+        self._key_terms = array("I")  # Sorted by the folded text from each word offset
+        self._key_offsets = array("H")
+        self._short: Dict[str, List[Tuple[Tuple, int]]] = {}  # Ranked terms per short prefix
+        self._words: List[str] = []  # Distinct words of all terms
+        self._word_ids: Dict[str, int] = {}
+        self._word_weights = array("I")  # Terms containing each word
+        self._postings: Dict[str, array] = {}  # Trigram -> word IDs
+        self._user_queries: Dict[str, Dict[str, List]] = {}  # User ID -> folded query -> [text, weight]
+        self._queries = 0
+
+    # Construction
+
+    def _key(self, index: int) -> str:
+        return self._folded[self._key_terms[index]][self._key_offsets[index]:]
+
+    @staticmethod
+    def _word_offsets(folded: str) -> List[int]:
+        offsets = [0]
+        position = folded.find(" ")
+        while 0 <= position < 0xFFFF:
+            offsets.append(position + 1)
+            position = folded.find(" ", position + 1)
+        return offsets
+
+    def _add_word(self, word: str) -> None:
+        word_id = self._word_ids.get(word)
+        if word_id is not None:
+            self._word_weights[word_id] += 1
+            return
+        word_id = len(self._words)
+        self._word_ids[word] = word_id
+        self._words.append(sys.intern(word))
+        self._word_weights.append(1)
+        for gram in _trigrams(word):
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array("I")
+            postings.append(word_id)
+
+    def _update_short(self, term_id: int) -> None:
+        """
+        Re-rank a new or reweighted term in the cached short-prefix lists it belongs to.
+        """
+        if not self._short:
+            return
+        folded = self._folded[term_id]
+        ranks: Dict[str, Tuple] = {}
+        for offset in self._word_offsets(folded):
+            rank = self._rank(term_id, offset)
+            for length in range(1, SHORT_PREFIX + 1):
+                prefix = folded[offset:offset + length]
+                if len(prefix) == length and prefix in self._short and rank > ranks.get(prefix, ()):
+                    ranks[prefix] = rank
+        for prefix, rank in ranks.items():
+            ranked = [entry for entry in self._short[prefix] if entry[1] != term_id]
+            ranked.append((rank, term_id))
+            ranked.sort(reverse=True)
+            self._short[prefix] = ranked[:MAX_LIMIT]
+
+    def _add(self, kind: int, text: Optional[str], weight: int = 1, sort: bool = True) -> None:
+        """
+        Add a term or raise its weight. Caller holds the lock (or owns the index during a rebuild).
+        """
+        folded = fold_text(text)
+        if not folded:
+            return
+        key = (kind, folded)
+        term_id = self._ids.get(key)
+        if term_id is not None:
+            self._weights[term_id] += weight
+            self._update_short(term_id)
+            return
+
+        term_id = len(self._texts)
+        self._ids[key] = term_id
+        self._texts.append(sys.intern(text.strip()))
+        self._folded.append(sys.intern(folded))
+        self._kinds.append(kind)
+        self._weights.append(weight)
+        for offset in self._word_offsets(folded):
+            if sort:
+                index = bisect_left(range(len(self._key_terms)), folded[offset:], key=self._key)
+                self._key_terms.insert(index, term_id)
+                self._key_offsets.insert(index, offset)
+            else:
+                self._key_terms.append(term_id)
+                self._key_offsets.append(offset)
+        for word in set(folded.split()):
+            self._add_word(word)
+        self._update_short(term_id)
+
+    def _rank_short_prefixes(self) -> None:
+        """
+        Fill the short-prefix cache in one pass over the sorted keys (used after a rebuild).
+        """
+        groups: Dict[str, Dict[int, Tuple]] = {}
+        for index in range(len(self._key_terms)):
+            term_id, offset = self._key_terms[index], self._key_offsets[index]
+            group = groups.setdefault(self._folded[term_id][offset:offset + SHORT_PREFIX], {})
+            rank = self._rank(term_id, offset)
+            if rank > group.get(term_id, ()):
+                group[term_id] = rank
+        self._short = {}
+        for prefix, group in groups.items():
+            top = heapq.nlargest(MAX_LIMIT, ((rank, term_id) for term_id, rank in group.items()))
+            for length in range(1, len(prefix) + 1):
+                # A term's best rank under a shorter prefix is its best in one of the longer
+                # groups, where it is in the top list if it is in the shorter prefix's top list
+                merged = dict((term_id, rank) for rank, term_id in self._short.get(prefix[:length], []))
+                for rank, term_id in top:
+                    if rank > merged.get(term_id, ()):
+                        merged[term_id] = rank
+                self._short[prefix[:length]] = heapq.nlargest(
+                    MAX_LIMIT, ((rank, term_id) for term_id, rank in merged.items())
+                )
+
+    def rebuild(self, session: Session) -> None:
+        """
+        Rebuild the index from the Track table (duplicates of library tracks are skipped).
+
+        Users' queries are kept. The new index is built without the lock and
+        swapped in, so suggestions keep being served meanwhile.
+        """
+        started = time.perf_counter()
+        rows = session.exec(
+            select(Track.title, Track.artist, Track.album).where(Track.canonical_id == None)
+        ).all()
+
+        fresh = SuggestIndex()
+        for title, artist, album in rows:
+            fresh._add(TITLE, title, sort=False)
+            fresh._add(ARTIST, artist, sort=False)
+            fresh._add(ALBUM, album, sort=False)
+        order = sorted(range(len(fresh._key_terms)), key=fresh._key)
+        fresh._key_terms = array("I", (fresh._key_terms[i] for i in order))
+        fresh._key_offsets = array("H", (fresh._key_offsets[i] for i in order))
+        fresh._rank_short_prefixes()
+
+        with self._lock:
+            kept = ("_lock", "_user_queries", "_queries")
+            self.__dict__.update({k: v for k, v in fresh.__dict__.items() if k not in kept})
+            self.built_at = time.time()
+        _logger.info(
+            "Suggest index rebuilt: %d terms, %d words, %d prefix keys in %.1f ms",
+            len(fresh._texts), len(fresh._words), len(fresh._key_terms), (time.perf_counter() - started) * 1000
+        )
+
+    # Incremental updates
+
+    def add_track(self, title: Optional[str], artist: Optional[str], album: Optional[str]) -> None:
+        """
+        Add a newly indexed track's title, artist and album.
+        """
+        with self._lock:
+            self._add(TITLE, title)
+            self._add(ARTIST, artist)
+            self._add(ALBUM, album)
+
+    def record_query(self, user_id: str, query: str) -> None:
+        """
+        Remember a search of a user that found something, so it is suggested to them again.
+        Once MAX_QUERIES distinct queries are kept, only their weights change.
+        """
+        folded = fold_text(query)
+        if not folded:
+            return
+        with self._lock:
+            queries = self._user_queries.setdefault(user_id, {})
+            entry = queries.get(folded)
+            if entry is not None:
+                entry[1] += 1
+            elif self._queries < MAX_QUERIES:
+                queries[folded] = [sys.intern(query.strip()), 1]
+                self._queries += 1
+
+    # Lookups
+
+    def _rank(self, term_id: int, offset: int) -> Tuple:
+        # Matches at the start of a term rank above matches on a later word
+        return (2, offset == 0, self._weights[term_id])
+
+    def _prefix_matches(self, folded: str, scan: Optional[int]) -> Dict[int, Tuple]:
+        """
+        Best rank per term with a word starting with `folded`, over at most `scan` keys (all if None).
+        """
+        start = bisect_left(range(len(self._key_terms)), folded, key=self._key)
+        end = len(self._key_terms) if scan is None else min(start + scan, len(self._key_terms))
+        matches: Dict[int, Tuple] = {}
+        for index in range(start, end):
+            term_id, offset = self._key_terms[index], self._key_offsets[index]
+            if not self._folded[term_id].startswith(folded, offset):
+                break
+            rank = self._rank(term_id, offset)
+            if rank > matches.get(term_id, ()):
+                matches[term_id] = rank
+        return matches
+
+    def _query_matches(self, folded: str, user_id: Optional[str]) -> List[Tuple[Tuple, str]]:
+        """
+        Ranked (rank, text) of the user's queries with a word starting with `folded`.
+        """
+        matches = []
+        for query, (text, weight) in self._user_queries.get(user_id, {}).items():
+            offsets = [offset for offset in self._word_offsets(query) if query.startswith(folded, offset)]
+            if offsets:
+                matches.append(((2, offsets[0] == 0, weight), text))
+        return matches
+
+    def _short_matches(self, folded: str) -> Dict[int, Tuple]:
+        ranked = self._short.get(folded)
+        if ranked is None:
+            matches = self._prefix_matches(folded, None)
+            ranked = sorted(((rank, term_id) for term_id, rank in matches.items()), reverse=True)[:MAX_LIMIT]
+            self._short[folded] = ranked
+        return {term_id: rank for rank, term_id in ranked}
+
+    def _corrections(self, word: str) -> List[Tuple[float, str]]:
+        """
+        Known words sharing enough trigrams with `word`, best first (most shared, closest length, most common).
+        """
+        grams = _trigrams(word)
+        # At least two shared trigrams: a single common one ("the") says little
+        needed = min(len(grams), max(2, math.ceil(len(grams) * FUZZY_THRESHOLD)))
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        candidates = [
+            (count / len(grams), -abs(len(self._words[word_id]) - len(word)), self._word_weights[word_id], word_id)
+            for word_id, count in shared.items() if count >= needed
+        ]
+        best = heapq.nlargest(FUZZY_CORRECTIONS + 1, candidates)
+        return [(score, self._words[word_id]) for score, _, _, word_id in best if self._words[word_id] != word]
+
+    def _fuzzy_matches(self, folded: str, exclude: Dict[int, Tuple]) -> Dict[int, Tuple]:
+        head, _, last = folded.rpartition(" ")
+        if len(last) < FUZZY_MIN_LENGTH:
+            return {}
+        matches: Dict[int, Tuple] = {}
+        for score, word in self._corrections(last)[:FUZZY_CORRECTIONS]:
+            corrected = f"{head} {word}" if head else word
+            for term_id, (_, at_start, weight) in self._prefix_matches(corrected, FUZZY_SCAN).items():
+                rank = (1, score, at_start, weight)
+                if term_id not in exclude and rank > matches.get(term_id, ()):
+                    matches[term_id] = rank
+        return matches
+
+    def suggest(self, prefix: str, limit: int = 10, user_id: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        Suggestions for what the user has typed so far.
+
+        Terms starting with `prefix` (or with a word starting with it) come first,
+        heaviest first; if there are fewer than `limit`, terms matching a correction
+        of the last typed word follow. Earlier queries are only included for their user.
+
+        Args:
+            prefix: Raw search box contents.
+            limit: Maximum number of suggestions (at most MAX_LIMIT).
+            user_id: The signed-in user, whose queries are suggested too; None for library terms only.
+
+        Returns:
+            [{"text": ..., "kind": "title" | "artist" | "album" | "query"}, ...]
+        """
+        folded = fold_text(prefix)
+        limit = min(limit, MAX_LIMIT)
+        if not folded or limit <= 0:
+            return []
+        with self._lock:
+            if len(folded) <= SHORT_PREFIX:
+                matches = self._short_matches(folded)
+            else:
+                matches = self._prefix_matches(folded, PREFIX_SCAN)
+            queries = self._query_matches(folded, user_id)
+            if len(matches) + len(queries) < limit:
+                matches.update(self._fuzzy_matches(folded, matches))
+            ranked = [(rank, self._texts[term_id], self._kinds[term_id]) for term_id, rank in matches.items()]
+            ranked.extend((rank, text, QUERY) for rank, text in queries)
+            best = heapq.nlargest(limit, ranked, key=lambda item: item[0])
+            return [{"text": text, "kind": KIND_NAMES[kind]} for _, text, kind in best]
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+suggest_index: SuggestIndex = SuggestIndex()
+
+def rebuild_suggest_index() -> None:
+    """
+    Rebuild the suggest index in a fresh database session.
+    """
+    from app.db import engine
+
+    with Session(engine) as session:
+        suggest_index.rebuild(session)
@@ -0,0 +1,224 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlmodel import Session, or_, select
+
+from app.config import settings
+from app.db import engine
+from app.models import Track
+from app.services import inventory
+from app.services.jobs import JobContext
+from app.services.response_cache import LIBRARY, bump
+from app.utils.logger import setup_logger
+from app.utils.rate_limiter import TokenBucket
+
+_logger = setup_logger(__name__)
+
+SWEEP_BATCH: int = 500  # Track rows compared per transaction
+
+@contextmanager
+def _idle_io_priority() -> Iterator[None]:
+    """
+    Run the calling thread in the idle I/O scheduling class (Linux), so its disk
+    access only uses time that playback reads leave free. No-op where unsupported.
+    """
+    import psutil
+
+    try:
+        thread = psutil.Process(threading.get_native_id())
+        previous = thread.ionice()
+        thread.ionice(psutil.IOPRIO_CLASS_IDLE)
+    except (AttributeError, OSError, psutil.Error):
+        yield
+        return
+    try:
+        yield
+    finally:
+        try:
+            value = None if previous.ioclass == psutil.IOPRIO_CLASS_NONE else previous.value
+            thread.ionice(previous.ioclass, value)
+        except (OSError, psutil.Error):
+            _logger.warning("Could not restore I/O priority of thread %s", threading.current_thread().name)
+
+def _list_files(directory: Path, limiter: TokenBucket) -> List[Tuple[Path, os.stat_result]]:
+    if not directory.exists():
+        return []
+    files = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            limiter.acquire()
+            try:
+                if entry.is_file():
+                    files.append((Path(entry.path), entry.stat()))
+            except OSError:
+                continue  # Removed while listing
+    return files
+
+def clear_stale_partials(limiter: TokenBucket, max_age: float) -> Tuple[int, int]:
+    """
+    Delete `.download` files untouched for `max_age` seconds: leftovers of crashed
+    or killed downloads (live ones are written to continuously).
+
+    Returns:
+        (files removed, bytes freed).
+    """
+    cutoff = time.time() - max_age
+    removed, freed = 0, 0
+    for directory in (Path(settings.TEMP_DIR), Path(settings.CACHE_DIR)):
+        for path, stat in _list_files(directory, limiter):
+            if not path.name.endswith(inventory.PARTIAL_SUFFIX) or stat.st_mtime > cutoff:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                _logger.exception("Failed to remove stale partial download: %s", path)
+                continue
+            removed += 1
+            freed += stat.st_size
+    if removed:
+        inventory.adjust({f"{inventory.PARTIAL}.files": -removed, f"{inventory.PARTIAL}.bytes": -freed})
+        _logger.info("Removed %d stale partial downloads (%d bytes)", removed, freed)
+    return removed, freed
+
+def enforce_temp_budget(limiter: TokenBucket, budget_bytes: int) -> Tuple[int, int]:
+    """
+    Delete the least recently used temp cache files until TEMP_DIR fits its budget,
+    clearing the rows that pointed at them in one update.
+
+    Returns:
+        (files removed, bytes freed).
+    """
+    files = [
+        (path, stat) for path, stat in _list_files(Path(settings.TEMP_DIR), limiter)
+        if not path.name.endswith(inventory.PARTIAL_SUFFIX)
+    ]
+    total = sum(stat.st_size for _, stat in files)
+    if total <= budget_bytes:
+        return 0, 0
+
+    removed_paths: List[str] = []
+    freed = 0
+    for path, stat in sorted(files, key=lambda item: item[1].st_atime):
+        if total - freed <= budget_bytes:
+            break
+        limiter.acquire()
+        try:
+            path.unlink()
+        except OSError:
+            _logger.exception("Failed to remove temp cache file: %s", path)
+            continue
+        removed_paths.append(str(path))
+        freed += stat.st_size
+
+    with Session(engine) as session:
+        for start in range(0, len(removed_paths), SWEEP_BATCH):
+            session.exec(
+                update(Track)
+                .where(Track.local_path.in_(removed_paths[start:start + SWEEP_BATCH]))
+                .values(is_cached=False, local_path=None)
+            )
+        inventory.adjust({f"{inventory.TEMP}.files": -len(removed_paths), f"{inventory.TEMP}.bytes": -freed}, session)
+        bump(session, LIBRARY)
+        session.commit()
+    _logger.info("Temp cache over budget: removed %d files (%d bytes)", len(removed_paths), freed)
+    return len(removed_paths), freed
+
+def repair_rows(limiter: TokenBucket, ctx: Optional[JobContext] = None) -> Dict[str, int]:
+    """
+    Compare every track's `local_path`/`is_cached` with the filesystem in keyset-paginated
+    batches and fix YouTube rows in bulk.
+
+    Cached audio is looked up in one listing of CACHE_DIR and TEMP_DIR (persistent
+    copy preferred), so YouTube rows cost no per-row stat: rows whose file exists
+    elsewhere (e.g. a promotion whose DB update failed) are re-pointed, rows whose
+    file is gone are cleared, and unreferenced cache files are adopted. Library
+    rows are only stat'ed; missing library files are counted but left in place.
+
+    Returns:
+        Counts of re-pointed and cleared rows and of missing library files.
+    """
+    cached: Dict[str, str] = {}
+    for directory in (Path(settings.TEMP_DIR), Path(settings.CACHE_DIR)):
+        for path, _ in _list_files(directory, limiter):
+            if path.suffix == ".mp3":
+                cached[path.stem] = str(path)  # Persistent is listed last and wins
+
+    with Session(engine) as session:
+        total = session.exec(
+            select(func.count(Track.id)).where(or_(Track.local_path != None, Track.remote_id != None))
+        ).one()
+    counts = {"repointed": 0, "cleared": 0, "missing_library": 0}
+    last_id = ""
+    done = 0
+    while True:
+        if ctx:
+            ctx.check_cancelled()
+        with Session(engine) as session:
+            rows = session.exec(
+                select(Track.id, Track.source_type, Track.remote_id, Track.local_path, Track.is_cached)
+                .where(Track.id > last_id, or_(Track.local_path != None, Track.remote_id != None))
+                .order_by(Track.id)
+                .limit(SWEEP_BATCH)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            repoint: Dict[str, str] = {}
+            clear: List[str] = []
+            for row in rows:
+                if row.source_type == "youtube" and row.remote_id:
+                    expected = cached.get(row.remote_id)
+                    if expected:
+                        if row.local_path != expected or not row.is_cached:
+                            repoint[row.id] = expected
+                    elif row.is_cached or row.local_path:
+                        limiter.acquire()
+                        if not (row.local_path and os.path.exists(row.local_path)):
+                            clear.append(row.id)
+                elif row.local_path:
+                    limiter.acquire()
+                    if not os.path.exists(row.local_path):
+                        counts["missing_library"] += 1
+
+            for track_id, path in repoint.items():
+                session.exec(update(Track).where(Track.id == track_id).values(is_cached=True, local_path=path))
+            if clear:
+                session.exec(update(Track).where(Track.id.in_(clear)).values(is_cached=False, local_path=None))
+            if repoint or clear:
+                bump(session, LIBRARY)
+            session.commit()
+            counts["repointed"] += len(repoint)
+            counts["cleared"] += len(clear)
+        done += len(rows)
+        if ctx:
+            ctx.progress(done / max(1, total), f"Checked {done} tracks")
+
+    # After the pass every YouTube row is consistent, so only library rows point at missing files
+    inventory.set_value(inventory.MISSING_ROWS, counts["missing_library"])
+    return counts
+
+def run_sweep(ctx: Optional[JobContext] = None) -> str:
+    """
+    Clear stale partial downloads, enforce the temp cache budget and repair track rows,
+    at idle I/O priority and at most SWEEP_IO_RATE filesystem operations per second.
+
+    Returns:
+        A summary of what was fixed.
+    """
+    limiter = TokenBucket(settings.SWEEP_IO_RATE, settings.SWEEP_IO_RATE)
+    with _idle_io_priority():
+        partials, _ = clear_stale_partials(limiter, settings.PARTIAL_MAX_AGE)
+        evicted, _ = enforce_temp_budget(limiter, int(settings.TEMP_CACHE_MAX_GB * 1024 ** 3))
+        counts = repair_rows(limiter, ctx)
+    summary = (
+        f"{partials} stale partials removed, {evicted} temp files evicted, "
+        f"{counts['repointed']} rows re-pointed, {counts['cleared']} rows cleared, "
+        f"{counts['missing_library']} library files missing"
+    )
+    _logger.info("Sweep finished: %s", summary)
+    return summary
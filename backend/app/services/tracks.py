@@ -0,0 +1,120 @@
+import asyncio
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlmodel import Session, or_, select
+
+from app.models import Track
+from app.schemas import TrackOut
+from app.services import catalog, smart_playlists, ytmusic
+from app.services.dedup import dedup_key
+from app.services.response_cache import LIBRARY, bump
+from app.utils.logger import setup_logger
+
+_logger = setup_logger(__name__)
+
+YOUTUBE_ID_LENGTH: int = 11
+
+# Columns selected by list endpoints: exactly the fields of TrackOut, so rows can be
+# encoded as-is without hydrating Track objects
+TRACK_COLUMNS = tuple(getattr(Track, name) for name in TrackOut.model_fields)
+
+def row_dicts(rows: Iterable[Any]) -> List[Dict[str, Any]]:
+    """
+    Turn rows of a column select into plain dicts keyed by column label.
+    """
+    return [row._asdict() for row in rows]
+
+def needs_thumbnail(track: Dict[str, Any]) -> bool:
+    """
+    Whether a listed YouTube track is still missing its thumbnail (filled in by the backfill job).
+    """
+    return track["source_type"] == "youtube" and not track["thumbnail"] and bool(track["remote_id"])
+
+def track_from_song(video_id: str, yt_info: Optional[Dict]) -> Optional[Track]:
+    """
+    Build a new (unsaved) YouTube Track from `get_song` details.
+
+    Args:
+        video_id: YouTube video ID.
+        yt_info: Result of `ytmusic.get_song`.
+
+    Returns:
+        The Track, or None if the details are missing.
+    """
+    if not yt_info or "videoDetails" not in yt_info:
+        return None
+    details = yt_info["videoDetails"]
+    title = details.get("title", "Unknown Title")
+    artist = details.get("author", "Unknown Artist")
+    duration = details.get("lengthSeconds")
+    return Track(
+        id=str(uuid.uuid4()),
+        title=title,
+        artist=artist,
+        remote_id=video_id,
+        source_type="youtube",
+        duration=int(duration) if duration else None,
+        thumbnail=ytmusic.song_thumbnail(yt_info),
+        dedup_key=dedup_key(artist, title)
+    )
+
+def find_tracks(session: Session, track_ids: Iterable[str]) -> Dict[str, Track]:
+    """
+    Look up tracks by database ID or YouTube ID in a single query.
+
+    Returns:
+        Mapping from each requested ID that was found to its Track.
+    """
+    wanted = set(track_ids)
+    if not wanted:
+        return {}
+    found: Dict[str, Track] = {}
+    for track in session.exec(
+        select(Track).where(or_(Track.id.in_(wanted), Track.remote_id.in_(wanted)))
+    ).all():
+        for key in (track.id, track.remote_id):
+            if key in wanted and key not in found:
+                found[key] = track
+    return found
+
+async def resolve_tracks(session: Session, track_ids: List[str], concurrency: int = 8) -> Dict[str, Track]:
+    """
+    Resolve many track IDs to Tracks, auto-indexing unknown YouTube IDs.
+
+    Known IDs are found with one query. Unknown YouTube IDs are looked up
+    concurrently, at most `concurrency` at a time, and the new Tracks are saved
+    in a single commit.
+
+    Args:
+        session: Database session.
+        track_ids: Database or YouTube IDs.
+        concurrency: Maximum parallel YouTube Music lookups.
+
+    Returns:
+        Mapping from each resolvable requested ID to its Track.
+    """
+    resolved = find_tracks(session, track_ids)
+    missing = list(dict.fromkeys(
+        t for t in track_ids if t not in resolved and len(t) == YOUTUBE_ID_LENGTH
+    ))
+    if not missing:
+        return resolved
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def lookup(video_id: str) -> Optional[Track]:
+        async with semaphore:
+            return track_from_song(video_id, await ytmusic.get_song(video_id))
+
+    _logger.info("Auto-indexing %d tracks from YouTube Music", len(missing))
+    new_tracks = await asyncio.gather(*(lookup(video_id) for video_id in missing))
+    for video_id, track in zip(missing, new_tracks):
+        if track:
+            session.add(track)
+            catalog.add_track(session, track)
+            smart_playlists.track_added(session, track)
+            resolved[video_id] = track
+    bump(session, LIBRARY)
+    session.commit()
+    return resolved
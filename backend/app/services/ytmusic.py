@@ -1,15 +1,65 @@
-from typing import List, Dict
-
-from ytmusicapi import YTMusic
+from typing import List, Dict, Optional
 
+from app.config import settings
+from app.services.metadata_cache import MetadataCache, default_cache_path
+from app.services.ytmusic_client import YTMusicClient
 from app.utils.logger import setup_logger
 
 _logger = setup_logger(__name__)
 
-# Initialize YTMusic (using guest mode for now to avoid requiring browser auth)
-yt: YTMusic = YTMusic()
+# Rate-limited async client (guest mode for now to avoid requiring browser auth).
+# The configured rate is for the whole deployment, so each worker process gets a share.
+_workers = max(1, settings.WEB_CONCURRENCY)
+client: YTMusicClient = YTMusicClient(
+    max_workers=settings.YTMUSIC_MAX_WORKERS,
+    rate_per_sec=settings.YTMUSIC_RATE_PER_SEC / _workers,
+    burst=max(1, settings.YTMUSIC_BURST // _workers),
+    max_retries=settings.YTMUSIC_MAX_RETRIES,
+    pool_size=settings.YTMUSIC_POOL_SIZE
+)
+
+# Persistent cache shared by search, song details and watch playlists
+metadata_cache: MetadataCache = MetadataCache(default_cache_path())
 
-def search_youtube(query: str, limit: int = 20) -> List[Dict]:
+def _format_track(item: Dict) -> Dict:
+    """
+    Convert a YouTube Music search/watch item into the API track dictionary.
+    """
+    return {
+        "id": item.get("videoId"),
+        "title": item.get("title"),
+        "artist": ", ".join([a.get("name") for a in item.get("artists", [])]),
+        "album": (item.get("album") or {}).get("name"),
+        "duration": item.get("duration_seconds"),
+        "source_type": "youtube",
+        "remote_id": item.get("videoId"),
+        "thumbnail": (item.get("thumbnails") or [{}])[-1].get("url")
+    }
+
+async def _fetch_search(query: str, limit: int) -> List[Dict]:
+    _logger.info("External search on YouTube Music for: %s", query)
+    results = await client.search(query, limit=limit)
+    formatted_results = []
+    for item in results:
+        track = _format_track(item)
+        track["is_cached"] = False  # Checked against DB in main search logic
+        formatted_results.append(track)
+    return formatted_results
+
+async def _fetch_song(video_id: str) -> Optional[Dict]:
+    _logger.info("Fetching song details for: %s", video_id)
+    yt_info = await client.get_song(video_id)
+    if not yt_info or "videoDetails" not in yt_info:
+        return None
+    # Only video details are used; streaming URLs expire and would bloat the cache
+    return {"videoDetails": yt_info["videoDetails"]}
+
+async def _fetch_watch_playlist(video_id: str, limit: int) -> List[Dict]:
+    _logger.info("Fetching related tracks for: %s", video_id)
+    watch_playlist = await client.get_watch_playlist(video_id, limit=limit)
+    return [_format_track(item) for item in watch_playlist.get("tracks", [])]
+
+async def search_youtube(query: str, limit: int = 20) -> List[Dict]:
     """
     Search YouTube Music for songs matching the query.
 
@@ -19,53 +69,50 @@ def search_youtube(query: str, limit: int = 20) -> List[Dict]:
     Returns:
         A list of formatted dictionaries containing track metadata.
     """
-    _logger.info("External search on YouTube Music for: %s", query)
+    key = f"{limit}:{query.strip().lower()}"
     try:
-        results = yt.search(query, filter="songs", limit=limit)
-        formatted_results = []
-        for item in results:
-            formatted_results.append({
-                "id": item.get("videoId"),
-                "title": item.get("title"),
-                "artist": ", ".join([a.get("name") for a in item.get("artists", [])]),
-                "album": item.get("album", {}).get("name"),
-                "duration": item.get("duration_seconds"),
-                "source_type": "youtube",
-                "remote_id": item.get("videoId"),
-                "is_cached": False,  # Checked against DB in main search logic
-                "thumbnail": item.get("thumbnails", [{}])[-1].get("url")
-            })
-        return formatted_results
+        results = await metadata_cache.get_or_fetch("search", key, lambda: _fetch_search(query, limit))
+        return results or []
     except Exception:
         _logger.exception("YouTube Music API search failed")
         return []
-def get_related_tracks(video_id: str, limit: int = 20) -> List[Dict]:
+
+async def get_song(video_id: str) -> Optional[Dict]:
+    """
+    Fetch song details for a video ID, served from the metadata cache when possible.
+
+    Args:
+        video_id: YouTube video ID.
+
+    Returns:
+        A dictionary with a `videoDetails` entry, or None if the song could not be fetched.
+    """
+    try:
+        return await metadata_cache.get_or_fetch("song", video_id, lambda: _fetch_song(video_id))
+    except Exception:
+        _logger.exception("YouTube Music get_song failed for: %s", video_id)
+        return None
+
+def song_thumbnail(yt_info: Optional[Dict]) -> Optional[str]:
+    """
+    Return the largest thumbnail URL from a `get_song` result, if any.
+    """
+    if not yt_info or "videoDetails" not in yt_info:
+        return None
+    thumbnails = yt_info["videoDetails"].get("thumbnail", {}).get("thumbnails", [])
+    return thumbnails[-1].get("url") if thumbnails else None
+
+async def get_related_tracks(video_id: str, limit: int = 20) -> List[Dict]:
     """
     Fetch related tracks based on a video ID (Radio Mode).
     """
-    _logger.info("Fetching related tracks for: %s", video_id)
+    key = f"{limit}:{video_id}"
     try:
-        # get_watch_playlist returns a playlist of related videos
-        watch_playlist = yt.get_watch_playlist(video_id, limit=limit)
-        results = watch_playlist.get("tracks", [])
-        
-        formatted_results = []
-        for item in results:
-            # Skip the current video if it's in the results
-            if item.get("videoId") == video_id:
-                continue
-                
-            formatted_results.append({
-                "id": item.get("videoId"),
-                "title": item.get("title"),
-                "artist": ", ".join([a.get("name") for a in item.get("artists", [])]),
-                "album": item.get("album", {}).get("name"),
-                "duration": item.get("duration_seconds"),
-                "source_type": "youtube",
-                "remote_id": item.get("videoId"),
-                "thumbnail": item.get("thumbnails", [{}])[-1].get("url")
-            })
-        return formatted_results
+        results = await metadata_cache.get_or_fetch(
+            "watch", key, lambda: _fetch_watch_playlist(video_id, limit)
+        ) or []
     except Exception:
         _logger.exception("YouTube Music get_related_tracks failed")
         return []
+    # Skip the current video if it's in the results
+    return [item for item in results if item.get("id") != video_id]
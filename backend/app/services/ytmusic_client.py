@@ -0,0 +1,148 @@
+import asyncio
+import functools
+import random
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.utils.logger import setup_logger
+from app.utils.profiler import track_phase
+from app.utils.rate_limiter import TokenBucket
+
+_logger = setup_logger(__name__)
+
+_STATUS_PATTERN = re.compile(r"HTTP (\d{3})")
+REQUEST_TIMEOUT: int = 15
+
+def _is_retryable(exc: Exception) -> bool:
+    """
+    Decide whether a failed YouTube Music call is worth retrying (429, 5xx or network errors).
+    """
+    from ytmusicapi.exceptions import YTMusicServerError
+
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(exc, YTMusicServerError):
+        match = _STATUS_PATTERN.search(str(exc))
+        if match:
+            status = int(match.group(1))
+            return status == 429 or status >= 500
+    return False
+
+class YTMusicClient:
+    """
+    Async wrapper around `ytmusicapi.YTMusic`.
+
+    The blocking library runs on a dedicated bounded executor (instead of the default
+    thread pool shared with FastAPI), over a pooled keep-alive `requests.Session`.
+    Every call is paced by a token bucket and retried with jittered exponential
+    backoff on 429/5xx responses. `ytmusicapi` itself is only imported and
+    constructed on the first call, keeping it off the startup path.
+    """
+    def __init__(
+        self,
+        max_workers: int = 4,
+        rate_per_sec: float = 5.0,
+        burst: int = 10,
+        max_retries: int = 3,
+        pool_size: int = 8,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 8.0
+    ) -> None:
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ytmusic")
+        self._bucket = TokenBucket(rate_per_sec, burst)
+        self._pool_size = pool_size
+        self._yt: Optional[Any] = None
+        self._init_lock = threading.Lock()
+
+    def _get_yt(self) -> Any:
+        """
+        Return the underlying `YTMusic` instance, creating it on first use.
+        """
+        if self._yt is None:
+            with self._init_lock:
+                if self._yt is None:
+                    from ytmusicapi import YTMusic
+
+                    _logger.info("Initializing YouTube Music client")
+                    self._yt = YTMusic(requests_session=self._build_session(self._pool_size))
+        return self._yt
+
+    @staticmethod
+    def _build_session(pool_size: int) -> requests.Session:
+        """
+        Create a keep-alive session whose connection pool matches the executor size.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.request = functools.partial(session.request, timeout=REQUEST_TIMEOUT)
+        return session
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """
+        Exponential backoff with full jitter.
+        """
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    async def call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        """
+        Invoke a `YTMusic` method on the client executor with rate limiting and retries.
+
+        Args:
+            method: Name of the `YTMusic` method (e.g. "search", "get_song").
+            *args: Positional arguments for the method.
+            **kwargs: Keyword arguments for the method.
+
+        Returns:
+            Whatever the underlying method returns.
+
+        Raises:
+            Exception: The last error once retries are exhausted or for non-retryable errors.
+        """
+        loop = asyncio.get_running_loop()
+        if self._yt is None:
+            await loop.run_in_executor(self._executor, self._get_yt)
+        func = functools.partial(getattr(self._yt, method), *args, **kwargs)
+        attempt = 0
+        while True:
+            await self._bucket.acquire_async()
+            try:
+                with track_phase("ytmusic"):
+                    return await loop.run_in_executor(self._executor, func)
+            except Exception as exc:
+                if attempt >= self.max_retries or not _is_retryable(exc):
+                    raise
+                delay = self._backoff_delay(attempt)
+                attempt += 1
+                _logger.warning(
+                    "YouTube Music %s failed (%s), retry %d/%d in %.2fs",
+                    method, exc.__class__.__name__, attempt, self.max_retries, delay
+                )
+                await asyncio.sleep(delay)
+
+    async def search(self, query: str, limit: int = 20) -> List[Dict]:
+        """
+        Search YouTube Music songs.
+        """
+        return await self.call("search", query, filter="songs", limit=limit)
+
+    async def get_song(self, video_id: str) -> Optional[Dict]:
+        """
+        Fetch raw song details for a video ID.
+        """
+        return await self.call("get_song", video_id)
+
+    async def get_watch_playlist(self, video_id: str, limit: int = 20) -> Dict:
+        """
+        Fetch the watch playlist (related tracks) for a video ID.
+        """
+        return await self.call("get_watch_playlist", video_id, limit=limit)
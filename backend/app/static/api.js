@@ -19,6 +19,9 @@ const API = {
     search: (query, offset, limit, options) =>
         apiFetch(`/search?q=${encodeURIComponent(query)}&offset=${offset}&limit=${limit}`, options),
 
+    suggest: (query, options) =>
+        apiFetch(`/search/suggest?q=${encodeURIComponent(query)}&limit=8`, options),
+
     getPopular: (offset, limit, options) =>
         apiFetch(`/tracks/popular?offset=${offset}&limit=${limit}`, options),
 
@@ -1,5 +1,5 @@
 // main.js - Entry Point
-console.log("MySpotify v2.9.1 - Refactored");
+console.log("MySpotify v2.9.2 - Refactored");
 
 const state = {
     user: null,
@@ -18,7 +18,8 @@ const state = {
     currentTracksContext: [],
     currentTrackIndex: -1,
     currentPlaylistId: null,
-    searchAbortController: null // To cancel previous search requests
+    searchAbortController: null, // To cancel previous search requests
+    suggestAbortController: null
 };
 
 // --- Core Logic ---
@@ -89,7 +90,38 @@ const performSearch = async (query, append = false) => {
     }
 };
 
-const debouncedSearch = debounce((q) => performSearch(q), 500);
+// Full searches (YouTube included) only once typing pauses; suggestions come from memory and can be live.
+// Skipped if the box changed meanwhile (a picked suggestion) or the query was already searched (Enter).
+const debouncedSearch = debounce((q) => {
+    if (q !== document.getElementById('main-search')?.value || q === state.searchMeta.query) return;
+    performSearch(q);
+}, 1000);
+
+const loadSuggestions = async (query) => {
+    const list = document.getElementById('search-suggestions');
+    if (!list) return;
+    if (state.suggestAbortController) state.suggestAbortController.abort();
+    if (query.trim().length === 0) {
+        list.replaceChildren();
+        return;
+    }
+    state.suggestAbortController = new AbortController();
+    try {
+        const res = await API.suggest(query, { signal: state.suggestAbortController.signal });
+        if (!res.ok) return;
+        const suggestions = await res.json();
+        list.replaceChildren(...suggestions.map(s => {
+            const option = document.createElement('option');
+            option.value = s.text;
+            option.label = s.kind;
+            return option;
+        }));
+    } catch (err) {
+        if (err.name !== 'AbortError') console.error("Suggestions failed:", err);
+    }
+};
+
+const debouncedSuggest = debounce(loadSuggestions, 120);
 
 // --- Initialization ---
 const initApp = async () => {
@@ -143,6 +175,12 @@ const initEventListeners = () => {
     searchInput?.addEventListener('input', (e) => {
         const query = e.target.value;
         if (clearBtn) clearBtn.classList.toggle('visible', query.length > 0);
+        // A picked suggestion arrives as an input event without a typing inputType
+        if (!e.inputType || e.inputType === 'insertReplacementText') {
+            performSearch(query);
+            return;
+        }
+        debouncedSuggest(query);
         debouncedSearch(query);
     });
 
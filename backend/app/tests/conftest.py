@@ -0,0 +1,32 @@
+import sys
+from typing import Any, Generator
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+import app.db
+
+@pytest.fixture
+def engine(monkeypatch) -> Any:
+    """
+    A fresh in-memory database with every table, shared by all threads.
+
+    It replaces `app.db.engine` and every loaded module's copy of it, so services
+    that open their own sessions (catalog, play log, inventory, ...) use it too.
+    """
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    original = app.db.engine
+    for name, module in list(sys.modules.items()):
+        if name.startswith("app.") and getattr(module, "engine", None) is original:
+            monkeypatch.setattr(module, "engine", engine)
+    return engine
+
+@pytest.fixture
+def session(engine) -> Generator[Session, None, None]:
+    """
+    A session on the `engine` fixture's database.
+    """
+    with Session(engine) as session:
+        yield session
@@ -23,3 +23,118 @@ def test_token_creation() -> None:
     )
     assert isinstance(token, str)
     assert len(token) > 0
+
+def test_password_checks_run_off_the_event_loop() -> None:
+    """
+    Test that the async wrappers hash and verify on the auth thread pool.
+    """
+    import asyncio
+    import threading
+    from app.auth_utils import get_password_hash_async, verify_password_async
+
+    async def check() -> bool:
+        hashed = await get_password_hash_async("secret")
+        return await verify_password_async("secret", hashed)
+
+    assert asyncio.run(check()) is True
+    assert any(thread.name.startswith("auth") for thread in threading.enumerate())
+
+def test_cache_max_age() -> None:
+    """
+    Test that certificate lifetimes follow Cache-Control and Age.
+    """
+    from app.auth_utils import cache_max_age
+
+    assert cache_max_age({"Cache-Control": "public, max-age=19045, must-revalidate", "Age": "45"}) == 19000
+    assert cache_max_age({"cache-control": "max-age=10", "age": "60"}) == 0
+    assert cache_max_age({"Cache-Control": "no-store, max-age=100"}) is None
+    assert cache_max_age({}) is None
+
+def test_google_certs_are_reused_until_expiry(monkeypatch) -> None:
+    """
+    Test that certificates are fetched once while fresh and again for a rotated key ID.
+    """
+    from app import auth_utils
+
+    certs = auth_utils.GoogleCerts()
+    fetches = []
+    monkeypatch.setattr(certs, "_fetch", lambda: fetches.append(1) or ({"k1": "pem"}, 3600.0))
+    assert certs.get("k1") == {"k1": "pem"}
+    assert certs.get("k1") == {"k1": "pem"}
+    assert len(fetches) == 1
+
+    certs.get("k2")  # Within MIN_CERT_REFETCH of the last fetch
+    assert len(fetches) == 1
+    monkeypatch.setattr(auth_utils, "MIN_CERT_REFETCH", 0.0)
+    certs.get("k2")
+    assert len(fetches) == 2
+
+def test_google_id_token_verification(monkeypatch) -> None:
+    """
+    Test signature, audience and issuer checks against cached certificates.
+    """
+    pytest.importorskip("cryptography")
+    import time
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from google.auth import crypt, jwt as google_jwt
+    from app import auth_utils
+    from app.config import settings
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_pem = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    signer = crypt.RSASigner.from_string(private_pem, key_id="k1")
+    monkeypatch.setattr(auth_utils.google_certs, "_fetch", lambda: ({"k1": public_pem}, 3600.0))
+
+    def token(**claims) -> str:
+        now = int(time.time())
+        payload = {"iss": "https://accounts.google.com", "aud": settings.GOOGLE_CLIENT_ID, "sub": "g1",
+                   "email": "a@b", "iat": now, "exp": now + 600, **claims}
+        return google_jwt.encode(signer, payload).decode()
+
+    assert auth_utils.verify_google_id_token(token())["sub"] == "g1"
+    for bad in (token(iss="https://evil.example"), token(aud="other-client"), "not-a-token"):
+        with pytest.raises(ValueError):
+            auth_utils.verify_google_id_token(bad)
+
+def test_login_throttle_is_per_client() -> None:
+    """
+    Test that a client is throttled after its burst while others are unaffected.
+    """
+    from app.utils.rate_limiter import KeyedRateLimiter
+
+    limiter = KeyedRateLimiter(rate=1.0, capacity=2, max_keys=2)
+    assert limiter.check("a") == 0 and limiter.check("a") == 0
+    assert 0 < limiter.check("a") <= 1.0
+    assert limiter.check("b") == 0
+    limiter.check("c")  # Evicts "a", the least recently seen
+    assert limiter.check("a") == 0
+
+def test_client_ip_is_resolved_through_trusted_proxies() -> None:
+    """
+    Test that the login throttle key is the client behind Caddy and the tunnel, not the
+    proxy, and that forwarding headers from untrusted peers are ignored.
+    """
+    from starlette.requests import Request
+
+    from app.utils.client_ip import client_ip
+
+    def request(peer: str, headers: dict) -> Request:
+        raw = [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+        return Request({"type": "http", "client": (peer, 1234), "headers": raw})
+
+    trusted = "127.0.0.1,172.16.0.0/12"
+    # LAN client through Caddy
+    assert client_ip(request("172.18.0.3", {"X-Forwarded-For": "192.168.1.20"}), trusted) == "192.168.1.20"
+    # Internet client through the tunnel connector, then Caddy
+    tunnel = {"X-Forwarded-For": "172.18.0.5", "CF-Connecting-IP": "203.0.113.7"}
+    assert client_ip(request("172.18.0.3", tunnel), trusted) == "203.0.113.7"
+    # Spoofed headers from a client reaching the app directly
+    assert client_ip(request("198.51.100.1", tunnel), trusted) == "198.51.100.1"
+    # Only the hops added by trusted proxies count, not what the client prepended
+    assert client_ip(request("172.18.0.3", {"X-Forwarded-For": "1.1.1.1, 192.168.1.20"}), trusted) == "192.168.1.20"
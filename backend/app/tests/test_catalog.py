@@ -0,0 +1,99 @@
+from sqlmodel import Session, select
+
+from app.models import Album, Artist, Track
+from app.services import catalog
+
+def _add(session: Session, track_id: str, artist: str, album: str = None, duration: int = 100, **kwargs) -> Track:
+    track = Track(id=track_id, title=track_id, artist=artist, album=album, duration=duration, source_type="local", **kwargs)
+    session.add(track)
+    catalog.add_track(session, track)
+    session.commit()
+    return track
+
+def _snapshot(session: Session):
+    artists = [tuple(row) for row in session.exec(
+        select(Artist.id, Artist.track_count, Artist.album_count, Artist.total_duration).order_by(Artist.id)
+    ).all()]
+    albums = [tuple(row) for row in session.exec(
+        select(Album.id, Album.artist_id, Album.track_count, Album.total_duration).order_by(Album.id)
+    ).all()]
+    return artists, albums
+
+def test_incremental_add_groups_by_primary_artist(engine) -> None:
+    """
+    Test that spellings and featured credits of one artist share an entry and albums are counted.
+    """
+    with Session(engine) as session:
+        first = _add(session, "t1", "Radiohead", "OK Computer")
+        second = _add(session, "t2", "radiohead feat. Thom Yorke", "ok computer", duration=50)
+        _add(session, "t3", "Radiohead", "Kid A")
+        _add(session, "t4", "Portishead")
+        _add(session, "dup", "Radiohead", "OK Computer", canonical_id="t1")
+
+        assert first.artist_id == second.artist_id
+        assert first.album_id == second.album_id
+        artist = session.get(Artist, first.artist_id)
+        assert (artist.name, artist.track_count, artist.album_count, artist.total_duration) == ("Radiohead", 3, 2, 250)
+        assert session.get(Album, first.album_id).track_count == 2
+        assert session.exec(select(Track.artist_id).where(Track.id == "dup")).one() is None
+
+def test_remove_track_drops_empty_entries(engine) -> None:
+    """
+    Test that uncounting an album's last track deletes the album and then the artist.
+    """
+    with Session(engine) as session:
+        first = _add(session, "t1", "Radiohead", "OK Computer")
+        second = _add(session, "t2", "Radiohead", "Kid A")
+        artist_id = first.artist_id
+
+        catalog.remove_track(session, second)
+        session.commit()
+        assert session.get(Artist, artist_id).album_count == 1
+        assert session.get(Album, catalog.album_id("radiohead", "kid a")) is None
+
+        catalog.remove_track(session, first)
+        session.commit()
+        assert session.get(Artist, artist_id) is None
+        assert first.artist_id is None
+
+def test_rebuild_matches_incremental_maintenance(engine) -> None:
+    """
+    Test that a rebuild reproduces the incremental aggregates and re-points stale tracks.
+    """
+    with Session(engine) as session:
+        _add(session, "t1", "Radiohead", "OK Computer", thumbnail="a.jpg")
+        _add(session, "t2", "radiohead feat. Thom Yorke", "OK Computer")
+        _add(session, "t3", "Massive Attack", "Mezzanine")
+        _add(session, "t4", "Massive Attack")
+        incremental = _snapshot(session)
+
+        stale = session.get(Track, "t3")
+        stale.artist_id, stale.album_id = None, None
+        session.add(stale)
+        session.commit()
+
+    result = catalog.rebuild()
+    assert result == {"artists": 2, "albums": 2, "repointed": 1}
+    with Session(engine) as session:
+        assert _snapshot(session) == incremental
+        assert session.get(Track, "t3").album_id == catalog.album_id("massive attack", "mezzanine")
+        assert session.get(Album, catalog.album_id("radiohead", "ok computer")).thumbnail == "a.jpg"
+
+def test_band_names_with_ampersands_and_commas_stay_whole(engine) -> None:
+    """
+    Test that "&" and commas in a band's name do not split it, only featured credits are dropped.
+    """
+    with Session(engine) as session:
+        band = _add(session, "t1", "Mumford & Sons", "Sigh No More")
+        _add(session, "t2", "Mumford and Sons feat. Baaba Maal")
+        _add(session, "t3", "Mumford")
+        earth = _add(session, "t4", "Earth, Wind & Fire", "I Am")
+        _add(session, "t5", "Earth, Wind & Fire x The Emotions")
+        _add(session, "t6", "Earth")
+
+        assert band.artist_id == catalog.artist_id("mumford and sons")
+        assert session.get(Artist, band.artist_id).name == "Mumford & Sons"
+        assert session.get(Artist, band.artist_id).track_count == 2
+        assert session.get(Artist, earth.artist_id).name == "Earth, Wind & Fire"
+        assert session.get(Artist, earth.artist_id).track_count == 2
+        assert session.get(Artist, catalog.artist_id("earth")).track_count == 1
@@ -0,0 +1,64 @@
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.utils.compression import CompressionMiddleware, choose_encoding
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+    rows = [{"id": i, "thumbnail": f"https://i.ytimg.com/vi/{i}/hqdefault.jpg"} for i in range(50)]
+
+    @app.get("/tracks")
+    def tracks() -> JSONResponse:
+        return JSONResponse(rows, headers={"ETag": '"abc"'})
+
+    @app.get("/small")
+    def small() -> dict:
+        return {"ok": True}
+
+    @app.get("/audio")
+    def audio() -> StreamingResponse:
+        return StreamingResponse(iter([b"\xff\xfb" * 500, b"\xff\xfb" * 500]), media_type="audio/mpeg")
+
+    @app.get("/stream")
+    def stream() -> StreamingResponse:
+        return StreamingResponse((f'{{"n":{i}}}\n'.encode() for i in range(200)), media_type="application/x-ndjson")
+
+    return TestClient(app)
+
+def test_choose_encoding() -> None:
+    """
+    Test Accept-Encoding negotiation (brotli is only chosen when installed).
+    """
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("*") in ("br", "gzip")
+    assert choose_encoding("") is None
+
+def test_only_text_responses_are_compressed() -> None:
+    """
+    Test that JSON and NDJSON streams are gzipped while small bodies and audio pass through.
+    """
+    client = _client()
+    headers = {"Accept-Encoding": "gzip"}
+
+    response = client.get("/tracks", headers=headers)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"abc"'
+    assert int(response.headers["content-length"]) < len(response.content)  # decoded by the client
+    assert response.json()[49]["id"] == 49
+
+    small = client.get("/small", headers=headers)
+    assert "content-encoding" not in small.headers and small.json() == {"ok": True}
+
+    audio = client.get("/audio", headers=headers)
+    assert "content-encoding" not in audio.headers and len(audio.content) == 2000
+
+    stream = client.get("/stream", headers=headers)
+    assert stream.headers["content-encoding"] == "gzip"
+    assert stream.text.splitlines()[-1] == '{"n":199}'
+
+    raw = client.get("/tracks", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers and "vary" not in raw.headers
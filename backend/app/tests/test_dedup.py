@@ -0,0 +1,93 @@
+import os
+import shutil
+
+import pytest
+from sqlmodel import Session
+
+from app.config import settings
+from app.models import Track
+from app.services.dedup import (
+    collapse_results,
+    compute_fingerprint,
+    dedup_key,
+    fingerprint_similarity,
+    link_duplicates,
+    reclaim_duplicates,
+    resolve_canonical,
+)
+
+def test_dedup_key_normalises_tags() -> None:
+    """
+    Test that cosmetic differences between YouTube and ID3 tags map to the same key.
+    """
+    assert dedup_key("Radiohead", "Karma Police") == dedup_key(
+        "radiohead, Thom Yorke", "Karma Police (Remastered)"
+    )
+    assert dedup_key("Beyoncé", "Halo [Official Video]") == dedup_key("Beyonce", "halo")
+    assert dedup_key("Artist", "Song feat. Someone") == dedup_key("Artist", "Song")
+    assert dedup_key("Artist", "(Intro)") is None
+
+def test_collapse_results_prefers_first_copy() -> None:
+    """
+    Test that a YouTube result duplicating a local one is dropped from search output.
+    """
+    results = [
+        {"id": "local-1", "artist": "Daft Punk", "title": "One More Time", "duration": 320},
+        {"id": "yt-1", "artist": "Daft Punk", "title": "One More Time (Official Audio)", "duration": 321},
+        {"id": "yt-2", "artist": "Daft Punk", "title": "One More Time", "duration": 600},
+    ]
+    assert [r["id"] for r in collapse_results(results)] == ["local-1", "yt-2"]
+
+def test_link_and_reclaim_duplicates(session: Session, tmp_path, monkeypatch) -> None:
+    """
+    Test linking a YouTube row to its local twin and reclaiming the cached copy.
+    """
+    monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(settings, "TEMP_DIR", str(tmp_path / "tmp"))
+    cache_file = tmp_path / "cache" / "dupvideo001.mp3"
+    os.makedirs(cache_file.parent)
+    cache_file.write_bytes(b"x" * 1024)
+
+    session.add(Track(id="local", title="Song", artist="Band", source_type="local",
+                      local_path=__file__, is_cached=True, duration=200))
+    session.add(Track(id="yt", title="Song (Lyrics)", artist="Band", source_type="youtube",
+                      remote_id="dupvideo001", local_path=str(cache_file), is_cached=True, duration=201))
+    session.add(Track(id="other", title="Song", artist="Band", source_type="youtube",
+                      remote_id="othervideo1", duration=400))
+    session.commit()
+
+    assert link_duplicates(session, use_fingerprint=False) == 1
+    yt = session.get(Track, "yt")
+    assert yt.canonical_id == "local"
+    assert session.get(Track, "other").canonical_id is None
+    assert resolve_canonical(session, yt).id == "local"
+
+    assert reclaim_duplicates(session) == (1, 1024)
+    assert not cache_file.exists()
+    assert session.get(Track, "yt").is_cached is False
+    # The library file itself is never touched
+    assert os.path.exists(__file__)
+
+def test_fingerprint_similarity_tolerates_offsets() -> None:
+    """
+    Test that a shifted copy of a fingerprint still matches while noise does not.
+    """
+    base = "0110100111001010" * 8
+    shifted = "10" + base[:-2]
+    assert fingerprint_similarity(base, shifted) == 1.0
+    assert fingerprint_similarity(base, "01" * 64) < 0.8
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_compute_fingerprint_is_stable(tmp_path) -> None:
+    """
+    Test that re-encoding the same audio yields a near-identical fingerprint.
+    """
+    import subprocess
+    source = tmp_path / "tone.wav"
+    reencoded = tmp_path / "tone.mp3"
+    subprocess.run(["ffmpeg", "-v", "quiet", "-f", "lavfi", "-i", "anoisesrc=d=5:seed=1",
+                    str(source)], check=True)
+    subprocess.run(["ffmpeg", "-v", "quiet", "-i", str(source), str(reencoded)], check=True)
+    a, b = compute_fingerprint(str(source)), compute_fingerprint(str(reencoded))
+    assert a and b
+    assert fingerprint_similarity(a, b) >= 0.8
@@ -0,0 +1,185 @@
+import asyncio
+import sys
+import threading
+
+import psutil
+import pytest
+
+from app.services.downloads import (
+    PRIORITY_PLAY, PRIORITY_PREFETCH, PRIORITY_SYNC, DownloadBusy, DownloadManager
+)
+from app.services.stream_scheduler import PacedStreamingResponse, StreamScheduler
+
+# Stand-in for yt-dlp: writes `chunks` KB (forever if 0), one every `delay` seconds
+FAKE_YTDLP = """
+import sys, time
+chunks, delay = int(sys.argv[1]), float(sys.argv[2])
+sent = 0
+while not chunks or sent < chunks:
+    sys.stdout.buffer.write(b"x" * 1024)
+    sys.stdout.flush()
+    sent += 1
+    time.sleep(delay)
+"""
+
+def _fake_cmd(tmp_path, chunks: int, delay: float) -> list:
+    script = tmp_path / "yt-dlp.py"
+    script.write_text(FAKE_YTDLP)
+    return [sys.executable, str(script), str(chunks), str(delay)]
+
+def test_stress_never_exceeds_the_caps(tmp_path) -> None:
+    """
+    Test that a burst of live streams and prefetches never runs more fake yt-dlp
+    processes than allowed, nor more background ones than their share, and that
+    every download still completes.
+    """
+    manager = DownloadManager(max_processes=3, max_background=1, per_listener=0, queue_timeout=30)
+    cmd = _fake_cmd(tmp_path, 5, 0.02)
+    peak = {"processes": 0, "background": 0}
+    done = threading.Event()
+
+    def sample() -> None:
+        me = psutil.Process()
+        while not done.is_set():
+            peak["processes"] = max(peak["processes"], len(me.children()))
+            snapshot = manager.snapshot()
+            peak["background"] = max(
+                peak["background"], snapshot["classes"]["prefetch"]["running"] + snapshot["classes"]["sync"]["running"]
+            )
+            done.wait(0.005)
+
+    async def play(index: int) -> int:
+        download = await manager.open_stream(cmd, f"t{index}", f"u{index}")
+        try:
+            received = 0
+            while chunk := await download.stdout.read(4096):
+                received += len(chunk)
+            assert await download.wait() == 0
+            return received
+        finally:
+            await download.close()
+
+    def prefetch(index: int) -> int:
+        with open(tmp_path / f"p{index}.download", "wb") as out:
+            priority = PRIORITY_SYNC if index % 2 else PRIORITY_PREFETCH
+            return manager.run(cmd, f"p{index}", out, priority=priority)
+
+    async def run() -> tuple:
+        plays = [play(index) for index in range(12)]
+        prefetches = [asyncio.to_thread(prefetch, index) for index in range(4)]
+        return await asyncio.gather(asyncio.gather(*plays), asyncio.gather(*prefetches))
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    try:
+        received, codes = asyncio.run(run())
+    finally:
+        done.set()
+        sampler.join()
+
+    assert received == [5 * 1024] * 12
+    assert codes == [0] * 4
+    assert 1 <= peak["processes"] <= 3
+    assert peak["background"] <= 1
+    snapshot = manager.snapshot()
+    assert snapshot["running"] == [] and snapshot["queued"] == []
+    assert snapshot["classes"]["play"]["admitted"] == 12
+    assert snapshot["classes"]["play"]["queue_ms"]["max"] > 0
+
+def test_waiters_are_admitted_by_class_then_arrival() -> None:
+    """
+    Test that once the only slot frees up, queued plays go before prefetches and prefetches before syncs.
+    """
+    manager = DownloadManager(max_processes=1, max_background=1, per_listener=0, queue_timeout=5)
+    order = []
+
+    async def wait(priority: int, track_id: str) -> None:
+        slot = await manager.acquire_async(priority, track_id)
+        order.append(track_id)
+        manager.release(slot)
+
+    async def run() -> None:
+        held = await manager.acquire_async(PRIORITY_PLAY, "held")
+        waiters = []
+        for priority, track_id in ((PRIORITY_SYNC, "sync"), (PRIORITY_PREFETCH, "prefetch"), (PRIORITY_PLAY, "play")):
+            waiters.append(asyncio.create_task(wait(priority, track_id)))
+            await asyncio.sleep(0.01)
+        manager.release(held)
+        await asyncio.gather(*waiters)
+
+    asyncio.run(run())
+    assert order == ["play", "prefetch", "sync"]
+
+def test_queue_timeout_and_superseded_streams(tmp_path) -> None:
+    """
+    Test that a stream gets DownloadBusy when no slot frees up in time, that a signed-in
+    listener's new stream kills the process of their previous one, and that streams of
+    anonymous listeners (one address may be a whole household) are left alone.
+    """
+    manager = DownloadManager(max_processes=2, max_background=0, per_listener=1, queue_timeout=0.2)
+    cmd = _fake_cmd(tmp_path, 0, 0.05)
+
+    async def run() -> None:
+        first = await manager.open_stream(cmd, "t1", "u1")
+        other = await manager.open_stream(cmd, "t2", "u2")
+        with pytest.raises(DownloadBusy):
+            await manager.acquire_async(PRIORITY_PLAY, "t3", "u3")
+
+        # u1 skips: their first stream is killed and its slot goes to the new one
+        task = asyncio.create_task(manager.open_stream(cmd, "t4", "u1"))
+        assert await asyncio.wait_for(first.wait(), 5) != 0
+        assert first.cancelled
+        await first.close()
+        second = await task
+        assert manager.snapshot()["classes"]["play"]["timed_out"] == 1
+        for download in (second, other):
+            await download.close()
+            assert download.process.returncode is not None
+
+        shared = [await manager.open_stream(cmd, f"a{index}", "ip:192.168.1.20") for index in range(2)]
+        assert not any(download.cancelled for download in shared)
+        assert all(download.process.returncode is None for download in shared)
+        for download in shared:
+            await download.close()
+
+    asyncio.run(run())
+    assert manager.snapshot()["running"] == []
+
+def test_client_disconnect_kills_the_process(tmp_path) -> None:
+    """
+    Test that when a client goes away mid-stream, the response closes its download:
+    yt-dlp is terminated and the slot freed, not left running until its pipe drains.
+    """
+    manager = DownloadManager(max_processes=1, max_background=0, per_listener=0, queue_timeout=1)
+    scheduler = StreamScheduler(uplink_kbps=0, pace_multiplier=1, burst_seconds=60, default_kbps=1000)
+    cmd = _fake_cmd(tmp_path, 0, 0.01)
+
+    async def run() -> int:
+        download = await manager.open_stream(cmd, "t1", "u1")
+        pid = download.process.pid
+
+        async def body():
+            while chunk := await download.stdout.read(1024):
+                yield chunk
+
+        first_chunk = asyncio.Event()
+
+        async def receive() -> dict:
+            await first_chunk.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: dict) -> None:
+            if message.get("body"):
+                first_chunk.set()
+
+        response = PacedStreamingResponse(
+            body(), {"track_id": "t1", "owner": "u1", "source": "youtube"},
+            scheduler=scheduler, on_close=download.close
+        )
+        await asyncio.wait_for(response({"type": "http", "method": "GET"}, receive, send), 5)
+        return pid
+
+    pid = asyncio.run(run())
+    assert not psutil.pid_exists(pid) or psutil.Process(pid).status() == psutil.STATUS_ZOMBIE
+    assert manager.snapshot()["running"] == []
+    assert scheduler.snapshot()["active"] == 0
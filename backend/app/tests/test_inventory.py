@@ -0,0 +1,47 @@
+from sqlmodel import Session
+
+from app.models import Track
+from app.services import inventory
+
+def test_reconcile_then_incremental_updates(engine, tmp_path, monkeypatch) -> None:
+    """
+    Test that a reconciliation seeds the totals and later file events adjust them without a walk.
+    """
+    library, cache, temp = tmp_path / "library", tmp_path / "cache", tmp_path / "temp"
+    for path in (library / "album", cache, temp):
+        path.mkdir(parents=True)
+    monkeypatch.setattr(inventory.settings, "MUSIC_PATH", str(library))
+    monkeypatch.setattr(inventory.settings, "CACHE_DIR", str(cache))
+    monkeypatch.setattr(inventory.settings, "TEMP_DIR", str(temp))
+
+    (library / "album" / "a.mp3").write_bytes(b"x" * 100)
+    (library / "album" / "b.flac").write_bytes(b"x" * 300)
+    (library / "album" / "cover.jpg").write_bytes(b"x" * 50)
+    (cache / "vid.mp3").write_bytes(b"x" * 40)
+    (temp / "tmp.mp3.download").write_bytes(b"x" * 7)
+    with Session(engine) as session:
+        session.add(Track(id="gone", title="Gone", source_type="local", local_path=str(library / "gone.mp3")))
+        session.add(Track(id="here", title="Here", source_type="local", local_path=str(library / "album" / "a.mp3")))
+        session.commit()
+
+    assert inventory.area_bytes(inventory.PERSISTENT) is None
+    inventory.reconcile()
+    with Session(engine) as session:
+        report = inventory.snapshot(session)
+    assert report["library"]["by_format"] == {"flac": {"files": 1, "bytes": 300}, "mp3": {"files": 1, "bytes": 100}}
+    assert report["library"]["bytes"] == 400
+    assert report["cache"]["persistent"] == {"files": 1, "bytes": 40}
+    assert report["partials"] == {"files": 1, "bytes": 7}
+    assert report["missing_rows"] == 1
+    assert report["reconciled_at"] is not None
+
+    inventory.file_added(inventory.TEMP, temp / "new.mp3", 25)
+    inventory.file_moved(inventory.TEMP, inventory.PERSISTENT, cache / "new.mp3", 25)
+    with Session(engine) as session:
+        inventory.file_removed(inventory.LIBRARY, library / "album" / "b.flac", 300, session)
+        session.commit()
+        report = inventory.snapshot(session)
+    assert report["cache"]["persistent"] == {"files": 2, "bytes": 65}
+    assert report["cache"]["temp"] == {"files": 0, "bytes": 0}
+    assert report["library"]["by_format"]["flac"] == {"files": 0, "bytes": 0}
+    assert inventory.area_bytes(inventory.PERSISTENT) == 65
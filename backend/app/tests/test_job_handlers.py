@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session, select
+
+from app.models import Track
+from app.services import job_handlers
+from app.services.jobs import JobContext, JobRunner
+
+def test_backfill_skips_recent_misses(engine, monkeypatch) -> None:
+    """
+    Test that the thumbnail backfill works through tracks in ID order and does not
+    look up again, until the retry period is over, a track it found nothing for.
+    """
+    monkeypatch.setattr(job_handlers, "BACKFILL_BATCH", 2)
+    with Session(engine) as session:
+        for index in range(4):
+            session.add(Track(id=f"t{index}", title="Song", source_type="youtube", remote_id=f"v{index}"))
+        stale = datetime.now(timezone.utc) - timedelta(days=job_handlers.BACKFILL_RETRY_DAYS + 1)
+        session.add(Track(id="t9", title="Song", source_type="youtube", remote_id="v9", thumbnail_checked_at=stale))
+        session.commit()
+
+    looked_up = []
+
+    async def fake_get_song(video_id: str) -> dict:
+        looked_up.append(video_id)
+        # v0 and v9 have no artwork on YouTube
+        thumbnails = [] if video_id in ("v0", "v9") else [{"url": f"https://img/{video_id}.jpg"}]
+        return {"videoDetails": {"thumbnail": {"thumbnails": thumbnails}}}
+
+    monkeypatch.setattr("app.services.ytmusic.get_song", fake_get_song)
+    ctx = JobContext(JobRunner(engine), "backfill")
+    for _ in range(3):
+        job_handlers.backfill_thumbnails(ctx)
+
+    assert looked_up == ["v0", "v1", "v2", "v3", "v9"]
+    with Session(engine) as session:
+        tracks = {track.id: track for track in session.exec(select(Track)).all()}
+    assert tracks["t3"].thumbnail == "https://img/v3.jpg"
+    assert tracks["t0"].thumbnail is None and tracks["t0"].thumbnail_checked_at is not None
@@ -0,0 +1,161 @@
+import threading
+
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.models import Job
+from app.services.jobs import JobRunner, PRIORITY_HIGH, PRIORITY_LOW
+
+def _runner(tmp_path, **kwargs) -> JobRunner:
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    return JobRunner(engine, **kwargs)
+
+def test_exclusive_jobs_are_coalesced_and_complete(tmp_path) -> None:
+    """
+    Test that a second submission of an active exclusive job returns the same job.
+    """
+    runner = _runner(tmp_path)
+    release = threading.Event()
+    runs = []
+
+    def scan(ctx) -> str:
+        release.wait(5)
+        runs.append(1)
+        ctx.progress(1.0)
+        return "done"
+
+    runner.register("index", scan, kind="cpu")
+    runner.start()
+    first = runner.submit("index")
+    assert runner.submit("index") == first
+    release.set()
+    assert runner.wait(first, timeout=5)
+    job = runner.get(first)
+    assert job["status"] == "succeeded" and job["message"] == "done"
+    assert runs == [1]
+    assert runner.has_succeeded("index")
+
+def test_priority_order_and_cancellation(tmp_path) -> None:
+    """
+    Test that higher-priority jobs run first and that cancelled jobs stop at a checkpoint.
+    """
+    runner = _runner(tmp_path, io_workers=1)
+    order = []
+    gate = threading.Event()
+
+    def fetch(ctx, name: str) -> None:
+        if name == "blocker":
+            while not ctx.cancelled:
+                gate.wait(0.01)
+            ctx.check_cancelled()
+        order.append(name)
+
+    runner.register("fetch", fetch, kind="io", exclusive=False)
+    runner.start()
+    blocker = runner.submit("fetch", {"name": "blocker"})
+    low = runner.submit("fetch", {"name": "low"}, priority=PRIORITY_LOW)
+    high = runner.submit("fetch", {"name": "high"}, priority=PRIORITY_HIGH)
+    dropped = runner.submit("fetch", {"name": "dropped"})
+    assert runner.cancel(dropped)
+    assert runner.cancel(blocker)
+    assert runner.wait(low, timeout=5) and runner.wait(high, timeout=5)
+    assert order == ["high", "low"]
+    assert runner.get(blocker)["status"] == "cancelled"
+    assert runner.get(dropped)["status"] == "cancelled"
+
+def test_interrupted_jobs_resume_on_start(tmp_path) -> None:
+    """
+    Test that jobs left running or queued by a previous process are resumed.
+    """
+    runner = _runner(tmp_path)
+    with Session(runner.engine) as session:
+        session.add(Job(id="a", job_type="index", unique_key="index", status="running", attempts=1))
+        session.add(Job(id="b", job_type="gone", unique_key="gone"))
+        session.commit()
+
+    runner.register("index", lambda ctx: "resumed", kind="cpu")
+    runner.start()
+    assert runner.wait("a", timeout=5)
+    assert runner.get("a")["status"] == "succeeded"
+    assert runner.get("a")["attempts"] == 2
+    assert runner.get("b")["status"] == "cancelled"
+
+def test_follower_submissions_are_run_by_the_leader(tmp_path, monkeypatch) -> None:
+    """
+    Test that a job submitted by a follower process is persisted and picked up by the leader.
+    """
+    monkeypatch.setattr("app.services.jobs.POLL_INTERVAL", 0.05)
+    leader = _runner(tmp_path)
+    follower = JobRunner(leader.engine)
+    for runner in (leader, follower):
+        runner.register("index", lambda ctx: "done", kind="cpu")
+
+    job_id = follower.submit("index")
+    assert follower.submit("index") == job_id  # Coalesced through the table
+    leader.start()
+    assert leader.wait(job_id, timeout=5)
+    assert follower.get(job_id)["status"] == "succeeded"
+    assert follower.has_succeeded("index")
+
+    # Submitted after the leader started: adopted by polling
+    later = follower.submit("index")
+    for _ in range(100):
+        if follower.get(later)["status"] == "succeeded":
+            break
+        threading.Event().wait(0.05)
+    assert follower.get(later)["status"] == "succeeded"
+
+def test_failures_recording_a_job_do_not_kill_its_worker(tmp_path) -> None:
+    """
+    Test that when recording a job's outcome fails (e.g. the database is locked), the job is
+    still released so it can be submitted again, and the worker goes on to the next job.
+    """
+    runner = _runner(tmp_path, cpu_workers=1)
+    runner.register("index", lambda ctx: "done", kind="cpu")
+    update = runner._update
+    calls = []
+
+    def flaky_update(job_id: str, **fields) -> None:
+        calls.append(job_id)
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        update(job_id, **fields)
+
+    runner._update = flaky_update
+    runner.start()
+    first = runner.submit("index")
+    assert runner.wait(first, timeout=5)
+    second = runner.submit("index")
+    assert second != first
+    assert runner.wait(second, timeout=5)
+    assert runner.get(second)["status"] == "succeeded"
+
+def test_cancelled_jobs_are_persisted_before_release(tmp_path, monkeypatch) -> None:
+    """
+    Test that a cancelled queued job is already marked cancelled when it is released,
+    so the poller adopting unknown queued jobs never brings it back.
+    """
+    monkeypatch.setattr("app.services.jobs.POLL_INTERVAL", 0.01)
+    runner = _runner(tmp_path, io_workers=1)
+    gate = threading.Event()
+    runner.register("fetch", lambda ctx, name: gate.wait(5), kind="io", exclusive=False)
+    runner.start()
+    blocker = runner.submit("fetch", {"name": "blocker"})
+    queued = runner.submit("fetch", {"name": "queued"})
+
+    release = runner._release
+    seen = []
+
+    def checked_release(job_id: str) -> None:
+        if job_id == queued:
+            seen.append(runner.get(job_id)["status"])
+        release(job_id)
+
+    runner._release = checked_release
+    assert runner.cancel(queued)
+    threading.Event().wait(0.1)  # Several polls
+    gate.set()
+    assert runner.wait(blocker, timeout=5)
+    assert seen == ["cancelled"]
+    assert runner.get(queued)["status"] == "cancelled"
+    assert runner.get(queued)["attempts"] == 0
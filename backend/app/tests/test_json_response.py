@@ -0,0 +1,15 @@
+import json
+from datetime import datetime, timezone
+
+from app.utils import json_response
+
+def test_dumps_matches_stdlib_fallback(monkeypatch) -> None:
+    """
+    Test that the orjson path and the stdlib fallback produce the same document.
+    """
+    content = [{"id": "t1", "title": "Ä", "added_at": datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc), "n": None}]
+    fast = json_response.dumps(content)
+    monkeypatch.setattr(json_response, "orjson", None)
+    slow = json_response.dumps(content)
+    assert json.loads(fast) == json.loads(slow)
+    assert json.loads(slow)[0]["added_at"] == "2024-01-02T03:04:05+00:00"
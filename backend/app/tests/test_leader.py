@@ -0,0 +1,20 @@
+import threading
+
+from app.utils.leader import LeaderElection
+
+def test_only_one_process_leads_and_a_follower_takes_over(tmp_path) -> None:
+    """
+    Test that the lock admits a single leader and that leadership passes on release.
+    """
+    path = str(tmp_path / "leader.lock")
+    first, second = LeaderElection(path), LeaderElection(path, retry_interval=0.01)
+    assert first.try_acquire()
+    assert not second.try_acquire()
+
+    elected = threading.Event()
+    second.run(elected.set)
+    assert not elected.wait(0.1)
+    first.release()
+    assert elected.wait(2)
+    assert second.is_leader
+    second.release()
@@ -0,0 +1,74 @@
+import json
+import logging
+import sys
+
+from app.utils import logger as log_utils
+from app.utils.logger import JsonFormatter, RateLimitedLogger, level_for, setup_logger
+
+class _ListHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(record.getMessage())
+
+def test_level_for_uses_longest_module_prefix() -> None:
+    """
+    Test per-module level overrides.
+    """
+    spec = "app.services=WARNING, app.services.streamer=DEBUG, app.bad=NOPE"
+    assert level_for("app.services.streamer", "INFO", spec) == logging.DEBUG
+    assert level_for("app.services.search", "INFO", spec) == logging.WARNING
+    assert level_for("app.servicesx", "INFO", spec) == logging.INFO
+    assert level_for("app.bad", "error", spec) == logging.ERROR
+
+def test_json_formatter_includes_tracebacks() -> None:
+    """
+    Test that JSON lines carry the merged message and the exception text.
+    """
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        record = logging.getLogger("t").makeRecord("t", logging.ERROR, "f", 1, "failed %s", ("x",), sys.exc_info())
+    entry = json.loads(JsonFormatter().format(record))
+    assert (entry["level"], entry["logger"], entry["message"]) == ("ERROR", "t", "failed x")
+    assert "RuntimeError: boom" in entry["exception"]
+
+def test_records_are_written_by_the_listener_thread() -> None:
+    """
+    Test that loggers enqueue records for the single writer thread.
+    """
+    captured = _ListHandler()
+    logger = setup_logger("app.tests.queued")
+    log_utils._listener.handlers = (*log_utils._listener.handlers, captured)
+    try:
+        logger.info("queued %d", 1)
+        log_utils._listener.stop()
+        log_utils._listener.start()
+    finally:
+        log_utils._listener.handlers = log_utils._listener.handlers[:-1]
+    assert "queued 1" in captured.messages
+
+def test_rate_limited_logger_reports_suppressed_records() -> None:
+    """
+    Test that records over a template's budget are dropped and counted, but warnings pass.
+    """
+    captured = _ListHandler()
+    base = logging.getLogger("app.tests.sampled")
+    base.addHandler(captured)
+    base.setLevel(logging.INFO)
+    base.propagate = False
+    sampled = RateLimitedLogger(base, rate=0.001, burst=2)
+
+    for index in range(5):
+        sampled.info("Streaming request for: %s", index)
+    sampled.info("Other message")
+    sampled.warning("Streaming request for: %s", "w")
+    sampled._buckets["Streaming request for: %s"]._tokens = 1.0  # Refilled
+    sampled.info("Streaming request for: %s", 9)
+
+    assert captured.messages == [
+        "Streaming request for: 0", "Streaming request for: 1", "Other message",
+        "Streaming request for: w", "Streaming request for: 9 (3 similar suppressed)",
+    ]
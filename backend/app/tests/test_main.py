@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session, select
+
+from app import main
+from app.models import Playlist, PlaylistTrack, Track, User
+from app.schemas import PlaylistImport, PlaylistOrder, PlaylistTrackAdd, PlaylistTrackBatch
+
+def test_failed_startup_is_reported_by_readiness(monkeypatch) -> None:
+    """
+    Test that an exception in the bootstrap thread is caught and turns /health/ready into a lasting failure.
+    """
+    def broken_init_db() -> None:
+        raise RuntimeError("disk I/O error")
+
+    monkeypatch.setattr(main, "init_db", broken_init_db)
+    monkeypatch.setattr(main, "BOOTSTRAP_ERROR", None)
+    main._bootstrap()
+
+    response = asyncio.run(main.readiness())
+    assert response.status_code == 503
+    body = json.loads(response.body)
+    assert body["status"] == "failed"
+    assert body["error"] == "RuntimeError: disk I/O error"
+    assert body["components"] == {"database": False}
+
+def _playlist_user(session: Session) -> User:
+    user = User(id="u1", username="u1", email="u1@example.com")
+    session.add(user)
+    for index in range(4):
+        session.add(Track(id=f"t{index}", title=f"Song {index}", source_type="local"))
+    session.add(Playlist(id="p1", name="Mix", owner_id="u1"))
+    session.commit()
+    return user
+
+def _playlist_tracks(session: Session, playlist_id: str = "p1") -> list:
+    return list(session.exec(
+        select(PlaylistTrack.track_id).where(PlaylistTrack.playlist_id == playlist_id).order_by(PlaylistTrack.position)
+    ).all())
+
+def test_batch_add_remove_and_reorder_routes(session: Session) -> None:
+    """
+    Test the playlist batch endpoints: add skips duplicates and reports unknown IDs, remove
+    drops every entry of the listed tracks, and reorder puts listed tracks first.
+    """
+    user = _playlist_user(session)
+
+    async def scenario() -> list:
+        results = [await main.add_tracks_to_playlist(
+            "p1", PlaylistTrackAdd(track_ids=["t0", "t1", "t2", "t0", "unknown"]), session, user
+        )]
+        results.append(await main.add_tracks_to_playlist(
+            "p1", PlaylistTrackAdd(track_ids=["t3", "t0"], allow_duplicates=True), session, user
+        ))
+        assert _playlist_tracks(session) == ["t0", "t1", "t2", "t3", "t0"]
+        results.append(await main.reorder_playlist("p1", PlaylistOrder(track_ids=["t2", "t0"]), session, user))
+        assert _playlist_tracks(session) == ["t2", "t0", "t1", "t3", "t0"]
+        results.append(await main.remove_tracks_from_playlist(
+            "p1", PlaylistTrackBatch(track_ids=["t0", "t3"]), session, user
+        ))
+        assert _playlist_tracks(session) == ["t2", "t1"]
+        return results
+
+    added, duplicated, reordered, removed = asyncio.run(scenario())
+    assert added == {"status": "success", "added": 3, "skipped": 1, "unresolved": ["unknown"]}
+    assert duplicated["added"] == 2
+    assert reordered == {"status": "success", "count": 5}
+    assert removed == {"status": "success", "removed": 3}
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(main.reorder_playlist("missing", PlaylistOrder(track_ids=["t0"]), session, user))
+    assert error.value.status_code == 404
+
+def test_failed_import_leaves_no_playlist(session: Session, monkeypatch) -> None:
+    """
+    Test that an imported playlist is saved with its tracks in one commit, and not at all if adding them fails.
+    """
+    user = _playlist_user(session)
+    result = asyncio.run(main.import_playlist(PlaylistImport(name="Imported", track_ids=["t1", "t0"]), session, user))
+    assert _playlist_tracks(session, result["playlist_id"]) == ["t1", "t0"]
+
+    async def failing(*args) -> dict:
+        raise RuntimeError("YouTube Music unavailable")
+
+    monkeypatch.setattr(main.tracks, "resolve_tracks", failing)
+    with pytest.raises(RuntimeError):
+        asyncio.run(main.import_playlist(PlaylistImport(name="Broken", track_ids=["t0"]), session, user))
+    session.rollback()
+    assert session.exec(select(Playlist.name).order_by(Playlist.name)).all() == ["Imported", "Mix"]
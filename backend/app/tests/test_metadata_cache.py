@@ -0,0 +1,135 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from app.services.metadata_cache import MetadataCache
+
+def test_fresh_entries_survive_a_new_instance(tmp_path) -> None:
+    """
+    Test that cached values are persisted to disk and reused without refetching.
+    """
+    path = str(tmp_path / "meta.db")
+    calls = []
+
+    async def fetch() -> dict:
+        calls.append(1)
+        return {"videoDetails": {"title": "Song"}}
+
+    first = asyncio.run(MetadataCache(path).get_or_fetch("song", "abc", fetch))
+    # A "restart" must not re-pay the lookup
+    second = asyncio.run(MetadataCache(path).get_or_fetch("song", "abc", fetch))
+    assert first == second == {"videoDetails": {"title": "Song"}}
+    assert len(calls) == 1
+
+def test_stale_entries_are_served_while_refreshing(tmp_path) -> None:
+    """
+    Test stale-while-revalidate: the old value is returned and refreshed in the background.
+    """
+    cache = MetadataCache(str(tmp_path / "meta.db"), ttls={"search": (0, 3600)})
+
+    async def old() -> list:
+        return ["old"]
+
+    async def new() -> list:
+        return ["new"]
+
+    async def scenario() -> list:
+        await cache.get_or_fetch("search", "q", old)
+        served = await cache.get_or_fetch("search", "q", new)
+        await asyncio.gather(*cache._refreshing.values())
+        return served
+
+    assert asyncio.run(scenario()) == ["old"]
+    assert cache._read("search", "q")[0] == ["new"]
+
+def test_failures_are_negatively_cached(tmp_path) -> None:
+    """
+    Test that a lookup that found nothing is remembered for the negative TTL, while one
+    that failed is only held back for the much shorter error TTL.
+    """
+    cache = MetadataCache(str(tmp_path / "meta.db"), negative_ttl=60, error_ttl=0)
+    calls = []
+
+    async def missing() -> None:
+        calls.append("missing")
+        return None
+
+    async def failing() -> dict:
+        calls.append("failing")
+        raise RuntimeError("HTTP 500")
+
+    assert asyncio.run(cache.get_or_fetch("song", "dead", missing)) is None
+    assert asyncio.run(cache.get_or_fetch("song", "dead", missing)) is None
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            asyncio.run(cache.get_or_fetch("song", "flaky", failing))
+    assert calls == ["missing", "failing", "failing"]
+
+    held_back = MetadataCache(str(tmp_path / "meta.db"), error_ttl=60)
+    assert asyncio.run(held_back.get_or_fetch("song", "flaky", failing)) is None
+    assert len(calls) == 3
+
+def test_failed_writes_do_not_lose_the_lookup(tmp_path, monkeypatch) -> None:
+    """
+    Test that a locked database does not fail a lookup: the fetched value is still
+    returned, and a fetcher's own error is raised rather than the write's.
+    """
+    cache = MetadataCache(str(tmp_path / "meta.db"))
+
+    def locked(*args) -> None:
+        raise sqlite3.OperationalError("database is locked")
+
+    async def fetch() -> dict:
+        return {"videoDetails": {"title": "Song"}}
+
+    async def missing() -> None:
+        return None
+
+    async def failing() -> dict:
+        raise RuntimeError("HTTP 500")
+
+    monkeypatch.setattr(cache, "_write", locked)
+    assert asyncio.run(cache.get_or_fetch("song", "abc", fetch)) == {"videoDetails": {"title": "Song"}}
+    assert asyncio.run(cache.get_or_fetch("song", "dead", missing)) is None
+    with pytest.raises(RuntimeError, match="HTTP 500"):
+        asyncio.run(cache.get_or_fetch("song", "flaky", failing))
+
+def test_prune_removes_expired_entries(tmp_path) -> None:
+    """
+    Test that entries past their stale window are pruned.
+    """
+    cache = MetadataCache(str(tmp_path / "meta.db"), ttls={"watch": (0, 0)})
+
+    async def fetch() -> list:
+        return [1, 2]
+
+    asyncio.run(cache.get_or_fetch("watch", "v", fetch))
+    assert cache.prune() == 1
+
+def test_database_is_not_touched_from_the_event_loop(tmp_path) -> None:
+    """
+    Test that cache reads and writes run on the cache's own threads, not the event loop's.
+    """
+    cache = MetadataCache(str(tmp_path / "meta.db"))
+    threads = set()
+    read, write = cache._read, cache._write
+
+    def traced(func):
+        def wrapper(*args):
+            threads.add(threading.current_thread().name)
+            return func(*args)
+        return wrapper
+
+    cache._read, cache._write = traced(read), traced(write)
+
+    async def fetch() -> dict:
+        return {"videoDetails": {}}
+
+    async def scenario() -> None:
+        await cache.get_or_fetch("song", "abc", fetch)
+        await cache.get_or_fetch("song", "abc", fetch)
+
+    asyncio.run(scenario())
+    assert threads and all(name.startswith("metadata-cache") for name in threads)
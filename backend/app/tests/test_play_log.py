@@ -0,0 +1,102 @@
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, select
+
+from app.models import PlayDaily, PlayEvent, PlayMonthly, Track
+from app.services import play_log
+from app.services.play_log import DAY, PlayLog
+
+def _add_tracks(engine) -> None:
+    with Session(engine) as session:
+        for index in range(3):
+            session.add(Track(id=f"t{index}", title=f"Song {index}", source_type="local"))
+        session.commit()
+
+def test_plays_are_buffered_until_a_batch_fills(engine) -> None:
+    """
+    Test that plays are written in one insert by the flusher once a batch fills, or by an explicit flush.
+    """
+    _add_tracks(engine)
+    log = PlayLog(batch_size=3)
+    log.start(interval=60)
+    log.record("u1", "t0", 100)
+    log.record("u1", "t1", 101)
+    with Session(engine) as session:
+        assert session.exec(select(PlayEvent)).all() == []
+    log.record("u2", "t0", 102)
+    for _ in range(100):
+        with Session(engine) as session:
+            if session.exec(select(PlayEvent)).all():
+                break
+        time.sleep(0.02)
+    log.record("u1", "t2", 103)
+    with Session(engine) as session:
+        assert len(session.exec(select(PlayEvent)).all()) == 3
+    assert log.flush() == 1
+    assert log.flush() == 0
+
+def test_failed_flush_keeps_the_plays(engine, monkeypatch) -> None:
+    """
+    Test that a write the database rejects is logged, not raised, and retried by the next flush.
+    """
+    _add_tracks(engine)
+    log = PlayLog(batch_size=100)
+    log.record("u1", "t0", 100)
+
+    def locked(*args) -> None:
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+    bump = play_log.bump
+    monkeypatch.setattr(play_log, "bump", locked)
+    assert log.try_flush() == 0
+    monkeypatch.setattr(play_log, "bump", bump)
+    assert log.try_flush() == 1
+    with Session(engine) as session:
+        assert len(session.exec(select(PlayEvent)).all()) == 1
+
+def test_rollup_counts_each_event_once_and_prunes(engine) -> None:
+    """
+    Test daily and monthly aggregates across runs and pruning of rolled-up events.
+    """
+    _add_tracks(engine)
+    now = int(datetime.now(timezone.utc).timestamp())
+    old = now - 200 * DAY
+    log = PlayLog(batch_size=100)
+    for played_at in (now, now, old):
+        log.record("u1", "t0", played_at)
+    log.flush()
+    assert play_log.rollup() == {"rolled_up": 3, "pruned_events": 1, "pruned_days": 0}
+
+    log.record("u1", "t0", now)
+    log.flush()
+    assert play_log.rollup()["rolled_up"] == 1
+    assert play_log.rollup()["rolled_up"] == 0
+
+    with Session(engine) as session:
+        daily = dict(session.exec(select(PlayDaily.day, PlayDaily.plays)).all())
+        assert daily == {now // DAY: 3, old // DAY: 1}
+        assert sum(session.exec(select(PlayMonthly.plays)).all()) == 4
+        assert len(session.exec(select(PlayEvent)).all()) == 3
+
+        top = session.exec(play_log.top_statement("u1", "week", 10)).all()
+        assert [(row.id, row.plays) for row in top] == [("t0", 3)]
+        assert session.exec(play_log.top_statement("u1", "all", 10)).one().plays == 4
+
+def test_history_pages_by_event_id(engine) -> None:
+    """
+    Test that keyset pages of the history are contiguous and newest first.
+    """
+    _add_tracks(engine)
+    log = PlayLog(batch_size=100)
+    for index in range(5):
+        log.record("u1", f"t{index % 3}", 1000 + index)
+    log.record("u2", "t0", 2000)
+    log.flush()
+
+    with Session(engine) as session:
+        first = session.exec(play_log.history_statement("u1", None, 3)).all()
+        second = session.exec(play_log.history_statement("u1", first[-1].event_id, 3)).all()
+    assert [row.played_at for row in first + second] == [1004, 1003, 1002, 1001, 1000]
+    assert [row.id for row in first] == ["t1", "t0", "t2"]
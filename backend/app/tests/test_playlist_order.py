@@ -0,0 +1,59 @@
+from sqlalchemy import text
+from sqlmodel import Session, create_engine, select
+
+from app.db import _rebuild_table
+from app.models import Playlist, PlaylistTrack
+from app.services import playlist_order
+from app.services.playlist_order import GAP, position_between
+
+def test_position_between_uses_gaps_and_signals_rebalance() -> None:
+    """
+    Test midpoint, start/end and exhausted-gap cases.
+    """
+    assert position_between(None, None) == GAP
+    assert position_between(GAP, None) == 2 * GAP
+    assert position_between(None, GAP) == 0
+    assert position_between(GAP, 2 * GAP) == GAP + GAP // 2
+    assert position_between(5, 6) is None
+
+def test_moves_write_one_row_until_the_gap_is_exhausted(session: Session) -> None:
+    """
+    Test that repeated inserts at the same spot eventually rebalance and keep order.
+    """
+    session.add(Playlist(id="p", name="P", owner_id="u"))
+    first = PlaylistTrack(playlist_id="p", track_id="a", position=playlist_order.append_position(session, "p"))
+    session.add(first)
+    session.commit()
+    last = PlaylistTrack(playlist_id="p", track_id="z", position=playlist_order.append_position(session, "p"))
+    session.add(last)
+    session.commit()
+
+    # Always insert right after the first entry: halves the gap each time
+    for index in range(15):
+        position = playlist_order.position_after_entry(session, "p", first)
+        session.add(PlaylistTrack(playlist_id="p", track_id=f"t{index}", position=position))
+        session.commit()
+
+    rows = session.exec(
+        select(PlaylistTrack).where(PlaylistTrack.playlist_id == "p").order_by(PlaylistTrack.position)
+    ).all()
+    assert [r.track_id for r in rows] == ["a"] + [f"t{i}" for i in reversed(range(15))] + ["z"]
+    assert len({r.position for r in rows}) == len(rows)
+
+def test_legacy_playlist_table_is_rebuilt_with_surrogate_ids(tmp_path) -> None:
+    """
+    Test the migration from the composite-key table: order kept, positions spread out, duplicates allowed after.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE playlisttrack (playlist_id VARCHAR, track_id VARCHAR, position INTEGER, "
+            "PRIMARY KEY (playlist_id, track_id))"
+        ))
+        conn.execute(text("INSERT INTO playlisttrack VALUES ('p', 'b', 7), ('p', 'a', 3), ('q', 'a', 0)"))
+        _rebuild_table(conn, "playlisttrack")
+        rows = conn.execute(text(
+            "SELECT playlist_id, track_id, position FROM playlisttrack ORDER BY playlist_id, position"
+        )).all()
+        conn.execute(text("INSERT INTO playlisttrack (playlist_id, track_id, position) VALUES ('p', 'a', 5000)"))
+    assert [tuple(r) for r in rows] == [("p", "a", GAP), ("p", "b", 2 * GAP), ("q", "a", GAP)]
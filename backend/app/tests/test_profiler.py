@@ -0,0 +1,117 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.utils.profiler import (
+    ProfilingMiddleware,
+    ProfilingState,
+    RequestTrace,
+    _current_trace,
+    install_sqlalchemy_hooks,
+    profiling,
+    track_phase,
+)
+
+def test_track_phase_accumulates_on_current_trace() -> None:
+    """
+    Test that phases are attributed to the active trace and ignored without one.
+    """
+    with track_phase("auth"):
+        pass  # No active trace: must be a no-op
+
+    trace = RequestTrace("GET", "/x")
+    token = _current_trace.set(trace)
+    try:
+        with track_phase("auth"):
+            pass
+        with track_phase("auth"):
+            pass
+    finally:
+        _current_trace.reset(token)
+
+    assert trace.phases["auth"]["count"] == 2
+
+def test_sqlalchemy_hooks_record_db_phase() -> None:
+    """
+    Test that SQL statements executed during a traced request count towards the db phase.
+    """
+    engine = create_engine("sqlite://")
+    install_sqlalchemy_hooks(engine)
+    trace = RequestTrace("GET", "/db")
+    token = _current_trace.set(trace)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    finally:
+        _current_trace.reset(token)
+
+    assert trace.phases["db"]["count"] >= 1
+
+def test_slow_requests_are_retained_and_sampled_profiles_attached() -> None:
+    """
+    Test that the middleware keeps slow traces and attaches a profile to sampled requests.
+    """
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware)
+
+    @app.get("/ping")
+    async def ping() -> dict:
+        return {"ok": True}
+
+    previous = (profiling.threshold_ms, profiling.sample_rate)
+    profiling.recent.clear()
+    profiling.configure(threshold_ms=0, sample_rate=1.0)
+    try:
+        response = TestClient(app).get("/ping")
+    finally:
+        profiling.configure(threshold_ms=previous[0], sample_rate=previous[1])
+
+    assert response.status_code == 200
+    trace = profiling.snapshot()["traces"][0]
+    assert trace["path"] == "/ping"
+    assert trace["status"] == 200
+    assert trace["profile"]
+
+def test_configure_clamps_sample_rate() -> None:
+    """
+    Test that the sample rate is clamped into [0, 1].
+    """
+    state = ProfilingState(threshold_ms=100, sample_rate=0.0)
+    state.configure(sample_rate=5.0)
+    assert state.sample_rate == 1.0
+    state.configure(sample_rate=-1.0)
+    assert state.sample_rate == 0.0
+    assert state.maybe_start_profiler() is None
+
+def test_streaming_responses_are_profiled_until_they_start() -> None:
+    """
+    Test that a sampled streaming response gives up the profiler once its headers are
+    sent, rather than holding it (and blocking other samples) for its whole body.
+    """
+    held_during_body = []
+
+    async def stream(scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for _ in range(3):
+            held_during_body.append(profiling._profiler_lock.locked())
+            await send({"type": "http.response.body", "body": b"x", "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive() -> dict:
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        pass
+
+    previous = (profiling.threshold_ms, profiling.sample_rate)
+    profiling.recent.clear()
+    profiling.configure(threshold_ms=0, sample_rate=1.0)
+    try:
+        asyncio.run(ProfilingMiddleware(stream)({"type": "http", "method": "GET", "path": "/stream"}, receive, send))
+    finally:
+        profiling.configure(threshold_ms=previous[0], sample_rate=previous[1])
+
+    assert held_during_body == [False, False, False]
+    assert profiling.snapshot()["traces"][0]["profile"]
@@ -0,0 +1,60 @@
+from sqlmodel import Session
+
+from app.models import PlaylistTrack, Track, UserActivity
+from app.services.radio import RadioEngine
+
+def _track(track_id: str, remote_id: str = None) -> Track:
+    return Track(id=track_id, title=f"Title {track_id}", source_type="youtube" if remote_id else "local",
+                 remote_id=remote_id)
+
+def _remote(video_id: str) -> dict:
+    return {"id": video_id, "remote_id": video_id, "title": video_id, "source_type": "youtube"}
+
+def test_playlist_neighbours_are_recommended_without_repeats(session: Session) -> None:
+    """
+    Test that playlist co-occurrence drives local picks and refills skip what was served.
+    """
+    for track_id in ["a", "b", "c", "d"]:
+        session.add(_track(track_id))
+    for position, track_id in enumerate(["a", "b", "c", "d"]):
+        session.add(PlaylistTrack(playlist_id="p1", track_id=track_id, position=position))
+    session.add(UserActivity(user_id="u1", track_id="a", play_count=3, is_liked=True))
+    session.commit()
+
+    radio = RadioEngine(local_share=1.0)
+    radio.rebuild(session)
+
+    first = radio.next_batch("a", None, "u1", limit=2)
+    assert [t["id"] for t in first] == ["b", "c"]
+    second = radio.next_batch("a", None, "u1", limit=2)
+    assert [t["id"] for t in second] == ["d"]
+
+def test_local_and_youtube_candidates_are_mixed_and_deduped(session: Session) -> None:
+    """
+    Test interleaving of local and YouTube candidates, preferring library copies.
+    """
+    session.add_all([_track("a"), _track("b"), _track("yt-known", remote_id="vid00000001")])
+    session.add_all([
+        PlaylistTrack(playlist_id="p1", track_id="a", position=0),
+        PlaylistTrack(playlist_id="p1", track_id="b", position=1),
+    ])
+    session.commit()
+
+    radio = RadioEngine(local_share=0.5)
+    radio.rebuild(session)
+    radio.set_related("seedvideo01", [_remote("vid00000001"), _remote("vid00000002")])
+
+    batch = radio.next_batch("a", "seedvideo01", "u1", limit=10, exclude=["vid00000002"])
+    ids = [t["id"] for t in batch]
+    # Local neighbour first, then the YouTube hit resolved to its library row; the excluded one is skipped
+    assert ids == ["b", "yt-known"]
+
+def test_incremental_play_links_tracks(session: Session) -> None:
+    """
+    Test that consecutive plays create links without a rebuild.
+    """
+    radio = RadioEngine()
+    radio.record_play("u1", _track("x"))
+    radio.record_play("u1", _track("y"))
+    assert radio.local_degree("x") == 1
+    assert [t["id"] for t in radio.next_batch("x", None, "u2", limit=5)] == ["y"]
@@ -0,0 +1,64 @@
+import asyncio
+
+from fastapi import Request
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.services import response_cache
+from app.services.response_cache import LIBRARY, ResponseCache, bump, cached_json, user_scope
+
+def _request(etag: str = None) -> Request:
+    headers = [(b"if-none-match", etag.encode())] if etag else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "query_string": b""})
+
+def test_etag_revalidation_and_invalidation_on_bump(tmp_path, monkeypatch) -> None:
+    """
+    Test that a repeat request hits the cache, a matching If-None-Match gets 304, and a bump changes the ETag.
+    """
+    monkeypatch.setattr(response_cache, "response_cache", ResponseCache(ttl=60))
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    SQLModel.metadata.create_all(engine)
+    builds = []
+
+    async def build() -> list:
+        builds.append(1)
+        return [{"id": "t1", "n": len(builds)}]
+
+    def get(session: Session, etag: str = None):
+        return asyncio.run(cached_json(_request(etag), session, "tracks/liked", [user_scope("u1"), LIBRARY], build))
+
+    with Session(engine) as session:
+        first = get(session)
+        assert first.status_code == 200 and first.body == b'[{"id":"t1","n":1}]'
+        etag = first.headers["etag"]
+        assert etag.startswith('W/"')
+
+        assert get(session).body == first.body and len(builds) == 1
+        assert get(session, etag).status_code == 304
+        assert len(builds) == 1
+
+        bump(session, user_scope("u2"))
+        session.commit()
+        assert get(session, etag).status_code == 304  # Other users' changes don't invalidate
+
+        bump(session, user_scope("u1"))
+        session.commit()
+        fresh = get(session, etag)
+        assert fresh.status_code == 200 and fresh.headers["etag"] != etag
+        assert fresh.body == b'[{"id":"t1","n":2}]'
+
+def test_field_projection_is_part_of_the_key(tmp_path, monkeypatch) -> None:
+    """
+    Test that `fields` trims each item and is cached separately from the full response.
+    """
+    monkeypatch.setattr(response_cache, "response_cache", ResponseCache(ttl=60))
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    SQLModel.metadata.create_all(engine)
+
+    async def build() -> list:
+        return [{"id": "t1", "title": "A", "thumbnail": "https://example.com/a.jpg"}]
+
+    with Session(engine) as session:
+        full = asyncio.run(cached_json(_request(), session, "tracks/recent", [LIBRARY], build))
+        slim = asyncio.run(cached_json(_request(), session, "tracks/recent", [LIBRARY], build, fields=("id", "title")))
+    assert slim.body == b'[{"id":"t1","title":"A"}]'
+    assert slim.headers["etag"] != full.headers["etag"]
@@ -0,0 +1,65 @@
+import asyncio
+import json
+import time
+
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.models import Track
+from app.services import search
+
+def _youtube_item(video_id: str, title: str) -> dict:
+    return {"id": video_id, "remote_id": video_id, "title": title, "artist": "Band",
+            "source_type": "youtube", "duration": 200, "thumbnail": f"https://img/{video_id}.jpg"}
+
+def _setup(tmp_path, monkeypatch, delay: float):
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(search, "engine", engine)
+    with Session(engine) as session:
+        session.add(Track(id="local-1", title="Queen Song", artist="Band", source_type="local", duration=200))
+        session.add(Track(id="yt-row", title="Queen Live", artist="Other", source_type="youtube", remote_id="known000000"))
+        session.commit()
+
+    async def fake_search(query: str, limit: int = 20) -> list:
+        await asyncio.sleep(delay)
+        return [_youtube_item("known000000", "Queen Live"), _youtube_item("new00000000", "Queen New")]
+
+    monkeypatch.setattr(search.ytmusic, "search_youtube", fake_search)
+    return engine
+
+def test_local_results_do_not_wait_past_the_deadline(tmp_path, monkeypatch) -> None:
+    """
+    Test that a slow YouTube search is cut off at the deadline and local hits are still returned.
+    """
+    engine = _setup(tmp_path, monkeypatch, delay=1.0)
+
+    async def run() -> tuple:
+        with Session(engine) as session:
+            started = time.perf_counter()
+            results, partial = await search.search(session, "Queen", 0, 20, None, deadline=0.05)
+            return results, partial, time.perf_counter() - started
+
+    results, partial, elapsed = asyncio.run(run())
+    assert partial and elapsed < 0.5
+    assert {r["id"] for r in results} == {"local-1", "yt-row"}
+
+def test_merge_and_progressive_events(tmp_path, monkeypatch) -> None:
+    """
+    Test that known YouTube items are replaced by their rows, backfilled, and streamed after the local event.
+    """
+    engine = _setup(tmp_path, monkeypatch, delay=0.01)
+
+    async def collect() -> list:
+        return [json.loads(line) async for line in search.search_events("Queen", 0, 20, None, timeout=5)]
+
+    events = asyncio.run(collect())
+    assert [e["type"] for e in events] == ["local", "youtube", "done"]
+    assert {i["id"] for i in events[0]["items"]} == {"local-1", "yt-row"}
+    # The known video was already sent as a library row, so only the new one follows
+    assert [i["id"] for i in events[1]["items"]] == ["new00000000"]
+    assert events[2]["partial"] is False
+
+    with Session(engine) as session:
+        merged = search.merge_search_results(session, [_youtube_item("known000000", "Queen Live")], set())
+        assert merged[0]["id"] == "yt-row"
+        assert session.get(Track, "yt-row").thumbnail == "https://img/known000000.jpg"
@@ -0,0 +1,75 @@
+from sqlmodel import Session
+
+from app.models import PlaylistTrack, Track, UserActivity
+from app.services import shuffle
+from app.services.shuffle import SeededPermutation, weighted_order
+
+def _clear_caches(monkeypatch) -> None:
+    monkeypatch.setattr(shuffle, "_collections", shuffle._LRU(shuffle.MAX_COLLECTIONS))
+    monkeypatch.setattr(shuffle, "_orders", shuffle._LRU(shuffle.MAX_ORDERS))
+
+def test_permutation_is_a_seeded_bijection() -> None:
+    """
+    Test that every position maps to a distinct index, reproducibly per seed.
+    """
+    for size in (1, 2, 3, 17, 1000, 4097):
+        order = [SeededPermutation(size, 7)[i] for i in range(size)]
+        assert sorted(order) == list(range(size))
+    first = [SeededPermutation(1000, 7)[i] for i in range(20)]
+    assert first == [SeededPermutation(1000, 7)[i] for i in range(20)]
+    assert first != [SeededPermutation(1000, 8)[i] for i in range(20)]
+    assert first != list(range(20))
+
+def test_weighted_order_favours_heavy_keys() -> None:
+    """
+    Test that a key weighing as much as all others together usually comes early.
+    """
+    from array import array
+
+    keys = array("q", range(100))
+    early = sum(weighted_order(keys, {42: 99.0}, seed).index(42) < 10 for seed in range(200))
+    assert early > 150
+    assert list(weighted_order(keys, {}, 3)) == list(weighted_order(keys, {}, 3))
+
+def test_library_pages_cover_the_library_once(session: Session, monkeypatch) -> None:
+    """
+    Test that consecutive pages of one seed cover every non-duplicate track once.
+    """
+    _clear_caches(monkeypatch)
+    for index in range(25):
+        session.add(Track(id=f"t{index}", title=f"Song {index}", source_type="local"))
+    session.add(Track(id="dup", title="Song 0", source_type="youtube", canonical_id="t0"))
+    session.commit()
+
+    collection = shuffle.library_collection(session)
+    pages = [shuffle.library_page(session, shuffle.page_keys(collection, 5, offset, 10)) for offset in (0, 10, 20)]
+    ids = [row["id"] for page in pages for row in page]
+    assert sorted(ids) == sorted(f"t{index}" for index in range(25))
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert "rowid" not in pages[0][0]
+
+def test_playlist_collection_reloads_on_membership_change(session: Session, monkeypatch) -> None:
+    """
+    Test that adding an entry refreshes the key array and liked entries are weighted.
+    """
+    _clear_caches(monkeypatch)
+    for index in range(3):
+        session.add(Track(id=f"t{index}", title=f"Song {index}", source_type="local"))
+        session.add(PlaylistTrack(playlist_id="p1", track_id=f"t{index}", position=index))
+    session.add(UserActivity(user_id="u1", track_id="t1", is_liked=True))
+    session.commit()
+
+    collection = shuffle.playlist_collection(session, "p1")
+    assert len(collection.keys) == 3
+    assert shuffle.playlist_collection(session, "p1") is collection
+
+    session.add(PlaylistTrack(playlist_id="p1", track_id="t0", position=10))
+    session.commit()
+    collection = shuffle.playlist_collection(session, "p1")
+    assert len(collection.keys) == 4
+
+    weights = shuffle.playlist_weights(session, "p1", "u1", "likes")
+    assert list(weights.values()) == [shuffle.LIKE_WEIGHT]
+    keys = shuffle.page_keys(collection, 1, 0, 10, ("likes", "u1"), lambda: weights)
+    page = shuffle.playlist_page(session, keys)
+    assert sorted(row["entry_id"] for row in page) == sorted(collection.keys)
@@ -0,0 +1,127 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.models import SmartPlaylist, SmartPlaylistTrack, Track, UserActivity
+from app.services import catalog, smart_playlists
+
+def _playlist(session: Session, rules, sort: str = "added", limit: int = 100, match: str = "all") -> SmartPlaylist:
+    playlist = SmartPlaylist(id=str(uuid.uuid4()), owner_id="u1", name="x", rules="[]", max_tracks=0)
+    smart_playlists.define(playlist, "x", rules, match, sort, limit)
+    smart_playlists.refresh(session, playlist)
+    session.commit()
+    return playlist
+
+def _members(session: Session, playlist: SmartPlaylist):
+    return list(session.exec(smart_playlists.members_statement(playlist, Track.id)).all())
+
+def _activity(session: Session, track_id: str, **values) -> None:
+    activity = session.get(UserActivity, ("u1", track_id)) or UserActivity(user_id="u1", track_id=track_id)
+    for name, value in values.items():
+        setattr(activity, name, value)
+    session.add(activity)
+    smart_playlists.activity_changed(session, "u1", track_id)
+    session.commit()
+
+def test_compile_validates_rules_and_detects_activity_joins() -> None:
+    """
+    Test that malformed rules are rejected and activity-only rule sets use an inner join.
+    """
+    for rule in (
+        {"field": "mood", "op": "is", "value": "x"},
+        {"field": "plays", "op": "contains", "value": 1},
+        {"field": "plays", "op": "gt", "value": True},
+        {"field": "last_played", "op": "in_last", "value": 0},
+    ):
+        with pytest.raises(ValueError):
+            smart_playlists.compile_rules([rule], "all")
+
+    liked = {"field": "liked", "op": "is", "value": True}
+    short = {"field": "duration", "op": "lt", "value": 300}
+    assert smart_playlists.compile_rules([liked, short], "all").needs_activity
+    assert not smart_playlists.compile_rules([liked, short], "any").needs_activity
+    assert not smart_playlists.compile_rules([{"field": "plays", "op": "lt", "value": 1}], "all").needs_activity
+    assert smart_playlists.compile_rules([{"field": "added", "op": "in_last", "value": 7}], "all").timed
+
+def test_membership_follows_plays_and_likes(session: Session) -> None:
+    """
+    Test "liked but not played in 30 days" through likes and plays without a full refresh.
+    """
+    old = datetime.now(timezone.utc) - timedelta(days=60)
+    for index in range(3):
+        session.add(Track(id=f"t{index}", title=f"Song {index}", source_type="local"))
+    session.add(UserActivity(user_id="u1", track_id="t0", is_liked=True, last_played=old, play_count=1))
+    session.add(UserActivity(user_id="u1", track_id="t1", is_liked=True, last_played=datetime.now(timezone.utc)))
+    session.commit()
+
+    playlist = _playlist(session, [
+        {"field": "liked", "op": "is", "value": True},
+        {"field": "last_played", "op": "not_in_last", "value": 30},
+    ])
+    assert playlist.needs_activity and playlist.timed
+    assert _members(session, playlist) == ["t0"]
+
+    _activity(session, "t2", is_liked=True)
+    _activity(session, "t0", play_count=2, last_played=datetime.now(timezone.utc))
+    assert _members(session, playlist) == ["t2"]
+    assert (playlist.track_count, playlist.stale) == (1, False)
+
+def test_capped_playlist_evicts_lowest_ranked_and_marks_stale_on_drop(session: Session) -> None:
+    """
+    Test that a full "most played" playlist keeps its top tracks as play counts change.
+    """
+    for index, plays in enumerate((5, 3, 1)):
+        session.add(Track(id=f"t{index}", title=f"Song {index}", source_type="local"))
+        session.add(UserActivity(user_id="u1", track_id=f"t{index}", play_count=plays))
+    session.commit()
+
+    playlist = _playlist(session, [{"field": "plays", "op": "gte", "value": 1}], sort="plays", limit=2)
+    assert _members(session, playlist) == ["t0", "t1"]
+
+    _activity(session, "t2", play_count=4)
+    assert _members(session, playlist) == ["t0", "t2"]
+    assert playlist.track_count == 2
+
+    _activity(session, "t0", play_count=0)
+    assert playlist.stale and smart_playlists.needs_refresh(playlist)
+    smart_playlists.refresh(session, playlist)
+    assert _members(session, playlist) == ["t2", "t1"]
+
+def test_indexed_tracks_join_matching_playlists(session: Session) -> None:
+    """
+    Test that a new track is checked against track-only playlists and duplicates leave them.
+    """
+    playlist = _playlist(session, [
+        {"field": "artist", "op": "is", "value": "Radiohead"},
+        {"field": "duration", "op": "lt", "value": 300},
+    ])
+    liked = _playlist(session, [{"field": "liked", "op": "is", "value": True}])
+
+    for track_id, artist, duration in (("t0", "Radiohead ft. Thom Yorke", 200), ("t1", "Radiohead", 400), ("t2", "Muse", 100)):
+        track = Track(id=track_id, title=track_id, artist=artist, duration=duration, source_type="local")
+        catalog.add_track(session, track)
+        smart_playlists.track_added(session, track)
+    session.commit()
+    assert _members(session, playlist) == ["t0"]
+    assert liked.track_count == 0
+
+    smart_playlists.track_removed(session, "t0")
+    session.commit()
+    assert _members(session, playlist) == []
+
+def test_evaluation_budget_interrupts_costly_rules(session: Session, monkeypatch) -> None:
+    """
+    Test that a full evaluation over its step budget is aborted with RulesTooExpensive.
+    """
+    for index in range(500):
+        session.add(Track(id=f"t{index}", title=f"Song {index}", source_type="local"))
+    session.commit()
+
+    monkeypatch.setattr(settings, "SMART_PLAYLIST_MAX_STEPS", 2000)
+    with pytest.raises(smart_playlists.RulesTooExpensive):
+        _playlist(session, [{"field": "title", "op": "contains", "value": "9"}])
+    session.rollback()
+    assert session.exec(select(SmartPlaylistTrack)).all() == []
@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+from starlette.requests import Request
+
+from app.auth_utils import create_access_token
+from app.services.stream_scheduler import (
+    KBPS, PacedFileResponse, StreamScheduler, fair_shares, parse_limits, stream_owner
+)
+
+def test_fair_shares_give_leftovers_to_larger_demands() -> None:
+    """
+    Test that small demands are met in full and the rest is split evenly.
+    """
+    assert fair_shares(100, {"a": 10, "b": 60, "c": 60}) == {"a": 10, "b": 45, "c": 45}
+    assert fair_shares(100, {"a": 10, "b": 20}) == {"a": 10, "b": 20}
+    assert fair_shares(None, {"a": 10}) == {"a": 10}
+    assert parse_limits("u1=500, ip:1.2.3.4=0,bad") == {"u1": 500.0, "ip:1.2.3.4": 0.0}
+
+def test_listeners_share_fairly_before_their_streams() -> None:
+    """
+    Test that a listener with three streams gets no more than one with a single stream,
+    that listener caps apply, and that closing a stream frees its share.
+    """
+    scheduler = StreamScheduler(uplink_kbps=1200, pace_multiplier=2, burst_seconds=10, default_kbps=160)
+    greedy = [scheduler.open(f"t{index}", "u1", "youtube") for index in range(3)]
+    polite = scheduler.open("t9", "u2", "file", bitrate_kbps=320)
+    assert round(polite.rate / KBPS) == 600
+    assert [round(stream.rate / KBPS) for stream in greedy] == [200, 200, 200]
+
+    scheduler.close(greedy[0])
+    scheduler.close(greedy[1])
+    assert round(greedy[2].rate / KBPS) == 320
+    assert round(polite.rate / KBPS) == 640
+
+    capped = StreamScheduler(uplink_kbps=0, pace_multiplier=2, burst_seconds=10, default_kbps=160,
+                             user_kbps=100, user_limits={"vip": 0})
+    assert round(capped.open("t1", "u1", "file").rate / KBPS) == 100
+    assert round(capped.open("t1", "vip", "file").rate / KBPS) == 320
+    assert capped.snapshot()["active"] == 2
+
+def test_listeners_behind_the_proxy_get_separate_shares(monkeypatch) -> None:
+    """
+    Test that anonymous clients reaching the app through Caddy are told apart by their
+    forwarded address, so each gets a fair share and their own cap.
+    """
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "TRUSTED_PROXIES", "172.16.0.0/12")
+
+    def request(headers: dict) -> Request:
+        raw = [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+        return Request({"type": "http", "client": ("172.18.0.3", 1234), "headers": raw})
+
+    first = stream_owner(request({"X-Forwarded-For": "192.168.1.20"}))
+    second = stream_owner(request({"X-Forwarded-For": "172.18.0.5", "CF-Connecting-IP": "203.0.113.7"}))
+    user = stream_owner(request({"Authorization": f"Bearer {create_access_token({'sub': 'u1'})}"}))
+    assert (first, second, user) == ("ip:192.168.1.20", "ip:203.0.113.7", "u1")
+
+    scheduler = StreamScheduler(uplink_kbps=600, pace_multiplier=2, burst_seconds=10, default_kbps=160, user_kbps=250)
+    greedy = [scheduler.open(f"t{index}", first, "youtube") for index in range(3)]
+    other = scheduler.open("t9", second, "youtube")
+    assert round(other.rate / KBPS) == 250
+    assert round(sum(stream.rate for stream in greedy) / KBPS) == 250
+
+def test_file_response_bursts_then_paces(tmp_path) -> None:
+    """
+    Test that a file is sent through a registered stream, its burst immediately and
+    the rest at the paced rate, with Range requests still honoured.
+    """
+    path = tmp_path / "song.mp3"
+    path.write_bytes(b"x" * 30000)
+    # 100 KB/s pace with a 10 KB burst: the 30 KB file needs about 0.2 s
+    scheduler = StreamScheduler(uplink_kbps=0, pace_multiplier=1, burst_seconds=0.1, default_kbps=800)
+
+    async def get(headers: list) -> tuple:
+        sent = []
+
+        async def receive() -> dict:
+            raise AssertionError("ASGI 2.4 responses do not wait for a disconnect")
+
+        async def send(message: dict) -> None:
+            sent.append(message)
+
+        pacing = {"track_id": "t1", "owner": "u1", "source": "file"}
+        response = PacedFileResponse(str(path), pacing, scheduler=scheduler)
+        scope = {"type": "http", "asgi": {"spec_version": "2.4"}, "method": "GET", "headers": headers}
+        await response(scope, receive, send)
+        return sent[0]["status"], b"".join(message.get("body", b"") for message in sent[1:])
+
+    started = time.monotonic()
+    status, body = asyncio.run(get([]))
+    elapsed = time.monotonic() - started
+    assert (status, body) == (200, b"x" * 30000)
+    assert 0.15 <= elapsed < 2
+    assert scheduler.snapshot()["active"] == 0
+
+    status, body = asyncio.run(get([(b"range", b"bytes=0-99")]))
+    assert (status, len(body)) == (206, 100)
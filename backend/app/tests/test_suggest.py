@@ -0,0 +1,66 @@
+from sqlmodel import Session, delete
+
+from app.models import Track
+from app.services.suggest import SuggestIndex
+
+def _index(session: Session) -> SuggestIndex:
+    session.add(Track(id="t1", title="Let It Be", artist="The Beatles", album="Let It Be", source_type="local"))
+    session.add(Track(id="t2", title="Hey Jude", artist="The Beatles", source_type="local"))
+    session.add(Track(id="t3", title="Beat It", artist="Michael Jackson", album="Thriller", source_type="local"))
+    session.add(Track(id="t4", title="Bohemian Rhapsody", artist="Queen", source_type="local"))
+    session.add(Track(id="t5", title="Hey Jude", artist="The Beatles", source_type="youtube",
+                      remote_id="vid", canonical_id="t2"))
+    session.commit()
+    index = SuggestIndex()
+    index.rebuild(session)
+    return index
+
+def _texts(results: list) -> list:
+    return [r["text"] for r in results]
+
+def test_prefix_matches_term_and_word_starts(session: Session) -> None:
+    """
+    Test that a prefix matches the start of any word, term starts first, duplicates skipped.
+    """
+    index = _index(session)
+    assert _texts(index.suggest("beat")) == ["Beat It", "The Beatles"]
+    assert index.suggest("hey") == [{"text": "Hey Jude", "kind": "title"}]
+    assert index.suggest("  ") == []
+
+def test_typos_fall_back_to_trigram_matches(session: Session) -> None:
+    """
+    Test that misspelled input still finds close terms, but unrelated input finds nothing.
+    """
+    index = _index(session)
+    assert _texts(index.suggest("bohemain")) == ["Bohemian Rhapsody"]
+    assert "The Beatles" in _texts(index.suggest("beatels"))
+    assert index.suggest("xqzw") == []
+
+def test_incremental_updates_survive_rebuild(session: Session) -> None:
+    """
+    Test that added tracks are found at once and recorded queries outlive a rebuild.
+    """
+    index = _index(session)
+    index.add_track("Café del Mar", "Energy 52", None)
+    assert index.suggest("cafe") == [{"text": "Café del Mar", "kind": "title"}]
+
+    index.record_query("u1", "queen live")
+    index.record_query("u1", "Queen Live")
+    session.exec(delete(Track))
+    session.commit()
+    index.rebuild(session)
+    assert index.suggest("queen", user_id="u1") == [{"text": "queen live", "kind": "query"}]
+    assert index.suggest("live", user_id="u1") == [{"text": "queen live", "kind": "query"}]
+    assert index.suggest("cafe", user_id="u1") == []
+
+def test_queries_are_only_suggested_to_their_user(session: Session) -> None:
+    """
+    Test that a user's searches are not suggested to other users or anonymous callers,
+    while library terms are suggested to everyone.
+    """
+    index = _index(session)
+    index.record_query("u1", "hey there delilah")
+    assert _texts(index.suggest("hey", user_id="u1")) == ["Hey Jude", "hey there delilah"]
+    assert _texts(index.suggest("hey", user_id="u2")) == ["Hey Jude"]
+    assert _texts(index.suggest("hey")) == ["Hey Jude"]
+    assert index.suggest("delilah") == []
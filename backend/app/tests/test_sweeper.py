@@ -0,0 +1,56 @@
+import os
+import time
+
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.models import Track
+from app.services import inventory, sweeper
+
+def test_sweep_clears_partials_enforces_budget_and_repairs_rows(tmp_path, monkeypatch) -> None:
+    """
+    Test one sweep: stale partials go, the temp budget evicts the oldest file, and rows are fixed in bulk.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'sweep.db'}")
+    SQLModel.metadata.create_all(engine)
+    cache, temp = tmp_path / "cache", tmp_path / "temp"
+    cache.mkdir()
+    temp.mkdir()
+    for module in (sweeper, inventory):
+        monkeypatch.setattr(module, "engine", engine)
+    monkeypatch.setattr(sweeper.settings, "CACHE_DIR", str(cache))
+    monkeypatch.setattr(sweeper.settings, "TEMP_DIR", str(temp))
+    monkeypatch.setattr(sweeper.settings, "TEMP_CACHE_MAX_GB", 150 / 1024 ** 3)
+    old = time.time() - 7200
+
+    (temp / "stale.mp3.download").write_bytes(b"x" * 10)
+    os.utime(temp / "stale.mp3.download", (old, old))
+    (temp / "live.mp3.download").write_bytes(b"x" * 10)
+    (temp / "evicted0000.mp3").write_bytes(b"x" * 100)
+    os.utime(temp / "evicted0000.mp3", (old, old))
+    (temp / "adopted0000.mp3").write_bytes(b"x" * 100)
+    (cache / "promoted000.mp3").write_bytes(b"x" * 100)
+
+    with Session(engine) as session:
+        session.add(Track(id="a", title="Evicted", source_type="youtube", remote_id="evicted0000",
+                          is_cached=True, local_path=str(temp / "evicted0000.mp3")))
+        session.add(Track(id="b", title="Promoted", source_type="youtube", remote_id="promoted000",
+                          is_cached=True, local_path=str(temp / "promoted000.mp3")))
+        session.add(Track(id="c", title="Adopted", source_type="youtube", remote_id="adopted0000"))
+        session.add(Track(id="d", title="Gone", source_type="youtube", remote_id="gone0000000",
+                          is_cached=True, local_path=str(temp / "gone0000000.mp3")))
+        session.add(Track(id="e", title="Local", source_type="local", local_path=str(tmp_path / "missing.mp3")))
+        session.commit()
+
+    summary = sweeper.run_sweep()
+    assert summary.startswith("1 stale partials removed, 1 temp files evicted")
+
+    assert not (temp / "stale.mp3.download").exists() and (temp / "live.mp3.download").exists()
+    assert not (temp / "evicted0000.mp3").exists()
+    with Session(engine) as session:
+        tracks = {t.id: t for t in session.exec(select(Track)).all()}
+        assert (tracks["a"].is_cached, tracks["a"].local_path) == (False, None)
+        assert tracks["b"].local_path == str(cache / "promoted000.mp3")
+        assert tracks["c"].is_cached and tracks["c"].local_path == str(temp / "adopted0000.mp3")
+        assert (tracks["d"].is_cached, tracks["d"].local_path) == (False, None)
+        assert tracks["e"].local_path  # Library rows are reported, not rewritten
+        assert inventory.snapshot(session)["missing_rows"] == 1
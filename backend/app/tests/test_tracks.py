@@ -0,0 +1,37 @@
+import asyncio
+
+from sqlmodel import Session
+
+from app.models import Track
+from app.services import tracks
+
+def test_resolve_tracks_indexes_unknown_ids_with_bounded_concurrency(engine, monkeypatch) -> None:
+    """
+    Test that known IDs come from the database and unknown YouTube IDs are fetched in parallel, within the limit.
+    """
+    running, peak = 0, 0
+
+    async def fake_get_song(video_id: str) -> dict:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if video_id == "deadvideo00":
+            return None
+        return {"videoDetails": {"title": f"Song {video_id}", "author": "Band", "lengthSeconds": "200"}}
+
+    monkeypatch.setattr(tracks.ytmusic, "get_song", fake_get_song)
+    with Session(engine) as session:
+        session.add(Track(id="local-1", title="Known", source_type="youtube", remote_id="knownvideo0"))
+        session.commit()
+
+        wanted = ["knownvideo0", "local-1", "deadvideo00"] + [f"newvideo{i:03d}" for i in range(10)]
+        resolved = asyncio.run(tracks.resolve_tracks(session, wanted, concurrency=3))
+
+        assert resolved["knownvideo0"].id == resolved["local-1"].id == "local-1"
+        assert "deadvideo00" not in resolved
+        assert resolved["newvideo005"].title == "Song newvideo005"
+        assert resolved["newvideo005"].duration == 200
+        assert peak == 3
+        assert len(session.exec(Track.__table__.select()).all()) == 11
@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+import pytest
+from ytmusicapi.exceptions import YTMusicServerError
+
+from app.services.ytmusic_client import YTMusicClient, _is_retryable
+from app.utils.rate_limiter import TokenBucket
+
+class _FlakyYTMusic:
+    """
+    Stand-in for YTMusic that fails with the given errors before succeeding.
+    """
+    def __init__(self, errors: list) -> None:
+        self.errors = list(errors)
+        self.calls = 0
+
+    def get_song(self, video_id: str) -> dict:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"videoDetails": {"videoId": video_id}}
+
+def _client(fake: _FlakyYTMusic) -> YTMusicClient:
+    client = YTMusicClient(max_workers=2, rate_per_sec=1000, burst=1000, max_retries=2, backoff_base=0.001)
+    client._yt = fake
+    return client
+
+def test_retryable_errors() -> None:
+    """
+    Test that only throttling and server errors are retried.
+    """
+    assert _is_retryable(YTMusicServerError("Server returned HTTP 429: Too Many Requests."))
+    assert _is_retryable(YTMusicServerError("Server returned HTTP 503: Service Unavailable."))
+    assert not _is_retryable(YTMusicServerError("Server returned HTTP 404: Not Found."))
+    assert not _is_retryable(ValueError("bad input"))
+
+def test_call_retries_on_429() -> None:
+    """
+    Test that a throttled call is retried and eventually succeeds.
+    """
+    fake = _FlakyYTMusic([YTMusicServerError("Server returned HTTP 429: Too Many Requests.")])
+    result = asyncio.run(_client(fake).get_song("abc"))
+    assert result["videoDetails"]["videoId"] == "abc"
+    assert fake.calls == 2
+
+def test_call_gives_up_after_max_retries() -> None:
+    """
+    Test that retries are bounded and non-retryable errors are raised immediately.
+    """
+    error = YTMusicServerError("Server returned HTTP 500: Internal Server Error.")
+    fake = _FlakyYTMusic([error] * 5)
+    with pytest.raises(YTMusicServerError):
+        asyncio.run(_client(fake).get_song("abc"))
+    assert fake.calls == 3
+
+    fake = _FlakyYTMusic([YTMusicServerError("Server returned HTTP 400: Bad Request.")])
+    with pytest.raises(YTMusicServerError):
+        asyncio.run(_client(fake).get_song("abc"))
+    assert fake.calls == 1
+
+def test_token_bucket_paces_after_burst() -> None:
+    """
+    Test that the bucket allows a burst and then asks callers to wait.
+    """
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+    assert not bucket.try_acquire()
+
+    started = time.monotonic()
+    asyncio.run(TokenBucket(rate=50, capacity=1).acquire_async(2))
+    assert time.monotonic() - started >= 0.015
+
+def test_client_is_constructed_lazily() -> None:
+    """
+    Test that creating the client does not build `YTMusic` until the first call.
+    """
+    client = YTMusicClient()
+    assert client._yt is None
+    client._yt = _FlakyYTMusic([])
+    assert asyncio.run(client.get_song("abc")) == {"videoDetails": {"videoId": "abc"}}
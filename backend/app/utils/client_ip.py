@@ -0,0 +1,49 @@
+import ipaddress
+from functools import lru_cache
+from typing import List, Optional, Union
+
+from starlette.requests import HTTPConnection
+
+from app.config import settings
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+@lru_cache(maxsize=8)
+def _networks(spec: str) -> List[Network]:
+    return [ipaddress.ip_network(part.strip(), strict=False) for part in spec.split(",") if part.strip()]
+
+def _trusted(address: str, spec: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in _networks(spec))
+
+def client_ip(request: HTTPConnection, trusted_proxies: Optional[str] = None) -> str:
+    """
+    Address of the client behind our reverse proxies.
+
+    Requests reach the app through Caddy (and, from outside, the Cloudflare tunnel
+    connector), so the socket peer is always a proxy. Starting from the peer, each
+    hop that is a trusted proxy (TRUSTED_PROXIES) is replaced by the address it
+    forwarded for, taken from the right end of X-Forwarded-For. If every hop is
+    trusted, as for the tunnel connector, Cloudflare's CF-Connecting-IP names the
+    client. Headers from untrusted peers are ignored, so they cannot be spoofed.
+
+    Args:
+        request: The incoming request (or WebSocket).
+        trusted_proxies: Comma-separated addresses/networks; defaults to TRUSTED_PROXIES.
+
+    Returns:
+        The client's IP address, or "unknown".
+    """
+    spec = settings.TRUSTED_PROXIES if trusted_proxies is None else trusted_proxies
+    address = request.client.host if request.client else "unknown"
+    if not _trusted(address, spec):
+        return address
+    hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        address = hop
+        if not _trusted(address, spec):
+            return address
+    return request.headers.get("cf-connecting-ip", address).strip()
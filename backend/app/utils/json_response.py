@@ -0,0 +1,34 @@
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the standard library encoder
+    orjson = None
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    return jsonable_encoder(value)
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode `content` as compact UTF-8 JSON.
+
+    With orjson installed, dicts, lists, datetimes and UUIDs are encoded natively
+    in one pass; other values go through `jsonable_encoder`.
+
+    Args:
+        content: Data to encode.
+
+    Returns:
+        The JSON document.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
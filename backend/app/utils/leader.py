@@ -0,0 +1,104 @@
+import fcntl
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, IO, Iterator, Optional
+
+from app.config import settings
+from app.utils.logger import setup_logger
+
+_logger = setup_logger(__name__)
+
+def default_lock_dir() -> str:
+    """
+    Directory holding the inter-process lock files: next to the SQLite database when possible.
+    """
+    if settings.DATABASE_URL.startswith("sqlite:///"):
+        db_path = settings.DATABASE_URL.replace("sqlite:///", "")
+        return os.path.dirname(db_path) or "."
+    return settings.CACHE_DIR
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """
+    Hold an exclusive advisory lock on `path` for the duration of the block (blocking).
+    Used to serialise one-off work such as schema migration between worker processes.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+class LeaderElection:
+    """
+    Elect one leader among the worker processes sharing a lock file.
+
+    The leader holds a non-blocking `flock` on the file for its whole lifetime; the
+    kernel releases it when the process exits, so a follower retrying every
+    `retry_interval` seconds takes over after a crash. Work that must run once per
+    deployment (watcher, indexer, job workers) is started from `on_elected`.
+    """
+    def __init__(self, path: str, retry_interval: float = 10.0) -> None:
+        self.path = path
+        self.retry_interval = retry_interval
+        self._handle: Optional[IO] = None
+        self._stop = threading.Event()
+
+    @property
+    def is_leader(self) -> bool:
+        return self._handle is not None
+
+    def try_acquire(self) -> bool:
+        """
+        Try to become leader without blocking.
+
+        Returns:
+            True if this process is (now) the leader.
+        """
+        if self._handle is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        handle = open(self.path, "a+")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        handle.seek(0)
+        handle.truncate()
+        handle.write(str(os.getpid()))
+        handle.flush()
+        self._handle = handle
+        return True
+
+    def release(self) -> None:
+        """
+        Give up leadership (stops the retry loop).
+        """
+        self._stop.set()
+        if self._handle is not None:
+            fcntl.flock(self._handle, fcntl.LOCK_UN)
+            self._handle.close()
+            self._handle = None
+
+    def run(self, on_elected: Callable[[], None]) -> None:
+        """
+        Campaign in a background thread and call `on_elected` once leadership is won.
+        """
+        def campaign() -> None:
+            while not self._stop.is_set():
+                if self.try_acquire():
+                    _logger.info("Process %d elected leader", os.getpid())
+                    try:
+                        on_elected()
+                    except Exception:
+                        _logger.exception("Leader startup failed")
+                    return
+                self._stop.wait(self.retry_interval)
+
+        if not self.try_acquire():
+            _logger.info("Process %d running as follower", os.getpid())
+        threading.Thread(target=campaign, name="leader-election", daemon=True).start()
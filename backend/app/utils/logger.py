@@ -1,36 +1,154 @@
+import atexit
 import logging
+import queue
 import sys
 import os
-from logging.handlers import RotatingFileHandler
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+from app.config import settings
+from app.utils.rate_limiter import TokenBucket
+
+_TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger, message and any traceback.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return orjson.dumps(entry).decode()
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Enqueues records for the listener thread after merging their arguments into the
+    message (arguments may change once the call returns). Unlike the stock
+    QueueHandler, the record is not formatted here: that is the writer's job.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def _parse_levels(spec: str) -> List[Tuple[str, int]]:
+    """
+    Parse "app.services.streamer=WARNING,app.indexer=DEBUG" into (prefix, level) pairs, longest prefix first.
+    """
+    levels = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        prefix, _, level = item.partition("=")
+        levels.append((prefix.strip(), logging.getLevelName(level.strip().upper())))
+    return sorted(levels, key=lambda pair: len(pair[0]), reverse=True)
+
+def level_for(name: str, default: str, spec: str) -> int:
+    """
+    Level of logger `name`: that of the longest matching module prefix in `spec`, else `default`.
+    """
+    for prefix, level in _parse_levels(spec):
+        if isinstance(level, int) and (name == prefix or name.startswith(prefix + ".")):
+            return level
+    return logging.getLevelName(default.upper())
+
+_queue_handler: Optional[QueueHandler] = None
+_listener: Optional[QueueListener] = None
+_setup_lock = threading.Lock()
+
+def _writer_handlers() -> List[logging.Handler]:
+    formatter = JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(_TEXT_FORMAT)
+
+    # 1. Console Handler (for docker logs)
+    handlers: List[logging.Handler] = [logging.StreamHandler(sys.stdout)]
+
+    # 2. Rotating File Handler (for persistence on SSD)
+    # We store it in /app/db which is a persistent volume
+    if settings.LOG_DIR and os.path.exists(settings.LOG_DIR):
+        handlers.append(RotatingFileHandler(
+            os.path.join(settings.LOG_DIR, "app.log"),
+            maxBytes=5*1024*1024, # 5MB
+            backupCount=5
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+def _shared_queue_handler() -> QueueHandler:
+    """
+    The queue handler shared by every logger, starting the single writer thread on first use.
+    """
+    global _queue_handler, _listener
+    with _setup_lock:
+        if _queue_handler is None:
+            records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+            _listener = QueueListener(records, *_writer_handlers(), respect_handler_level=True)
+            _listener.start()
+            # Drains the queue so records logged during shutdown are still written
+            atexit.register(_listener.stop)
+            _queue_handler = _DeferredQueueHandler(records)
+    return _queue_handler
 
 def setup_logger(name: str) -> logging.Logger:
     """
-    Set up a logger with a standard format, console handler, and rotating file handler.
+    Set up a logger whose records are written by one background thread.
+
+    Logging calls only enqueue the record, so console and file writes (and file
+    rotation) never run on the caller's thread, such as the event loop. The
+    level comes from LOG_LEVELS (per module prefix) or LOG_LEVEL, and the output
+    format from LOG_FORMAT ("text" or "json").
     """
     logger = logging.getLogger(name)
-    
+
     if not logger.handlers:
-        logger.setLevel(logging.INFO)
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-
-        # 1. Console Handler (for docker logs)
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
-
-        # 2. Rotating File Handler (for persistence on SSD)
-        # We store it in /app/db which is a persistent volume
-        log_dir = "/app/db"
-        if os.path.exists(log_dir):
-            log_path = os.path.join(log_dir, "app.log")
-            file_handler = RotatingFileHandler(
-                log_path, 
-                maxBytes=5*1024*1024, # 5MB
-                backupCount=5
-            )
-            file_handler.setFormatter(formatter)
-            logger.addHandler(file_handler)
-        
+        logger.setLevel(level_for(name, settings.LOG_LEVEL, settings.LOG_LEVELS))
+        logger.addHandler(_shared_queue_handler())
+
     return logger
+
+class RateLimitedLogger(logging.LoggerAdapter):
+    """
+    Logger for per-request messages such as "Streaming request for: %s".
+
+    Each message template gets a token bucket: up to `burst` records at once and
+    `rate` per second after that. Records over budget are dropped and counted,
+    and the next one that gets through reports how many similar ones were
+    suppressed. Warnings and errors are never dropped.
+    """
+    def __init__(self, logger: logging.Logger, rate: Optional[float] = None, burst: Optional[float] = None) -> None:
+        super().__init__(logger, {})
+        self.rate = settings.LOG_REQUEST_RATE if rate is None else rate
+        self.burst = settings.LOG_REQUEST_BURST if burst is None else burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._suppressed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def log(self, level: int, msg: Any, *args: Any, **kwargs: Any) -> None:
+        if not self.isEnabledFor(level):
+            return
+        if level < logging.WARNING:
+            template = str(msg)
+            with self._lock:
+                bucket = self._buckets.get(template)
+                if bucket is None:
+                    bucket = self._buckets[template] = TokenBucket(self.rate, self.burst)
+                if not bucket.try_acquire():
+                    self._suppressed[template] = self._suppressed.get(template, 0) + 1
+                    return
+                suppressed = self._suppressed.pop(template, 0)
+            if suppressed:
+                msg, args = f"{msg} (%d similar suppressed)", (*args, suppressed)
+        self.logger.log(level, msg, *args, **kwargs)
@@ -0,0 +1,255 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Generator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.utils.logger import setup_logger
+
+_logger = setup_logger(__name__)
+
+class RequestTrace:
+    """
+    Per-request timing record, broken down by named phases (auth, db, ytmusic, ...).
+    """
+    def __init__(self, method: str, path: str) -> None:
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.status_code: Optional[int] = None
+        self.ttfb_ms: Optional[float] = None
+        self.total_ms: Optional[float] = None
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.profile: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float) -> None:
+        """
+        Accumulate time spent in a phase. Safe to call from worker threads.
+
+        Args:
+            phase: Phase name.
+            seconds: Elapsed time in seconds.
+        """
+        with self._lock:
+            entry = self.phases.setdefault(phase, {"ms": 0.0, "count": 0})
+            entry["ms"] += seconds * 1000
+            entry["count"] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Return a JSON-serialisable representation of the trace.
+        """
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status": self.status_code,
+            "ttfb_ms": round(self.ttfb_ms or 0.0, 2),
+            "total_ms": round(self.total_ms or 0.0, 2),
+            "phases": {
+                name: {"ms": round(v["ms"], 2), "count": int(v["count"])}
+                for name, v in self.phases.items()
+            },
+            "profile": self.profile,
+        }
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+def get_current_trace() -> Optional[RequestTrace]:
+    """
+    Return the trace of the request being handled in the current context, if any.
+    """
+    return _current_trace.get()
+
+@contextmanager
+def track_phase(phase: str) -> Generator[None, None, None]:
+    """
+    Time the enclosed block and attribute it to `phase` on the current request trace.
+    Does nothing outside of a traced request.
+
+    Args:
+        phase: Phase name (e.g. "auth", "ytmusic", "ytdlp_spawn").
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(phase, time.perf_counter() - started)
+
+def install_sqlalchemy_hooks(engine: Engine) -> None:
+    """
+    Attribute SQL execution time to the "db" phase of the current request trace.
+
+    Args:
+        engine: The SQLAlchemy engine to instrument.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        starts = conn.info.get("query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add("db", elapsed)
+
+class ProfilingState:
+    """
+    Runtime profiling configuration plus a ring buffer of recent slow/sampled traces.
+    """
+    def __init__(self, threshold_ms: int, sample_rate: float, history: int = 50) -> None:
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._profiler_lock = threading.Lock()
+
+    def configure(self, threshold_ms: Optional[int] = None, sample_rate: Optional[float] = None) -> None:
+        """
+        Update the slow-request threshold and/or profiling sample rate of this worker process.
+
+        Args:
+            threshold_ms: Requests slower than this (time to first byte) are logged.
+            sample_rate: Fraction of requests (0.0 - 1.0) to run under cProfile.
+        """
+        if threshold_ms is not None:
+            self.threshold_ms = max(0, threshold_ms)
+        if sample_rate is not None:
+            self.sample_rate = min(1.0, max(0.0, sample_rate))
+        _logger.info(
+            "Profiling configured: threshold=%sms sample_rate=%s", self.threshold_ms, self.sample_rate
+        )
+
+    def maybe_start_profiler(self) -> Optional[cProfile.Profile]:
+        """
+        Start a cProfile collector for this request if it is sampled.
+        Only one request is profiled at a time since the interpreter allows a single active profiler.
+
+        Returns:
+            The running profiler, or None if the request is not sampled.
+        """
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        if not self._profiler_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is already active
+            self._profiler_lock.release()
+            return None
+        return profiler
+
+    def stop_profiler(self, profiler: cProfile.Profile, top: int = 25) -> str:
+        """
+        Stop a running profiler and render its hottest functions.
+
+        Args:
+            profiler: Profiler returned by `maybe_start_profiler`.
+            top: Number of entries to include.
+
+        Returns:
+            The pstats report sorted by cumulative time.
+        """
+        try:
+            profiler.disable()
+        finally:
+            self._profiler_lock.release()
+        buffer = io.StringIO()
+        pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(top)
+        return buffer.getvalue()
+
+    def record(self, trace: RequestTrace) -> None:
+        """
+        Log and retain the trace if it is slow or was profiled.
+
+        Args:
+            trace: The finished request trace.
+        """
+        is_slow = (trace.ttfb_ms or 0.0) >= self.threshold_ms
+        if not is_slow and trace.profile is None:
+            return
+        data = trace.to_dict()
+        self.recent.append(data)
+        if is_slow:
+            summary = dict(data)
+            summary.pop("profile", None)
+            _logger.warning("Slow request: %s", json.dumps(summary))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return the current configuration and the retained traces, newest first.
+        """
+        traces: List[Dict[str, Any]] = list(reversed(self.recent))
+        return {
+            "worker_pid": os.getpid(),
+            "threshold_ms": self.threshold_ms,
+            "sample_rate": self.sample_rate,
+            "traces": traces,
+        }
+
+profiling: ProfilingState = ProfilingState(
+    threshold_ms=settings.SLOW_REQUEST_THRESHOLD_MS,
+    sample_rate=settings.PROFILE_SAMPLE_RATE,
+)
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware recording a `RequestTrace` for every HTTP request.
+
+    The slow-request threshold is applied to the time until the response starts,
+    so long-running audio streams are only reported when they are slow to begin.
+    Sampled requests are likewise only profiled until the response starts: a
+    stream's body can take minutes, and only one request is profiled at a time.
+    """
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(scope.get("method", ""), scope.get("path", ""))
+        token = _current_trace.set(trace)
+        profiler = profiling.maybe_start_profiler()
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal profiler
+            if message["type"] == "http.response.start":
+                trace.status_code = message.get("status")
+                trace.ttfb_ms = (time.perf_counter() - trace.started) * 1000
+                if profiler is not None:
+                    trace.profile = profiling.stop_profiler(profiler)
+                    profiler = None
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            trace.total_ms = (time.perf_counter() - trace.started) * 1000
+            if trace.ttfb_ms is None:
+                trace.ttfb_ms = trace.total_ms
+            if profiler is not None:
+                trace.profile = profiling.stop_profiler(profiler)
+            _current_trace.reset(token)
+            profiling.record(trace)
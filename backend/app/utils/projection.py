@@ -0,0 +1,34 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+def parse_fields(raw: Optional[str], model: Type[BaseModel]) -> Optional[Tuple[str, ...]]:
+    """
+    Parse a `?fields=id,title,artist` projection against a response model.
+
+    Args:
+        raw: Comma-separated field names, or None/empty for the full objects.
+        model: Response model whose fields may be requested.
+
+    Returns:
+        The requested fields in order (deduplicated), or None for no projection.
+
+    Raises:
+        HTTPException: 400 if a field is not part of the model.
+    """
+    if raw is None or not raw.strip():
+        return None
+    fields = tuple(dict.fromkeys(name.strip() for name in raw.split(",") if name.strip()))
+    unknown = [name for name in fields if name not in model.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def project(items: List[Dict[str, Any]], fields: Optional[Sequence[str]]) -> List[Dict[str, Any]]:
+    """
+    Keep only `fields` of each item (fields an item lacks are left out).
+    """
+    if fields is None:
+        return items
+    return [{name: item[name] for name in fields if name in item} for item in items]
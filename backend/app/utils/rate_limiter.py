@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Tokens refill continuously at `rate` per second up to `capacity`. Callers
+    reserve a token and are told how long to wait before using it, so the same
+    bucket can pace both threads and coroutines.
+    """
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """
+        Take `tokens` from the bucket, going into debt if necessary.
+
+        Args:
+            tokens: Number of tokens to consume.
+
+        Returns:
+            Seconds the caller must wait before proceeding (0 if tokens were available).
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """
+        Take `tokens` only if they are available right now.
+
+        Args:
+            tokens: Number of tokens to consume.
+
+        Returns:
+            True if the tokens were taken, False otherwise.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """
+        Seconds until `tokens` will be available, without taking them (0 if they are now).
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def set_rate(self, rate: float) -> None:
+        """
+        Change the refill rate, crediting the time elapsed so far at the old rate.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """
+        Block the calling thread until `tokens` are available.
+        """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens: float = 1.0) -> None:
+        """
+        Wait without blocking the event loop until `tokens` are available.
+        """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+class KeyedRateLimiter:
+    """
+    One token bucket per key (e.g. client IP), for the most recently seen `max_keys` keys.
+
+    Evicting a key only forgets its debt early, and the keys evicted are those
+    idle for longest, whose buckets have mostly refilled anyway.
+    """
+    def __init__(self, rate: float, capacity: float, max_keys: int = 4096) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, key: Hashable) -> float:
+        """
+        Take a token from `key`'s bucket if one is available.
+
+        Returns:
+            0 if the call may proceed, otherwise the seconds to wait before retrying.
+        """
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(key)
+        return 0.0 if bucket.try_acquire() else bucket.wait_time()
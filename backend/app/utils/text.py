@@ -0,0 +1,73 @@
+import re
+import unicodedata
+from typing import Optional
+
+# "(Official Video)", "[Lyrics]", "(Remastered 2011)" ... are dropped before comparing titles
+_BRACKETED = re.compile(r"[\(\[\{][^\)\]\}]*[\)\]\}]")
+_FEATURING = re.compile(r"\s(feat\.?|ft\.?|featuring)\s.*$")
+_ARTIST_SEPARATORS = re.compile(r"\s*(?:,|&|;|/|\sx\s|\sfeat\.?\s|\sft\.?\s|\sfeaturing\s)\s*")
+# Featured and guest credits ("A feat. B", "A (ft. B)", "A x B"); "&", "and" and commas may be part of a band's name
+_FEATURED_CREDITS = re.compile(r"\s+[\(\[]?(?:feat\.?|ft\.?|featuring|x)\s.*$")
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+def fold_text(value: Optional[str]) -> str:
+    """
+    Lowercase, strip accents and collapse punctuation/whitespace.
+
+    Args:
+        value: Arbitrary text (may be None).
+
+    Returns:
+        The folded string, empty if `value` is empty.
+    """
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+    stripped = _NON_WORD.sub(" ", stripped.replace("&", " and "))
+    return _SPACES.sub(" ", stripped).strip()
+
+def normalise_title(title: Optional[str]) -> str:
+    """
+    Normalise a track title for matching: drop bracketed qualifiers and featured artists.
+    """
+    if not title:
+        return ""
+    base = _BRACKETED.sub(" ", title.lower())
+    base = _FEATURING.sub("", base)
+    return fold_text(base)
+
+def split_artists(artist: Optional[str]) -> list:
+    """
+    Split a free-text artist field ("A, B & C feat. D") into individual folded names.
+    """
+    if not artist:
+        return []
+    names = [fold_text(part) for part in _ARTIST_SEPARATORS.split(artist.lower())]
+    return [name for name in names if name]
+
+def primary_artist(artist: Optional[str]) -> str:
+    """
+    Return the folded name of the first credited artist.
+    """
+    names = split_artists(artist)
+    return names[0] if names else ""
+
+def main_artist_name(artist: Optional[str]) -> str:
+    """
+    Return the artist field as written without featured credits ("Mumford & Sons feat. Baaba Maal"
+    -> "Mumford & Sons"). Unlike `primary_artist`, names with "&" or commas are kept whole.
+    """
+    if not artist:
+        return ""
+    # Credits are matched on the lowercased text; lowercasing keeps offsets for all but a few scripts
+    match = _FEATURED_CREDITS.search(artist.lower())
+    name = artist[:match.start()] if match and match.start() > 0 else artist
+    return name.strip()
+
+def main_artist(artist: Optional[str]) -> str:
+    """
+    Return the folded name of the main artist, as grouped by the catalog.
+    """
+    return fold_text(main_artist_name(artist))
@@ -2,11 +2,11 @@ import time
 from pathlib import Path
 
 from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler, FileCreatedEvent, FileMovedEvent
+from watchdog.events import FileSystemEventHandler, FileCreatedEvent, FileDeletedEvent, FileMovedEvent
 from sqlmodel import Session
 
 from app.db import engine
-from app.indexer import scan_file
+from app.indexer import forget_file, scan_file
 from app.utils.logger import setup_logger
 
 _logger = setup_logger(__name__)
@@ -31,8 +31,18 @@ class LibraryHandler(FileSystemEventHandler):
         if not event.is_directory:
             _logger.info("File moved: from %s to %s", event.src_path, event.dest_path)
             with Session(engine) as session:
+                forget_file(Path(event.src_path), session)
                 scan_file(Path(event.dest_path), session)
 
+    def on_deleted(self, event: FileDeletedEvent) -> None:
+        """
+        Handle file removal.
+        """
+        if not event.is_directory:
+            _logger.info("File deleted: %s", event.src_path)
+            with Session(engine) as session:
+                forget_file(Path(event.src_path), session)
+
 def start_watcher(library_path: str) -> None:
     """
     Initialize and start the filesystem observer for the music library.